@@ -45,7 +45,11 @@
 # ======================================================================================
 
 import math
+import numpy as np
 from SNIP_functions_open import *
+from SNIP_dem_open import *
+from SNIP_routing_open import *
+from SNIP_instrumentation_open import *
 
 def distanceCalc2d(p0, p1):
     """
@@ -94,7 +98,8 @@ def distanceDistDEMPath(p0, p1):
     slope = (float((p1[2] - p0[2]))/float(distancePlanar))*100              # Slope
     return distanz, slope
 
-def aStar(rasterSize, rasterPoints, buildPoints, start, end, idp0, idp1, neighborhood, f_topo):
+@timedFunction("aStar")
+def aStar(rasterSize, rasterPoints, buildPoints, start, end, idp0, idp1, neighborhood, f_topo, demIndex=None, routing=None):
     """
     This function calculates the a* path based on a Input Raster. In case the a* search takes too long because of the many DEM-points,
     ,the function is aborted.
@@ -106,6 +111,8 @@ def aStar(rasterSize, rasterPoints, buildPoints, start, end, idp0, idp1, neighbo
     start, end              --    Id of start node, Id of end Node
     idp0, idp1              --    Coordinates of start and end node
     neighborhood            --    How large the search window is for the a* algorithm    [m]
+    demIndex                --    Grid index of the DEM with the building cells (optional)
+    routing                 --    Routing context. If the backend is not legacy, the a* search runs on CSR arrays (optional)
     
     Output Arguments:
     aStarPath               --    A* Path
@@ -114,47 +121,69 @@ def aStar(rasterSize, rasterPoints, buildPoints, start, end, idp0, idp1, neighbo
     maxNumberOfDEMPoints = 20000000          # Maximal Number of points the a* Algorithm runs on
     shortListFROM, shortListTO = [], []
     
+    useCSR = routing is not None and routing["backend"] != "legacy" and demIndex is not None and "buildingCells" in demIndex and demIndex["grid"] is not None and demIndex["uniqueCells"]
+
     # Assign FROMNODE and TONODE the closest DEM-cell Points
-    for i in rasterPoints:
-        if (i[1] - rasterSize < start[0] and start[0] < (i[1] + rasterSize)) and (i[2] - rasterSize < start[1] and start[1] <(i[2] + rasterSize)):
-            shortListFROM.append(i)
-        if (i[1] - rasterSize < end[0] and end[0] < (i[1] + rasterSize)) and (i[2] - rasterSize < end[1] and end[1] <(i[2] + rasterSize)): 
-            shortListTO.append(i)
-       
-    # Search closest point in shortList of startNode
-    fr, dist = [start[0], start[1]], 9999999999
-
-    for i in shortListFROM:
-        to = [i[1], i[2]]
-        disttoCellPoint = distanceCalc2d(fr, to)
-
-        if disttoCellPoint < dist:
-            startCell, startX, startY = i[0], i[1], i[2]
-            dist = disttoCellPoint
-
-    # Search closest point in shortList of pointTO
-    fr, dist = [end[0], end[1]], 9999999999
-    
-    for i in shortListTO:
-        to = [i[1], i[2]]
-        disttoCellPoint = distanceCalc2d(fr, to)
+    if demIndex is not None and demIndex["grid"] is not None:
+        startPos, goalPos = selectDEMCells([start[0], end[0]], [start[1], end[1]], demIndex, strictWindow=True).tolist()
+        if startPos < 0 or goalPos < 0:
+            raise Exception("ERROR: No DEM cell found for the a* search.")
+        startCell, startX, startY = rasterPoints[startPos][0], rasterPoints[startPos][1], rasterPoints[startPos][2]
+        goalCell, endX, endY = rasterPoints[goalPos][0], rasterPoints[goalPos][1], rasterPoints[goalPos][2]
+    else:
+        for i in rasterPoints:
+            if (i[1] - rasterSize < start[0] and start[0] < (i[1] + rasterSize)) and (i[2] - rasterSize < start[1] and start[1] <(i[2] + rasterSize)):
+                shortListFROM.append(i)
+            if (i[1] - rasterSize < end[0] and end[0] < (i[1] + rasterSize)) and (i[2] - rasterSize < end[1] and end[1] <(i[2] + rasterSize)): 
+                shortListTO.append(i)
+           
+        # Search closest point in shortList of startNode
+        fr, dist = [start[0], start[1]], 9999999999
+
+        for i in shortListFROM:
+            to = [i[1], i[2]]
+            disttoCellPoint = distanceCalc2d(fr, to)
+
+            if disttoCellPoint < dist:
+                startCell, startX, startY = i[0], i[1], i[2]
+                dist = disttoCellPoint
+
+        # Search closest point in shortList of pointTO
+        fr, dist = [end[0], end[1]], 9999999999
+        
+        for i in shortListTO:
+            to = [i[1], i[2]]
+            disttoCellPoint = distanceCalc2d(fr, to)
+
+            if disttoCellPoint < dist:
+                goalCell, endX, endY = i[0], i[1], i[2]
+                dist = disttoCellPoint
 
-        if disttoCellPoint < dist:
-            goalCell, endX, endY = i[0], i[1], i[2]
-            dist = disttoCellPoint
+    if useCSR:
+        # Create graph and calculate a*-path on CSR arrays
+        csrGraph, _, boundingCandidates = createDEMGraph(rasterSize, rasterPoints, buildPoints, startX, startY, endX, endY, neighborhood, f_topo, demIndex, asCSR=True)
+        recordSize("demGraph.points", len(boundingCandidates))
 
-    # Create graph
-    candidateListWithCosts, _, boundingCandidates = createDEMGraph(rasterSize, rasterPoints, buildPoints, startX, startY, endX, endY, neighborhood, f_topo)
+        if len(boundingCandidates) > maxNumberOfDEMPoints:
+            return [], []
+
+        startLocal, goalLocal = np.searchsorted(csrGraph["positions"], [startPos, goalPos]).tolist()
+        path = aStarCSR(csrGraph, startLocal, goalLocal, endX, endY, routing["backend"])
+        path = [boundingCandidates[i][0] for i in path[::-1]]
+    else:
+        # Create graph
+        candidateListWithCosts, _, boundingCandidates = createDEMGraph(rasterSize, rasterPoints, buildPoints, startX, startY, endX, endY, neighborhood, f_topo, demIndex)
+        recordSize("demGraph.points", len(boundingCandidates))
 
-    # If path searching would take too much time, quit without search
-    if len(candidateListWithCosts) > maxNumberOfDEMPoints:
-        aStarPath = []
-        boundingCandidates = []
-        return aStarPath, boundingCandidates
+        # If path searching would take too much time, quit without search
+        if len(candidateListWithCosts) > maxNumberOfDEMPoints:
+            aStarPath = []
+            boundingCandidates = []
+            return aStarPath, boundingCandidates
 
-    # Calculate a*-path
-    path = aStarAlgorithm(candidateListWithCosts, startCell, goalCell, startX, startY, endX, endY, rasterPoints)
-    path = path[::-1]
+        # Calculate a*-path
+        path = aStarAlgorithm(candidateListWithCosts, startCell, goalCell, startX, startY, endX, endY, rasterPoints)
+        path = path[::-1]
 
     #Write path out with coordinates
     if len(path) > 2:                                                #if no path was found, ArchPath list is equal to MST
@@ -244,7 +273,8 @@ def checkQuadrant(startX, startY, endX, endY):
         quadrantSituation = 4
         return quadrantSituation
 
-def createDEMGraph(rasterSize, rasterPoints, buildingPoints, startX, startY, endX, endY, neighborhood, f_topo):
+@timedFunction("createDEMGraph")
+def createDEMGraph(rasterSize, rasterPoints, buildingPoints, startX, startY, endX, endY, neighborhood, f_topo, demIndex=None, asCSR=False):
     """
     This creates a graph out of DEM points.
 
@@ -255,6 +285,8 @@ def createDEMGraph(rasterSize, rasterPoints, buildingPoints, startX, startY, end
     startX, startY       --    Start Coordinate 
     endX, endY           --    End Coordinate
     neighborhood         --    Neighborhood Criteria
+    demIndex             --    Grid index of the DEM. If it contains the building mask, the graph is created with arrays
+    asCSR                --    True: The graph is returned as CSR arrays (see createDEMGraphArrays) instead of a dictionary
  
     Output Arguments:
     pnts                 --    updated nodes
@@ -262,6 +294,16 @@ def createDEMGraph(rasterSize, rasterPoints, buildingPoints, startX, startY, end
     buildingcells        --    Raster cells where there is a buildling on it
     pointListBoundingBox --    All pnts within a bounding box
     """
+    if demIndex is not None and "buildingCells" in demIndex and demIndex["grid"] is not None and demIndex["uniqueCells"]:
+        csrGraph = createDEMGraphArrays(rasterSize, startX, startY, endX, endY, neighborhood, f_topo, demIndex)
+        buildingcells = csrGraph["ids"][csrGraph["isBuilding"]].tolist()
+        pointListBoundingBox = [rasterPoints[pos] for pos in csrGraph["positions"].tolist()]
+        if asCSR:
+            return csrGraph, buildingcells, pointListBoundingBox
+        return demGraphToDictionary(csrGraph), buildingcells, pointListBoundingBox
+    elif asCSR:
+        raise Exception("ERROR: The CSR output of the DEM graph needs a regular DEM grid with building cells.")
+
     dictionaryGraph, buildingcells, pointListBoundingBox = {}, [], []
     quadrant = checkQuadrant(startX, startY, endX, endY)                # iterate rasterPoints to read out only these points which lie in the bounding box
      
@@ -284,7 +326,18 @@ def createDEMGraph(rasterSize, rasterPoints, buildingPoints, startX, startY, end
                 pointListBoundingBox.append(i)
         
     #Check which cells are house-cells and store in list
-    for i in pointListBoundingBox:
+    if demIndex is not None and "buildingCells" in demIndex:
+        buildingMask, positionOfID = demIndex["buildingCells"], demIndex["positionOfID"]
+        for i in pointListBoundingBox:
+            if buildingMask[positionOfID[i[0]]]:
+                if i[1] == startX and i[2] == startY or i[1] == endX and i[2] == endY:                                          # Prevent that the starting or end node are classified as buildings
+                    continue
+                buildingcells.append(i[0])
+        pointListToCheck = []
+    else:
+        pointListToCheck = pointListBoundingBox
+
+    for i in pointListToCheck:
         currID, currX, currY, currZ = i[0], i[1], i[2], i[3]
 
         #Check if building is within a cell
@@ -330,6 +383,131 @@ def createDEMGraph(rasterSize, rasterPoints, buildingPoints, startX, startY, end
         dictionaryGraph[currID] = toDictionary           
     return dictionaryGraph, buildingcells, pointListBoundingBox
 
+def createDEMGraphArrays(rasterSize, startX, startY, endX, endY, neighborhood, f_topo, demIndex):
+    """
+    This function creates the graph out of the DEM points in the bounding box with array operations on the DEM grid.
+    The neighbours of all cells are found by shifting the grid in the 8 directions. As in the original graph creation,
+    only neighbours which differ in X and Y are connected and cells with buildings have no outgoing edges.
+
+    Input Arguments:
+    rasterSize           --    Size of raster cell
+    startX, startY       --    Start Coordinate
+    endX, endY           --    End Coordinate
+    neighborhood         --    Neighborhood Criteria
+    f_topo               --    Weighting factor of the topography
+    demIndex             --    Grid index of the DEM with building cells
+
+    Output Arguments:
+    csrGraph             --    Dictionary with the graph in CSR form. ids, positions (in raster points), coordinates,
+                               isBuilding: arrays with one entry per node. indptr, indices, weights: edges
+    """
+    grid, demX, demY, demZ = demIndex["grid"], demIndex["xs"], demIndex["ys"], demIndex["zs"]
+    nrOfRows, nrOfCols = grid.shape
+
+    # Bounding box (same criteria as the quadrant selection)
+    if startX <= endX:
+        xLow, xHigh = startX - neighborhood, endX + neighborhood
+    else:
+        xLow, xHigh = endX - neighborhood, startX + neighborhood
+    if startY <= endY:
+        yLow, yHigh = startY - neighborhood, endY + neighborhood
+    else:
+        yLow, yHigh = endY - neighborhood, startY + neighborhood
+
+    colLow = max(int(math.floor((xLow - demIndex["x0"]) / rasterSize)) - 1, 0)
+    colHigh = min(int(math.ceil((xHigh - demIndex["x0"]) / rasterSize)) + 1, nrOfCols - 1)
+    rowLow = max(int(math.floor((yLow - demIndex["y0"]) / rasterSize)) - 1, 0)
+    rowHigh = min(int(math.ceil((yHigh - demIndex["y0"]) / rasterSize)) + 1, nrOfRows - 1)
+
+    window = grid[rowLow:rowHigh + 1, colLow:colHigh + 1]
+    found = window >= 0
+    windowPos = np.where(found, window, 0)
+    windowX, windowY = demX[windowPos], demY[windowPos]
+    inBox = found & (windowX >= xLow) & (windowX <= xHigh) & (windowY >= yLow) & (windowY <= yHigh)
+
+    # Nodes are ordered as in the list of raster points
+    positions = np.sort(window[inBox])
+    localID = np.full(window.shape, -1, dtype=np.int64)
+    localID[inBox] = np.searchsorted(positions, window[inBox])
+
+    isStartOrEnd = (windowX == startX) & (windowY == startY) | (windowX == endX) & (windowY == endY)
+    isBuilding = inBox & demIndex["buildingCells"][windowPos] & ~isStartOrEnd
+    isOpen = inBox & ~isBuilding
+
+    # Shift the grid in all 8 directions to find the neighbours
+    paddedID = np.pad(localID, 1, constant_values=-1)
+    paddedOpen = np.pad(isOpen, 1, constant_values=False)
+    height, width = window.shape
+    fromIDs, toIDs = [], []
+
+    for dRow in (-1, 0, 1):
+        for dCol in (-1, 0, 1):
+            if dRow == 0 and dCol == 0:
+                continue
+            neighbourID = paddedID[1 + dRow:1 + dRow + height, 1 + dCol:1 + dCol + width]
+            neighbourOpen = paddedOpen[1 + dRow:1 + dRow + height, 1 + dCol:1 + dCol + width]
+            isEdge = isOpen & neighbourOpen
+            fromIDs.append(localID[isEdge])
+            toIDs.append(neighbourID[isEdge])
+
+    fromIDs, toIDs = np.concatenate(fromIDs), np.concatenate(toIDs)
+    fromPos, toPos = positions[fromIDs], positions[toIDs]
+    currX, currY, currZ = demX[fromPos], demY[fromPos], demZ[fromPos]
+    toX, toY, toZ = demX[toPos], demY[toPos], demZ[toPos]
+
+    # Neighbour criteria of the original graph creation (new 7.01.2015: only neighbours which differ in X and Y)
+    isEdge = (toX >= currX - rasterSize) & (toX <= currX + rasterSize) & (toY <= currY + rasterSize) & (toY >= currY - rasterSize)
+    isEdge &= (currX != toX) & (currY != toY)
+    fromIDs, toIDs, toPos = fromIDs[isEdge], toIDs[isEdge], toPos[isEdge]
+    currX, currY, currZ, toX, toY, toZ = currX[isEdge], currY[isEdge], currZ[isEdge], toX[isEdge], toY[isEdge], toZ[isEdge]
+
+    # Neighbours of a node are in the order of the list of raster points
+    order = np.lexsort((toPos, fromIDs))
+    fromIDs, toIDs = fromIDs[order], toIDs[order]
+    currX, currY, currZ, toX, toY, toZ = currX[order], currY[order], currZ[order], toX[order], toY[order], toZ[order]
+
+    # Weighted distances
+    heightDiff = toZ - currZ
+    distanz2d = applyOnUniqueValues(math.hypot, currX - toX, currY - toY)
+    distanz3d = np.sqrt(applyOnUniqueValues(lambda v: pow(v, 2), distanz2d) + applyOnUniqueValues(lambda v: pow(v, 2), heightDiff))
+    factor = np.where(heightDiff == 0, 1.0, applyOnUniqueValues(lambda v: float(abs(v)**f_topo), heightDiff))
+
+    isBuildingNode = np.zeros(len(positions), dtype=bool)
+    isBuildingNode[localID[inBox]] = isBuilding[inBox]
+
+    indptr = np.zeros(len(positions) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(fromIDs, minlength=len(positions)))
+
+    csrGraph = {
+        "ids": demIndex["ids"][positions],
+        "positions": positions,
+        "xs": demX[positions],
+        "ys": demY[positions],
+        "zs": demZ[positions],
+        "isBuilding": isBuildingNode,
+        "indptr": indptr,
+        "indices": toIDs,
+        "weights": distanz3d * factor}
+    return csrGraph
+
+
+def demGraphToDictionary(csrGraph):
+    """
+    This function converts a DEM graph in CSR form into a dictionary graph.
+
+    Input Arguments:
+    csrGraph             --    DEM graph in CSR form (see createDEMGraphArrays)
+
+    Output Arguments:
+    dictionaryGraph      --    Graph. Form: {ID: {neighbourID: weightedDistance}}
+    """
+    ids, indptr, indices, weights = csrGraph["ids"].tolist(), csrGraph["indptr"].tolist(), csrGraph["indices"].tolist(), csrGraph["weights"].tolist()
+    dictionaryGraph = {}
+    for nr, currID in enumerate(ids):
+        dictionaryGraph[currID] = {ids[indices[k]]: weights[k] for k in range(indptr[nr], indptr[nr + 1])}
+    return dictionaryGraph
+
+
 def aStarAlgorithm(G, start, goal, startX, startY, endX, endY, listWithCoordinates):
     """
     A-Star Algorithm to find shortest path between two points.
@@ -0,0 +1,309 @@
+# ======================================================================================
+# Copyright 2014  Swiss Federal Institute of Aquatic Science and Technology
+#
+# This file is part of SNIP (Sustainable Network Infrastructure Planning)
+# SNIP is used for determining the optimal degree of centralization for waste
+# water infrastructures. You find detailed information about SNIP in Eggimann et al. (2014).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Contact:   sven.eggimann@eawag.ch
+# Version    1.0
+# Date:      1.07.2015
+# Author:     Eggimann Sven
+# ======================================================================================
+# The SNIP model was updated and modified for use in rural Alabama in 2025.
+# For detailed information see Jordan et al. (in prep).
+
+# The model was modified for Python 3.11 to run on open source packages.
+# This module measures the runtime and the peak memory of the SNIP stages (preprocessing, Dijkstra,
+# a*, expansion and merging module) on synthetic input (see SNIP_synthetic_open.py) of different
+# sizes. Each measurement is appended as one JSON line to a history file, so that the runs of
+# different versions can be compared.
+
+# Author:   Mallory Jordan
+# Contact:  maj0082@auburn.edu
+# ======================================================================================
+
+# Imports
+import json, os, platform, subprocess, sys, time, tracemalloc
+import argparse
+import numpy as np
+from SNIP_open import *
+from SNIP_synthetic_open import *
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Not available on Windows
+
+benchmarkStages = ("synthetic", "preprocessing", "dijkstra", "aStar", "snip")
+
+
+def getGitCommit():
+    """
+    This function reads the git commit of the model code.
+
+    Output Arguments:
+    commit          --    Short hash of the commit (None if unknown)
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def getMaxRSS():
+    """
+    This function reads the largest resident memory of the process.
+
+    Output Arguments:
+    maxRSS          --    [MB] Largest resident memory (None if unknown)
+    """
+    if resource is None:
+        return None
+    maxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxRSS / 1024.0 ** 2 if sys.platform == "darwin" else maxRSS / 1024.0  # Bytes on macOS, KB on Linux
+
+
+def measureStage(function, *args, traceMemory=True):
+    """
+    This function measures the runtime and the peak memory of a function.
+
+    Input Arguments:
+    function        --    Function to measure
+    args            --    Arguments of the function
+    traceMemory     --    1: Peak memory with tracemalloc (slows the calculation down), 0: only runtime
+
+    Output Arguments:
+    result          --    Result of the function
+    seconds         --    [s] Runtime
+    peakMemory      --    [MB] Peak of the allocated memory during the calculation (None if not traced)
+    """
+    if traceMemory:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        result = function(*args)
+        seconds = time.perf_counter() - start
+        peakMemory = tracemalloc.get_traced_memory()[1] / 1024.0 ** 2 if traceMemory else None
+    finally:
+        if traceMemory:
+            tracemalloc.stop()
+    return result, seconds, peakMemory
+
+
+def selectRoutePairs(aggregatetPoints, nrPairs, rng, minDistance=0, maxDistance=None):
+    """
+    This function selects random pairs of aggregated nodes for the route searches.
+
+    Input Arguments:
+    aggregatetPoints    --    Aggregated nodes
+    nrPairs             --    Number of pairs
+    rng                 --    Random generator (numpy)
+    minDistance         --    [m] Minimum distance between the nodes
+    maxDistance         --    [m] Maximum distance between the nodes (None: no maximum)
+
+    Output Arguments:
+    pairs               --    List with the pairs of nodes
+    """
+    pairs = []
+    if len(aggregatetPoints) < 2:
+        return pairs
+    coordinates = np.array([(node[1], node[2]) for node in aggregatetPoints])
+    for _ in range(nrPairs * 20):
+        if len(pairs) == nrPairs:
+            break
+        pos0 = int(rng.integers(len(aggregatetPoints)))
+        distances = np.hypot(coordinates[:, 0] - coordinates[pos0, 0], coordinates[:, 1] - coordinates[pos0, 1])
+        inRange = (distances >= max(minDistance, 1e-9)) & (distances <= (np.inf if maxDistance is None else maxDistance))
+        candidates = np.flatnonzero(inRange)
+        if len(candidates) > 0:
+            pairs.append((aggregatetPoints[pos0], aggregatetPoints[int(rng.choice(candidates))]))
+    return pairs
+
+
+def runDijkstraSearches(prepared, pairs, backend):
+    """
+    This function runs the Dijkstra searches between the pairs of nodes on the street graph.
+
+    Input Arguments:
+    prepared            --    Prepared input (PreparedNetwork)
+    pairs               --    Pairs of aggregated nodes
+    backend             --    Routing backend
+
+    Output Arguments:
+    details             --    Number of searches and number of searches without a path
+    """
+    routing = createRoutingContext(prepared.streetGraph, backend)
+    noPath = 0
+    for node0, node1 in pairs:
+        try:
+            dijkstra(prepared.streetGraph, node0[0], node1[0], 0, routing)
+        except KeyError:
+            noPath += 1  # Node is not in the street graph or not connected
+    return {"searches": len(pairs), "noPath": noPath}
+
+
+def runAStarSearches(prepared, pairs, params, backend):
+    """
+    This function runs the a* searches between the pairs of nodes on the DEM.
+
+    Input Arguments:
+    prepared            --    Prepared input (PreparedNetwork)
+    pairs               --    Pairs of aggregated nodes
+    params              --    Model parameters
+    backend             --    Routing backend
+
+    Output Arguments:
+    details             --    Number of searches and number of searches without a path
+    """
+    routing = createRoutingContext(prepared.streetGraph, backend)
+    demIndex = dict(prepared.demIndex)
+    demIndex["buildingCells"] = createBuildingMask(demIndex, prepared.buildPoints)
+    noPath = 0
+    for node0, node1 in pairs:
+        try:
+            path, _ = aStar(prepared.rasterSize, prepared.rasterPoints, prepared.buildPoints, (node0[1], node0[2], node0[3]),
+                            (node1[1], node1[2], node1[3]), node0[0], node1[0], params["neighborhood"], params["f_topo"],
+                            demIndex, routing)
+        except Exception:
+            path = []  # e.g. too many DEM points
+        if len(path) == 0:
+            noPath += 1
+    return {"searches": len(pairs), "noPath": noPath}
+
+
+def appendBenchmarkHistory(pathHistory, records):
+    """
+    This function appends the measurements to the history file (one JSON object per line).
+
+    Input Arguments:
+    pathHistory         --    Path of the history file (.jsonl)
+    records             --    List with the measurements
+    """
+    with open(pathHistory, "a") as outFile:
+        for record in records:
+            outFile.write(json.dumps(record) + "\n")
+    return
+
+
+def runBenchmark(nrSources, layout="grid", seed=1, outFolder="SNIP_benchmark", stages=benchmarkStages, nrSearches=100,
+                 params=None, traceMemory=True, pathHistory=None):
+    """
+    This function measures the SNIP stages on synthetic input with a number of sources.
+
+    Input Arguments:
+    nrSources           --    Number of parcels
+    layout              --    Street network: grid or organic
+    seed                --    Seed of the random generator (input and route pairs)
+    outFolder           --    Folder for the synthetic input and the SNIP outputs
+    stages              --    Measured stages (see benchmarkStages). The input is always created and preprocessed.
+    nrSearches          --    Number of Dijkstra and a* searches
+    params              --    Model parameters (see get_model_parameters)
+    traceMemory         --    1: Peak memory with tracemalloc, 0: only runtime
+    pathHistory         --    History file (None: not written)
+
+    Output Arguments:
+    records             --    List with a dictionary for each measurement
+    """
+    for stage in stages:
+        if stage not in benchmarkStages:
+            raise Exception("ERROR: Unknown benchmark stage: " + str(stage))
+    if params is None:
+        params = get_model_parameters()
+
+    runFolder = os.path.join(outFolder, layout + "_" + str(nrSources) + "_" + str(seed))
+    inputFolder = os.path.join(runFolder, "input")
+    environment = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": getGitCommit(),
+        "python": platform.python_version(), "platform": platform.platform(), "sources": nrSources,
+        "layout": layout, "seed": seed, "routingBackend": params["routingBackend"], "traceMemory": bool(traceMemory)}
+    records = []
+
+    def addRecord(stage, seconds, peakMemory, details=None):
+        record = dict(environment, stage=stage, seconds=seconds, peakMemoryMB=peakMemory, maxRSSMB=getMaxRSS(),
+                      details=details or {})
+        records.append(record)
+        print("{:>8} {:<8} {:<22} {:10.3f} s".format(nrSources, layout, stage, seconds))
+        if pathHistory is not None:
+            appendBenchmarkHistory(pathHistory, [record])
+
+    # Synthetic input
+    (in_street, buildings, inDHM), seconds, peakMemory = measureStage(
+        createSyntheticInput, inputFolder, nrSources, layout, seed, traceMemory=traceMemory)
+    if "synthetic" in stages:
+        addRecord("synthetic", seconds, peakMemory)
+
+    # Preprocessing (with the timers of the preprocessing steps)
+    resetInstrumentation()
+    preprocessingFolder = os.path.join(runFolder, "preprocessing") + "/"
+    os.makedirs(preprocessingFolder, exist_ok=True)
+    prepared, seconds, peakMemory = measureStage(preprocess, in_street, buildings, inDHM, preprocessingFolder, params,
+                                                 traceMemory=traceMemory)
+    if "preprocessing" in stages:
+        report = createInstrumentationReport()
+        details = {name: timer["total"] for name, timer in report["timers"].items()}
+        details.update({name: size["last"] for name, size in report["sizes"].items()})
+        addRecord("preprocessing", seconds, peakMemory, details)
+    resetInstrumentation()
+
+    rng = np.random.default_rng(seed)
+    if "dijkstra" in stages:
+        pairs = selectRoutePairs(prepared.aggregatetPoints, nrSearches, rng)
+        details, seconds, peakMemory = measureStage(runDijkstraSearches, prepared, pairs, params["routingBackend"],
+                                                    traceMemory=traceMemory)
+        addRecord("dijkstra", seconds, peakMemory, details)
+
+    if "aStar" in stages:
+        pairs = selectRoutePairs(prepared.aggregatetPoints, nrSearches, rng, 2 * prepared.rasterSize, 2 * params["neighborhood"])
+        details, seconds, peakMemory = measureStage(runAStarSearches, prepared, pairs, params, params["routingBackend"],
+                                                    traceMemory=traceMemory)
+        addRecord("aStar", seconds, peakMemory, details)
+
+    # SNIP (expansion and merging module measured with the timers of the calculation)
+    if "snip" in stages:
+        snipFolder = os.path.join(runFolder, "snip") + "/"
+        result, seconds, peakMemory = measureStage(solve, prepared, params, snipFolder, traceMemory=traceMemory)
+        with open(snipFolder + "instrumentation.json") as inFile:
+            report = json.load(inFile)
+        addRecord("snip", seconds, peakMemory, {"counters": report["counters"]})
+        for stage in ("expansionModule", "mergingModule"):
+            timer = report["timers"].get(stage, {"total": 0.0, "calls": 0})
+            addRecord(stage, timer["total"], peakMemory, {"calls": timer["calls"]})
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sources", type=int, nargs="+", default=[1000, 10000, 100000], help="Numbers of sources (parcels)")
+    parser.add_argument("--layout", nargs="+", choices=streetLayouts, default=["grid"], help="Street networks")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the random generator")
+    parser.add_argument("--stages", nargs="+", choices=benchmarkStages, default=list(benchmarkStages), help="Measured stages")
+    parser.add_argument("--searches", type=int, default=100, help="Number of Dijkstra and a* searches")
+    parser.add_argument("--backend", default="python", help="Routing backend (see get_model_parameters)")
+    parser.add_argument("--outdir", default="SNIP_benchmark", help="Folder for the synthetic input and the outputs")
+    parser.add_argument("--history", default="benchmark_history.jsonl", help="History file (one JSON line per measurement)")
+    parser.add_argument("--no-memory", action="store_true", help="Do not trace the memory (faster)")
+
+    args = parser.parse_args()
+
+    params = get_model_parameters(routingBackend=args.backend)
+    for layout in args.layout:
+        for nrSources in args.sources:
+            runBenchmark(nrSources, layout, args.seed, args.outdir, args.stages, args.searches, params,
+                         not args.no_memory, args.history)
+    print("History written to: " + args.history)
@@ -0,0 +1,444 @@
+# ======================================================================================
+# Copyright 2014  Swiss Federal Institute of Aquatic Science and Technology
+#
+# This file is part of SNIP (Sustainable Network Infrastructure Planning)
+# SNIP is used for determining the optimal degree of centralization for waste
+# water infrastructures. You find detailed information about SNIP in Eggimann et al. (2014).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Contact:   sven.eggimann@eawag.ch
+# Version    1.0
+# Date:      1.07.2015
+# Author:     Eggimann Sven
+# ======================================================================================
+# The SNIP model was updated and modified for use in rural Alabama in 2025.
+# For detailed information see Jordan et al. (in prep).
+
+# The model was modified for Python 3.11 to run on open source packages.
+# This module saves and loads the lists of SNIP in a binary checkpoint (NumPy .npz) instead of
+# the str() text files. Each list is stored column by column according to its schema. Integers
+# and floats are restored with their type, so that the loaded lists are equal to the saved lists.
+# The state of the SNIP solver is saved in the same format to continue a calculation (resume).
+
+# Author:   Mallory Jordan
+# Contact:  maj0082@auburn.edu
+# ======================================================================================
+
+# Imports
+import os, json, time
+import numpy as np
+
+checkpointVersion = 1  # Version of the checkpoint format (checkpoints of another version cannot be loaded)
+
+# Schemas of the lists: (row type, columns). Column types:
+#   "value"     --  int, float or () (no node, e.g. the downstream node of a wwtp in sewers)
+#   "ragged"    --  list of values with different length in each row
+#   (row type, columns)  --  nested row with a fixed number of columns
+# Rows of the other type (tuple instead of list or vice versa) are restored with their type.
+# A schema "values" is a list of values, "graph" a dictionary {node: {neighbour: value}} and
+# ("dict", (row type, columns)) a dictionary {node: row}.
+nodeColumns = ["value"] * 9 + ["ragged", "value"]  # [ID, X, Y, Z, flow, ..., ownFlow, buildings, TD]
+pnColumns = ["value"] * 7  # [weighted distance, FROM, TO, X, Y, Z, factor]
+checkpointSchemas = {
+    "rasterPoints": (tuple, ["value"] * 4),
+    "buildPoints": (tuple, ["value"] * 5),
+    "streetVertices": (list, ["value"] * 4),
+    "edgeList": (list, [(list, ["value"] * 4), (list, ["value"] * 4), "value", "value", "value", "value"]),
+    "forSNIP": (list, nodeColumns),
+    "aggregatetPoints": (list, nodeColumns),
+    "buildings": (tuple, ["value", "value", "ragged"]),
+    "streetGraph": "graph",
+
+    # Solver state
+    "nodes": (list, nodeColumns),
+    "sewers": ("dict", (tuple, ["value", "value"])),
+    "sewers_Current": "values",
+    "WWTPs": (list, ["value"] * 2),
+    "pumps": (list, ["value"] * 4),
+    "PN": (list, pnColumns),
+    "initialPN": (list, pnColumns),
+    "streetNetwork": "graph",
+    "totalSystemCosts": (list, ["value"] * 6),
+    "hypoWWTPcorrectFlow": (list, ["value"] * 3),
+    "allPopNodesOntheWay": "values"}
+
+
+def encodeValues(name, values, arrays):
+    """
+    This function stores a list of ints and floats. Only ints are stored as int64, only floats as float64. Mixed
+    values are stored as float64 with a mask of the ints. The entries () are stored with a mask.
+
+    Input Arguments:
+    name            --    Name of the array
+    values          --    List with values
+    arrays          --    Dictionary with the arrays of the checkpoint (the arrays are added)
+    """
+    isEmpty = np.fromiter((value == () for value in values), dtype=bool, count=len(values))
+    if isEmpty.any():
+        arrays[name + "#empty"] = isEmpty
+        values = [0 if empty else value for value, empty in zip(values, isEmpty.tolist())]
+
+    isInt = np.fromiter((type(value) is int for value in values), dtype=bool, count=len(values))
+    if isInt.all():
+        arrays[name] = np.array(values, dtype=np.int64)
+    else:
+        for value in values:
+            if not isinstance(value, (int, float)):
+                raise Exception("ERROR: Value cannot be stored in a checkpoint: " + str(name) + " " + repr(value))
+        arrays[name] = np.array(values, dtype=np.float64)
+        if isInt.any():
+            arrays[name + "#int"] = isInt
+    return
+
+
+def decodeValues(name, arrays):
+    """
+    This function reads a list of values stored with encodeValues.
+
+    Input Arguments:
+    name            --    Name of the array
+    arrays          --    Arrays of the checkpoint
+
+    Output Arguments:
+    values          --    List with values
+    """
+    values = arrays[name].tolist()
+    if name + "#int" in arrays:
+        for pos in np.flatnonzero(arrays[name + "#int"]).tolist():
+            values[pos] = int(values[pos])
+    if name + "#empty" in arrays:
+        for pos in np.flatnonzero(arrays[name + "#empty"]).tolist():
+            values[pos] = ()
+    return values
+
+
+def encodeColumns(name, rows, schema, arrays):
+    """
+    This function stores the rows of a list column by column.
+
+    Input Arguments:
+    name            --    Name of the list
+    rows            --    Rows of the list
+    schema          --    Schema of the rows (row type, columns)
+    arrays          --    Dictionary with the arrays of the checkpoint (the arrays are added)
+    """
+    rowType, columns = schema
+    for row in rows:
+        if len(row) != len(columns):
+            raise Exception("ERROR: Row does not match the checkpoint schema of " + str(name) + ": " + str(row))
+    isOther = np.fromiter((type(row) is not rowType for row in rows), dtype=bool, count=len(rows))
+    if isOther.any():
+        arrays[name + "#other"] = isOther
+
+    for col, column in enumerate(columns):
+        columnName = name + "/" + str(col)
+        values = [row[col] for row in rows]
+        if column == "value":
+            encodeValues(columnName, values, arrays)
+        elif column == "ragged":
+            arrays[columnName + "#len"] = np.fromiter((len(value) for value in values), dtype=np.int64, count=len(values))
+            encodeValues(columnName, [entry for value in values for entry in value], arrays)
+        else:
+            encodeColumns(columnName, values, column, arrays)
+    return
+
+
+def decodeColumns(name, nrRows, schema, arrays):
+    """
+    This function reads the rows of a list stored with encodeColumns.
+
+    Input Arguments:
+    name            --    Name of the list
+    nrRows          --    Number of rows
+    schema          --    Schema of the rows (row type, columns)
+    arrays          --    Arrays of the checkpoint
+
+    Output Arguments:
+    rows            --    Rows of the list
+    """
+    rowType, columns = schema
+    columnValues = []
+    for col, column in enumerate(columns):
+        columnName = name + "/" + str(col)
+        if column == "value":
+            columnValues.append(decodeValues(columnName, arrays))
+        elif column == "ragged":
+            flat, pos, values = decodeValues(columnName, arrays), 0, []
+            for length in arrays[columnName + "#len"].tolist():
+                values.append(flat[pos:pos + length])
+                pos += length
+            columnValues.append(values)
+        else:
+            columnValues.append(decodeColumns(columnName, nrRows, column, arrays))
+    rows = [rowType(row) for row in zip(*columnValues)] if columns else [rowType() for _ in range(nrRows)]
+    if name + "#other" in arrays:
+        otherType = list if rowType is tuple else tuple
+        for pos in np.flatnonzero(arrays[name + "#other"]).tolist():
+            rows[pos] = otherType(rows[pos])
+    return rows
+
+
+def encodeGraph(name, graph, arrays):
+    """
+    This function stores a graph {node: {neighbour: value}}.
+
+    Input Arguments:
+    name            --    Name of the graph
+    graph           --    Graph
+    arrays          --    Dictionary with the arrays of the checkpoint (the arrays are added)
+    """
+    encodeValues(name + "/nodes", list(graph), arrays)
+    arrays[name + "/degree"] = np.fromiter((len(graph[node]) for node in graph), dtype=np.int64, count=len(graph))
+    encodeValues(name + "/neighbours", [neighbour for node in graph for neighbour in graph[node]], arrays)
+    encodeValues(name + "/values", [value for node in graph for value in graph[node].values()], arrays)
+    return
+
+
+def decodeGraph(name, arrays):
+    """
+    This function reads a graph stored with encodeGraph.
+
+    Input Arguments:
+    name            --    Name of the graph
+    arrays          --    Arrays of the checkpoint
+
+    Output Arguments:
+    graph           --    Graph {node: {neighbour: value}}
+    """
+    neighbours, values = decodeValues(name + "/neighbours", arrays), decodeValues(name + "/values", arrays)
+    graph, pos = {}, 0
+    for node, degree in zip(decodeValues(name + "/nodes", arrays), arrays[name + "/degree"].tolist()):
+        graph[node] = dict(zip(neighbours[pos:pos + degree], values[pos:pos + degree]))
+        pos += degree
+    return graph
+
+
+def encodeContent(name, content, schema, arrays):
+    """
+    This function stores a list, graph or dictionary according to its schema.
+
+    Input Arguments:
+    name            --    Name of the list
+    content         --    List, graph or dictionary
+    schema          --    Schema (see checkpointSchemas)
+    arrays          --    Dictionary with the arrays of the checkpoint (the arrays are added)
+    """
+    if schema == "graph":
+        encodeGraph(name, content, arrays)
+    elif schema == "values":
+        encodeValues(name + "/values", content, arrays)
+    elif schema[0] == "dict":
+        encodeValues(name + "/keys", list(content), arrays)
+        arrays[name + "#rows"] = np.array(len(content), dtype=np.int64)
+        encodeColumns(name, list(content.values()), schema[1], arrays)
+    else:
+        arrays[name + "#rows"] = np.array(len(content), dtype=np.int64)
+        encodeColumns(name, content, schema, arrays)
+    return
+
+
+def decodeContent(name, schema, arrays):
+    """
+    This function reads a list, graph or dictionary stored with encodeContent.
+
+    Input Arguments:
+    name            --    Name of the list
+    schema          --    Schema (see checkpointSchemas)
+    arrays          --    Arrays of the checkpoint
+
+    Output Arguments:
+    content         --    List, graph or dictionary
+    """
+    if schema == "graph":
+        return decodeGraph(name, arrays)
+    elif schema == "values":
+        return decodeValues(name + "/values", arrays)
+    elif schema[0] == "dict":
+        rows = decodeColumns(name, int(arrays[name + "#rows"]), schema[1], arrays)
+        return dict(zip(decodeValues(name + "/keys", arrays), rows))
+    else:
+        return decodeColumns(name, int(arrays[name + "#rows"]), schema, arrays)
+
+
+def checkCheckpointVersion(pathCheckpoint, arrays):
+    """
+    This function checks if a checkpoint has the version of this module.
+
+    Input Arguments:
+    pathCheckpoint  --    Path of the checkpoint (.npz)
+    arrays          --    Arrays of the checkpoint
+    """
+    if int(arrays["version"]) != checkpointVersion:
+        raise Exception("ERROR: Checkpoint version " + str(int(arrays["version"])) + " cannot be loaded (version " + str(checkpointVersion) + "): " + str(pathCheckpoint))
+    return
+
+
+def saveCheckpoint(pathCheckpoint, content, schemas=None, compressed=False, metadata=None):
+    """
+    This function saves lists and graphs into a binary checkpoint (.npz). The file is written to a temporary
+    file first and then renamed, so that an existing checkpoint is not destroyed if saving fails.
+
+    Input Arguments:
+    pathCheckpoint  --    Path of the checkpoint (.npz)
+    content         --    Dictionary {name: list or graph}
+    schemas         --    Schemas of the lists (default: checkpointSchemas)
+    compressed      --    Compress the checkpoint (smaller, but slower)
+    metadata        --    Dictionary with further values (must be JSON serializable, see loadCheckpointMetadata)
+
+    Output Arguments:
+    pathCheckpoint  --    Path of the checkpoint
+    """
+    if schemas is None:
+        schemas = checkpointSchemas
+
+    if metadata is None:
+        metadata = {}
+
+    arrays = {"version": np.array(checkpointVersion), "names": np.array(list(content), dtype=str),
+              "metadata": np.array(json.dumps(metadata))}
+    for name in content:
+        if name not in schemas:
+            raise Exception("ERROR: No checkpoint schema for: " + str(name))
+        encodeContent(name, content[name], schemas[name], arrays)
+
+    pathTemporary = pathCheckpoint + ".tmp.npz"
+    if compressed:
+        np.savez_compressed(pathTemporary, **arrays)
+    else:
+        np.savez(pathTemporary, **arrays)
+    os.replace(pathTemporary, pathCheckpoint)
+    return pathCheckpoint
+
+
+def loadCheckpoint(pathCheckpoint, names=None, schemas=None):
+    """
+    This function loads lists and graphs from a binary checkpoint (see saveCheckpoint).
+
+    Input Arguments:
+    pathCheckpoint  --    Path of the checkpoint (.npz)
+    names           --    Names of the lists to load (default: all)
+    schemas         --    Schemas of the lists (default: checkpointSchemas)
+
+    Output Arguments:
+    content         --    Dictionary {name: list or graph}
+    """
+    if schemas is None:
+        schemas = checkpointSchemas
+
+    with np.load(pathCheckpoint, allow_pickle=False) as arrays:
+        checkCheckpointVersion(pathCheckpoint, arrays)
+        storedNames = arrays["names"].tolist()
+        if names is None:
+            names = storedNames
+
+        arrays = {key: arrays[key] for key in arrays.files if key.split("/")[0].split("#")[0] in names}  # Read the arrays once
+        content = {}
+        for name in names:
+            if name not in storedNames:
+                raise Exception("ERROR: List is not stored in the checkpoint: " + str(name))
+            content[name] = decodeContent(name, schemas[name], arrays)
+    return content
+
+
+def loadCheckpointMetadata(pathCheckpoint):
+    """
+    This function loads the metadata of a checkpoint (see saveCheckpoint).
+
+    Input Arguments:
+    pathCheckpoint  --    Path of the checkpoint (.npz)
+
+    Output Arguments:
+    metadata        --    Dictionary with the metadata
+    """
+    with np.load(pathCheckpoint, allow_pickle=False) as arrays:
+        checkCheckpointVersion(pathCheckpoint, arrays)
+        metadata = json.loads(str(arrays["metadata"]))
+    return metadata
+
+
+def createCheckpointTimer(checkpointIterations, checkpointSeconds):
+    """
+    This function creates the timer for the checkpoints of the solver state.
+
+    Input Arguments:
+    checkpointIterations    --    Checkpoint every N iterations (0: off)
+    checkpointSeconds       --    Checkpoint every T seconds (0: off)
+
+    Output Arguments:
+    checkpointTimer         --    Timer (None if no checkpoints are written)
+    """
+    if checkpointIterations <= 0 and checkpointSeconds <= 0:
+        return None
+    return {"iterations": checkpointIterations, "seconds": checkpointSeconds, "count": 0, "last": time.perf_counter()}
+
+
+def checkpointDue(checkpointTimer):
+    """
+    This function counts an iteration and tests whether a checkpoint is due (every N iterations or T seconds).
+
+    Input Arguments:
+    checkpointTimer         --    Timer (see createCheckpointTimer)
+
+    Output Arguments:
+    due                     --    True if a checkpoint needs to be written
+    """
+    if checkpointTimer is None:
+        return False
+    checkpointTimer["count"] += 1
+    if checkpointTimer["iterations"] > 0 and checkpointTimer["count"] >= checkpointTimer["iterations"]:
+        return True
+    return checkpointTimer["seconds"] > 0 and time.perf_counter() - checkpointTimer["last"] >= checkpointTimer["seconds"]
+
+
+def saveSolverState(pathCheckpoint, checkpointKey, phase, state, flags, checkpointTimer=None):
+    """
+    This function saves the state of the SNIP solver.
+
+    Input Arguments:
+    pathCheckpoint          --    Path of the checkpoint (.npz)
+    checkpointKey           --    Identification of the calculation (parameters, input), checked when resuming
+    phase                   --    "expansion": at the start of an iteration of the expansion module, "merge": before the merging module
+    state                   --    Dictionary with the lists of the solver (see checkpointSchemas)
+    flags                   --    Dictionary with the scalar variables of the solver
+    checkpointTimer         --    Timer which is reset (optional)
+    """
+    saveCheckpoint(pathCheckpoint, state, metadata={"key": checkpointKey, "phase": phase, "flags": flags})
+    if checkpointTimer is not None:
+        checkpointTimer["count"], checkpointTimer["last"] = 0, time.perf_counter()
+    print("Solver state saved (" + phase + "): " + str(pathCheckpoint))
+    return
+
+
+def loadSolverState(pathCheckpoint, checkpointKey):
+    """
+    This function loads the state of the SNIP solver (see saveSolverState).
+
+    Input Arguments:
+    pathCheckpoint          --    Path of the checkpoint (.npz)
+    checkpointKey           --    Identification of the calculation, must be the same as when the checkpoint was saved
+
+    Output Arguments:
+    phase                   --    Phase of the solver
+    state                   --    Dictionary with the lists of the solver
+    flags                   --    Dictionary with the scalar variables of the solver
+    """
+    if not os.path.isfile(pathCheckpoint):
+        raise Exception("ERROR: No solver state to resume: " + str(pathCheckpoint))
+    metadata = loadCheckpointMetadata(pathCheckpoint)
+    if metadata["key"] != json.loads(json.dumps(checkpointKey)):
+        raise Exception("ERROR: Solver state was saved with other parameters or input: " + str(pathCheckpoint))
+    state = loadCheckpoint(pathCheckpoint)
+    print("Solver state loaded (" + metadata["phase"] + "): " + str(pathCheckpoint))
+    return metadata["phase"], state, metadata["flags"]
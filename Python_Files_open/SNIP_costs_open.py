@@ -45,6 +45,77 @@
 # ======================================================================================
 
 import math
+import numpy as np
+from SNIP_sewers_open import *
+
+# Norm pipe diameters [m] with the constant factors of Manning-Strickler: (d / 4) ** (2 / 3) and d ** 2
+normPipeDiameters = np.array((.1, .15, .2, .25, .3))
+pipeRadiusFactors = np.array([(i / 4.0) ** (0.6666666666666666) for i in normPipeDiameters.tolist()])
+pipeAreaFactors = np.array([i ** 2.0 for i in normPipeDiameters.tolist()])
+pipeDiameterTable = tuple(zip(normPipeDiameters.tolist(), pipeRadiusFactors.tolist(), pipeAreaFactors.tolist()))
+
+
+def getPipeCostsPerMeter(pipeDiameter, averageTrenchDepth, costFactor):
+    """
+    This function calculates the construction costs per meter of pipe. The cost curve is used for single pipes and
+    for arrays of pipes (calculatePipeCosts, calculatePipeCostsArray and the cost model).
+
+    Input Arguments:
+    pipeDiameter              -    Pipe Diameter (at most 0.3m)
+    averageTrenchDepth        -    Average trench depth [m]
+    costFactor                -    Factor of the cost variation (1 + fc_SewerCost)
+
+    Output Arguments:
+    costPerMeter              -    Construction costs per meter pipe
+    """
+    a = 152.51 * pipeDiameter + 173.08  # Linearly derived function for a & b
+    b = 760.31 * pipeDiameter - 78.208  # Linearly derived function for a & b
+    return a * averageTrenchDepth + b * costFactor
+
+
+def getPumpEnergyCosts(Q, heightDifference, pricekWh):
+    """
+    This function calculates the yearly energy costs of pumps (single pumps or arrays of pumps).
+    #Source: The sewage pumping handbook, p. 84 ff
+
+    Input Arguments:
+    Q                     -    Flow [l / s]
+    heightDifference      -    Pumped height difference
+    pricekWh              -    Price per kWh
+
+    Output Arguments:
+    operationCostsPerYear -    Yearly operation costs
+    """
+    # gravity = 9.81                      # [m / s^2]
+    # runninghoursPerYear = 365.25 * 24   # [h/year]
+    # efficiency = 0.5                    # efficiency of pump plus motor
+
+    # Operation costs
+    # motorPowerInput = (gravity * Q * heightDifference )/(efficiency*1000)       # [kW]  slower
+    # EnergyUsed = motorPowerInput * runninghoursPerYear                          # [kWh] slower
+
+    motorPowerInput = (9.81 * Q * heightDifference) / (500)  # [kW]  faster
+    EnergyUsed = motorPowerInput * 8766  # [kWh] faster
+    return EnergyUsed * pricekWh
+
+
+def getWWTPCostsOfEW(EW, capexFactor, opexFactor):
+    """
+    This function calculates the replacement and the yearly operation costs of wwtps (single wwtps or arrays of wwtps).
+
+    Input Arguments:
+    EW                      -    Population equivalent [PE]
+    capexFactor             -    Factor of the replacement costs (1 + fc_wwtpCapex)
+    opexFactor              -    Factor of the operation costs (1 + fc_wwtpOpex)
+
+    Output Arguments:
+    replacementCosts        -    Replacement costs
+    totannaulOperationCosts -    Yearly operation costs
+    """
+    replacementCosts = 13318 * EW ** -0.209 * capexFactor * EW  # Source: VSA
+    totannaulOperationCosts = 340.82 * EW ** -0.171 * opexFactor * EW  # Source VSA
+    return replacementCosts, totannaulOperationCosts
+
 
 def calculatePipeCosts(pipeDiameter, distance, averageTrenchDepth, lifeSewers, interestRate, operationCostsPerYear,
                        fc_SewerCost):
@@ -71,10 +142,8 @@ def calculatePipeCosts(pipeDiameter, distance, averageTrenchDepth, lifeSewers, i
         pipeDiameter = .3
 
     # CAPEX
-    a = 152.51 * pipeDiameter + 173.08  # Linearly derived function for a & b
-    b = 760.31 * pipeDiameter - 78.208  # Linearly derived function for a & b
     costFactor = 1 + fc_SewerCost  # Calculate how costs vary
-    costPerMeter = a * averageTrenchDepth + b * costFactor  # Calculate cost per meter pipe
+    costPerMeter = getPipeCostsPerMeter(pipeDiameter, averageTrenchDepth, costFactor)  # Calculate cost per meter pipe
     totCost = float(costPerMeter * distance)  # Total costs of whole pipe length
 
     # OPEX
@@ -100,18 +169,7 @@ def getPumpCostsDependingOnFlow(Q, heightDifference, pricekWh, nrOfOperatingYear
     Output Arguments:
     pipeDiameter          -    Needed pipe diameter
     """
-    # gravity = 9.81                      # [m / s^2]
-    # runninghoursPerYear = 365.25 * 24   # [h/year]
-    # efficiency = 0.5                    # efficiency of pump plus motor
-
-    # Operation costs
-    # motorPowerInput = (gravity * Q * heightDifference )/(efficiency*1000)       # [kW]  slower
-    # EnergyUsed = motorPowerInput * runninghoursPerYear                          # [kWh] slower
-
-    motorPowerInput = (9.81 * Q * heightDifference) / (500)  # [kW]  faster
-    EnergyUsed = motorPowerInput * 8766  # [kWh] faster
-
-    operationCostsPerYear = EnergyUsed * pricekWh
+    operationCostsPerYear = getPumpEnergyCosts(Q, heightDifference, pricekWh)
     operationCostsOverWholePeriod = operationCostsPerYear * nrOfOperatingYears  # Costs over whole life span
 
     # Error message
@@ -134,36 +192,27 @@ def getPipeDiameter(Q, slope, stricklerC):
     Output Arguments:
     pipeDiameter          -   Needed pipe diameter
     """
+    if slope == 0:  # Error if slope is zero
+        # If slope is 0 WWTP is pumped and a Diameter of 0.1 is assumed.
+        return pipeDiameterTable[0][0]
+        # raise Exception("ERROR: Pipe diameter cannot get calculated because slope is zero.")
+
     Q = Q / 86400.0                            # Convert the flow [m3/day] to [m3/s], 24.0*60.0*60.0  = 86400.0
     Qmax = 0.8                                 # Maximum filling condition
-    normDiameterList = (.1, .15, .2, .25, .3)  # [m] Norm pipe diameters
     vmin = 0.6096 # Minimum flow velocity [m/s]
+    sqrtSlope = math.sqrt(abs(slope))
 
     # Iterate list with norm diameters until the calculate flow is bigger
-    for i in normDiameterList:
+    for i, radiusFactor, areaFactor in pipeDiameterTable:
 
-        if slope == 0:  # Error if slope is zero
-            # If slope is 0 WWTP is pumped and a Diameter of 0.25 is assumed.
-            pipeDiameter = normDiameterList[0]
-            return pipeDiameter
-            # raise Exception("ERROR: Pipe diameter cannot get calculated because slope is zero.")
-        else:
-            # Calculate flow in pipe with diameter i [m3/s]
-            # Qfull = stricklerC * (i/4.0)**(2.0/3.0) *math.sqrt(abs(slope)) * (math.pi/4.0) * i**2.0                     # slower
-            Qfull = stricklerC * (i / 4.0) ** (0.6666666666666666) * math.sqrt(abs(slope)) * (
-                0.7853981633974483) * i ** 2.0  # faster
+        # Calculate velocity of flow in pipe, v [m/s] and flow in pipe with diameter i [m3/s]
+        v = stricklerC * radiusFactor * sqrtSlope
+        Qfull = v * (0.7853981633974483) * areaFactor
 
-            # Calculate velocity of flow in pipe, v [m/s]
-            v = stricklerC * (i/4.0) ** (0.6666666666666666) * math.sqrt(abs(slope))
-
-            # If pipe can bear more than flow as input, select this diameter # 80 % condition. Flow velocity must greater or equal to minimum.
-            if Qfull * Qmax >= Q and v >= vmin:
-                pipeDiameter = i
-                return pipeDiameter
-
-        if i == .3:  # Not big enough norm-pipe diameter existing
-            pipeDiameter = .3
-            return pipeDiameter
+        # If pipe can bear more than flow as input, select this diameter # 80 % condition. Flow velocity must greater or equal to minimum.
+        if Qfull * Qmax >= Q and v >= vmin:
+            return i
+    return pipeDiameterTable[-1][0]  # Not big enough norm-pipe diameter existing
 
 
 def costWWTP(flow, EWQuantity, lifeWwtps, interestRate, fc_wwtpOpex, fc_wwtpCapex):
@@ -187,19 +236,134 @@ def costWWTP(flow, EWQuantity, lifeWwtps, interestRate, fc_wwtpOpex, fc_wwtpCape
     sensFactor_Operation = 1 + fc_wwtpOpex
     sensFactor_Replacement = 1 + fc_wwtpCapex
 
-    # Capex - Annual Operation costs
-    replacementCostsPerEW = 13318 * EW ** -0.209 * sensFactor_Replacement  # Source: VSA
-    replacementCosts = replacementCostsPerEW * EW
+    # Capex and Opex - Annual Operation costs
+    replacementCosts, totannaulOperationCosts = getWWTPCostsOfEW(EW, sensFactor_Replacement, sensFactor_Operation)
     annuitiesReplacementCosts = replacementCosts * ((interestRate * r ** lifeWwtps)) / (
             r ** lifeWwtps - 1)  # Calculate annuities
-
-    # Opex - Annual Operation Costs
-    annaulOperationCostsPerEW = 340.82 * EW ** -0.171 * sensFactor_Operation  # Source VSA
-    totannaulOperationCosts = annaulOperationCostsPerEW * EW
     totalAnnualCosts = annuitiesReplacementCosts + totannaulOperationCosts  # Operation Costs & replacement costs
     return totalAnnualCosts
 
 
+def getPipeDiameters(Q, slope, stricklerC):
+    """
+    This function calculates the pipe diameters of many pipes at once (same as getPipeDiameter). All norm diameters
+    are checked at once with the constant factors of the norm diameters.
+
+    Input Arguments:
+    Q                     -    Array with the flows in the pipes
+    slope                 -    Array with the slopes
+    stricklerC            -    Strickler coefficient
+
+    Output Arguments:
+    pipeDiameters         -    Array with the needed pipe diameters
+    """
+    return selectPipeDiameters(Q, slope, stricklerC * pipeRadiusFactors)
+
+
+def selectPipeDiameters(Q, slope, velocityFactors):
+    """
+    This function selects the norm diameters of many pipes (see getPipeDiameters).
+
+    Input Arguments:
+    Q                     -    Array with the flows in the pipes
+    slope                 -    Array with the slopes
+    velocityFactors       -    Array with the velocity of each norm diameter at slope 1 (stricklerC * radius factor)
+
+    Output Arguments:
+    pipeDiameters         -    Array with the needed pipe diameters
+    """
+    Q = np.asarray(Q, dtype=float) / 86400.0  # Convert the flow [m3/day] to [m3/s]
+    slope = np.asarray(slope, dtype=float)
+    Qmax = 0.8  # Maximum filling condition
+    vmin = 0.6096  # Minimum flow velocity [m/s]
+
+    # Velocity and flow in the pipes (rows) for each norm diameter (columns)
+    v = velocityFactors[np.newaxis, :] * np.sqrt(np.abs(slope))[:, np.newaxis]
+    Qfull = v * (0.7853981633974483) * pipeAreaFactors
+    fits = (Qfull * Qmax >= Q[:, np.newaxis]) & (v >= vmin)
+
+    # Select the smallest norm diameter which can bear the flow (0.3 if none, 0.1 if the slope is 0)
+    pipeDiameters = np.where(fits.any(axis=1), normPipeDiameters[np.argmax(fits, axis=1)], normPipeDiameters[-1])
+    pipeDiameters[slope == 0] = normPipeDiameters[0]
+    return pipeDiameters
+
+
+def calculatePipeCostsArray(pipeDiameter, distance, averageTrenchDepth, lifeSewers, interestRate,
+                            operationCostsPerYear, fc_SewerCost):
+    """
+    This function calculates the costs of many pipes at once (same as calculatePipeCosts).
+
+    Input Arguments:
+    pipeDiameter              -    Array with the pipe diameters
+    distance                  -    Array with the pipe distances [m]
+    averageTrenchDepth        -    Array with the average trench depths [m]
+    lifeSewers, ...           -    See calculatePipeCosts
+
+    Output Arguments:
+    totannuities              -    Array with the annuities of the pipe costs, including maintenance
+    """
+    r = float(interestRate + 1.0)  # calculate r of annuities formula
+    pipeDiameter = np.minimum(np.asarray(pipeDiameter, dtype=float), .3)  # Parameters of 300 for larger diameters
+    distance = np.asarray(distance, dtype=float)
+
+    # CAPEX
+    costFactor = 1 + fc_SewerCost
+    costPerMeter = getPipeCostsPerMeter(pipeDiameter, np.asarray(averageTrenchDepth, dtype=float), costFactor)
+    totCost = costPerMeter * distance
+
+    # OPEX
+    averageYearlyOperationCosts = operationCostsPerYear * distance
+    totannuities = ((interestRate * r ** lifeSewers) / (r ** lifeSewers - 1)) * totCost + averageYearlyOperationCosts
+    return totannuities
+
+
+def getPumpCostsArray(Q, heightDifference, pricekWh, nrOfOperatingYears, interestRate):
+    """
+    This function calculates the yearly operation costs of many pumps at once (same as getPumpCostsDependingOnFlow).
+
+    Input Arguments:
+    Q                     -    Array with the flows
+    heightDifference      -    Array with the pumped height differences
+    pricekWh, ...         -    See getPumpCostsDependingOnFlow
+
+    Output Arguments:
+    operationCostsPerYear -    Array with the yearly operation costs
+    """
+    Q, heightDifference = np.asarray(Q, dtype=float), np.asarray(heightDifference, dtype=float)
+    operationCostsPerYear = getPumpEnergyCosts(Q, heightDifference, pricekWh)
+
+    # Error message
+    wrongPumps = np.flatnonzero((heightDifference < 0) | (operationCostsPerYear < 0))
+    if len(wrongPumps) > 0:
+        raise Exception("ERROR: Pumping costs cannot be calculated correctly. " + str(
+            heightDifference[wrongPumps[0]]) + "" + str(Q[wrongPumps[0]]))  # Does not make sense if pumped down
+    return operationCostsPerYear
+
+
+def costWWTPArray(flow, EWQuantity, lifeWwtps, interestRate, fc_wwtpOpex, fc_wwtpCapex):
+    """
+    This function calculates the costs of many wwtps at once (same as costWWTP).
+
+    Input Arguments:
+    flow                    -    Array with the amounts of waste water to be treated [in m3]
+    EWQuantity, ...         -    See costWWTP
+
+    Output Arguments:
+    totalAnnualCosts        -    Array with the total annuities
+    """
+    r = float(interestRate + 1.0)  # r of annuities formula
+    EW = np.asarray(flow, dtype=float) / float(EWQuantity)  # [PE]
+    if np.any(EW == 0):  # As costWWTP
+        raise ZeroDivisionError("0.0 cannot be raised to a negative power")
+    sensFactor_Operation = 1 + fc_wwtpOpex
+    sensFactor_Replacement = 1 + fc_wwtpCapex
+
+    # Capex and Opex - Annual Operation costs
+    replacementCosts, totannaulOperationCosts = getWWTPCostsOfEW(EW, sensFactor_Replacement, sensFactor_Operation)
+    annuitiesReplacementCosts = replacementCosts * ((interestRate * r ** lifeWwtps)) / (r ** lifeWwtps - 1)
+    return annuitiesReplacementCosts + totannaulOperationCosts
+
+
 def calculateConnectionCosts(pipeCostI, totPumpCostI, pipeCostII, totPumpCostII, pipeCostIII, totPumpCostIII,
                              WWTPcostsI, interestRate, lifeWwtps, lifeSewers):
     """
@@ -247,6 +411,131 @@ def calculateConnectionCosts(pipeCostI, totPumpCostI, pipeCostII, totPumpCostII,
     return costConnection
 
 
+def createCostModel(EW_Q, lifeWwtps, interestRate, pumpingYears, pricekWh, stricklerC, lifeSewers, operationCosts,
+                    fc_SewerCost, fc_wwtpOpex, fc_wwtpCapex):
+    """
+    This function creates the cost model of a run. The annuity factors, the cost factors and the velocities of the
+    norm diameters only depend on the parameters and are calculated once. The cost model uses the same cost curves
+    as the cost functions (calculatePipeCosts, costWWTP, ...).
+
+    Input Arguments:
+    EW_Q, lifeWwtps, ...    -    Cost relevant parameters (see calculatetotalAnnuities)
+
+    Output Arguments:
+    costModel               -    Dictionary with the parameters and the precalculated factors
+    """
+    r = float(interestRate + 1.0)  # r of annuities formula
+    sewerCompoundFactor, wwtpCompoundFactor = r ** lifeSewers, r ** lifeWwtps
+    return {
+        "parameters": (EW_Q, lifeWwtps, interestRate, pumpingYears, pricekWh, stricklerC, lifeSewers, operationCosts,
+                       fc_SewerCost, fc_wwtpOpex, fc_wwtpCapex),
+        "EW_Q": float(EW_Q), "lifeWwtps": lifeWwtps, "interestRate": interestRate, "pumpingYears": pumpingYears,
+        "pricekWh": pricekWh, "stricklerC": stricklerC, "lifeSewers": lifeSewers, "operationCosts": operationCosts,
+        "fc_SewerCost": fc_SewerCost, "fc_wwtpOpex": fc_wwtpOpex, "fc_wwtpCapex": fc_wwtpCapex,
+        "sewerDiscountFactors": (sewerCompoundFactor - 1, interestRate * sewerCompoundFactor),
+        "wwtpAnnuityFactors": (interestRate * wwtpCompoundFactor, wwtpCompoundFactor - 1),
+        "wwtpOpexFactor": 1 + fc_wwtpOpex, "wwtpCapexFactor": 1 + fc_wwtpCapex,
+        "pipeVelocityFactors": stricklerC * pipeRadiusFactors}
+
+
+def createCostModelFromInput(inParameter):
+    """
+    This function creates the cost model of the input parameters of SNIP (see createCostModel).
+
+    Input Arguments:
+    inParameter             -    Input parameters of SNIP()
+
+    Output Arguments:
+    costModel               -    Cost model
+    """
+    return createCostModel(inParameter[12], inParameter[13], inParameter[10], inParameter[8], inParameter[7],
+                           inParameter[11], inParameter[9], inParameter[14], inParameter[17], inParameter[18],
+                           inParameter[19])
+
+
+def getModelPipeDiameters(costModel, Q, slope):
+    """
+    This function calculates the pipe diameters of many pipes with the cost model (see getPipeDiameters).
+    """
+    return selectPipeDiameters(Q, slope, costModel["pipeVelocityFactors"])
+
+
+def getModelPipeCostsArray(costModel, pipeDiameter, distance, averageTrenchDepth):
+    """
+    This function calculates the annuities of many pipes with the cost model (see calculatePipeCostsArray).
+    """
+    return calculatePipeCostsArray(pipeDiameter, distance, averageTrenchDepth, costModel["lifeSewers"],
+                                   costModel["interestRate"], costModel["operationCosts"], costModel["fc_SewerCost"])
+
+
+def getModelPumpCosts(costModel, Q, heightDifference):
+    """
+    This function calculates the costs of a pump with the cost model (same as getPumpCostsDependingOnFlow).
+
+    Input Arguments:
+    costModel                       -    Cost model
+    Q                               -    Flow
+    heightDifference                -    Pumped height difference
+
+    Output Arguments:
+    operationCostsPerYear           -    Yearly operation costs
+    operationCostsOverWholePeriod   -    Operation costs over the whole life span
+    """
+    operationCostsPerYear = getPumpEnergyCosts(Q, heightDifference, costModel["pricekWh"])
+    if heightDifference < 0 or operationCostsPerYear < 0:
+        raise Exception("ERROR: Pumping costs cannot be calculated correctly. " + str(heightDifference) + "" + str(
+            Q))  # Does not make sense if pumped down
+    return operationCostsPerYear, operationCostsPerYear * costModel["pumpingYears"]
+
+
+def getModelWWTPCosts(costModel, flow):
+    """
+    This function calculates the annuities of a wwtp with the cost model (same as costWWTP).
+
+    Input Arguments:
+    costModel               -    Cost model
+    flow                    -    Amount of waste water to be treated [in m3]
+
+    Output Arguments:
+    totalAnnualCosts        -    Total annuities
+    """
+    EW = float(flow) / costModel["EW_Q"]  # [PE]
+    annuityNumerator, annuityDenominator = costModel["wwtpAnnuityFactors"]
+    replacementCosts, totannaulOperationCosts = getWWTPCostsOfEW(EW, costModel["wwtpCapexFactor"],
+                                                                 costModel["wwtpOpexFactor"])
+    return replacementCosts * annuityNumerator / annuityDenominator + totannaulOperationCosts
+
+
+def getModelWWTPCostsArray(costModel, flow):
+    """
+    This function calculates the annuities of many wwtps with the cost model (see costWWTPArray).
+    """
+    return costWWTPArray(flow, costModel["EW_Q"], costModel["lifeWwtps"], costModel["interestRate"],
+                         costModel["fc_wwtpOpex"], costModel["fc_wwtpCapex"])
+
+
+def getModelConnectionCosts(costModel, pipeCostI, totPumpCostI, pipeCostII, totPumpCostII, pipeCostIII,
+                            totPumpCostIII):
+    """
+    This function calculates the costs of the lowest central connection with the cost model (same as
+    calculateConnectionCosts).
+
+    Input Arguments:
+    costModel                                 --    Cost model
+    pipeCostI, totPumpCostI, ...              --    Pipe- & pumping costs of the options I, II and III
+
+    Output Arguments:
+    costConnection                            --    Costs of lowest central connection
+    """
+    var2, denominator = costModel["sewerDiscountFactors"]
+    connectionII = pipeCostII * var2 / denominator + totPumpCostII
+    costConnectionI = pipeCostI * var2 / denominator + totPumpCostI - connectionII
+    costConnectionIII = pipeCostIII * var2 / denominator + totPumpCostIII - connectionII
+    if costConnectionI < costConnectionIII:
+        return costConnectionI
+    return costConnectionIII
+
+
 def calculatetotalAnnuities(listWTPs, EW_Q, lifeWwtps, interestRate, pumps, pumpingYears, pricekWh, sewers, flowPoints,
                             edgeList, nodes, stricklerC, lifeSewers, operationCosts, fc_SewerCost, fc_wwtpOpex,
                             fc_wwtpCapex):
@@ -330,6 +619,199 @@ def calculatetotalAnnuities(listWTPs, EW_Q, lifeWwtps, interestRate, pumps, pump
     return completePumpCosts, completeWWTPCosts, completePublicPipeCosts
 
 
+def getNodeValues(nodes):
+    """
+    This function reads out the flow in the pipe below each node and the trench depth of each node.
+
+    Input:
+    nodes               -    Nodes
+
+    Output:
+    nodeValues          -    Dictionary {ID: (flow, trench depth),...}
+    """
+    nodeValues = {}
+    for a in nodes:
+        if a[0] not in nodeValues:
+            nodeValues[a[0]] = (a[4] + a[8], a[3] - a[10])
+    return nodeValues
+
+
+def getEdgeDistances(edgeList):
+    """
+    This function reads out the distance and slope of the edges in both directions.
+
+    Input:
+    edgeList            -    List with edges
+
+    Output:
+    edgeDistances       -    Dictionary {(fromID, toID): (distance, slope),...}
+    """
+    edgeDistances = {}
+    for edge in edgeList:
+        if (edge[0][0], edge[1][0]) not in edgeDistances:  # Stored inverse, thus slope needs to get inverted
+            edgeDistances[(edge[0][0], edge[1][0])] = (edge[2], edge[3] * -1)
+        if (edge[1][0], edge[0][0]) not in edgeDistances:
+            edgeDistances[(edge[1][0], edge[0][0])] = (edge[2], edge[3])
+    return edgeDistances
+
+
+def getPipeArrays(pipes, sewers, nodeValues, edgeDistances):
+    """
+    This function reads out aligned arrays with the flow, slope, distance and average trench depth of pipes.
+
+    Input:
+    pipes               -    IDs of the upper nodes of the pipes
+    sewers              -    Sewers
+    nodeValues          -    Flow and trench depth of the nodes (see getNodeValues)
+    edgeDistances       -    Distance and slope of the edges (see getEdgeDistances)
+
+    Output:
+    Q, slope, distance, averageTrenchDepth    -    Arrays of the pipes
+    """
+    Q, slope, distance, averageTrenchDepth = [], [], [], []
+    for pipe in pipes:
+        nextNode = sewers[pipe][0]
+        flow, trenchDepthFrom = nodeValues[pipe]
+        edgeDistance, edgeSlope = edgeDistances[(pipe, nextNode)]
+        Q.append(flow)
+        slope.append(edgeSlope)
+        distance.append(edgeDistance)
+        averageTrenchDepth.append((abs(trenchDepthFrom) + abs(nodeValues[nextNode][1])) / 2)
+    return np.array(Q, dtype=float), np.array(slope, dtype=float), np.array(distance, dtype=float), np.array(
+        averageTrenchDepth, dtype=float)
+
+
+def calculatetotalAnnuitiesVectorized(listWTPs, EW_Q, lifeWwtps, interestRate, pumps, pumpingYears, pricekWh, sewers,
+                                      flowPoints, edgeList, nodes, stricklerC, lifeSewers, operationCosts,
+                                      fc_SewerCost, fc_wwtpOpex, fc_wwtpCapex):
+    '''
+    This function calculates the total system costs of a system (same as calculatetotalAnnuities). The nodes and
+    edges are read out once into arrays and the costs of all pipes, pumps and wwtps are calculated with numpy.
+
+    Input:
+    listWTPs, ...       -    See calculatetotalAnnuities
+
+    Output:
+    completePumpCosts   -    Pump costs
+    completeWWTPCosts   -    WWTP costs
+    completePublicPipeCosts    -    Sewer costs
+    '''
+    # calculate WWTPs costs
+    completeWWTPCosts = float(np.sum(costWWTPArray([i[1] for i in listWTPs], EW_Q, lifeWwtps, interestRate,
+                                                   fc_wwtpOpex, fc_wwtpCapex)))
+
+    # Calculate pump costs
+    completePumpCosts = float(np.sum(getPumpCostsArray([pmp[1] for pmp in pumps], [pmp[2] for pmp in pumps],
+                                                       pricekWh, pumpingYears, interestRate)))
+
+    # Calculate sewer costs
+    pipes = [pipe for pipe in sewers if sewers[pipe][0] != ()]
+    Q, slope, distance, averageTrenchDepth = getPipeArrays(pipes, sewers, getNodeValues(nodes),
+                                                           getEdgeDistances(edgeList))
+    pipeDiameter = getPipeDiameters(Q, slope, stricklerC)
+    completePublicPipeCosts = float(np.sum(calculatePipeCostsArray(pipeDiameter, distance, averageTrenchDepth,
+                                                                   lifeSewers, interestRate, operationCosts,
+                                                                   fc_SewerCost)))
+    return completePumpCosts, completeWWTPCosts, completePublicPipeCosts
+
+
+def createCostLedger(costModel=None):
+    """
+    This function creates an empty cost ledger. The ledger stores the annuities of each pipe, pump and wwtp of the
+    last calculation of the total system costs together with the values they were calculated with. In the next
+    calculation, only the annuities of the changed pipes, pumps and wwtps are calculated again.
+
+    Input Arguments:
+    costModel           -    Cost model of the run (optional, created from the parameters of the first calculation)
+
+    Output Arguments:
+    costLedger          -    Dictionary with the cost model, the annuities of the pipes ({ID: (values, costs)}),
+                             pumps and wwtps ({values: costs}) and the drain roots of the sewers (see createDrainRoots)
+    """
+    return {"costModel": costModel, "pipeCosts": {}, "pumpCosts": {}, "wwtpCosts": {}, "drainRoots": createDrainRoots()}
+
+
+def updateCostLedger(costLedger, listWTPs, EW_Q, lifeWwtps, interestRate, pumps, pumpingYears, pricekWh, sewers,
+                     edgeList, nodes, stricklerC, lifeSewers, operationCosts, fc_SewerCost, fc_wwtpOpex, fc_wwtpCapex):
+    '''
+    This function calculates the total system costs of a system (same as calculatetotalAnnuities) with a cost ledger.
+    Only the annuities of the pipes, pumps and wwtps which changed since the last calculation are calculated again.
+
+    Input:
+    costLedger          -    Cost ledger (see createCostLedger)
+    listWTPs, ...       -    See calculatetotalAnnuities
+
+    Output:
+    completePumpCosts   -    Pump costs
+    completeWWTPCosts   -    WWTP costs
+    completePublicPipeCosts    -    Sewer costs
+    '''
+    parameters = (EW_Q, lifeWwtps, interestRate, pumpingYears, pricekWh, stricklerC, lifeSewers, operationCosts,
+                  fc_SewerCost, fc_wwtpOpex, fc_wwtpCapex)
+    costModel = costLedger["costModel"]
+    if costModel is None or costModel["parameters"] != parameters:  # Annuities of other parameters are not valid
+        costModel = costLedger["costModel"] = createCostModel(*parameters)
+        costLedger["pipeCosts"], costLedger["pumpCosts"], costLedger["wwtpCosts"] = {}, {}, {}
+
+    # calculate WWTPs costs
+    lastWWTPCosts, wwtpCosts, completeWWTPCosts = costLedger["wwtpCosts"], {}, 0
+    for i in listWTPs:
+        if i[1] in wwtpCosts:
+            WWTPcostsA1 = wwtpCosts[i[1]]
+        elif i[1] in lastWWTPCosts:
+            WWTPcostsA1 = wwtpCosts[i[1]] = lastWWTPCosts[i[1]]
+        else:
+            WWTPcostsA1 = wwtpCosts[i[1]] = getModelWWTPCosts(costModel, i[1])
+        completeWWTPCosts += WWTPcostsA1
+
+    # Calculate pump costs
+    lastPumpCosts, pumpCosts, completePumpCosts = costLedger["pumpCosts"], {}, 0
+    for pmp in pumps:
+        flow, heightDifference = pmp[1], pmp[2]
+        if (flow, heightDifference) in pumpCosts:
+            summingPumpCosts = pumpCosts[(flow, heightDifference)]
+        elif (flow, heightDifference) in lastPumpCosts:
+            summingPumpCosts = pumpCosts[(flow, heightDifference)] = lastPumpCosts[(flow, heightDifference)]
+        else:
+            summingPumpCosts, _ = getModelPumpCosts(costModel, flow, heightDifference)
+            pumpCosts[(flow, heightDifference)] = summingPumpCosts
+        completePumpCosts += summingPumpCosts
+
+    # Calculate sewer costs
+    nodeValues, edgeDistances = getNodeValues(nodes), getEdgeDistances(edgeList)
+    lastPipeCosts, pipeCosts, changedPipes = costLedger["pipeCosts"], {}, []
+    for pipe in sewers:
+        if sewers[pipe][0] != ():
+            oldNode = pipe
+            nextNode = sewers[pipe][0]
+            Q, trenchDepthFrom = nodeValues[oldNode]
+            distance, slope = edgeDistances[(oldNode, nextNode)]
+            trenchDepthTo = nodeValues[nextNode][1]
+            values = (nextNode, Q, distance, slope, trenchDepthFrom, trenchDepthTo)
+
+            lastPipe = lastPipeCosts.get(pipe)
+            if lastPipe is not None and lastPipe[0] == values:
+                pipeCosts[pipe] = lastPipe
+            else:
+                pipeCosts[pipe] = (values, None)
+                changedPipes.append(pipe)
+
+    # Calculate the costs of the changed pipes at once
+    if changedPipes:
+        Q, slope, distance, averageTrenchDepth = getPipeArrays(changedPipes, sewers, nodeValues, edgeDistances)
+        pipeDiameter = getModelPipeDiameters(costModel, Q, slope)
+        costsPerYear = getModelPipeCostsArray(costModel, pipeDiameter, distance, averageTrenchDepth)
+        for pipe, pipeCostsPerYear in zip(changedPipes, costsPerYear.tolist()):
+            pipeCosts[pipe] = (pipeCosts[pipe][0], pipeCostsPerYear)
+
+    completePublicPipeCosts = 0
+    for _, costsPerYear in pipeCosts.values():
+        completePublicPipeCosts += costsPerYear
+
+    costLedger["pipeCosts"], costLedger["pumpCosts"], costLedger["wwtpCosts"] = pipeCosts, pumpCosts, wwtpCosts
+    return completePumpCosts, completeWWTPCosts, completePublicPipeCosts
+
+
 def costsPrivateSewers(buildings, buildPoints, pipeDiameterPrivateSewer, averageTrenchDepthPrivateSewer, lifeSewers,
                        interestRate, operationCosts, fc_SewerCost):
     '''
@@ -373,8 +855,8 @@ def costsPrivateSewers(buildings, buildPoints, pipeDiameterPrivateSewer, average
     return totCostPrivateSewer  # don't multiply by life sewers
 
 
-def getCostsOfCrossedWWTPs(allNodesToAddToPN, pathBetweenWWTPs, WWTPS_noCon, sewers_NoCon, nodes_noCon, EW_Q,
-                           wwtpLifespan, interestRate, fc_wwtpOperation, fc_wwtpReplacement):
+def getCostsOfCrossedWWTPs(allNodesToAddToPN, pathBetweenWWTPs, WWTPS_noCon, sewers_NoCon, nodes_noCon, costModel,
+                           drainRoots=None):
     '''
     This function estimates the costs of all crossed wwtps on the path between two wwtps.
     
@@ -384,7 +866,8 @@ def getCostsOfCrossedWWTPs(allNodesToAddToPN, pathBetweenWWTPs, WWTPS_noCon, sew
     WWTPS_noCon          -    WWTP
     sewers_NoCon         -    Sewers
     nodes_noCon          -    Nodes
-    EW_Q, wwtpLifespan, interestRate, fc_wwtpOperation, fc_wwtpReplacement    -    Cost relevant parameters
+    costModel            -    Cost model (see createCostModel)
+    drainRoots           -    Drain roots of the sewers (optional, see createDrainRoots)
     
     Output:
     sumCostcrossedWWTP   -    Costs
@@ -392,43 +875,35 @@ def getCostsOfCrossedWWTPs(allNodesToAddToPN, pathBetweenWWTPs, WWTPS_noCon, sew
     # Iterate path and get the sum of all flow which flows to WWTPs in the path
     allWWTPsInPath = []  # List to store all crossed wwtp with the flow [[ID, flow]]
     sumCostcrossedWWTP = 0  # Total costs
+    nodesOnPath, wwtpIDs = set(pathBetweenWWTPs), set(wwtp[0] for wwtp in WWTPS_noCon)
 
     # Get all WWTPs in Path
     for i in allNodesToAddToPN:
-        for wwtp in WWTPS_noCon:
-            if i[0] == wwtp[0]:
-                if i[0] in pathBetweenWWTPs:
-                    allWWTPsInPath.append([i[0], 0])
-                    break
+        if i[0] in wwtpIDs and i[0] in nodesOnPath:
+            allWWTPsInPath.append([i[0], 0])
 
     # Iterate path
     if len(allWWTPsInPath) > 0:
+        crossedWWTPs = {}  # {ID: [ID, flow]} (first entry of each wwtp)
+        for wwtp in allWWTPsInPath:
+            crossedWWTPs.setdefault(wwtp[0], wwtp)
+        ownFlows = {}  # Flow of the nodes on the path
+        for n in nodes_noCon:
+            if n[0] in nodesOnPath and n[0] not in ownFlows:
+                ownFlows[n[0]] = n[8]
+
+        # get WWTP to which each node flows and sum the flows
+        if drainRoots is not None:
+            updateDrainRoots(drainRoots, sewers_NoCon)
         for i in pathBetweenWWTPs:
-            wwtpfound = 0
-
-            # get WWTP to which this node flows
-            iterate = i
-            try:
-                while wwtpfound == 0:
-                    nextN = sewers_NoCon[iterate]
-                    if nextN[0] == ():
-                        wwtpfound = 1
-                        toWWTP = iterate
-                        break
-                    iterate = nextN[0]
-            except:
+            toWWTP = getDrainRoot(drainRoots, sewers_NoCon, i)
+            if toWWTP is None or toWWTP not in sewers_NoCon:
                 continue  # This node was not in network
+            if toWWTP in crossedWWTPs:
+                crossedWWTPs[toWWTP][1] += ownFlows[i]
 
-            for wwtp in allWWTPsInPath:
-                if wwtp[0] == toWWTP:
-                    for n in nodes_noCon:
-                        if n[0] == i:
-                            fl = n[8]
-                            break
-                    wwtp[1] += fl
-                    break
-        for i in allWWTPsInPath:
-            flowWWTP = i[1]
-            costCrossed = costWWTP(flowWWTP, EW_Q, wwtpLifespan, interestRate, fc_wwtpOperation, fc_wwtpReplacement)
+        # Costs of all crossed wwtps at once
+        costsCrossed = getModelWWTPCostsArray(costModel, [i[1] for i in allWWTPsInPath])
+        for costCrossed in costsCrossed.tolist():
             sumCostcrossedWWTP += costCrossed
     return sumCostcrossedWWTP
@@ -0,0 +1,282 @@
+# ======================================================================================
+# Copyright 2014  Swiss Federal Institute of Aquatic Science and Technology
+#
+# This file is part of SNIP (Sustainable Network Infrastructure Planning)
+# SNIP is used for determining the optimal degree of centralization for waste
+# water infrastructures. You find detailed information about SNIP in Eggimann et al. (2014).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Contact:   sven.eggimann@eawag.ch
+# Version    1.0
+# Date:      1.07.2015
+# Author:     Eggimann Sven
+# ======================================================================================
+# The SNIP model was updated and modified for use in rural Alabama in 2025.
+# For detailed information see Jordan et al. (in prep).
+
+# The model was modified for Python 3.11 to run on open source packages.
+# This module holds the grid index of the DEM points which is used to look up raster
+# cells without iterating the whole list of raster points.
+
+# Author:   Mallory Jordan
+# Contact:  maj0082@auburn.edu
+# ======================================================================================
+
+# Imports
+import math
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree                   # Optional, only used for DEMs which are not a regular grid
+except ImportError:
+    cKDTree = None
+
+exactHypot = np.frompyfunc(math.hypot, 2, 1)            # Same rounding as math.hypot used in the rest of SNIP
+
+
+def createDEMIndex(rasterPoints, rasterSize):
+    """
+    This function creates a grid index of the DEM points. The raster points are binned into rows and columns
+    of the raster so that a raster cell can be found with index arithmetic. If the DEM points are not a regular
+    grid, a KD-Tree is used instead (if scipy is available).
+
+    Input Arguments:
+    rasterPoints          --    Raster points. Form: [(ID, X, Y, Z),...]
+    rasterSize            --    Size of the raster cells
+
+    Output Arguments:
+    demIndex              --    Dictionary with the coordinate arrays and the grid of list positions (-1: no DEM point)
+    """
+    ids = np.array([p[0] for p in rasterPoints], dtype=np.int64)
+    xs = np.array([p[1] for p in rasterPoints], dtype=float)
+    ys = np.array([p[2] for p in rasterPoints], dtype=float)
+    zs = np.array([p[3] for p in rasterPoints], dtype=float)
+
+    demIndex = {"rasterSize": rasterSize, "ids": ids, "xs": xs, "ys": ys, "zs": zs, "grid": None, "tree": None,
+                "positionOfID": {int(ID): pos for pos, ID in enumerate(ids)}}
+
+    if len(rasterPoints) == 0:
+        return demIndex
+
+    x0, y0 = xs.min(), ys.min()
+    cols = np.rint((xs - x0) / rasterSize).astype(np.int64)
+    rows = np.rint((ys - y0) / rasterSize).astype(np.int64)
+
+    # Check if all DEM points lie on the grid
+    tolerance = 0.001 * rasterSize
+    isRegular = np.all(np.abs(x0 + cols * rasterSize - xs) <= tolerance) and np.all(np.abs(y0 + rows * rasterSize - ys) <= tolerance)
+
+    if isRegular:
+        nrOfRows, nrOfCols = int(rows.max()) + 1, int(cols.max()) + 1
+        grid = np.full((nrOfRows, nrOfCols), -1, dtype=np.int64)
+        _, firstPositions = np.unique(rows * nrOfCols + cols, return_index=True)     # In case of duplicates the first point in the list is used
+        grid[rows[firstPositions], cols[firstPositions]] = firstPositions
+        demIndex.update({"grid": grid, "x0": x0, "y0": y0, "rows": rows, "cols": cols, "uniqueCells": len(firstPositions) == len(ids)})
+    elif cKDTree is not None:
+        demIndex["tree"] = cKDTree(np.column_stack((xs, ys)))
+    return demIndex
+
+
+def applyOnUniqueValues(function, *arrays):
+    """
+    This function applies a scalar function element-wise, but evaluates it only once for each unique value (or
+    combination of values). Like this the results are exactly the same as with the math functions used in the list
+    based calculations, also if numpy would round differently.
+
+    Input Arguments:
+    function              --    Scalar function
+    arrays                --    Arrays with the arguments of the function (same length)
+
+    Output Arguments:
+    results               --    Array with function values
+    """
+    if len(arrays[0]) == 0:
+        return np.zeros(0)
+    if len(arrays) == 1:
+        uniqueValues, inverse = np.unique(arrays[0], return_inverse=True)
+        results = np.array([function(value) for value in uniqueValues.tolist()], dtype=float)
+    else:
+        uniqueValues, inverse = np.unique(np.column_stack(arrays), axis=0, return_inverse=True)
+        results = np.array([function(*values) for values in uniqueValues.tolist()], dtype=float)
+    return results[inverse.reshape(-1)]
+
+
+def selectDEMCells(xs, ys, demIndex, firstMatch=False, strictWindow=False):
+    """
+    This function selects for each coordinate the DEM cell within the search window of +/- raster size.
+
+    Input Arguments:
+    xs, ys                --    Coordinates of the points to look up
+    demIndex              --    DEM index (see createDEMIndex)
+    firstMatch            --    True: The first raster point of the list within the search window is selected (as the
+                                original list iteration), False: The closest raster point is selected
+    strictWindow          --    True: Raster points on the border of the search window are excluded
+
+    Output Arguments:
+    positions             --    Position in the list of raster points for each coordinate (-1: no DEM cell found)
+    """
+    xs, ys = np.atleast_1d(np.asarray(xs, dtype=float)), np.atleast_1d(np.asarray(ys, dtype=float))
+    positions = np.full(len(xs), -1, dtype=np.int64)
+
+    if len(xs) == 0 or len(demIndex["ids"]) == 0:
+        return positions
+
+    if demIndex["grid"] is None:
+        return selectDEMCellsScattered(xs, ys, demIndex, firstMatch, strictWindow)
+
+    rasterSize, grid, demX, demY = demIndex["rasterSize"], demIndex["grid"], demIndex["xs"], demIndex["ys"]
+    nrOfRows, nrOfCols = grid.shape
+    baseRows = np.rint((ys - demIndex["y0"]) / rasterSize).astype(np.int64)
+    baseCols = np.rint((xs - demIndex["x0"]) / rasterSize).astype(np.int64)
+    bestKey = np.full(len(xs), np.inf)
+
+    # Iterate the cells around the closest grid cell. Check the window with the original coordinates.
+    for dRow in (-2, -1, 0, 1, 2):
+        for dCol in (-2, -1, 0, 1, 2):
+            rows, cols = baseRows + dRow, baseCols + dCol
+            inside = (rows >= 0) & (rows < nrOfRows) & (cols >= 0) & (cols < nrOfCols)
+            candidates = np.full(len(xs), -1, dtype=np.int64)
+            candidates[inside] = grid[rows[inside], cols[inside]]
+            found = candidates >= 0
+            candX, candY = demX[np.where(found, candidates, 0)], demY[np.where(found, candidates, 0)]
+
+            if strictWindow:
+                inWindow = (candX - rasterSize < xs) & (xs < candX + rasterSize) & (candY - rasterSize < ys) & (ys < candY + rasterSize)
+            else:
+                inWindow = (candX <= xs + rasterSize) & (candX >= xs - rasterSize) & (candY <= ys + rasterSize) & (candY >= ys - rasterSize)
+            inWindow &= found
+
+            if not inWindow.any():
+                continue
+
+            key = np.full(len(xs), np.inf)
+            if firstMatch:
+                key[inWindow] = candidates[inWindow]
+            else:
+                key[inWindow] = exactHypot(xs[inWindow] - candX[inWindow], ys[inWindow] - candY[inWindow]).astype(float)
+
+            isBetter = inWindow & ((key < bestKey) | ((key == bestKey) & (candidates < positions)))
+            positions[isBetter], bestKey[isBetter] = candidates[isBetter], key[isBetter]
+    return positions
+
+
+def selectDEMCellsScattered(xs, ys, demIndex, firstMatch, strictWindow):
+    """
+    This function selects the DEM cells if the DEM points are not a regular grid (see selectDEMCells).
+
+    Input Arguments:
+    xs, ys                --    Coordinates of the points to look up
+    demIndex              --    DEM index (see createDEMIndex)
+    firstMatch            --    Criteria to select first point in list instead of closest point
+    strictWindow          --    Criteria to exclude points on the border of the search window
+
+    Output Arguments:
+    positions             --    Position in the list of raster points for each coordinate (-1: no DEM cell found)
+    """
+    rasterSize, demX, demY = demIndex["rasterSize"], demIndex["xs"], demIndex["ys"]
+    positions = np.full(len(xs), -1, dtype=np.int64)
+
+    if demIndex["tree"] is not None:
+        candidateLists = demIndex["tree"].query_ball_point(np.column_stack((xs, ys)), r=rasterSize * 1.000001, p=np.inf)
+    else:
+        candidateLists = [range(len(demX))] * len(xs)
+
+    for nr, candidateList in enumerate(candidateLists):
+        x, y, bestKey = xs[nr], ys[nr], None
+        for pos in sorted(candidateList):
+            candX, candY = demX[pos], demY[pos]
+            if strictWindow:
+                inWindow = candX - rasterSize < x < candX + rasterSize and candY - rasterSize < y < candY + rasterSize
+            else:
+                inWindow = x - rasterSize <= candX <= x + rasterSize and y - rasterSize <= candY <= y + rasterSize
+            if inWindow:
+                if firstMatch:
+                    positions[nr] = pos
+                    break
+                key = math.hypot(x - candX, y - candY)
+                if bestKey is None or key < bestKey:
+                    positions[nr], bestKey = pos, key
+    return positions
+
+
+def sample_heights(xs, ys, demIndex, firstMatch=False):
+    """
+    This function reads out the heights of the DEM for many coordinates in one call.
+
+    Input Arguments:
+    xs, ys                --    Coordinates of the points
+    demIndex              --    DEM index (see createDEMIndex)
+    firstMatch            --    True: Height of the first raster point in the list within +/- raster size (compatibility
+                                with the original list iteration), False: Height of the closest raster point
+
+    Output Arguments:
+    heights               --    Array with heights (nan if no DEM cell is found within the raster size)
+    """
+    positions = selectDEMCells(xs, ys, demIndex, firstMatch)
+    heights = np.full(len(positions), np.nan)
+    heights[positions >= 0] = demIndex["zs"][positions[positions >= 0]]
+    return heights
+
+
+def createBuildingMask(demIndex, buildingPoints):
+    """
+    This function marks all DEM cells on which there is a building. The buildings are binned into the raster cells
+    (np.floor((x - x0) / cell)) once per run instead of checking every cell against every building for each a* search.
+    Buildings on the border of a cell mark both neighbouring cells (as when checking each cell).
+
+    Input Arguments:
+    demIndex              --    DEM index (see createDEMIndex)
+    buildingPoints        --    Buildings. Form: [(ID, X, Y, ...),...]
+
+    Output Arguments:
+    buildingCells         --    Boolean array with an entry for each raster point (True: building within cell)
+    """
+    rasterSize, demX, demY = demIndex["rasterSize"], demIndex["xs"], demIndex["ys"]
+    buildingCells = np.zeros(len(demX), dtype=bool)
+
+    if len(buildingPoints) == 0 or len(demX) == 0:
+        return buildingCells
+
+    xGeb = np.array([geb[1] for geb in buildingPoints], dtype=float)
+    yGeb = np.array([geb[2] for geb in buildingPoints], dtype=float)
+
+    if demIndex["grid"] is None:
+        if demIndex["tree"] is not None:
+            candidateLists = demIndex["tree"].query_ball_point(np.column_stack((xGeb, yGeb)), r=0.5 * rasterSize * 1.000001, p=np.inf)
+        else:
+            candidateLists = [range(len(demX))] * len(xGeb)
+
+        for nr, candidateList in enumerate(candidateLists):
+            for pos in candidateList:
+                if demX[pos] - 0.5*rasterSize <= xGeb[nr] <= demX[pos] + 0.5*rasterSize and demY[pos] - 0.5*rasterSize <= yGeb[nr] <= demY[pos] + 0.5*rasterSize:
+                    buildingCells[pos] = True
+        return buildingCells
+
+    grid = demIndex["grid"]
+    nrOfRows, nrOfCols = grid.shape
+    baseCols = np.floor((xGeb - (demIndex["x0"] - 0.5 * rasterSize)) / rasterSize).astype(np.int64)
+    baseRows = np.floor((yGeb - (demIndex["y0"] - 0.5 * rasterSize)) / rasterSize).astype(np.int64)
+
+    for dRow in (-1, 0, 1):
+        for dCol in (-1, 0, 1):
+            rows, cols = baseRows + dRow, baseCols + dCol
+            inside = (rows >= 0) & (rows < nrOfRows) & (cols >= 0) & (cols < nrOfCols)
+            cells = grid[rows[inside], cols[inside]]
+            found = cells >= 0
+            cells, x, y = cells[found], xGeb[inside][found], yGeb[inside][found]
+            currX, currY = demX[cells], demY[cells]
+            inCell = (currX - 0.5*rasterSize <= x) & (x <= currX + 0.5*rasterSize) & (currY - 0.5*rasterSize <= y) & (y <= currY + 0.5*rasterSize)
+            buildingCells[cells[inCell]] = True
+    return buildingCells
@@ -47,13 +47,22 @@
 # Imports
 import geopandas as gpd
 import pandas as pd
-import os, math, sys, operator
+import os, math, sys, operator, heapq, shutil, tempfile
 from datetime import datetime
 from shapely.geometry import LineString, MultiLineString, GeometryCollection, Point, MultiPoint
 from shapely.ops import split, nearest_points
 from SNIP_astar_open import *
 from SNIP_costs_open import *
+from SNIP_dem_open import *
+from SNIP_routing_open import *
+from SNIP_parallel_open import *
+from SNIP_checkpoint_open import *
+from SNIP_instrumentation_open import *
+from SNIP_spatial_open import *
+from SNIP_sewers_open import *
+from SNIP_positions_open import *
 
+pathWorker = None  # Static input of the speculative path finding in the workers of the pool (see initPathWorker)
 
 def distanceCalc2d(p0, p1):
     """
@@ -168,7 +177,7 @@ def getTopFleftBottomRightTuple(aggregatedNodes):
     return tupleTopLef, tupleBottomRight
 
 
-def assignHighAggregatedNodes(aggregatetPoints, rasterPoints, rasterSize, minTD):
+def assignHighAggregatedNodes(aggregatetPoints, rasterPoints, rasterSize, minTD, demIndex=None, firstMatch=True):
     """
     This function assigns the correct height to aggregate nodes by searching the height of a DEM.
 
@@ -177,18 +186,21 @@ def assignHighAggregatedNodes(aggregatetPoints, rasterPoints, rasterSize, minTD)
     rasterPoints          -    list with nodes to reset flow
     rasterSize            -    WWTP from which the breath search was made ??? Really Needed?
     minTD                 -    Minimum Trench Depth
+    demIndex              -    Grid index of the DEM (created if not provided)
+    firstMatch            -    True: first raster point within raster size (as originally), False: closest raster point
 
     Output Arguments:
     withHeith             -    Aggregated nodes with correct height
     """
+    if demIndex is None:
+        demIndex = createDEMIndex(rasterPoints, rasterSize)
+
+    positions = selectDEMCells([i[1] for i in aggregatetPoints], [i[2] for i in aggregatetPoints], demIndex, firstMatch)
+
     withHeith = []
-    for i in aggregatetPoints:
-        X, Y = i[1], i[2]
-        for f in rasterPoints:  # Assign height
-            if (f[1] <= X + rasterSize and f[1] >= X - rasterSize) and (
-                    f[2] <= Y + rasterSize and f[2] >= Y - rasterSize):
-                heightSTART = f[3]
-                break
+    for i, pos in zip(aggregatetPoints, positions):
+        if pos >= 0:  # Assign height. If no DEM cell is found, the height of the node before is used
+            heightSTART = rasterPoints[pos][3]
         z = [i[0], i[1], i[2], heightSTART, i[4], i[5], i[6], i[7], i[8], i[9], heightSTART - minTD]
         withHeith.append(z)
     return withHeith
@@ -667,30 +679,27 @@ def addToEdgeList(edgeList, distStartEnd, slopeDijkstra, idp0, idp1, p0, p1):
     return edgeList
 
 
-def costToWTP(pathToWTP, edgesID, nodes, pumps, minTD, toNode, sewers, discountYearsSewers, interestRate, stricklerC,
-              operationCosts, f_SewerCost):
+def costToWTP(pathToWTP, edgeChanges, nodes, pumps, minTD, toNode, sewers, costModel):
     """
     This function calculates the network sewer costs from a node to the closest wwtp. Calculations start from source.
 
     Input Arguments:
     pathToWTP             -- path to closest wwtp
-    edgesID               -- edges
+    edgeChanges           -- changes of the edges of the option (see createEdgeChanges)
     nodes                 -- nodes
     pumps                 -- list with pumps
     minTD                 -- min trench depth
     toNode                -- source ID
     sewers                -- sewer network
-    discountYearsSewers   -- lifespan of sewers
-    interestRate          -- real interest rate
-    stricklerC            -- strickler coefficient
-    operationCosts        -- Operation costs of sewer per meter [CHF]
+    costModel             -- cost model (see createCostModel)
 
     Output Arguments:
     totCosts              -- Cost of network (new and already existing)
-    edgesID               -- Edge list with adopted pipe diameters
+    edgeChanges           -- Changes of the edges with adopted pipe diameters
     """
     cnt, totCosts = -1, 0
     flowCurrentNode = getSummedFlow(nodes, toNode)  # Get flow of the new connected node
+    positions, flows, slopes, distances, averageTDs = [], [], [], [], []  # Segments of the path
 
     # Iterate path to WWTP
     for i in pathToWTP:
@@ -699,15 +708,14 @@ def costToWTP(pathToWTP, edgesID, nodes, pumps, minTD, toNode, sewers, discountY
 
         # Get distance & flow of each segments
         if cnt > 0:
-            pos = 0
-            for edge in edgesID:
-                if edge[0][0] == oldNode and edge[1][0] == nextNode:  # Stored inverse, thus slope needs to get inverted
-                    distanz, slope = edge[2], edge[3] * -1  # slope needs to be inverted
-                    break
-                if edge[1][0] == oldNode and edge[0][0] == nextNode:
-                    distanz, slope = edge[2], edge[3]  # distance, # slope stays the same
-                    break
-                pos += 1
+            pos = getEdgePosition(edgeChanges, oldNode, nextNode)
+            if pos is None:
+                raise Exception("ERROR: No edge between " + str(oldNode) + " and " + str(nextNode))
+            edge = readEdge(edgeChanges, pos)
+            if edge[0][0] == oldNode and edge[1][0] == nextNode:  # Stored inverse, thus slope needs to get inverted
+                distanz, slope = edge[2], edge[3] * -1  # slope needs to be inverted
+            else:
+                distanz, slope = edge[2], edge[3]  # distance, # slope stays the same
 
             flowSegment, trenchDepthFROM = readFlow(nodes, oldNode)  # get flow
             _, trenchDepthTO = readFlow(nodes, nextNode)  # get new trenchDepth
@@ -721,43 +729,45 @@ def costToWTP(pathToWTP, edgesID, nodes, pumps, minTD, toNode, sewers, discountY
                 averageTD = (abs(trenchDepthFROM) + abs(trenchDepthTO)) / 2
 
             # Calculate pipe segment costs
-            totalFlow = flowSegment + flowCurrentNode
+            totalFlow = flowSegment + flowCurrentNode  # flow upstream used for estimating diameter
+            positions.append(pos)
+            flows.append(totalFlow)
+            slopes.append(slope)
+            distances.append(distanz)
+            averageTDs.append(averageTD)
+        oldNode = i
 
-            # flow upstream used for estimating diameter
-            pipeDiameter = getPipeDiameter(totalFlow, slope, stricklerC)  # get pipe diameter
-            segmentCosts = calculatePipeCosts(pipeDiameter, distanz, averageTD, discountYearsSewers, interestRate,
-                                              operationCosts,
-                                              f_SewerCost)  # segment pipe costs #could be added totalFlow, slope,
-            edgesID[pos][4] = pipeDiameter  # Add pipe diameter to edgeList
+    # Pipe diameters and segment pipe costs of all segments at once
+    if positions:
+        pipeDiameters = getModelPipeDiameters(costModel, flows, slopes).tolist()
+        segmentCosts = getModelPipeCostsArray(costModel, pipeDiameters, distances, averageTDs).tolist()
+        for pos, pipeDiameter, segmentCost in zip(positions, pipeDiameters, segmentCosts):
+            writeEdge(edgeChanges, pos)[4] = pipeDiameter  # Add pipe diameter to edgeList
 
             # If nextNode not in sewers then this pipe has to be newly constructed with full new costs. If nextNode is in sewers, then this pipe is already constructed and only only partial cost arise
-            totCosts = totCosts + segmentCosts
-        oldNode = i
-    return totCosts, edgesID
+            totCosts = totCosts + segmentCost
+    return totCosts, edgeChanges
 
 
-def costsBetweenWWTPs(pathToWTP, edgesID, nodes, inverse, pumps, minTD, discountYearsSewers, interestRate, stricklerC,
-                      operationCosts, f_SewerCost):
+def costsBetweenWWTPs(pathToWTP, edgeChanges, nodes, inverse, pumps, minTD, costModel):
     """
     This function calculates the network sewer costs from a wwtp to another wwtp.  Start from back
 
     Input Arguments:
     pathToWTP             --    path to closest wwtp
-    edgesID               --    edges
+    edgeChanges           --    changes of the edges of the option (see createEdgeChanges)
     nodes                 --    nodes
     inverse               --    Direction criteria
     pumps                 --    list with pumps
     minTD                 --    minimum trench depth
-    discountYearsSewers   --    lifespan of sewers
-    interestRate          --    real interest rate
-    stricklerC            --    strickler coefficient
-    operationCosts        --    Operation costs of sewer per meter [CHF]
+    costModel             --    cost model (see createCostModel)
 
     Output Arguments:
     segmentCostsSUM       --    Cost of pipes
-    edgesID               --    Edges ID
+    edgeChanges           --    Changes of the edges with adopted pipe diameters
     """
     segmentCostsSUM, count = 0, -1
+    positions, flows, slopes, distances, averageTDs = [], [], [], [], []  # Segments of the path
 
     # Path to WWTP
     for i in pathToWTP:
@@ -766,16 +776,15 @@ def costsBetweenWWTPs(pathToWTP, edgesID, nodes, inverse, pumps, minTD, discount
 
         # Get distance & flow of each segments
         if count > 0:
-            pos = 0
-            for edge in edgesID:  # distances from edge list.
-                if edge[0][0] == oldNode and edge[1][0] == nextNode:
-                    distanz, slope = edge[2], edge[
-                        3] * -1  # distance, slope needs to be multiplyed by minus one as direction is inversed
-                    break
-                if edge[1][0] == oldNode and edge[0][0] == nextNode:
-                    distanz, slope = edge[2], edge[3]  # distance, slope stays the same#
-                    break
-                pos += 1
+            pos = getEdgePosition(edgeChanges, oldNode, nextNode)  # distances from edge list.
+            if pos is None:
+                raise Exception("ERROR: No edge between " + str(oldNode) + " and " + str(nextNode))
+            edge = readEdge(edgeChanges, pos)
+            if edge[0][0] == oldNode and edge[1][0] == nextNode:
+                distanz, slope = edge[2], edge[
+                    3] * -1  # distance, slope needs to be multiplyed by minus one as direction is inversed
+            else:
+                distanz, slope = edge[2], edge[3]  # distance, slope stays the same#
 
             for punkt in nodes:
                 if punkt[0] == oldNode:
@@ -795,21 +804,22 @@ def costsBetweenWWTPs(pathToWTP, edgesID, nodes, inverse, pumps, minTD, discount
             else:
                 averageTD = (abs(trenchDepthFROM) + abs(trenchDepthTO)) / 2
 
-            pipeDiameter = getPipeDiameter(totalFlow, slope, stricklerC)
-            edgesID[pos][4] = pipeDiameter  # Change pipe diameter
-
-            # Normal Way
-            if inverse == 0:
-                segmentCosts = calculatePipeCosts(pipeDiameter, distanz, averageTD, discountYearsSewers, interestRate,
-                                                  operationCosts, f_SewerCost)
-            else:  # Inverse flow
-                slope = slope * -1  # slope is inversed
-                segmentCosts = calculatePipeCosts(pipeDiameter, distanz, averageTD, discountYearsSewers, interestRate,
-                                                  operationCosts, f_SewerCost)
-            segmentCostsSUM = segmentCostsSUM + segmentCosts
+            positions.append(pos)
+            flows.append(totalFlow)
+            slopes.append(slope)
+            distances.append(distanz)
+            averageTDs.append(averageTD)
         oldNode = i
 
-    return segmentCostsSUM, edgesID
+    # Pipe diameters and segment pipe costs of all segments at once (the costs do not depend on the direction)
+    if positions:
+        pipeDiameters = getModelPipeDiameters(costModel, flows, slopes).tolist()
+        segmentCosts = getModelPipeCostsArray(costModel, pipeDiameters, distances, averageTDs).tolist()
+        for pos, pipeDiameter, segmentCost in zip(positions, pipeDiameters, segmentCosts):
+            writeEdge(edgeChanges, pos)[4] = pipeDiameter  # Change pipe diameter
+            segmentCostsSUM = segmentCostsSUM + segmentCost
+
+    return segmentCostsSUM, edgeChanges
 
 
 def appendDistances(pathtoOrigin, sewers):
@@ -1310,7 +1320,7 @@ def getInflowingNodes(nodes, partOfNetwork, initialFlowWWTP, notInaNetwork):
         return nodes
 
 
-def findNetworkToRemove(archPathWWTP, nodesToNetwork, nodesFromNetwork, sewers, WWTPs):
+def findNetworkToRemove(archPathWWTP, nodesToNetwork, nodesFromNetwork, sewers, WWTPs, drainRoots=None):
     """
     This function checks if there are intermediate nodes which are not in the beginning
     or starting network. If yes, search the wwtp of this node and add to list in order that
@@ -1322,6 +1332,7 @@ def findNetworkToRemove(archPathWWTP, nodesToNetwork, nodesFromNetwork, sewers,
     nodesFromNetwork           -    Nodes in network of starting node
     sewers                     -    Network before iteration
     WWTPs                      -    list of wwtps
+    drainRoots                 -    Drain roots of the sewers (optional, see createDrainRoots)
 
     Output Arguments:
     wwtpsOnTheWayBetweenWTPs   -    wwtps on the way between two nodes.
@@ -1337,6 +1348,8 @@ def findNetworkToRemove(archPathWWTP, nodesToNetwork, nodesFromNetwork, sewers,
             noNetworkNode.append(i[0])
 
     # Check if in sewers and thus in a network. If in a network, go to closestWWTP and give out WWTP (in oder to remove whole network)
+    if drainRoots is not None:
+        updateDrainRoots(drainRoots, sewers)
     for i in noNetworkNode:
         try:
             inNetworkNode = sewers[i][0]  # Check to which wWTP the node flows
@@ -1344,7 +1357,9 @@ def findNetworkToRemove(archPathWWTP, nodesToNetwork, nodesFromNetwork, sewers,
                 if i not in wwtpsOnTheWayBetweenWTPs:
                     wwtpsOnTheWayBetweenWTPs.append(i)
             else:
-                _, closestARA = getclosestWTPreconnection(inNetworkNode, WWTPs, sewers)
+                closestARA = getDrainRoot(drainRoots, sewers, inNetworkNode)
+                if closestARA not in sewers:
+                    continue  # Network does not end in a wwtp
                 if fromNodeWWTP != closestARA and toNodeWWTP != closestARA:  # Check if closest ARA is a wwtp
                     if closestARA not in wwtpsOnTheWayBetweenWTPs:  # If closest ARA is not the starting or ending node(which can be a wwpt)
                         wwtpsOnTheWayBetweenWTPs.append(closestARA)
@@ -1469,7 +1484,150 @@ def addDEMPntstoNodes(nodes, archPathListMST, boundingCandidates, fromNode, toNo
     return nodes
 
 
-def getClosestNetworkWWTP(nodes, WWTPs, sewers, pZero, checkBackConnectionID):
+def createNetworkIndex(cellSize=100.0):
+    """
+    This function creates the index of the sewer nodes used to find the closest node of another network. The
+    index is updated with the changes of the sewers before each search (see updateNetworkIndex).
+
+    Input Arguments:
+    cellSize                  --    [m] Size of the grid cells
+
+    Output Arguments:
+    networkIndex              --    Dictionary with the grid of the sewer nodes (without wwtps), the sewers of the
+                                    last update, the coordinates of the nodes and the drain roots of the nodes (see
+                                    createDrainRoots)
+    """
+    return {"grid": createPointGrid(cellSize), "sewers": {}, "coordinates": {}, "nrOfReadNodes": 0,
+            "notIndexed": set(), "drainRoots": createDrainRoots()}
+
+
+def getNodeCoordinates(networkIndex, ID, nodes):
+    """
+    This function reads out the coordinates of a node (same as getPns, the first entry with the ID is used).
+
+    Input Arguments:
+    networkIndex              --    Network index
+    ID                        --    ID
+    nodes                     --    nodes
+
+    Output Arguments:
+    coordinates               --    (X, Y, Z) or None if the node is not in nodes
+    """
+    coordinates = networkIndex["coordinates"]
+    if ID not in coordinates:
+        # New nodes are appended to the nodes, so only the nodes which are not yet read are added
+        if networkIndex["nrOfReadNodes"] > len(nodes):
+            coordinates.clear()
+            networkIndex["nrOfReadNodes"] = 0
+        for i in nodes[networkIndex["nrOfReadNodes"]:]:
+            if i[0] not in coordinates:
+                coordinates[i[0]] = (i[1], i[2], i[3])
+        networkIndex["nrOfReadNodes"] = len(nodes)
+    return coordinates.get(ID)
+
+
+def updateNetworkIndex(networkIndex, sewers, nodes):
+    """
+    This function updates the network index with the changes of the sewers since the last update.
+
+    Input Arguments:
+    networkIndex              --    Network index
+    sewers                    --    Sewer Network
+    nodes                     --    nodes
+
+    Output Arguments:
+    indexComplete             --    True if all sewer nodes (without wwtps) could be added to the grid
+    """
+    grid, notIndexed, indexedSewers = networkIndex["grid"], networkIndex["notIndexed"], networkIndex["sewers"]
+    updateDrainRoots(networkIndex["drainRoots"], sewers)
+    changedEntries = sewers.items() - indexedSewers.items()
+    removedNodes = indexedSewers.keys() - sewers.keys()
+
+    if changedEntries or removedNodes:
+        for ID in removedNodes:
+            del indexedSewers[ID]
+        indexedSewers.update(changedEntries)
+        for ID in removedNodes:
+            removeGridPoint(grid, ID)
+            notIndexed.discard(ID)
+        for ID, entry in changedEntries:
+            removeGridPoint(grid, ID)
+            notIndexed.discard(ID)
+            if entry[0] != ():  # Check that not wwtp
+                coordinates = getNodeCoordinates(networkIndex, ID, nodes)
+                if coordinates is None or coordinates[0] is None or coordinates[1] is None:
+                    notIndexed.add(ID)
+                else:
+                    addGridPoint(grid, ID, coordinates[0], coordinates[1], coordinates)
+    return len(notIndexed) == 0
+
+
+def flowsToNode(drainRoots, sewers, ID, toNode):
+    """
+    This function checks whether a node flows to a node (same nodes as found with breathSearch(toNode, sewers)).
+
+    Input Arguments:
+    drainRoots                --    Drain roots (updated with the sewers, see updateDrainRoots)
+    sewers                    --    Sewer Network
+    ID                        --    ID
+    toNode                    --    Node downstream (e.g. wwtp)
+
+    Output Arguments:
+    flowsTo                   --    True if the node is toNode or flows to toNode
+    """
+    if toNode not in sewers or sewers[toNode][0] == ():
+        return ID == toNode or getDrainRoot(drainRoots, sewers, ID) == toNode
+
+    onPath, element = set(), ID
+    while element not in onPath:
+        if element == toNode:
+            return True
+        if element not in sewers or sewers[element][0] == ():
+            return False
+        onPath.add(element)
+        element = sewers[element][0]
+    return False
+
+
+def getClosestForeignNetworkNode(networkIndex, sewers, pZero, checkBackConnectionID):
+    """
+    This function searches the closest sewer node (3d distance) which does not flow to a wwtp. The grid is
+    searched ring by ring until no closer node is possible. Of several nodes with the same distance the first
+    one in the sewers is taken.
+
+    Input Arguments:
+    networkIndex              --    Network index (updated, see updateNetworkIndex)
+    sewers                    --    Sewer Network nodes
+    pZero                     --    from Node
+    checkBackConnectionID     --    ID of WWTP
+
+    Output Arguments:
+    closestNetworkNode        --    Closest node of another network (False if there is none)
+    """
+    closestNetworkNode, closestDistance, sameDistance = False, 9999999999, []
+
+    for minDistance, ringCells in iterateGridRings(networkIndex["grid"], pZero[0], pZero[1]):
+        if closestNetworkNode is not False and minDistance > closestDistance * (1 + 1e-12) + 1e-9:
+            break
+        for _, points in ringCells:
+            for networkNode, corNet in points.items():
+                if flowsToNode(networkIndex["drainRoots"], sewers, networkNode, checkBackConnectionID):
+                    continue  # In order that not own network node is found
+                distanz3d, _, _ = distanceCalc3d(pZero, corNet)
+                if distanz3d < closestDistance:  # Get closest unweighted wwtp
+                    closestNetworkNode, closestDistance, sameDistance = networkNode, distanz3d, [networkNode]
+                elif distanz3d == closestDistance and closestNetworkNode is not False:
+                    sameDistance.append(networkNode)
+
+    if len(sameDistance) > 1:
+        sameDistance = set(sameDistance)
+        for i in sewers:
+            if i in sameDistance:
+                return i
+    return closestNetworkNode
+
+
+def getClosestNetworkWWTP(nodes, WWTPs, sewers, pZero, checkBackConnectionID, networkIndex=None):
     """
     This Function calculates the closest network node (merging heuristic)
     Then it iterates on the found network until a wwtp is reached
@@ -1480,22 +1638,26 @@ def getClosestNetworkWWTP(nodes, WWTPs, sewers, pZero, checkBackConnectionID):
     sewers                    --    Sewer Network nodes
     pZero                     --    from Node
     checkBackConnectionID     --    ID of WWTP
+    networkIndex              --    Network index (optional, see createNetworkIndex). If None, all nodes are compared.
 
     Output Arguments:
     closestWWTPinNet  --    Closest wwpt in a network
     cordWWTPinNet     --    Coordinate of wwtp in network
     """
-    closestNetworkNode, closestDistance = False, 9999999999
-    currentNetworkNodes = breathSearch(checkBackConnectionID, sewers)  # find all nodes in current network
-
-    for i in sewers:
-        if sewers[i][0] != ():  # Check that not wwtp
-            if i not in currentNetworkNodes:  # In order that not own network node is found
-                networkNode, corNet, _, _, _, _ = getPns(i, nodes)
-                distanz3d, _, _ = distanceCalc3d(pZero, corNet)
-                if distanz3d < closestDistance:  # Get closest unweighted wwtp
-                    closestNetworkNode = networkNode
-                    closestDistance = distanz3d  # Replace distance
+    if networkIndex is not None and updateNetworkIndex(networkIndex, sewers, nodes):
+        closestNetworkNode = getClosestForeignNetworkNode(networkIndex, sewers, pZero, checkBackConnectionID)
+    else:
+        closestNetworkNode, closestDistance = False, 9999999999
+        currentNetworkNodes = breathSearch(checkBackConnectionID, sewers)  # find all nodes in current network
+
+        for i in sewers:
+            if sewers[i][0] != ():  # Check that not wwtp
+                if i not in currentNetworkNodes:  # In order that not own network node is found
+                    networkNode, corNet, _, _, _, _ = getPns(i, nodes)
+                    distanz3d, _, _ = distanceCalc3d(pZero, corNet)
+                    if distanz3d < closestDistance:  # Get closest unweighted wwtp
+                        closestNetworkNode = networkNode
+                        closestDistance = distanz3d  # Replace distance
 
     # Closeset Network node
     if closestNetworkNode == False:
@@ -1619,16 +1781,132 @@ def turnNodesIntoWWTP(WWTPs, nodes, aggregatetPoints, sewers):
     return final_wwtps
 
 
-def connectivityPotential(nodes, WWTPs, idWWTP, pZero, f_merge):
+def createWWTPIndex(cellSize=500.0):
     """
-    Find node with highest connectivity-potential in wwtps. Plus the function finds the closest (euclidian distance) wwtp
+    This function creates the index of the wwtps used to find the closest wwtp and the wwtp with the highest
+    connectivity-potential. The index is updated with the changes of the wwtps before each search (see updateWWTPIndex).
 
     Input Arguments:
+    cellSize                   --    [m] Size of the grid cells
+
+    Output Arguments:
+    wwtpIndex                  --    Dictionary with the grid of the wwtps which can be connected, the state of each wwtp
+                                     at the last update and the smallest and largest size of the wwtps in each cell
+    """
+    return {"grid": createPointGrid(cellSize), "wwtps": {}, "positionOfID": {}, "notIndexed": set(), "cellSizes": {},
+            "sizeRange": None}
+
+
+def updateWWTPIndex(wwtpIndex, WWTPs, nodes):
+    """
+    This function updates the wwtp index with the changed, added and deleted wwtps (e.g. by delEntry or
+    updateFlowInWWTP) and the changed force criteria in the nodes since the last update.
+
+    Input Arguments:
+    wwtpIndex                  --    WWTP index
+    WWTPs                      --    List with wwtps
     nodes                      --    nodes
+
+    Output Arguments:
+    indexComplete              --    True if all wwtps could be added to the index
+    """
+    positionOfID, lastWWTPs, grid = wwtpIndex["positionOfID"], wwtpIndex["wwtps"], wwtpIndex["grid"]
+    currentWWTPs, positionsRead = {}, False
+    for f in WWTPs:
+        pos = positionOfID.get(f[0])
+        if (pos is None or pos >= len(nodes) or nodes[pos][0] != f[0]) and not positionsRead:
+            positionOfID.clear()
+            for pos, i in enumerate(nodes):
+                positionOfID.setdefault(i[0], pos)  # Same as getPns, the first entry with the ID is used
+            positionsRead, pos = True, positionOfID.get(f[0])
+        if pos is None or pos >= len(nodes) or nodes[pos][0] != f[0] or f[0] in currentWWTPs:
+            return False  # Not in nodes or twice in the wwtps
+        i = nodes[pos]
+        currentWWTPs[f[0]] = (f[1], i[5], i[1], i[2], i[3])  # Size, force criteria, coordinates
+
+    if currentWWTPs == lastWWTPs:
+        return len(wwtpIndex["notIndexed"]) == 0
+
+    changedCells = set()
+    for ID in lastWWTPs.keys() - currentWWTPs.keys():
+        changedCells.add(grid["cellOfPoint"].get(ID))
+        removeGridPoint(grid, ID)
+        wwtpIndex["notIndexed"].discard(ID)
+    for ID, entry in currentWWTPs.items():
+        if lastWWTPs.get(ID) == entry:
+            continue
+        changedCells.add(grid["cellOfPoint"].get(ID))
+        removeGridPoint(grid, ID)
+        wwtpIndex["notIndexed"].discard(ID)
+        size, forceConnection, x, y, z = entry
+        if forceConnection != 0:
+            continue  # Cannot be connected
+        if x is None or y is None or not isinstance(size, (int, float)) or not size > 0:
+            wwtpIndex["notIndexed"].add(ID)
+        else:
+            addGridPoint(grid, ID, x, y, (size, (x, y, z)))
+            changedCells.add(grid["cellOfPoint"][ID])
+
+    # Smallest and largest wwtp in each changed cell and of all wwtps
+    cellSizes = wwtpIndex["cellSizes"]
+    for cell in changedCells:
+        if cell in grid["cells"]:
+            sizes = [value[0] for value in grid["cells"][cell].values()]
+            cellSizes[cell] = (min(sizes), max(sizes))
+        else:
+            cellSizes.pop(cell, None)
+    if cellSizes:
+        wwtpIndex["sizeRange"] = (min(sizeRange[0] for sizeRange in cellSizes.values()), max(sizeRange[1] for sizeRange in cellSizes.values()))
+    else:
+        wwtpIndex["sizeRange"] = None
+    wwtpIndex["wwtps"] = currentWWTPs
+    return len(wwtpIndex["notIndexed"]) == 0
+
+
+def getSizeFactor(sizeRange, f_merge):
+    """
+    This function calculates the smallest size factor (size ** -f_merge) of the wwtps with a size in a range.
+
+    Input Arguments:
+    sizeRange                  --    Smallest and largest size
+    f_merge                    --    Merging Factor
+
+    Output Arguments:
+    sizeFactor                 --    Smallest size factor
+    """
+    return min(sizeRange[0] ** (-1 * f_merge), sizeRange[1] ** (-1 * f_merge))
+
+
+def getFirstWWTP(WWTPs, IDs):
+    """
+    This function selects of several wwtps the one which comes first in the list of wwtps.
+
+    Input Arguments:
     WWTPs                      --    List with wwtps
-    idWWTP                 --    To Node
+    IDs                        --    IDs of the wwtps
+
+    Output Arguments:
+    ID                         --    ID of the first wwtp
+    """
+    IDs = set(IDs)
+    for f in WWTPs:
+        if f[0] in IDs:
+            return f[0]
+
+
+def searchConnectivityPotential(wwtpIndex, WWTPs, idWWTP, pZero, f_merge):
+    """
+    This function searches the closest wwtp and the wwtp with the highest connectivity-potential in the wwtp index
+    (same result as the comparison of all wwtps in connectivityPotential). The grid is searched ring by ring and cells
+    are skipped if neither a closer wwtp nor a higher potential (lower index) is possible with the distance to the
+    cell and the sizes of its wwtps. Of several wwtps with the same value the first one in the list is taken.
+
+    Input Arguments:
+    wwtpIndex                  --    WWTP index (updated, see updateWWTPIndex)
+    WWTPs                      --    List with wwtps
+    idWWTP                     --    To Node
     pZero                      --    From Node
-    f_merge                    --    Puts the size in relation ot the distance. If large, the size gets more important
+    f_merge                    --    Merging Factor
 
     Output Arguments:
     potentialNode              --    Potential node with Index
@@ -1637,23 +1915,90 @@ def connectivityPotential(nodes, WWTPs, idWWTP, pZero, f_merge):
     closestCoordinates         --    Coordinates of closest WWTP
     """
     potIndex, closestDistance, potentialNode, closestWWTP = 9999999999, 9999999999, None, None
-
-    for f in WWTPs:
-        if f[0] != idWWTP:
-            idWWTPONE, pOne, _, _, forceConnection, _ = getPns(f[0], nodes)
-
-            if forceConnection == 0:
+    potentialNodeCoordinates, closestCoordinates, samePotential, sameDistance = None, None, [], []
+    grid, cellSizes = wwtpIndex["grid"], wwtpIndex["cellSizes"]
+    if wwtpIndex["sizeRange"] is None:
+        return None, None, None, None
+    smallestSizeFactor = getSizeFactor(wwtpIndex["sizeRange"], f_merge)
+    tolerance = 1 + 1e-9  # Rounding of the distance bounds
+
+    for minDistance, ringCells in iterateGridRings(grid, pZero[0], pZero[1]):
+        closestFound = closestWWTP is not None and minDistance > closestDistance * tolerance
+        potentialFound = potentialNode is not None and minDistance * smallestSizeFactor > potIndex * tolerance
+        if closestFound and potentialFound:
+            break
+        for cell, points in ringCells:
+            cellDistance = getCellDistance(grid, cell, pZero[0], pZero[1])
+            if (closestWWTP is not None and cellDistance > closestDistance * tolerance and
+                    potentialNode is not None and cellDistance * getSizeFactor(cellSizes[cell], f_merge) > potIndex * tolerance):
+                continue
+            for idWWTPONE, (size, pOne) in points.items():
+                if idWWTPONE == idWWTP:
+                    continue
                 distanceinclSlope, _, _ = distanceCalc3d(pZero, pOne)  # calculate 3d distance
-                size = f[1]  # size is in m3
 
                 # Get closest unweighted wwtp
                 if distanceinclSlope < closestDistance:
-                    closestWWTP, closestCoordinates, closestDistance = idWWTPONE, pOne, distanceinclSlope
+                    closestWWTP, closestCoordinates, closestDistance, sameDistance = idWWTPONE, pOne, distanceinclSlope, [idWWTPONE]
+                elif distanceinclSlope == closestDistance and closestWWTP is not None:
+                    sameDistance.append(idWWTPONE)
                 connectivityIndex = distanceinclSlope * size ** (-1 * f_merge)
 
                 # returns the node with the hightes potential
                 if connectivityIndex < potIndex:
-                    potentialNode, potentialNodeCoordinates, potIndex = idWWTPONE, pOne, connectivityIndex
+                    potentialNode, potentialNodeCoordinates, potIndex, samePotential = idWWTPONE, pOne, connectivityIndex, [idWWTPONE]
+                elif connectivityIndex == potIndex and potentialNode is not None:
+                    samePotential.append(idWWTPONE)
+
+    if len(sameDistance) > 1:
+        closestWWTP = getFirstWWTP(WWTPs, sameDistance)
+        closestCoordinates = grid["cells"][grid["cellOfPoint"][closestWWTP]][closestWWTP][1]
+    if len(samePotential) > 1:
+        potentialNode = getFirstWWTP(WWTPs, samePotential)
+        potentialNodeCoordinates = grid["cells"][grid["cellOfPoint"][potentialNode]][potentialNode][1]
+    return potentialNode, potentialNodeCoordinates, closestWWTP, closestCoordinates
+
+
+def connectivityPotential(nodes, WWTPs, idWWTP, pZero, f_merge, wwtpIndex=None):
+    """
+    Find node with highest connectivity-potential in wwtps. Plus the function finds the closest (euclidian distance) wwtp
+
+    Input Arguments:
+    nodes                      --    nodes
+    WWTPs                      --    List with wwtps
+    idWWTP                 --    To Node
+    pZero                      --    From Node
+    f_merge                    --    Puts the size in relation ot the distance. If large, the size gets more important
+    wwtpIndex                  --    WWTP index (optional, see createWWTPIndex). If None, all wwtps are compared.
+
+    Output Arguments:
+    potentialNode              --    Potential node with Index
+    potentialNodeCoordinates   --    Coordinates of potential node
+    closestWWTP                --    Id of closest WWTP
+    closestCoordinates         --    Coordinates of closest WWTP
+    """
+    if wwtpIndex is not None and updateWWTPIndex(wwtpIndex, WWTPs, nodes):
+        potentialNode, potentialNodeCoordinates, closestWWTP, closestCoordinates = searchConnectivityPotential(
+            wwtpIndex, WWTPs, idWWTP, pZero, f_merge)
+    else:
+        potIndex, closestDistance, potentialNode, closestWWTP = 9999999999, 9999999999, None, None
+
+        for f in WWTPs:
+            if f[0] != idWWTP:
+                idWWTPONE, pOne, _, _, forceConnection, _ = getPns(f[0], nodes)
+
+                if forceConnection == 0:
+                    distanceinclSlope, _, _ = distanceCalc3d(pZero, pOne)  # calculate 3d distance
+                    size = f[1]  # size is in m3
+
+                    # Get closest unweighted wwtp
+                    if distanceinclSlope < closestDistance:
+                        closestWWTP, closestCoordinates, closestDistance = idWWTPONE, pOne, distanceinclSlope
+                    connectivityIndex = distanceinclSlope * size ** (-1 * f_merge)
+
+                    # returns the node with the hightes potential
+                    if connectivityIndex < potIndex:
+                        potentialNode, potentialNodeCoordinates, potIndex = idWWTPONE, pOne, connectivityIndex
     if potentialNode == None:  # No Connection was found
         if closestWWTP == None:  # No Connection was found
             return None, None, None, None
@@ -1688,7 +2033,8 @@ def addOriginTolistWWTPs(nodes, WWTPs, origin):
 
 def updatePathLong(nodes, nodes_invert, path, sewersNoC, toNode):
     """
-    This function updates the correct flow in the nodes on a path.
+    This function updates the correct flow in the nodes on a path. The nodes of the path are read out once
+    (by ID) and the flow is changed in one pass along the path, always with three consecutive nodes.
 
     Input Arguments:
     nodes                      --    nodes
@@ -1700,195 +2046,71 @@ def updatePathLong(nodes, nodes_invert, path, sewersNoC, toNode):
     Output Arguments:
     nodes_invert              --    Updated nodes
     """
-    counter, finishReadingPath = 0, 0
+    # Nodes by ID (first entry of each ID)
+    invertIndex, nodeIndex = {}, {}
+    for node in nodes_invert:
+        if node[0] not in invertIndex:
+            invertIndex[node[0]] = node
+    for node in nodes:
+        if (node[0] == path[0] or node[0] == path[1]) and node[0] not in nodeIndex:
+            nodeIndex[node[0]] = node
 
     # Change Flow of first node
-    for f in nodes_invert:
-        if f[0] == path[0]:
-            flowStartNode = f[4]  # Flow before [4] is set to zero in starting node
-
-            # Against Flow
-            for i in nodes:
-                if i[0] == path[1]:  # next element in path
-                    if i[4] != 0:
-                        flowAgainstDirection = i[4] + i[8]
-                        break
-                    else:
-                        if i[0] in sewersNoC:
-                            flowAgainstDirection = i[8]
-                        else:
-                            flowAgainstDirection = 0  # node was node connected, meaning that there is no againstFlow
-                        break
-
-            # Flows in Node
-            for t in nodes:
-                if t[0] == path[0]:
-                    flowInNode = t[4]
-                    break
-
-            startFlow = flowInNode - flowAgainstDirection
-            f[4] = startFlow
-            break
+    flowStartNode = None
+    if path[0] in invertIndex:
+        startNode, nextNode = invertIndex[path[0]], nodeIndex[path[1]]
+        flowStartNode = startNode[4]  # Flow before [4] is set to zero in starting node
+
+        # Against Flow
+        if nextNode[4] != 0:
+            flowAgainstDirection = nextNode[4] + nextNode[8]
+        elif nextNode[0] in sewersNoC:
+            flowAgainstDirection = nextNode[8]
+        else:
+            flowAgainstDirection = 0  # node was node connected, meaning that there is no againstFlow
+        startNode[4] = nodeIndex[path[0]][4] - flowAgainstDirection
 
-    # Iterate path to swap wwtp
+    # Nodes of the path (a node which is not in the nodes is replaced by the node before)
+    pathNodes, newest = [], 0
     for entry in path:
-        counter += 1  # get next element
-        if counter == 1:
-            newest, secondNewest = 0, 0
-        if counter == 2:
-            secondNewest = 0
-        thirdNewest = secondNewest
-        secondNewest = newest
-
-        for i in nodes_invert:
-            if i[0] == entry:
-                newest = i
-                break
+        newest = invertIndex.get(entry, newest)
+        pathNodes.append(newest)
 
-        # Needed to get three points
-        if counter > 2 and finishReadingPath == 0:
-            newest, second, third = newest, secondNewest, thirdNewest
-
-            # Change flow along path to wwtp
-            for i in nodes_invert:
-                if i[0] == second[0]:  # Change flow in secondNewest
-                    if newest[0] == toNode:  # Last 3 nodes
-                        if secondNewest[8] == 0:  # Arrived at the end of path or only three entries
-                            if secondNewest[4] == 0:  # Connection to archPoint. Take over flow from node below
-                                updatedFlowSecondLast = third[4] + third[8]
-                                i[
-                                    4] = updatedFlowSecondLast  # change second last node
-                                nodes_invert = changeFlowInNode(nodes_invert, toNode,
-                                                                updatedFlowSecondLast)  # change last node
-                                break
-                            else:
-                                # only three nodes
-                                if third[0] == path[0]:
-                                    flowBefore = third[4] + third[8]  # As wwtp has now flow
-                                    if flowStartNode == second[4]:  # Check if there is inflow from other nodes
-                                        if newest[0] not in sewersNoC:
-                                            notAgainstFlow = second[4]
-                                        else:
-                                            notAgainstFlow = second[4] - (newest[4] + newest[8])
-                                    else:
-                                        if newest[0] not in sewersNoC:
-                                            notAgainstFlow = second[4]
-                                        else:
-                                            notAgainstFlow = second[4] - (newest[4] + newest[8])
-                                else:
-                                    flowBefore = third[4] + third[8]
-                                    if newest[0] not in sewersNoC:
-                                        notAgainstFlow = second[4]
-                                    else:
-                                        notAgainstFlow = second[4] - (newest[4] + newest[8])
-                                updatedFlowSecondLast = notAgainstFlow + flowBefore
-                                i[4] = updatedFlowSecondLast  # change second last node
-                                nodes_invert = changeFlowInNode(nodes_invert, toNode,
-                                                                updatedFlowSecondLast)  # change last node
-                                break
-                        else:
-                            if secondNewest[4] == 0:  # no flow
-                                flowBefore = third[4] + third[8]
-                                updatedFlowSecondLast = flowBefore
-                                flowForLast = second[8]
-                                i[4] = updatedFlowSecondLast  # change second last node
-                                nodes_invert = changeFlowInNode(nodes_invert, toNode,
-                                                                updatedFlowSecondLast + flowForLast)  # change last node
-                                break
-                            else:
-                                # first three nodes
-                                if third[0] == path[0]:
-                                    flowBefore = third[4] + third[8]
-
-                                    # Check if there is inflow from other nodes
-                                    if flowStartNode == second[4] + second[8]:
-                                        if newest[0] not in sewersNoC:
-                                            notAgainstFlow = second[4]
-                                        else:
-                                            notAgainstFlow = second[4] - (newest[4] + newest[8])
-                                    else:
-                                        if newest[0] not in sewersNoC:
-                                            notAgainstFlow = second[4]
-                                        else:
-                                            notAgainstFlow = second[4] - (newest[4] + newest[8])
-                                else:
-                                    flowBefore = third[4] + third[8]
+    # Iterate path to swap wwtp and change the flow of the second of three nodes
+    for position in range(2, len(pathNodes)):
+        third, second, newest = pathNodes[position - 2], pathNodes[position - 1], pathNodes[position]
 
-                                    if newest[
-                                        0] not in sewersNoC:  # If neweswt not in sewers, then the new branch is reached. Take over all flow
-                                        notAgainstFlow = second[4]
-                                    else:
-                                        notAgainstFlow = second[4] - (newest[4] + newest[8])
-                                flowForLast = secondNewest[8]
-                                updatedFlowSecondLast = notAgainstFlow + flowBefore
-                                i[4] = updatedFlowSecondLast  # change second last node
-                                nodes_invert = changeFlowInNode(nodes_invert, toNode,
-                                                                updatedFlowSecondLast + flowForLast)  # change last node
-                                break
-                        finishReadingPath = 1
-                        break
-                    else:  # Not Last 3 nodes, More than three nodes
-                        if secondNewest[8] == 0:
-                            if secondNewest[4] == 0:  # Connection to archPoint (unconnected point)
-                                updatedFlowSecondLast = third[4] + third[8]  # change second last
-                                i[4] = updatedFlowSecondLast  # change second last node
-                            else:
-                                if third[0] == path[0]:
-                                    flowBefore = third[8]
-                                    if flowStartNode == second[4]:  # Check if there is added flow
-                                        if newest[
-                                            0] not in sewersNoC:  # If neweswt not in sewers, then the new branch is reached. Take over all flow
-                                            notAgainstFlow = second[4]
-                                            flowBefore = third[4] + third[8]
-                                        else:
-                                            notAgainstFlow = second[4] - (newest[4] + newest[8])
-                                    else:
-                                        if newest[0] not in sewersNoC:
-                                            notAgainstFlow = second[4]
-                                            flowBefore = third[4] + third[8]
-                                        else:
-                                            notAgainstFlow = second[4] - (newest[4] + newest[8])
-                                            flowBefore = third[4] + third[8]
-                                else:  # not first 3 Points
-                                    flowBefore = third[4] + third[8]
-                                    if newest[
-                                        0] not in sewersNoC:  # If neweswt not in sewers, then the new branch is reached. Take over all flow
-                                        notAgainstFlow = second[4]
-                                    else:
-                                        notAgainstFlow = second[4] - (newest[4] + newest[8])
-                                updatedFlowSecondLast = notAgainstFlow + flowBefore
-                                i[4] = updatedFlowSecondLast  # change second last node
-                        else:  # is inhabited because has flow
-                            if secondNewest[4] == 0:  # inhabited point, no flow
-                                if newest[0] not in sewersNoC:
-                                    updatedFlowSecondLast = third[4] + third[8]  # change second last
-                                    i[4] = updatedFlowSecondLast  # change second last node
-                                else:
-                                    updatedFlowSecondLast = (third[4] - (newest[4] + newest[8])) + third[
-                                        8]  # change second last
-                                    i[4] = updatedFlowSecondLast  # change second last node
-                            else:  # There is flow
-                                if third[0] == path[0]:  # First 3 Points
-                                    flowBefore = third[4] + third[8]
-                                    if flowStartNode == second[4]:  # Check if there is added flow
-                                        if newest[0] not in sewersNoC:
-                                            notAgainstFlow = second[4]
-                                        else:
-                                            notAgainstFlow = second[4] - (newest[4] + newest[8])
-                                    else:
-                                        if newest[0] not in sewersNoC:
-                                            notAgainstFlow = second[4]
-                                        else:
-                                            notAgainstFlow = second[4] - (newest[4] + newest[8])
-                                else:  # not first 3 Points
-                                    flowBefore = third[4] + third[8]  # change second last node
-                                    if newest[0] not in sewersNoC:
-                                        notAgainstFlow = second[4]
-                                    else:
-                                        notAgainstFlow = second[4] - (newest[4] + newest[8])
-                                updatedFlowSecondLast = notAgainstFlow + flowBefore
-                                i[4] = updatedFlowSecondLast  # change second last node
-                    break
+        # Flow not flowing against the path. If newest is not in sewers, the new branch is reached: Take over all flow
+        if newest[0] not in sewersNoC:
+            notAgainstFlow = second[4]
+        else:
+            notAgainstFlow = second[4] - (newest[4] + newest[8])
+
+        if newest[0] == toNode:  # Last 3 nodes
+            if second[4] == 0:  # Connection to archPoint or no flow. Take over flow from node below
+                updatedFlowSecondLast = third[4] + third[8]
+            else:
+                updatedFlowSecondLast = notAgainstFlow + (third[4] + third[8])
+            second[4] = updatedFlowSecondLast  # change second last node
+            if second[8] == 0:  # Arrived at the end of path or only three entries
+                newest[4] = updatedFlowSecondLast  # change last node
+            else:
+                newest[4] = updatedFlowSecondLast + second[8]  # change last node
+        elif second[8] == 0:  # Not Last 3 nodes, More than three nodes
+            if second[4] == 0:  # Connection to archPoint (unconnected point)
+                second[4] = third[4] + third[8]
+            elif third[0] == path[0] and newest[0] in sewersNoC and flowStartNode == second[4]:
+                second[4] = notAgainstFlow + third[8]  # First 3 points without added flow
+            else:
+                second[4] = notAgainstFlow + (third[4] + third[8])
+        else:  # is inhabited because has flow
+            if second[4] == 0:  # inhabited point, no flow
+                if newest[0] not in sewersNoC:
+                    second[4] = third[4] + third[8]
+                else:
+                    second[4] = (third[4] - (newest[4] + newest[8])) + third[8]
+            else:  # There is flow
+                second[4] = notAgainstFlow + (third[4] + third[8])
     return nodes_invert
 
 
@@ -1955,30 +2177,32 @@ def invertFlowToNearestWTP(pathtonearestWTPswap, sewers_A3, sewers):
     return sewers_A3
 
 
-def sumCostOfArchWWTPs(allPopNodesOntheWay, nodes, EW_Q, wwtpLifespan, interestRate, fc_wwtpOperation,
-                       fc_wwtpReplacement):
+def sumCostOfArchWWTPs(allPopNodesOntheWay, nodes, costModel):
     """
     This function sums the costs of all wwtp on the archpath.
 
     Input Arguments:
     allPopNodesOntheWay     --    All popluated nodes on the way
     nodes                   --    Nodes
-    EW_Q                    --    Population equivalent in liters
-    wwtpLifespan            --    Discounting years
-    interestRate            --    Real interest rate
+    costModel               --    Cost model (see createCostModel)
 
     Output Arguments:
     summedCostsWWPTS        --    total costs
     """
     summedCostsWWPTS = 0
+    if len(allPopNodesOntheWay) == 0:
+        return summedCostsWWPTS
 
-    for decentralizedWTP in allPopNodesOntheWay:  # Last one is not considered as it is calculated just above
-        for i in nodes:
-            if i[0] == decentralizedWTP:
-                flowWTPonTheWay = costWWTP((i[8] + i[4]), EW_Q, wwtpLifespan, interestRate, fc_wwtpOperation,
-                                           fc_wwtpReplacement)  # frher False: flowToNOde
-                summedCostsWWPTS = summedCostsWWPTS + flowWTPonTheWay
-                break
+    # Read out the flows of the wwtps first
+    nodesOnTheWay, flowsOnTheWay = set(allPopNodesOntheWay), {}
+    for i in nodes:
+        if i[0] in nodesOnTheWay and i[0] not in flowsOnTheWay:
+            flowsOnTheWay[i[0]] = i[8] + i[4]  # frher False: flowToNOde
+    flows = [flowsOnTheWay[ID] for ID in allPopNodesOntheWay if ID in flowsOnTheWay]
+
+    # Costs of all wwtps at once
+    for flowWTPonTheWay in getModelWWTPCostsArray(costModel, flows).tolist():
+        summedCostsWWPTS = summedCostsWWPTS + flowWTPonTheWay
     return summedCostsWWPTS
 
 
@@ -2200,16 +2424,20 @@ def loopTest(pathNearWTP, sewersNoC):
     return pathNearWTP, loops
 
 
-def changeTD(nodes, edgesList, pumps, pathToNetwork, maxTD, minSlope, inflowNodes, sewers, minTD):
+def changeTD(nodes, edgeChanges, pumps, pathToNetwork, maxTD, minSlope, inflowNodes, sewers, minTD, positionIndex):
     """
     This function changes the trench depth. The function starts at the end of a path and then
     and changes the trench depth in order that the maximum trench depth and minimum slope criteria
     are fulfilled. In case there are inflowing branches, the trench depth is not changed. In case
     the maximum trench depth is not fulfilled, a pump is added to the pump list.
 
+    The trench depths, slopes and pumps are calculated in one pass along the path (see checkTrenchLifting).
+    The positions of the nodes and edges are read from the position index. The trench depths are changed in
+    the nodes (a copy of the option) and the slopes in the changes of the edges of the option.
+
     Input Arguments:
-    nodes             --    List with nodes
-    edgesList         --    List with edges
+    nodes             --    List with nodes (copy of the option, changed)
+    edgeChanges       --    Changes of the edges of the option (see createEdgeChanges)
     pumps             --    List with pumps
     pathToNetwork     --    Path
     maxTD             --    Max Trench depth
@@ -2217,50 +2445,85 @@ def changeTD(nodes, edgesList, pumps, pathToNetwork, maxTD, minSlope, inflowNode
     inflowNodes       --    Branch nodes
     sewers            --    Sewer Network
     minTD             --    Minimum Trench Depth
+    positionIndex     --    Positions of the nodes (see createPositionIndex)
 
     Output Arguments:
-    nodesCopy         --    Updated nodes
+    nodes             --    Updated nodes
     pumps             --    List with updated pumps
-    edgesList         --    List with edges where slope was recalulated is slope was laid (slope of pipes)
+    edgeChanges       --    Changes of the edges where slope was recalulated is slope was laid (slope of pipes)
     """
-    nodesCopy = fastCopyNodes(nodes)
-    edgesIDCopy = fastCopy(edgesList)
     pathToNetwork = InvertandswapID(pathToNetwork)  # inverse and swap path
+    if len(pathToNetwork) == 0:
+        return nodes, pumps, edgeChanges
+    lastID = pathToNetwork[-1][1][0]
+
+    # First node flowing into each inflow node and into the last node (in the order of the sewers)
+    liftNodes = set(inflowNodes)
+    liftNodes.add(lastID)
+    inflowingNodes = {}
+    for e, entry in sewers.items():
+        if entry[0] in liftNodes and entry[0] not in inflowingNodes:
+            inflowingNodes[entry[0]] = e
+            if len(inflowingNodes) == len(liftNodes):
+                break
+
+    # Trench heights along the path
+    positions, trenches = {}, {}
+    for ID in list(inflowingNodes.values()) + [ID for i in pathToNetwork for ID in (i[0], i[1][0])]:
+        if ID not in positions:
+            positions[ID] = getNodePosition(positionIndex, nodes, ID)
+            trenches[ID] = nodes[positions[ID]][10]
+    pumpsAtNodes = {pump[0]: pump for pump in pumps}  # Only one pump per node (see addPump)
 
     for i in pathToNetwork:  # iterate over path and change trechdepth if needed up to maximum trench depth
         fromID, toID = i[0], i[1][0]
         length = i[1][1]  # Read length
-        _, trenchFrom, hFrom = getTrenchDepth(nodesCopy, fromID)  # Get trenchHeight
-        positionToNode, trenchTo, hTo = getTrenchDepth(nodesCopy, toID)  # Get trenchHeight
+        fromNode, toNode = nodes[positions[fromID]], nodes[positions[toID]]
+        trenchFrom, trenchTo = trenches[fromID], trenches[toID]  # Get trenchHeight
         minRequiredHDiff = (minSlope * length) / 100  # Minimum required hight difference for free flow
-
-        if trenchFrom - minRequiredHDiff > hTo - maxTD:  # Check if slope is steep enough and possible trench depth not too deep
-            pumpFlow, lastID = False, pathToNetwork[-1][1][0]
-            nodesCopy, pumps = checkTrenchLifting(lastID, sewers, pumps, nodesCopy, nodes, trenchFrom, trenchTo,
-                                                  minRequiredHDiff, positionToNode, inflowNodes, toID, fromID, minSlope,
-                                                  pumpFlow, hTo, hFrom, minTD, maxTD)
+        pumpFlow = not trenchFrom - minRequiredHDiff > toNode[3] - maxTD  # Check if slope is steep enough and possible trench depth not too deep
+
+        pumpsAtNodes.pop(toID, None)  # If at toflowing node a pump was installed, delete the pump
+
+        # Check if the trench of an inflow node can be lifted (not if the first inflowing node is not pumped and would get a too low slope)
+        isInflowNode, liftTrenchDepth = toID in liftNodes, True
+        if isInflowNode and toID in inflowingNodes and inflowingNodes[toID] not in pumpsAtNodes:
+            inflowingNode = inflowingNodes[toID]
+            hDiffInflowNod = nodes[positions[inflowingNode]][10] - toNode[10]  # height difference new
+            newSlopToInflow = round(float(hDiffInflowNod) / float(sewers[inflowingNode][1]) * 100, 3)
+            if newSlopToInflow <= minSlope:
+                liftTrenchDepth = False
+
+        trenches[toID], pumpHeightDiference = getTrenchLifting(trenchFrom, trenchTo, minRequiredHDiff, toNode[3],
+                                                               fromNode[3], minTD, maxTD, pumpFlow, isInflowNode,
+                                                               liftTrenchDepth)
+        if pumpHeightDiference is not None:  # Add pump
+            pumpFlowFrom = fromNode[4] + fromNode[8]
+            if fromID in pumpsAtNodes:
+                pumpsAtNodes[fromID][1], pumpsAtNodes[fromID][2] = pumpFlowFrom, pumpHeightDiference
+            else:
+                if pumpHeightDiference <= 0 or pumpFlowFrom <= 0:
+                    raise Exception("ERROR ADDING PUMP:" + str(pumpHeightDiference) + "  " + str(pumpFlowFrom))
+                pumpsAtNodes[fromID] = [fromID, pumpFlowFrom, pumpHeightDiference, 0]
+
+        # Update slope of the edge which becomes the slope of the pipe or add the edge
+        newPipeSlope = (trenches[fromID] - trenches[toID]) / length  # New pipe slope
+        pos = getEdgePosition(edgeChanges, fromID, toID)
+        if pos is None:
+            appendEdge(edgeChanges, [[toID, toNode[1], toNode[2], toNode[3]],
+                                     [fromID, fromNode[1], fromNode[2], fromNode[3]], length, newPipeSlope, 0, 0])
         else:
-            pumpFlow, lastID = True, pathToNetwork[-1][1][0]
-            nodesCopy, pumps = checkTrenchLifting(lastID, sewers, pumps, nodesCopy, nodes, trenchFrom, trenchTo,
-                                                  minRequiredHDiff, positionToNode, inflowNodes, toID, fromID, minSlope,
-                                                  pumpFlow, hTo, hFrom, minTD, maxTD)
-
-        IDnew, cord_new, _, _, _, trenchTo = getPns(toID, nodesCopy)
-        IDold, cord_old, _, _, _, trenchFrom = getPns(fromID, nodesCopy)
-        newPipeSlope = (trenchFrom - trenchTo) / length  # New pipe slope
-
-        # Update slope in edgesIDCopy which becomes the slope of the pipe
-        for e in edgesIDCopy:
-            if e[0][0] == fromID and e[1][0] == toID:
-                e[3] = newPipeSlope * - 1  # Change slope with pipe installation
-                break
-
-            if e[1][0] == fromID and e[0][0] == toID:
-                e[3] = newPipeSlope  # Change slope with pipe installation
-                break
+            edge = writeEdge(edgeChanges, pos)
+            if edge[0][0] == fromID and edge[1][0] == toID:
+                edge[3] = newPipeSlope * - 1  # Change slope with pipe installation
+            else:
+                edge[3] = newPipeSlope  # Change slope with pipe installation
 
-        edgesIDCopy = addToEdgeList(edgesIDCopy, length, newPipeSlope, IDnew, IDold, cord_new, cord_old)
-    return nodesCopy, pumps, edgesIDCopy
+    # Write the changed trench heights (after the pass, the trench heights of inflowing nodes are read from the input)
+    for ID, trench in trenches.items():
+        nodes[positions[ID]][10] = trench
+    pumps[:] = pumpsAtNodes.values()
+    return nodes, pumps, edgeChanges
 
 
 def correctCoordinatesAfterClip(aggregatetPoints, streetVertices):
@@ -2345,16 +2608,14 @@ def writeInEdges(pntsOnPath):
     return edges
 
 
-def costPump(pathBetweenWWTPs, pumps, pricekWh, pumpYears, interestRate):  # Calculate pump costs
+def costPump(pathBetweenWWTPs, pumps, costModel):  # Calculate pump costs
     """
     This function calculates the pumping costs.
 
     Input Arguments:
     pathBetweenWWTPs          --    path
     pumps                     --    list with pumpes
-    pricekWh                  --    price per kWh
-    pumpYears                 --    Lifespan of pumps
-    interestRate              --    Real interest rate
+    costModel                 --    Cost model (see createCostModel)
 
     Output Arguments:
     pumpCosts                 --    Annual Pumping costs
@@ -2366,9 +2627,8 @@ def costPump(pathBetweenWWTPs, pumps, pricekWh, pumpYears, interestRate):  # Cal
         for pmp in pumps:
             if pmp[0] == i:
                 flow, heightDifference = pmp[1], pmp[2]
-                summingPumpCosts, totalCostOverWholePeriod = getPumpCostsDependingOnFlow(flow, heightDifference,
-                                                                                         pricekWh, pumpYears,
-                                                                                         interestRate)  # pump is found on path
+                summingPumpCosts, totalCostOverWholePeriod = getModelPumpCosts(costModel, flow,
+                                                                               heightDifference)  # pump is found on path
                 pumpCosts += summingPumpCosts  # sum pumping costs
                 break
     return pumpCosts, totalCostOverWholePeriod
@@ -2636,19 +2896,14 @@ def checkTrenchLifting(lastID, sewers, pumps, nodesCopy, nodes, trenchFrom, tren
     pumps                 --    Updated list of pumps
     """
     pumps = removePumpCheck(pumps, toID)  # Check if at toflowing node a pump was installed. If yes, delete the pump
-    Zmin = hTo - minTD  # Intermediate Calculation
-    ZToDepth = trenchFrom - minhDiffRequired  # Intermediate Calculation
+    isInflowNode, liftTrenchDepth = toID in inflowNodes or toID == lastID, True  # If no connecting edge is found, the wwtp is freistehend and thus trenchlift is always possible
 
-    # If node has inflowing nodes or last node is reached
-    if toID in inflowNodes or toID == lastID:  # Node has inflowing nodes
-        isFreistehendeWWTP, liftTrenchDepth = True, 1  # If no connecting edge is found, the wwtp is freistehend and thus trenchlift is always possible.  # 0 means that trench can't be lifted
-
-        # Get nodes flowing to inflow node
+    # If node has inflowing nodes or last node is reached, get nodes flowing to inflow node
+    if isInflowNode:
         for e in sewers:
             if sewers[e][0] == toID:
                 isPump = checkIfIsPump(pumps, e)  # Check if not a pump. If water is alread
                 if isPump == False:  # Only calculate trench depth for inflowing edges if not pumped
-                    isFreistehendeWWTP = False  # criteria if is a detached wwtp
                     lengthInflowNode = sewers[e][1]  # length to node in intework
                     _, trenchInflowFrom, _ = getTrenchDepth(nodes, e)  # Get trench depth in inflowing nodes
                     _, trenchTOID, _ = getTrenchDepth(nodes, toID)  # Get trench depth in inflowing nodes
@@ -2656,56 +2911,64 @@ def checkTrenchLifting(lastID, sewers, pumps, nodesCopy, nodes, trenchFrom, tren
                     newSlopToInflow = round(float(hDiffInflowNod) / float(lengthInflowNode) * 100,
                                             3)  # Calc slope. If positive, flows downstream
                     if newSlopToInflow <= minSlope:  # if new calculated slope is less steep, lift trench. (and not goes upwards) RIESENBAUSTELLE
-                        liftTrenchDepth = 0  # inflow node can be changed and is no problem
+                        liftTrenchDepth = False  # inflow node can be changed and is no problem
                 break
 
-        if isFreistehendeWWTP == True:  # If is a wwtp with no network
-            liftTrenchDepth = 1  # lift trench
-
-        if liftTrenchDepth == 1:
-            if pumpFlow == True:  # If trench depth would be too deep
-                nodesCopy[posToNode][10] = Zmin  # Set new trench depth
-                newHeightDiff = nodesCopy[posToNode][
-                                    10] - trenchFrom  # Calculate height difference which needs to be pumped
-                if newHeightDiff <= 0:
-                    newHeightDiff = nodesCopy[posToNode][10] - ZToDepth
-                pumps = addPump(pumps, fromID, newHeightDiff, nodes)  # Add pump
-            else:  # free flow is possible and trench depth within limits
-                if ZToDepth > Zmin and hTo < hFrom:
-                    nodesCopy[posToNode][10] = Zmin  # Set new trench depth
-                else:
-                    nodesCopy[posToNode][10] = ZToDepth  # Set new trench depth
-                    if nodesCopy[posToNode][10] > Zmin:  # If trench depth is above minium possible trench depth
-                        nodesCopy[posToNode][10] = trenchFrom - minTD  # Set new trench depth
-        else:
-            if ZToDepth < hTo - maxTD:  # As trench lift is not possible, depth is not changed
-                newHeightDiff = nodesCopy[posToNode][
-                                    10] - trenchFrom  # Calculate height difference which needs to be pumped
-                if newHeightDiff <= 0:  # trenchFrom is higher than nodesCopy[posToNode][10]. Might occur because similar heights
-                    newHeightDiff = nodesCopy[posToNode][
-                                        10] - ZToDepth  # Even though there is a slope, not steep enough. Pump only the height it would need for free flow
-                pumps = addPump(pumps, fromID, newHeightDiff, nodes)  # Add pump
-            else:  # free flow is possible and trench depth within limits
-                if trenchFrom == trenchTo:  # Is the case in merging wwtps
-                    nodesCopy[posToNode][10] = ZToDepth
-                else:  # Don't change trench depth
-                    if ZToDepth < trenchTo:
-                        nodesCopy[posToNode][10] = ZToDepth  # Set new trench depth
-    else:
-        if pumpFlow == True:  # has no inflowing node. Free flow is not possible
-            nodesCopy[posToNode][10] = Zmin  # Change trenchDepth of toNode to minTD as the water is pumped
-            newHeightDiff = nodesCopy[posToNode][10] - trenchFrom  # Calculate height difference which needs to be
-            if newHeightDiff <= 0:
-                newHeightDiff = nodesCopy[posToNode][10] - ZToDepth
-            pumps = addPump(pumps, fromID, newHeightDiff, nodes)  # Add pump
-        else:
-            if ZToDepth > Zmin and hTo < hFrom:  # free flow is possible
-                nodesCopy[posToNode][10] = Zmin  # Set new trench depth
-            else:  # free flow is not possible
-                nodesCopy[posToNode][10] = ZToDepth  # Change trenchDepth of toNode
+    nodesCopy[posToNode][10], pumpHeightDiference = getTrenchLifting(trenchFrom, trenchTo, minhDiffRequired, hTo,
+                                                                     hFrom, minTD, maxTD, pumpFlow, isInflowNode,
+                                                                     liftTrenchDepth)
+    if pumpHeightDiference is not None:
+        pumps = addPump(pumps, fromID, pumpHeightDiference, nodes)  # Add pump
     return nodesCopy, pumps
 
 
+def getTrenchLifting(trenchFrom, trenchTo, minhDiffRequired, hTo, hFrom, minTD, maxTD, pumpFlow, isInflowNode,
+                     liftTrenchDepth):
+    """
+    This function calculates the new trench height of the node a pipe flows to and the height which needs to be
+    pumped at the node the pipe starts (see checkTrenchLifting).
+
+    Input Arguments:
+    trenchFrom            --    Trench height from node
+    trenchTo              --    Trench height to node
+    minhDiffRequired      --    Minimum required height difference
+    hTo                   --    Height To node
+    hFrom                 --    Height from node
+    minTD                 --    Minimum trench depth
+    maxTD                 --    Maximum trench depth
+    pumpFlow              --    Criteria whether the flow is pumped or not
+    isInflowNode          --    Criteria whether the to node has inflowing nodes or is the last node
+    liftTrenchDepth       --    Criteria whether the trench of an inflow node can be lifted
+
+    Output Arguments:
+    trenchTo              --    New trench height to node
+    pumpHeightDiference   --    Height difference which needs to be pumped (None: no pump)
+    """
+    Zmin = hTo - minTD  # Intermediate Calculation
+    ZToDepth = trenchFrom - minhDiffRequired  # Intermediate Calculation
+    pumpHeightDiference = None
+
+    if isInflowNode and not liftTrenchDepth:
+        if ZToDepth < hTo - maxTD:  # As trench lift is not possible, depth is not changed
+            pumpHeightDiference = trenchTo - trenchFrom  # Calculate height difference which needs to be pumped
+            if pumpHeightDiference <= 0:  # trenchFrom is higher than trenchTo. Might occur because similar heights
+                pumpHeightDiference = trenchTo - ZToDepth  # Even though there is a slope, not steep enough. Pump only the height it would need for free flow
+        elif trenchFrom == trenchTo or ZToDepth < trenchTo:  # Is the case in merging wwtps or trench gets deeper
+            trenchTo = ZToDepth  # Set new trench depth
+    elif pumpFlow == True:  # Free flow is not possible or trench depth would be too deep
+        trenchTo = Zmin  # Change trenchDepth of toNode to minTD as the water is pumped
+        pumpHeightDiference = trenchTo - trenchFrom  # Calculate height difference which needs to be pumped
+        if pumpHeightDiference <= 0:
+            pumpHeightDiference = trenchTo - ZToDepth
+    elif ZToDepth > Zmin and hTo < hFrom:  # free flow is possible
+        trenchTo = Zmin  # Set new trench depth
+    else:
+        trenchTo = ZToDepth  # Change trenchDepth of toNode
+        if isInflowNode and trenchTo > Zmin:  # If trench depth is above minium possible trench depth
+            trenchTo = trenchFrom - minTD  # Set new trench depth
+    return trenchTo, pumpHeightDiference
+
+
 def addPump(pumps, toID, pumpHeightDiference, nodes):
     """
     This function either updates a pump at a node or inserts a pump at a node
@@ -2740,13 +3003,14 @@ def addPump(pumps, toID, pumpHeightDiference, nodes):
     return pumps
 
 
-def getNoLoopPath(sewers, path):
+def getNoLoopPath(sewers, path, drainRoots=None):
     """
     Test for loops in path. If found, replace path.
 
     Input Arguments:
     sewers                --    Sewer Network
     path                  --    Path
+    drainRoots            --    Drain roots of the sewers (optional, see createDrainRoots)
 
     Output Arguments:
     newPath               --    Path with no loops
@@ -2763,6 +3027,8 @@ def getNoLoopPath(sewers, path):
         firstNodeInToNetwork = None
         cnter = 1
         b = path[1][0]
+        if drainRoots is not None:
+            updateDrainRoots(drainRoots, sewers)
 
         # Test if first edge is not in network
         try:
@@ -2776,49 +3042,33 @@ def getNoLoopPath(sewers, path):
         for node in path[1:]:
             cnter += 1
             part_A.append(node)
-            exitKrit, ide, ide1 = 0, node[0], node[0]
+            exitKrit = 0
+            drainRoot = getDrainRoot(drainRoots, sewers, node[0])  # wwtp to which the node flows
 
             if ExitGivenNetwork == 1:  # If street was left already in first node, test for loops
-                exKit = 0
-                # Test if network is entered again.
-                while exKit == 0:  # Test if FROMID is reached. If yes, calculate path from here to wtpFrom
-                    try:
-                        new1 = sewers[ide1][0]
-                        if new1 == ():
-                            if ide1 == flowFromId:
-                                correctTO = sewers[node[0]]
-                                firstNodeInToNetwork = [node[0], [correctTO[0], correctTO[1]]]
-                                loopFound = 1  # Loop was found
-                                loopNode = node[0]  # Node which links to destination wwtp
-                                break
-                            else:
-                                break
-                        ide1 = new1
-                    except KeyError:
-                        exKit = 1
-            while 1:  # Test if toWWTP is reached. If yes, the closest toNetwork Point is found
-                try:  # If first edge is not in Network
-                    new = sewers[ide]
-                    if new[0] == ():
-                        if ide == flowToId:
-                            correctTO = sewers[node[0]]
-                            firstNodeInToNetwork = [node[0], [correctTO[0], correctTO[1]]]
-                            del part_A[-1]
-                            part_A.append(firstNodeInToNetwork)
-                            exitKrit = 1
-                            break
-                        else:  # other ID reached --> Network in Between!
-                            ExitGivenNetwork = 1
-                            break
-                    ide = new[0]
-
-                except KeyError:
+                # Test if network is entered again. Test if FROMID is reached. If yes, calculate path from here to wtpFrom
+                if drainRoot == flowFromId and drainRoot in sewers:
+                    correctTO = sewers[node[0]]
+                    firstNodeInToNetwork = [node[0], [correctTO[0], correctTO[1]]]
+                    loopFound = 1  # Loop was found
+                    loopNode = node[0]  # Node which links to destination wwtp
+
+            # Test if toWWTP is reached. If yes, the closest toNetwork Point is found
+            if drainRoot is not None and drainRoot in sewers:
+                if drainRoot == flowToId:
+                    correctTO = sewers[node[0]]
+                    firstNodeInToNetwork = [node[0], [correctTO[0], correctTO[1]]]
+                    del part_A[-1]
+                    part_A.append(firstNodeInToNetwork)
+                    exitKrit = 1
+                else:  # other ID reached --> Network in Between!
                     ExitGivenNetwork = 1
-                    if cnter == len(path):  # if last edge, check
-                        if node[1][0] == flowToId:
-                            firstNodeInToNetwork = [(), 0]
-                            exitKrit = 1
-                    break
+            else:  # Node is not in a network
+                ExitGivenNetwork = 1
+                if cnter == len(path):  # if last edge, check
+                    if node[1][0] == flowToId:
+                        firstNodeInToNetwork = [(), 0]
+                        exitKrit = 1
             if exitKrit == 1:
                 break
         part_A = replaceLoopPath(sewers, loopFound, loopNode,
@@ -2934,19 +3184,31 @@ def getPath(pathWithDistances):
     return liste
 
 
-def getAggregatedNodesinListWWTP(WWTPs, pipeNetwork, aggregatedNodes):
+def getAggregatedNodesinListWWTP(WWTPs, pipeNetwork, aggregatedNodes, drainRoots=None):
     """
     This function makes a breath search for each wwtp to get nr of aggregated nodes to listWWTPs.
+    With drain roots, the aggregated nodes are counted once per wwtp to which they flow instead.
 
     Input Arguments:
     WWTPs                             --    list with WWTPs
     pipeNetwork                       --    Sewer pipe network
+    drainRoots                        --    Drain roots of the sewer pipe network (optional, see createDrainRoots)
 
     Output Arguments:
     listWWTPwithAggregatedNodes       --    List with wwtp where the nr of aggregated nodes is added
     """
     listWWTPwithAggregatedNodes = []  # Form: ID, total Flow, total nr of aggregated nodes
+    if drainRoots is not None:
+        updateDrainRoots(drainRoots, pipeNetwork)
+        nrOfNodesPerRoot = {}
+        for ID in set(i[0] for i in aggregatedNodes):
+            drainRoot = getDrainRoot(drainRoots, pipeNetwork, ID)
+            nrOfNodesPerRoot[drainRoot] = nrOfNodesPerRoot.get(drainRoot, 0) + 1
+
     for wwtp in WWTPs:
+        if drainRoots is not None and getDrainRoot(drainRoots, pipeNetwork, wwtp[0]) == wwtp[0]:
+            listWWTPwithAggregatedNodes.append([wwtp[0], wwtp[1], nrOfNodesPerRoot.get(wwtp[0], 0)])
+            continue
         allNodes = breathSearch(wwtp[0], pipeNetwork)
         nrOfNodes = 0  # List to store only inahbited nodes
 
@@ -3072,7 +3334,7 @@ def getFlowtoCalculateRC(allPopNodesOntheWay, flowFrom, flowTo, nodes):
 
 def getFullHypotheticalCosts(aggregatetPoints, WWTPs, sewers, EW_Q, wwtpLifespan, interestRate, pumps, pumpYears,
                              pricekWh, edgeList, nodes, stricklerC, discountYearsSewers, operationCosts, f_SewerCost,
-                             fc_wwtpOperation, fc_wwtpReplacement):
+                             fc_wwtpOperation, fc_wwtpReplacement, costLedger=None):
     '''
     This function calculates total system systems and assumes decentralized solution for all not yet considered nodes.
 
@@ -3094,6 +3356,7 @@ def getFullHypotheticalCosts(aggregatetPoints, WWTPs, sewers, EW_Q, wwtpLifespan
     f_SewerCost         -    cost factor sewer
     fc_wwtpOperation    -    cost factor wwtp
     fc_wwtpReplacement  -    cost factor wwt
+    costLedger          -    Cost ledger with the annuities of the last calculation (optional, see createCostLedger)
 
     Ouput:
     degCen              -    Z
@@ -3102,13 +3365,13 @@ def getFullHypotheticalCosts(aggregatetPoints, WWTPs, sewers, EW_Q, wwtpLifespan
     listWWTPwithAggregatedNodes    -    All hypothetical WWTP with correct flow for z caluclations
     '''
     hypotheticalWWTP = fastCopy(WWTPs)
-    connectedNodes = []  # nodes to store in connected nodes
+    connectedNodes = set()  # nodes to store in connected nodes
 
     # Get ID of connected nodes
     for f in sewers:
-        connectedNodes.append(f)
-        if sewers[f][0] != () and sewers[f][0] not in connectedNodes:
-            connectedNodes.append(sewers[f][0])
+        connectedNodes.add(f)
+        if sewers[f][0] != ():
+            connectedNodes.add(sewers[f][0])
 
     # All not yet considered nodes are turned into a WWTP
     for i in aggregatetPoints:
@@ -3120,8 +3383,9 @@ def getFullHypotheticalCosts(aggregatetPoints, WWTPs, sewers, EW_Q, wwtpLifespan
     degCen = round((float(sources) - float(sinks)) / float(sources), 4)
 
     # Weighted Definition of Z
-    listWWTPwithAggregatedNodes = getAggregatedNodesinListWWTP(hypotheticalWWTP, sewers,
-                                                               aggregatetPoints)  # Get aggregated nodes
+    drainRoots = costLedger["drainRoots"] if costLedger is not None else None
+    listWWTPwithAggregatedNodes = getAggregatedNodesinListWWTP(hypotheticalWWTP, sewers, aggregatetPoints,
+                                                               drainRoots)  # Get aggregated nodes
     sumFlow, weightedTerm = 0, 0
 
     for i in listWWTPwithAggregatedNodes:
@@ -3130,26 +3394,257 @@ def getFullHypotheticalCosts(aggregatetPoints, WWTPs, sewers, EW_Q, wwtpLifespan
 
     degCenWeighted = (sumFlow - weightedTerm) / sumFlow
 
+    # Calculate final costs of whole system
+    if costLedger is not None:
+        completePumpCosts, completeWWTPCosts, completePublicPipeCosts = updateCostLedger(costLedger, hypotheticalWWTP,
+                                                                                         EW_Q, wwtpLifespan,
+                                                                                         interestRate, pumps, pumpYears,
+                                                                                         pricekWh, sewers, edgeList,
+                                                                                         nodes, stricklerC,
+                                                                                         discountYearsSewers,
+                                                                                         operationCosts, f_SewerCost,
+                                                                                         fc_wwtpOperation,
+                                                                                         fc_wwtpReplacement)
+        fullCosts = completePumpCosts + completeWWTPCosts + completePublicPipeCosts
+        return degCen, degCenWeighted, fullCosts, completePumpCosts, completeWWTPCosts, completePublicPipeCosts, listWWTPwithAggregatedNodes
+
     # Read out only the network points
     _, flowPoints = readOnlyNetwork(nodes, sewers)
 
     # Calculate final costs of whole system
-    completePumpCosts, completeWWTPCosts, completePublicPipeCosts = calculatetotalAnnuities(hypotheticalWWTP, EW_Q,
-                                                                                            wwtpLifespan, interestRate,
-                                                                                            pumps, pumpYears, pricekWh,
-                                                                                            sewers, flowPoints,
-                                                                                            edgeList, nodes, stricklerC,
-                                                                                            discountYearsSewers,
-                                                                                            operationCosts, f_SewerCost,
-                                                                                            fc_wwtpOperation,
-                                                                                            fc_wwtpReplacement)
+    completePumpCosts, completeWWTPCosts, completePublicPipeCosts = calculatetotalAnnuitiesVectorized(hypotheticalWWTP, EW_Q,
+                                                                                                      wwtpLifespan, interestRate,
+                                                                                                      pumps, pumpYears, pricekWh,
+                                                                                                      sewers, flowPoints,
+                                                                                                      edgeList, nodes, stricklerC,
+                                                                                                      discountYearsSewers,
+                                                                                                      operationCosts, f_SewerCost,
+                                                                                                      fc_wwtpOperation,
+                                                                                                      fc_wwtpReplacement)
 
     fullCosts = completePumpCosts + completeWWTPCosts + completePublicPipeCosts
     return degCen, degCenWeighted, fullCosts, completePumpCosts, completeWWTPCosts, completePublicPipeCosts, listWWTPwithAggregatedNodes
 
 
+def getSolverOptions(solverOptions=None):
+    """
+    This function completes the solver options with the default values. The solver options only change how
+    SNIP is calculated, not the model.
+
+    Input Arguments:
+    solverOptions          -    Dictionary with options (or None)
+
+    Output Arguments:
+    options                -    Dictionary with all options
+
+    Options:
+    routingBackend         -    Backend for the Djikstra and a* searches (legacy, python, numba, scipy, auto; see resolveRoutingBackend)
+    multiTargetMerge       -    1: Paths of all merging options are searched at once from the wwtp (may select another path if there are several shortest paths)
+    optionExecution        -    Pool of the solver: sequential, thread or process (see createExecutor). Options 1 and 3 of the
+                                expansion module are only calculated in a thread pool (in a process pool, the whole network
+                                state would be copied to the workers for each node and they are calculated without pool).
+    optionWorkers          -    Number of workers of the pool (0: number of cpus)
+    speculativeBatch       -    Number of next nodes in PN for which the paths are searched in advance in the pool (0: off, needs a pool and not the legacy backend)
+    mergeStrategy          -    sequential: wwtps are checked for merging in order of their size
+                                parallel: the merges of all wwtps are calculated against a snapshot in the pool and the cheapest ones which do not conflict are applied (changes the results)
+    checkpointIterations   -    Solver state is saved every N iterations of the expansion module and before the merging module (0: off)
+    checkpointSeconds      -    Solver state is saved every T seconds of the expansion module and before the merging module (0: off)
+    resume                 -    1: Continue from the saved solver state (solverState.npz in the output folder)
+    checkpointKey          -    Identification of the input (e.g. hash of the prepared input), checked when resuming
+    """
+    options = {
+        "routingBackend": "python",
+        "multiTargetMerge": 0,
+        "optionExecution": "sequential",
+        "optionWorkers": 0,
+        "speculativeBatch": 0,
+        "mergeStrategy": "sequential",
+        "checkpointIterations": 0,
+        "checkpointSeconds": 0,
+        "resume": 0,
+        "checkpointKey": None}
+
+    if solverOptions is not None:
+        for key in solverOptions:
+            if key not in options:
+                raise Exception("ERROR: Unknown solver option: " + str(key))
+        options.update(solverOptions)
+
+    if options["mergeStrategy"] not in ("sequential", "parallel"):
+        raise Exception("ERROR: Unknown merge strategy: " + str(options["mergeStrategy"]))
+    return options
+
+
+@timedFunction("option1")
+def evaluateOptionA1(nodes, edgeChanges, pumps, sewers, WWTPs, pathNearWTPInvert, allPopNodesOntheWay,
+                     pathtonearestWTP, pathToNearestWTPswapwithDistances, TONODE, sewerBeforeIteration, minTD, maxTD,
+                     minSlope, costModel, positionIndex):
+    """
+    This function calculates the sewer and pumping costs of Option 1 of the expansion module (connection to the
+    closest wwtp). The input lists are not changed.
+
+    Input Arguments:
+    nodes, pumps, sewers, WWTPs                 --    Current nodes, pumps, sewers and wwtps
+    edgeChanges                                 --    Changes of the edges of Option 1 (see createEdgeChanges)
+    pathNearWTPInvert                           --    Path to the closest wwtp with distances (inverted)
+    allPopNodesOntheWay                         --    All sources on the path to the wwtp
+    pathtonearestWTP                            --    Path to the closest wwtp
+    pathToNearestWTPswapwithDistances           --    Inverse path with distances
+    TONODE                                      --    Connected node
+    sewerBeforeIteration                        --    Sewers before the connection
+    minTD, maxTD, minSlope                      --    Model parameters
+    costModel                                   --    Cost model (see createCostModel)
+    positionIndex                               --    Positions of the nodes and edges (see createPositionIndex)
+
+    Output Arguments:
+    nodesA1                                     --    Nodes with new flow and trench depth
+    pumpsA1                                     --    Pumps
+    edgeChangesI                                --    Changes of the edges with new slope and pipe diameters
+    pipeCostA1                                  --    Sewer costs
+    pumpCostA1                                  --    Annual pumping costs
+    pumpCostWholePeriodI                        --    Pumping costs for the whole lifespan
+    """
+    nodesA1, pumpsA1 = fastCopyNodes(nodes), fastCopy(pumps)
+
+    # Option 1 - Sewer costs
+    nodesA1 = updateFlowA1(nodesA1, pathNearWTPInvert, allPopNodesOntheWay)  # Correct flow along the path.
+    nodesA1, inflowNodesA1 = correctTD(nodesA1, pathtonearestWTP[:-1], minTD, WWTPs, maxTD, minSlope,
+                                       sewers)  # Set all trench Depth except inflow nodes to minimum trench depth
+    nodesA1, pumpsA1, edgeChangesI = changeTD(nodesA1, edgeChanges, pumpsA1, pathToNearestWTPswapwithDistances,
+                                              maxTD, minSlope, inflowNodesA1, sewers, minTD, positionIndex)
+    pipeCostA1, edgeChangesI = costToWTP(pathtonearestWTP, edgeChangesI, nodesA1, pumpsA1, minTD, TONODE,
+                                         sewerBeforeIteration, costModel)  # Pipe costs
+
+    # Option 1 - Pumping costs
+    pumpCostA1, pumpCostWholePeriodI = costPump(pathtonearestWTP, pumpsA1,
+                                                costModel)  # Calculate annual pumping costs
+    return nodesA1, pumpsA1, edgeChangesI, pipeCostA1, pumpCostA1, pumpCostWholePeriodI
+
+
+@timedFunction("option3")
+def evaluateOptionA3(nodes, edgeChanges, pumps, P_A3, WWTPs, pathtonearestWTP, pathtonearestWTPInvert,
+                     pathToNearestWTPwithDistances, TONODE, closestARAtraditionell, sewerBeforeIteration, minTD, maxTD,
+                     minSlope, costModel, positionIndex):
+    """
+    This function calculates the sewer and pumping costs of Option 3 of the expansion module (connection and
+    swap of the wwtp). The input lists are not changed.
+
+    Input Arguments:
+    nodes, pumps, WWTPs                         --    Current nodes, pumps and wwtps
+    edgeChanges                                 --    Changes of the edges of Option 3 (see createEdgeChanges)
+    P_A3                                        --    Sewers with inverted flow to the closest wwtp
+    pathtonearestWTP                            --    Path to the closest wwtp
+    pathtonearestWTPInvert                      --    Inverted path to the closest wwtp
+    pathToNearestWTPwithDistances               --    Path with distances
+    TONODE                                      --    Connected node
+    closestARAtraditionell                      --    Closest wwtp
+    sewerBeforeIteration                        --    Sewers before the connection
+    minTD, maxTD, minSlope                      --    Model parameters
+    costModel                                   --    Cost model (see createCostModel)
+    positionIndex                               --    Positions of the nodes and edges (see createPositionIndex)
+
+    Output Arguments:
+    nodesA3                                     --    Nodes with new flow and trench depth
+    pumpsA3                                     --    Pumps
+    edgeChangesIII                              --    Changes of the edges with new slope and pipe diameters
+    pipeCostA3                                  --    Sewer costs
+    pumpCostA3                                  --    Annual pumping costs
+    pumpCostWholePeriodA3                       --    Pumping costs for the whole lifespan
+    """
+    nodesA3, pumpsA3 = fastCopyNodes(nodes), fastCopy(pumps)
+
+    # Option 3 - Sewer costs
+    if len(pathtonearestWTP) < 3:  # Single edge
+        nodesA3 = updatePathShort(nodesA3, pathtonearestWTPInvert)
+    else:
+        nodesA3 = updatePathLong(nodes, nodesA3, pathtonearestWTPInvert, sewerBeforeIteration,
+                                 TONODE)  # Several edges
+    nodesA3, inflowNodesA3 = correctTD(nodesA3, pathtonearestWTPInvert, minTD, WWTPs, maxTD, minSlope,
+                                       P_A3)  # Set all trench depth except inflow nodes to minimum trench depth
+    nodesA3, pumpsA3, edgeChangesIII = changeTD(nodesA3, edgeChanges, pumpsA3, pathToNearestWTPwithDistances, maxTD,
+                                                minSlope, inflowNodesA3, P_A3, minTD, positionIndex)
+
+    # Option 3 - Pumping costs
+    pumpCostA3, pumpCostWholePeriodA3 = costPump(pathtonearestWTPInvert, pumpsA3, costModel)  # Pump Costs III
+
+    # Calculate costs
+    pipeCostA3, edgeChangesIII = costToWTP(pathtonearestWTPInvert, edgeChangesIII, nodesA3, pumpsA3, minTD,
+                                           closestARAtraditionell, sewerBeforeIteration,
+                                           costModel)  # sum all, use negative slopes
+    return nodesA3, pumpsA3, edgeChangesIII, pipeCostA3, pumpCostA3, pumpCostWholePeriodA3
+
+
+def getSolverState(nodes, sewers, sewers_Current, WWTPs, pumps, PN, initialPN, edgeList, streetNetwork,
+                   aggregatetPoints, totalSystemCosts, hypoWWTPcorrectFlow, allPopNodesOntheWay):
+    """
+    This function collects the lists of the SNIP solver for a checkpoint (see saveSolverState).
+
+    Output Arguments:
+    state                  -    Dictionary with the lists
+    """
+    return {
+        "nodes": nodes, "sewers": sewers, "sewers_Current": sewers_Current, "WWTPs": WWTPs, "pumps": pumps, "PN": PN,
+        "initialPN": initialPN, "edgeList": edgeList, "streetNetwork": streetNetwork, "aggregatetPoints": aggregatetPoints,
+        "totalSystemCosts": totalSystemCosts, "hypoWWTPcorrectFlow": hypoWWTPcorrectFlow,
+        "allPopNodesOntheWay": allPopNodesOntheWay}
+
+
+def getSolverFlags(firstIteration, expansion, runNr, dezentralCriteria, hypoZWeighted, hypoCostsOld, reActivationEM,
+                   firstMergeCrit, Zreached):
+    """
+    This function collects the scalar variables of the SNIP solver for a checkpoint (see saveSolverState).
+
+    Output Arguments:
+    flags                  -    Dictionary with the variables
+    """
+    return {
+        "firstIteration": firstIteration, "expansion": expansion, "runNr": runNr,
+        "dezentralCriteria": dezentralCriteria, "hypoZWeighted": hypoZWeighted, "hypoCostsOld": hypoCostsOld,
+        "reActivationEM": reActivationEM, "firstMergeCrit": firstMergeCrit, "Zreached": Zreached}
+
+
 def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwork, startnode, edgeList, streetVertices,
-         rasterSize, buildPoints, buildings, rasterPoints, inParameter, aggregatetPoints):
+         rasterSize, buildPoints, buildings, rasterPoints, inParameter, aggregatetPoints, demIndex=None, solverOptions=None):
+    """
+    SNIP Algorithm. The pool of the solver options is created for the calculation (see calculateSNIP) and closed
+    afterwards, also if the calculation fails. With speculative path finding, the raster, the building points
+    and the DEM index are sent once to each worker of the pool (see initPathWorker).
+
+    Input and Output Arguments: see calculateSNIP
+    """
+    solverOptions = getSolverOptions(solverOptions)
+
+    # Grid index of the DEM and the cells with buildings for the a* searches (calculated once per run)
+    if demIndex is None:
+        demIndex = createDEMIndex(rasterPoints, rasterSize)
+    demIndex["buildingCells"] = createBuildingMask(demIndex, buildPoints)
+
+    pathContext, routingFolder = None, None
+    if solverOptions["speculativeBatch"] > 0 and solverOptions["optionExecution"] != "sequential" and \
+            solverOptions["routingBackend"] != "legacy":
+        if solverOptions["optionExecution"] == "process":
+            routingFolder = tempfile.mkdtemp(prefix="SNIP_routing_")
+        pathContext = createPathContext(rasterSize, rasterPoints, buildPoints, inParameter[5], inParameter[16],
+                                        demIndex, routingFolder)
+
+    try:
+        optionExecutor = createExecutor(solverOptions["optionExecution"], solverOptions["optionWorkers"],
+                                        initPathWorker if pathContext is not None else None, (pathContext,))
+        try:
+            return calculateSNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwork,
+                                 startnode, edgeList, streetVertices, rasterSize, buildPoints, buildings,
+                                 rasterPoints, inParameter, aggregatetPoints, demIndex, solverOptions,
+                                 optionExecutor, pathContext)
+        finally:
+            shutdownExecutor(optionExecutor)
+    finally:
+        if routingFolder is not None:
+            shutil.rmtree(routingFolder, ignore_errors=True)
+
+
+def calculateSNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwork, startnode, edgeList,
+                  streetVertices, rasterSize, buildPoints, buildings, rasterPoints, inParameter, aggregatetPoints,
+                  demIndex=None, solverOptions=None, optionExecutor=None, pathContext=None):
     """
     SNIP Algorithm
 
@@ -3169,6 +3664,10 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
     rasterPoints           -    Raster Points
     inParameter            -    Parameters for SNIP
     writeOutList           -    Intermediate Results
+    demIndex               -    Grid index of the DEM (created if not provided)
+    solverOptions          -    Options of the solver which do not change the model (see getSolverOptions)
+    optionExecutor         -    Pool for the options and the path finding (see createExecutor, None: no pool)
+    pathContext            -    Input of the path finding in the pool (see createPathContext, None: no speculative path finding)
 
     Output Arguments
     ExpansionTime, MergeTime                                                           -    Timers
@@ -3240,6 +3739,8 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
     expansion = 1  # Abort criteria
     totalSystemCosts = []  # List storing total system costs and Z
     hypoWWTPcorrectFlow = []  # Initial
+    dezentralCriteria, allPopNodesOntheWay = 0, []  # Results of the last connection
+    ExpansionTime, MergeTime = 0, 0  # [s] Time in the expansion and merging module
 
     # Initial calculations
     hypoZWeighted = 0  # Initial weighted Z value
@@ -3269,17 +3770,64 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
     if not os.path.exists(txtResultPath):
         os.mkdir(txtResultPath)
 
+    # Grid index of the DEM and the cells with buildings for the a* searches (calculated once per run)
+    if demIndex is None:
+        demIndex = createDEMIndex(rasterPoints, rasterSize)
+    if "buildingCells" not in demIndex:
+        demIndex["buildingCells"] = createBuildingMask(demIndex, buildPoints)
+
+    # Checkpoints of the solver state (in the expansion module and before the merging module)
+    solverOptions = getSolverOptions(solverOptions)
+    pathSolverState = outListFolder + "solverState.npz"
+    checkpointKey = {"inParameter": list(inParameter), "input": solverOptions["checkpointKey"], "OnlyExecuteMerge": OnlyExecuteMerge}
+    checkpointTimer = createCheckpointTimer(solverOptions["checkpointIterations"], solverOptions["checkpointSeconds"])
+    resumePhase = None
+    if solverOptions["resume"] == 1:
+        resumePhase, state, flags = loadSolverState(pathSolverState, checkpointKey)
+        nodes, sewers, sewers_Current, WWTPs = state["nodes"], state["sewers"], state["sewers_Current"], state["WWTPs"]
+        pumps, PN, initialPN, edgeList = state["pumps"], state["PN"], state["initialPN"], state["edgeList"]
+        streetNetwork, aggregatetPoints, totalSystemCosts = state["streetNetwork"], state["aggregatetPoints"], state["totalSystemCosts"]
+        hypoWWTPcorrectFlow, allPopNodesOntheWay = state["hypoWWTPcorrectFlow"], state["allPopNodesOntheWay"]
+        firstIteration, expansion, runNr, dezentralCriteria = flags["firstIteration"], flags["expansion"], flags["runNr"], flags["dezentralCriteria"]
+        hypoZWeighted, hypoCostsOld, reActivationEM = flags["hypoZWeighted"], flags["hypoCostsOld"], flags["reActivationEM"]
+        firstMergeCrit, Zreached = flags["firstMergeCrit"], flags["Zreached"]
+
+    # Street graph in CSR form for the Djikstra and a* searches
+    routing = createRoutingContext(streetNetwork, solverOptions["routingBackend"])
+    statePool = optionExecutor if sharesMemory(optionExecutor) else None  # Options 1 and 3 with the whole network state are not copied to processes
+    speculativeBatch = solverOptions["speculativeBatch"]
+    if optionExecutor is None or pathContext is None or routing["backend"] == "legacy":
+        speculativeBatch = 0  # Speculative path finding only in a pool initialised with the path context
+    pathPrefetch = {}
+    costModel = createCostModelFromInput(inParameter)  # Annuity and cost factors of the parameters of this run
+    costLedger = createCostLedger(costModel)  # Annuities of the last calculation of the hypothetical costs
+    positionIndex = createPositionIndex()  # Positions of the nodes and edges for the options
+
     # Expansion Module is activated
     while expansion == 1:
         print("Start expansion module...")
 
-        if PN == []:  # Exit in case PN is empty
+        if PN == [] and resumePhase != "merge":  # Exit in case PN is empty
             expansion = 0
             continue
 
-        if OnlyExecuteMerge == 0 and ignoreOnlyExecuteMerge == 0:
+        if OnlyExecuteMerge == 0 and ignoreOnlyExecuteMerge == 0 and resumePhase != "merge":
+            expansionStart = startTimer()
             while len(PN) > 0 or firstIteration == 1:
+                countEvent("expansionModule.iteration")
                 if ZtoReach > hypoZWeighted:  # Used to abort in case a certain z-value is reached
+                    if checkpointDue(checkpointTimer):  # Save solver state
+                        saveSolverState(pathSolverState, checkpointKey, "expansion",
+                                        getSolverState(nodes, sewers, sewers_Current, WWTPs, pumps, PN, initialPN,
+                                                       edgeList, streetNetwork, aggregatetPoints, totalSystemCosts,
+                                                       hypoWWTPcorrectFlow, allPopNodesOntheWay),
+                                        getSolverFlags(firstIteration, expansion, runNr, dezentralCriteria,
+                                                       hypoZWeighted, hypoCostsOld, reActivationEM, firstMergeCrit,
+                                                       Zreached), checkpointTimer)
+                    if speculativeBatch > 0:  # Search paths of the next nodes in advance
+                        pathPrefetch = prefetchCandidatePaths(pathPrefetch, PN, nodes, sewers, routing,
+                                                              optionExecutor, pathContext, speculativeBatch,
+                                                              streetFactor)
                     PN, FROMNODE, TONODE, weightFactorDijkstra, realDistance = getClosestNode(
                         PN)  # Select next node to connect
 
@@ -3291,7 +3839,7 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
                             hypoZ, hypoZWeighted, hypoCosts, hypoPumpCosts, hypoWWTPCosts, hypoPublicPipeCosts, hypoWWTPcorrectFlow = getFullHypotheticalCosts(
                                 aggregatetPoints, WWTPs, sewers, EW_Q, wwtpLifespan, interestRate, pumps, pumpYears,
                                 pricekWh, edgeList, nodes, stricklerC, discountYearsSewers, operationCosts, f_SewerCost,
-                                fc_wwtpOperation, fc_wwtpReplacement)
+                                fc_wwtpOperation, fc_wwtpReplacement, costLedger)
 
                             if reActivationEM == 0:
                                 if hypoCosts < hypoCostsOld:
@@ -3311,9 +3859,17 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
                             idp0, p0, _, _, _, _ = getPns(FROMNODE, nodes)  # get node information
                             idp1, p1, _, _, forceConnection, _ = getPns(TONODE, nodes)  # get node information
                             _, slopeMST, heightDiff = distanceCalc3d(p0, p1)  # calc slope of straight distance
+                            prefetchedPaths = None
+                            if speculativeBatch > 0:
+                                prefetchedPaths = takePrefetchedPaths(pathPrefetch, routing, idp0, idp1)
                             try:  # Try to find path on street with Dijkstra Algorithm
-                                archPath, distStartEnd, _ = dijkstra(streetNetwork, idp0, idp1,
-                                                                     heightDiff)  # Djikstra
+                                if prefetchedPaths is None:
+                                    archPath, distStartEnd, _ = dijkstra(streetNetwork, idp0, idp1,
+                                                                         heightDiff, routing)  # Djikstra
+                                elif prefetchedPaths[0] is None:
+                                    raise KeyError(idp1)  # No path along the street
+                                else:
+                                    archPath, distStartEnd, _ = prefetchedPaths[0]
                                 Djikstradistancce = distStartEnd * weightFactorDijkstra  # weight distance
                                 streetConnection = 1
                                 # arcpy.AddMessage("Path was found along the street..." + str(archPath))                                      # criteria whether the djikstra distance or MST distance was
@@ -3337,8 +3893,12 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
                             if streetConnection == 0:
                                 # arcpy.AddMessage("Try finding a path along the terrain (a*)...")
                                 changeStreetGraph = 1
-                                archPathMST, boundingCandidates = aStar(rasterSize, rasterPoints, buildPoints, p0, p1,
-                                                                        idp0, idp1, neighborhood, f_topo)
+                                if prefetchedPaths is not None and prefetchedPaths[1] is not None:
+                                    archPathMST, boundingCandidates = prefetchedPaths[1]
+                                else:
+                                    archPathMST, boundingCandidates = aStar(rasterSize, rasterPoints, buildPoints, p0,
+                                                                            p1, idp0, idp1, neighborhood, f_topo,
+                                                                            demIndex, routing)
                                 nodes = addDEMPntstoNodes(nodes, archPathMST, boundingCandidates, FROMNODE, TONODE,
                                                           minTD)  # Add new DEM-Points to nodes
 
@@ -3355,6 +3915,7 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
                                 edgeList, streetNetwork = addEdgesUpdateStreetNetwork(wayProperty, archPathMST, nodes,
                                                                                       boundingCandidates, edgeList,
                                                                                       streetNetwork)
+                                updateRoutingContext(routing, streetNetwork)  # Street graph needs to be exported again
 
                         # Path calculations
                         if firstIteration == 0:
@@ -3409,9 +3970,7 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
                             # Option  Module (OM) & Cost module (CM)
                             # ====================================================
                             P_A3 = dict(sewers)
-                            nodesA1, nodesA3 = fastCopyNodes(nodes), fastCopyNodes(nodes)
                             swapCriteria, dezentralCriteria = 0, 0  # if swap takes places ((yes or no), if decentral (yes or no)
-                            pumpsA1, pumpsA3 = fastCopy(pumps), fastCopy(pumps)
                             P_A3 = invertFlowToNearestWTP(pathtonearestWTPswap, P_A3,
                                                           sewers)  # Invert flow along the way to the nearest WWTP
 
@@ -3419,30 +3978,18 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
                             # Option 1
                             # --------
 
-                            # Option 1 - Sewer costs
-                            nodesA1 = updateFlowA1(nodesA1, pathNearWTPInvert,
-                                                   allPopNodesOntheWay)  # Correct flow along the path.
-                            nodesA1, inflowNodesA1 = correctTD(nodesA1, pathtonearestWTP[:-1], minTD, WWTPs, maxTD,
-                                                               minSlope,
-                                                               sewers)  # Set all trench Depth except inflow nodes to minimum trench depth
-                            nodesA1, pumpsA1, edgeListI = changeTD(nodesA1, edgeList, pumpsA1,
-                                                                   pathToNearestWTPswapwithDistances, maxTD, minSlope,
-                                                                   inflowNodesA1, sewers, minTD)
-                            pipeCostA1, edgeListI = costToWTP(pathtonearestWTP, edgeListI, nodesA1, pumpsA1, minTD,
-                                                              TONODE, sewerBeforeIteration, discountYearsSewers,
-                                                              interestRate, stricklerC, operationCosts,
-                                                              f_SewerCost)  # Pipe costs
+                            # Option 1 - Sewer costs and pumping costs (the options only store their changes of the edges)
+                            updatePositionIndex(positionIndex, nodes, edgeList)
+                            futureA1 = submitTask(statePool, evaluateOptionA1, nodes,
+                                                  createEdgeChanges(edgeList, positionIndex), pumps, sewers, WWTPs,
+                                                  pathNearWTPInvert, allPopNodesOntheWay, pathtonearestWTP,
+                                                  pathToNearestWTPswapwithDistances, TONODE, sewerBeforeIteration,
+                                                  minTD, maxTD, minSlope, costModel, positionIndex)
 
                             # Option 1 - WWTPs costs
                             flowWWFrom = getFlowWWTP(WWTPs,
                                                      closestARAtraditionell)  # WWTP costs: Additional costs of building a larger WWTP. Flow of closestARAtraditionell
-                            WWTPcostsA1 = costWWTP((flowWWFrom + flowAllArchPathWWTPs), EW_Q, wwtpLifespan,
-                                                   interestRate, fc_wwtpOperation,
-                                                   fc_wwtpReplacement)  # Costs of new WWTPs with original Flow, flow of connecting node and flow of all wwtps on archPaths
-
-                            # Option 1 - Pumping costs
-                            pumpCostA1, pumpCostWholePeriodI = costPump(pathtonearestWTP, pumpsA1, pricekWh, pumpYears,
-                                                                        interestRate)  # Calculate annual pumping costs
+                            WWTPcostsA1 = getModelWWTPCosts(costModel, (flowWWFrom + flowAllArchPathWWTPs))  # Costs of new WWTPs with original Flow, flow of connecting node and flow of all wwtps on archPaths
 
                             # --------
                             # Option 2
@@ -3461,21 +4008,22 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
                             summedFlowDecentralWWTP = getFlowtoCalculateRC(allPopNodesOntheWay, flowFrom, flowTo, nodes)
 
                             # Option 2 - WWTPs costs # TODO CHANGE FLOWTOADD (REMOVE)
-                            costDecentralWWTPs = sumCostOfArchWWTPs(allPopNodesOntheWay[:-1], nodes, EW_Q, wwtpLifespan,
-                                                                    interestRate, fc_wwtpOperation,
-                                                                    fc_wwtpReplacement)  # Calculate costs of new wwtps on added path
-                            wtpCostClosestARA = costWWTP(flowWWFrom, EW_Q, wwtpLifespan, interestRate, fc_wwtpOperation,
-                                                         fc_wwtpReplacement)  # cost of already build wwwt
+                            costDecentralWWTPs = sumCostOfArchWWTPs(allPopNodesOntheWay[:-1], nodes,
+                                                                    costModel)  # Calculate costs of new wwtps on added path
+                            wtpCostClosestARA = getModelWWTPCosts(costModel, flowWWFrom)  # cost of already build wwwt
                             WWTPcostsA2 = costDecentralWWTPs + wtpCostClosestARA
 
                             # Option 2 - Sewer costs
-                            pipeCostA2, _ = costToWTP(pathSubNetworkToClosestWWTP, edgeList, nodes, pumps, minTD,
-                                                      TONODE, sewerBeforeIteration, discountYearsSewers, interestRate,
-                                                      stricklerC, operationCosts, f_SewerCost)  # Pipe costs
+                            optionStart = startTimer()
+                            pipeCostA2, edgeChangesII = costToWTP(pathSubNetworkToClosestWWTP,
+                                                                  createEdgeChanges(edgeList, positionIndex), nodes,
+                                                                  pumps, minTD, TONODE, sewerBeforeIteration,
+                                                                  costModel)  # Pipe costs
 
                             # Option 2 - Pumping costs
-                            pumpCostA2, pumpCostWholePeriodA2 = costPump(pathSubNetworkToClosestWWTP, pumps, pricekWh,
-                                                                         pumpYears, interestRate)  # Pumping costs II
+                            pumpCostA2, pumpCostWholePeriodA2 = costPump(pathSubNetworkToClosestWWTP, pumps,
+                                                                         costModel)  # Pumping costs II
+                            stopTimer("option2", optionStart)
 
                             # --------
                             # Option 3
@@ -3483,29 +4031,15 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
                             # Option 3 - WWTPs costs
                             WWTPcostsA3 = WWTPcostsA1
 
-                            # Option 3 - Sewer costs
-                            if len(pathtonearestWTP) < 3:  # Single edge
-                                nodesA3 = updatePathShort(nodesA3, pathtonearestWTPInvert)
-                            else:
-                                nodesA3 = updatePathLong(nodes, nodesA3, pathtonearestWTPInvert, sewerBeforeIteration,
-                                                         TONODE)  # Several edges
-                            nodesA3, inflowNodesA3 = correctTD(nodesA3, pathtonearestWTPInvert, minTD, WWTPs, maxTD,
-                                                               minSlope,
-                                                               P_A3)  # Set all trench depth except inflow nodes to minimum trench depth
-                            nodesA3, pumpsA3, edgeListIII = changeTD(nodesA3, edgeList, pumpsA3,
-                                                                     pathToNearestWTPwithDistances, maxTD, minSlope,
-                                                                     inflowNodesA3, P_A3, minTD)
-
-                            # Option 3 - Pumping costs
-                            pumpCostA3, pumpCostWholePeriodA3 = costPump(pathtonearestWTPInvert, pumpsA3, pricekWh,
-                                                                         pumpYears, interestRate)  # Pump Costs III
-
-                            # Calculate costs
-                            pipeCostA3, edgeListIII = costToWTP(pathtonearestWTPInvert, edgeListIII, nodesA3, pumpsA3,
-                                                                minTD, closestARAtraditionell, sewerBeforeIteration,
-                                                                discountYearsSewers, interestRate, stricklerC,
-                                                                operationCosts,
-                                                                f_SewerCost)  # sum all, use negative slopes
+                            # Option 3 - Sewer costs and pumping costs (with the pipe diameters of Option 2)
+                            futureA3 = submitTask(statePool, evaluateOptionA3, nodes, copyEdgeChanges(edgeChangesII),
+                                                  pumps, P_A3, WWTPs, pathtonearestWTP, pathtonearestWTPInvert,
+                                                  pathToNearestWTPwithDistances, TONODE, closestARAtraditionell,
+                                                  sewerBeforeIteration, minTD, maxTD, minSlope, costModel,
+                                                  positionIndex)
+
+                            nodesA1, pumpsA1, edgeChangesI, pipeCostA1, pumpCostA1, pumpCostWholePeriodI = futureA1.result()
+                            nodesA3, pumpsA3, edgeChangesIII, pipeCostA3, pumpCostA3, pumpCostWholePeriodA3 = futureA3.result()
 
                             # Total option costs
                             totCostsA1 = pipeCostA1 + WWTPcostsA1 + pumpCostA1  # Option I
@@ -3513,10 +4047,9 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
                             totCostsA3 = pipeCostA3 + WWTPcostsA3 + pumpCostA3  # Option III
 
                             # Calculate cost of cheapest central connection costs.
-                            costConnectionA = calculateConnectionCosts(pipeCostA1, pumpCostWholePeriodI, pipeCostA2,
-                                                                       pumpCostWholePeriodA2, pipeCostA3,
-                                                                       pumpCostWholePeriodA3, WWTPcostsA1, interestRate,
-                                                                       wwtpLifespan, discountYearsSewers)
+                            costConnectionA = getModelConnectionCosts(costModel, pipeCostA1, pumpCostWholePeriodI,
+                                                                      pipeCostA2, pumpCostWholePeriodA2, pipeCostA3,
+                                                                      pumpCostWholePeriodA3)
 
                             resonableCosts = summedFlowDecentralWWTP / EW_Q * resonableCostsPerEW  # Total reasonable costs # Calculate reasonable costs (If positive: central costs are more expensive, if negative: decentral is more expensive)                                                                                                       # 1: Ignore, 0: Don't Ignore
 
@@ -3539,7 +4072,8 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
                                 sewers = dict(sewerBeforeIteration)
                                 sewers = appendListWTPsToNetwork(sewers, intermediateWWTPs)  # Append to network
 
-                                # Add path to edgeList
+                                # Add path to edgeList (with the pipe diameters of Option 2)
+                                edgeList = applyEdgeChanges(edgeChangesII)
                                 for i in pathToNearestWTPwithDistances:
                                     fromID, toID = i[0], i[1][0]
                                     length = i[1][1]  # Read length
@@ -3552,7 +4086,7 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
                                 if swapCriteria == 1:  # Switch WWTPs and connect
                                     # arcpy.AddMessage("OPTION SWAP")
                                     sewers = dict(P_A3)
-                                    edgeList = fastCopy(edgeListIII)  # Replace nodes by new nodes with new flow
+                                    edgeList = applyEdgeChanges(edgeChangesIII)  # Replace nodes by new nodes with new flow
                                     nodes = fastCopyNodes(nodesA3)
                                     WWTPs = delWWTP(WWTPs, closestARAtraditionell)  # Delete wwtps
                                     sewers_Current = appendToSewers(sewers_Current,
@@ -3565,7 +4099,7 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
                                     # arcpy.AddMessage("OPTION NO SWAP")
                                     sewers_Current = appendToSewers(sewers_Current,
                                                                     pathtonearestWTP)  # Append all newly connected nodes to pathtonearestWTP
-                                    edgeList = fastCopy(edgeListI)  # Replace nodes and pumps
+                                    edgeList = applyEdgeChanges(edgeChangesI)  # Replace nodes and pumps
                                     pumps = fastCopy(pumpsA1)
                                     nodes = fastCopyNodes(nodesA1)
                                     WWTPs = updateFlowInWWTP(WWTPs, nodes,
@@ -3582,9 +4116,20 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
                 else:  # Z-Value reached to abort
                     Zreached, expansion, firstIteration, PN = 1, 0, 0, []
             firstIteration = 0
+            ExpansionTime += stopTimer("expansionModule", expansionStart)
 
             # Merging module after Expansion Module
+        resumePhase = None
         if Zreached == 0:  # Go to Merging Module
+            if checkpointTimer is not None:  # Save solver state
+                saveSolverState(pathSolverState, checkpointKey, "merge",
+                                getSolverState(nodes, sewers, sewers_Current, WWTPs, pumps, PN, initialPN, edgeList,
+                                               streetNetwork, aggregatetPoints, totalSystemCosts,
+                                               hypoWWTPcorrectFlow, allPopNodesOntheWay),
+                                getSolverFlags(firstIteration, expansion, runNr, dezentralCriteria, hypoZWeighted,
+                                               hypoCostsOld, reActivationEM, firstMergeCrit, Zreached),
+                                checkpointTimer)
+            mergeStart = startTimer()
             nodes, sewers, pumps, WWTPs, PN, edgeList, totalSystemCosts = mergingModule(OnlyExecuteMerge, forceZ,
                                                                                         ZtoReach, hypoZWeighted,
                                                                                         firstMergeCrit,
@@ -3600,7 +4145,9 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
                                                                                         f_SewerCost, fc_wwtpOperation,
                                                                                         fc_wwtpReplacement,
                                                                                         totalSystemCosts,
-                                                                                        iterativeCostCalc)
+                                                                                        iterativeCostCalc, routing, solverOptions,
+                                                                                        optionExecutor, costLedger)
+            MergeTime += stopTimer("mergingModule", mergeStart)
             runNr, firstMergeCrit, reActivationEM = 0, 0, 1  # Expansion module is finished, As from now on the EM is only reactivated
             expansion = testExpansion(PN)  # Test if there is still expansion needed
 
@@ -3613,15 +4160,15 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
     final_Pumps = readPumpList(pumps, nodes)  # Read out all pumps
 
     # Calculate costs of whole system
-    completePumpCosts, completeWWTPCosts, completePublicPipeCosts = calculatetotalAnnuities(WWTPs, EW_Q, wwtpLifespan,
-                                                                                            interestRate, pumps,
-                                                                                            pumpYears, pricekWh,
-                                                                                            final_Network, flowPoints,
-                                                                                            edgeList, nodes, stricklerC,
-                                                                                            discountYearsSewers,
-                                                                                            operationCosts, f_SewerCost,
-                                                                                            fc_wwtpOperation,
-                                                                                            fc_wwtpReplacement)
+    completePumpCosts, completeWWTPCosts, completePublicPipeCosts = calculatetotalAnnuitiesVectorized(WWTPs, EW_Q, wwtpLifespan,
+                                                                                                      interestRate, pumps,
+                                                                                                      pumpYears, pricekWh,
+                                                                                                      final_Network, flowPoints,
+                                                                                                      edgeList, nodes, stricklerC,
+                                                                                                      discountYearsSewers,
+                                                                                                      operationCosts, f_SewerCost,
+                                                                                                      fc_wwtpOperation,
+                                                                                                      fc_wwtpReplacement)
 
     # Store the result as .txt files
     writeTotxt(txtResultPath, "inParameter", inParameter)
@@ -3642,7 +4189,15 @@ def SNIP(OnlyExecuteMerge, outListFolder, runNr, nodes, anteilDaten, streetNetwo
     flowIfSameCheck(final_wwtps, aggregatetPoints)  # Check if flow is lost
     print("SNIP is successfully calculated.")
     print("Costs per iteration:" + str(totalSystemCosts))
-    MergeTime, ExpansionTime = 0, 0
+
+    # Sizes of the graphs and lists
+    recordSize("streetNetwork.nodes", len(streetNetwork))
+    recordSize("streetNetwork.edges", sum(len(streetNetwork[node]) for node in streetNetwork) // 2)
+    recordSize("nodes", len(nodes))
+    recordSize("edgeList", len(edgeList))
+    recordSize("sewers", len(sewers))
+    recordSize("WWTPs", len(WWTPs))
+    recordSize("pumps", len(pumps))
 
     return ExpansionTime, MergeTime, final_Network, flowPoints, WWTPs, final_wwtps, final_Pumps, edgeList, completePumpCosts, completeWWTPCosts, completePublicPipeCosts, totalSystemCosts, buildings, buildPoints, aggregatetPoints
 
@@ -3651,7 +4206,7 @@ def mergingModule(OnlyExecuteMerge, forceZ, ZtoReach, hypoZWeighted, firstMergeC
                   sewers_Current, edgeList, pumps, PN, sewers, streetNetwork, f_merge, minTD, maxTD, minSlope,
                   discountYearsSewers, interestRate, stricklerC, operationCosts, pricekWh, pumpYears, wwtpLifespan,
                   EW_Q, resonableCostsPerEW, f_SewerCost, fc_wwtpOperation, fc_wwtpReplacement, totalSystemCosts,
-                  iterativeCostCalc):
+                  iterativeCostCalc, routing=None, solverOptions=None, executor=None, costLedger=None):
     '''
     Merging Module
 
@@ -3684,6 +4239,10 @@ def mergingModule(OnlyExecuteMerge, forceZ, ZtoReach, hypoZWeighted, firstMergeC
     resonableCostsPerEW  -    reasonable costs
     totalSystemCosts     -    List conting Z and hypothethical costs
     iterativeCostCalc    -
+    routing              -    Routing context for the Djikstra searches
+    solverOptions        -    Solver options (see getSolverOptions)
+    executor             -    Pool for the parallel merging strategy (optional)
+    costLedger           -    Cost ledger for the hypothetical costs (optional, see createCostLedger)
 
     Output Arguments:
     nodes:                -    Networ nodes
@@ -3699,6 +4258,14 @@ def mergingModule(OnlyExecuteMerge, forceZ, ZtoReach, hypoZWeighted, firstMergeC
     sortedListWWTPs = sortedListWWTPs[::-1]  # Invert sorting in oder that max values are first
     mergeCostStorage = []  # Used to store cheapest connetio nin case Z == 1 wants to be achieved
     finishedExpansion = 0
+    mergeResultsCache = {}  # Results of the parallel merging strategy which are still valid (see checkMergeConflict)
+    deferredWWTPs = set()  # WWTPs of the parallel merging strategy which are not merged, checked again after the merges
+    networkIndex = createNetworkIndex()  # Sewer nodes to find the closest network (option 2)
+    wwtpIndex = createWWTPIndex()  # WWTPs to find the closest wwtp and the highest connectivity-potential (options 1 & 3)
+    positionIndex = createPositionIndex()  # Positions of the nodes and edges for the options
+    costModel = createCostModel(EW_Q, wwtpLifespan, interestRate, pumpYears, pricekWh, stricklerC, discountYearsSewers,
+                                operationCosts, f_SewerCost, fc_wwtpOperation,
+                                fc_wwtpReplacement)  # Annuity and cost factors of the parameters
 
     if iterativeCostCalc == 1:
         hypoZOld = totalSystemCosts[len(totalSystemCosts) - 1][0]  # Current Z value
@@ -3732,6 +4299,101 @@ def mergingModule(OnlyExecuteMerge, forceZ, ZtoReach, hypoZWeighted, firstMergeC
                 sortedListWWTPs = []
                 continue
         else:
+            if solverOptions["mergeStrategy"] == "parallel":  # Apply the cheapest merges of a snapshot which do not conflict
+                deferredWWTPs.intersection_update(wwtp[0] for wwtp in sortedListWWTPs)
+                wwtpIDs = [wwtp[0] for wwtp in sortedListWWTPs
+                           if wwtp[0] not in mergeResultsCache and wwtp[0] not in deferredWWTPs]
+                if wwtpIDs == []:  # No more merges to check: wwtps which were not merged are checked again
+                    wwtpIDs = [wwtp[0] for wwtp in sortedListWWTPs if wwtp[0] in deferredWWTPs]
+                    deferredWWTPs = set()
+                mergeResults = evaluateMergesOfSnapshot(executor, wwtpIDs, nodes, WWTPs, sewers, edgeList, pumps,
+                                                        sortedListWWTPs, streetNetwork, routing, f_merge, forceZ,
+                                                        finishedExpansion, minTD, maxTD, minSlope, costModel,
+                                                        solverOptions["multiTargetMerge"])
+                mergeResultsCache.update(zip(wwtpIDs, mergeResults))
+                mergeResults = [mergeResultsCache[wwtp[0]] for wwtp in sortedListWWTPs if wwtp[0] in mergeResultsCache]
+
+                merges = [mergeResult for mergeResult in mergeResults if mergeResult["merge"] is not None]
+                merges.sort(key=lambda mergeResult: mergeResult["merge"]["mergeCosts"])
+                snapshotChanges, snapshotChanged = createSnapshotChanges(), False
+                networkRemovingID = None
+
+                for mergeResult in merges:
+                    if not (ZtoReach > hypoZWeighted and len(WWTPs) > 2 and len(sortedListWWTPs) > 1):
+                        break
+                    if mergeResult["merge"]["needsNetworkRemoving"] == 1:  # Merged below (networks are removed)
+                        if networkRemovingID is None:
+                            networkRemovingID = mergeResult["ID"]
+                        continue
+                    if checkMergeConflict(mergeResult, snapshotChanges, f_merge):
+                        continue  # Calculated again with the next snapshot
+
+                    WWTPFROM, WWTPTO = mergeResult["merge"]["WWTPFROM"], mergeResult["merge"]["WWTPTO"]
+                    pathBetweenWWTPs = mergeResult["merge"]["pathBetweenWWTPs"]
+                    WWTPs, _ = checkIfWWTPwereConnected(pathBetweenWWTPs, fastCopy(WWTPs), WWTPs)
+                    nodes, sewers, pumps, edgeList = applyMergeChanges(mergeResult, nodes, sewers, pumps, edgeList,
+                                                                       positionIndex)
+                    if mergeResult["merge"]["swap"] == 1:
+                        WWTPs = delEntry(WWTPs, WWTPFROM)  # Delete wwtp
+                        WWTPs = updateFlowInWWTP(WWTPs, nodes, WWTPTO)  # Update flow in WWTPs
+                        sortedListWWTPs = delEntry(sortedListWWTPs, WWTPFROM)  # Delete in wwtps to check for merging
+                        if not checkifInWWTPs(sortedListWWTPs, WWTPTO):  # Check WWTPTO again
+                            for wwtp in WWTPs:
+                                if wwtp[0] == WWTPTO:
+                                    sortedListWWTPs.insert(0, [wwtp[0], wwtp[1]])
+                    else:
+                        sortedListWWTPs = delEntry(sortedListWWTPs, WWTPTO)  # Delete in wwtps to check for merging
+                        WWTPs = delEntry(WWTPs, WWTPTO)  # Delete wwtp
+                        WWTPs = updateFlowInWWTP(WWTPs, nodes, WWTPFROM)  # Update flow in WWTPs
+                        sewers_Current = appendToSewers(sewers_Current, pathBetweenWWTPs[1:-1])
+                        mergeCostStorage = [e for e in mergeCostStorage if e[1][0] != WWTPTO and e[3][0] != WWTPTO]
+                    addSnapshotChanges(snapshotChanges, mergeResult, nodes, WWTPs, positionIndex)
+                    snapshotChanged = True
+
+                    # Calculate costs of current network, wwtps and if hypothetically all other wwtps wouldn't be connected but each have a decentral conncetion
+                    if iterativeCostCalc == 1 and ZtoReach > hypoZWeighted:
+                        hypoZ, hypoZWeighted, hypoCosts, hypoPumpCosts, hypoWWTPCosts, hypoPublicPipeCosts, _ = getFullHypotheticalCosts(
+                            aggregatetPoints, WWTPs, sewers, EW_Q, wwtpLifespan, interestRate, pumps, pumpYears,
+                            pricekWh, edgeList, nodes, stricklerC, discountYearsSewers, operationCosts, f_SewerCost,
+                            fc_wwtpOperation, fc_wwtpReplacement, costLedger)
+                        if hypoZ > hypoZOld:
+                            totalSystemCosts.append([hypoZ, hypoZWeighted, hypoCosts, hypoPumpCosts, hypoWWTPCosts,
+                                                     hypoPublicPipeCosts])
+                        hypoZOld = hypoZ
+
+                # WWTPs which are not merged are not checked again if nothing they read was changed by the merges
+                for mergeResult in mergeResults:
+                    if mergeResult["merge"] is None and checkifInWWTPs(sortedListWWTPs, mergeResult["ID"]) and \
+                            not checkMergeConflict(mergeResult, snapshotChanges, f_merge):
+                        for wwtp in sortedListWWTPs:
+                            if wwtp[0] == mergeResult["ID"]:
+                                for mergeCosts, mOpt in mergeResult["noMerges"]:
+                                    mergeCostStorage.append([mergeCosts, wwtp, wwtp[0], mOpt])
+                        nodes, sewers, pumps, edgeList = applyMergeChanges(mergeResult, nodes, sewers, pumps,
+                                                                           edgeList, positionIndex)
+                        addSnapshotChanges(snapshotChanges, mergeResult, nodes, WWTPs, positionIndex)
+                        sortedListWWTPs = delEntry(sortedListWWTPs, mergeResult["ID"])
+                        snapshotChanged = True
+
+                # Results which are not valid anymore are calculated again with the next snapshot (wwtps which were
+                # not merged as soon as there are no more merges to check). Merges with networks to remove are
+                # calculated again when they are merged below and are kept.
+                for ID in list(mergeResultsCache):
+                    if not checkifInWWTPs(sortedListWWTPs, ID):
+                        del mergeResultsCache[ID]
+                    elif mergeResultsCache[ID]["merge"] is None:
+                        deferredWWTPs.add(ID)  # Not valid, as otherwise not checked again (see above)
+                        del mergeResultsCache[ID]
+                    elif mergeResultsCache[ID]["merge"]["needsNetworkRemoving"] == 0 and checkMergeConflict(
+                            mergeResultsCache[ID], snapshotChanges, f_merge):
+                        del mergeResultsCache[ID]
+                if snapshotChanged or deferredWWTPs:
+                    continue
+
+                # Only merges with networks to remove are left, which are merged below
+                mergeResultsCache = {}
+                sortedListWWTPs = moveWWTPToFront(sortedListWWTPs, networkRemovingID)
+
             CurrentCheckedWWTP, checkBackConnectionID = sortedListWWTPs[0], sortedListWWTPs[0][
                 0]  # Current WWTP to check for merge, Get largest wwtp to check
 
@@ -3749,6 +4411,7 @@ def mergingModule(OnlyExecuteMerge, forceZ, ZtoReach, hypoZWeighted, firstMergeC
             wwtpToWwtopConncetion = 0  # Criteria to define whether wwtps are connected or not
 
             while expansionM == True:
+                countEvent("mergingModule.iteration")
                 _, pZero, _, _, forceCentralConnection, _ = getPns(checkBackConnectionID,
                                                                    nodes)  # Select wwtp where node was connected and test if connection is allowed
                 if forceCentralConnection == 1:
@@ -3758,9 +4421,9 @@ def mergingModule(OnlyExecuteMerge, forceZ, ZtoReach, hypoZWeighted, firstMergeC
                 # Option Selection Module (OSM)
                 nodeIdOpt1, nodeOpt1Cor, nodeIdOpt3, nodeOpt3Cor = connectivityPotential(nodes, WWTPs,
                                                                                          checkBackConnectionID, pZero,
-                                                                                         f_merge)  # Option 1 & Option 3
+                                                                                         f_merge, wwtpIndex)  # Option 1 & Option 3
                 nodeIdOpt2, nodeOpt2Cor, pathInClosestNetwork = getClosestNetworkWWTP(nodes, WWTPs, sewers_NoCon, pZero,
-                                                                                      checkBackConnectionID)  # Option 2
+                                                                                      checkBackConnectionID, networkIndex)  # Option 2
                 mergeOptions = storeMergingOptions(nodeIdOpt1, nodeOpt1Cor, nodeIdOpt2, nodeOpt2Cor, nodeIdOpt3,
                                                    nodeOpt3Cor)  # Store Merging Options in a list
 
@@ -3781,12 +4444,21 @@ def mergingModule(OnlyExecuteMerge, forceZ, ZtoReach, hypoZWeighted, firstMergeC
                             expansionM = False
                             break
 
+                        if solverOptions["multiTargetMerge"] == 1:  # Paths of all options with one search from the wwtp
+                            mergePaths = dijkstraManyToOne(streetNetwork, [mOpt[0] for mOpt in mergeOptions],
+                                                           checkBackConnectionID,
+                                                           [abs(pZero[2] - mOpt[1][2]) for mOpt in mergeOptions],
+                                                           routing)
+
                         for mOpt in mergeOptions:
                             try:  # Search path between WWTps with Djikstra
-                                heightDiff = abs(pZero[2] - mOpt[1][2])  # heightdifference
-                                archPathWWTP, distStartEnd, slopeDijkstra = dijkstra(streetNetwork, mOpt[0],
-                                                                                     checkBackConnectionID,
-                                                                                     heightDiff)  # Djkstra
+                                if solverOptions["multiTargetMerge"] == 1:
+                                    archPathWWTP, distStartEnd, slopeDijkstra = mergePaths[mOpt[0]]
+                                else:
+                                    heightDiff = abs(pZero[2] - mOpt[1][2])  # heightdifference
+                                    archPathWWTP, distStartEnd, slopeDijkstra = dijkstra(streetNetwork, mOpt[0],
+                                                                                         checkBackConnectionID,
+                                                                                         heightDiff, routing)  # Djkstra
                                 edgeList = addToEdgeList(edgeList, distStartEnd, slopeDijkstra, mOpt[0],
                                                          checkBackConnectionID, mOpt[1],
                                                          pZero)  # If the new streetDistance is not already added in edgeList, add to edgeList
@@ -3794,214 +4466,24 @@ def mergingModule(OnlyExecuteMerge, forceZ, ZtoReach, hypoZWeighted, firstMergeC
                             except KeyError:
                                 raise Exception("There can be no sewer path be determined between the two wwtps.")
 
-                            if nodeIdOpt2 == mOpt[0]:
-                                archPathWWTP = mergePathClosestNetwork(pathInClosestNetwork, archPathWWTP,
-                                                                       edgeList)  # If closest network, check path again.
-
-                            archPathWWTP = getNoLoopPath(sewers,
-                                                         archPathWWTP)  # Path is changed in order that there are no loops.
-                            sewers = appendToNetwork(sewers, archPathWWTP)  # Append no loop path to sewers
-                            inversearchPathWWTP = invertArchPath(archPathWWTP)
-
-                            # Get parts of path which are already part of a the starting and ending network
-                            nodesToNetwork = findInNetworkPath(archPathWWTP, sewers_NoCon,
-                                                               sewers)  # finds part of the From Network which need to be considered in costs calculations
-                            nodesFromNetwork = findInNetworkPath(inversearchPathWWTP, sewers_NoCon,
-                                                                 sewers)  # finds part of the To Network which need to be considered in costs calculations
-                            WWTPTO, WWTPFROM = nodesToNetwork[0], nodesFromNetwork[0]  # WWTPs
-
-                            # Update
-                            PathListToPotentialWWTP = InvertandswapID(inversearchPathWWTP)  # swap ID and invert path
-                            pathBetweenWWTPs = readOnlyNodesID(archPathWWTP)  # Only ID
-                            pathBetweenWWTPsInvert = pathBetweenWWTPs[::-1]  # Invert abd only ID
-                            archPathWWTPInvert = InvertandswapID(archPathWWTP)  # swap ID and invert path
-
-                            # Add ArchPath to edges # new that full path is entered into edgeList
-                            for edge in archPathWWTP:
-                                newNode, oldNode = edge[0], edge[1][0]
-                                IDnew, cord_new, _, _, _, _ = getPns(newNode, nodes)
-                                IDold, cord_old, _, _, _, _ = getPns(oldNode, nodes)
-                                distance, slope, _ = distanceCalc3d(cord_new, cord_old)
-                                edgeList = addToEdgeList(edgeList, distance, slope, IDnew, IDold, cord_new, cord_old)
-
-                            # =========================================
-                            # Check if networks need to be removedRemove networks
-                            # If there are intercrossed networks to remove, remove network nodes from sewers, clear nodes and add again to PN
-                            # =========================================
-                            netWorkToRemove, needsNetworkRemoving = findNetworkToRemove(archPathWWTP, nodesToNetwork,
-                                                                                        nodesFromNetwork, sewers_NoCon,
-                                                                                        WWTPs)  # Find sub networks to remove
-
-                            if needsNetworkRemoving == 1:
-                                # arcpy.AddMessage("Network needs to be removed")
-                                allNodesToAddToPN = []
-
-                                # Iterate over all wwts which needs to be deleted
-                                for wtpToDelet in netWorkToRemove:
-                                    allNodesToDelet = breathSearch(wtpToDelet, sewers)
-                                    nodes = clearFlow(nodes, allNodesToDelet)  # Clear copypnts flow and pressure
-                                    pumps = removePumpsWhereNoNetwork(pumps,
-                                                                      allNodesToDelet)  # Remove if there are pumps in between
-                                    sewers = removeInSewers(sewers,
-                                                            allNodesToDelet)  # Update the Ps and delete all network nodes from sewers
-                                    WWTPs = delEntry(WWTPs, wtpToDelet)  # delet WWTP
-                                    allNodesToAddToPN.append((wtpToDelet, allNodesToDelet))  # Append PN distances
-                                    sortedListWWTPs = delEntry(sortedListWWTPs, wtpToDelet)  # Delete WWTP
-
-                                sewers = appendToNetwork(sewers,
-                                                         archPathWWTP)  # Add the path between the wwtps to the sewer network
-
-                            sewers_B1, sewers_B3 = dict(sewers), dict(sewers)  # copy of sewers
-                            sewers_B1 = insertPathDirection(sewers_B1,
-                                                            PathListToPotentialWWTP)  # Add all nodes between wwtps to copy of sewers
-                            sewers_B3 = insertPathDirection(sewers_B3,
-                                                            inversearchPathWWTP)  # Add all nodes between wwtps to copy of sewers
-
-                            # Initialisation wwwtp reconnection
-                            nodes_BI = fastCopyNodes(nodes)
-                            nodes_B3 = fastCopyNodes(nodes)
-                            pumpWWTPListB1, pumpWWTPB3 = fastCopy(pumps), fastCopy(pumps)  # copy list with pumps
-                            flowWWFrom = getFlowWWTP(WWTPs, WWTPFROM)  # Get flow of largestWWTPID (same as idwWWTPZero)
-                            flowWWTO = getFlowWWTP(WWTPs, WWTPTO)  # Get flow of WWTPTO
-
-                            notInaNetworkBeforeConnection = getNotInNetwork(pathBetweenWWTPs,
-                                                                            sewers_NoCon)  # Get all nodes not in a network before interconnectin path is added
-                            notInaNetwork = getPointsNotInNetwork(pathBetweenWWTPs, nodesFromNetwork,
-                                                                  nodesToNetwork)  # Get all nodes not in a network after innterconnection path is added
-                            flowInitial_from, flowInitial_to = getFlowInitial(nodesFromNetwork, nodesToNetwork, nodes,
-                                                                              flowWWFrom, flowWWTO,
-                                                                              notInaNetworkBeforeConnection)  # Calculate initial Flow:  if next node is in Network, substract flow from flowWWFrom
-
-                            # -----------
-                            # Cost Module
-                            # -----------
-
-                            # --------
-                            # Option 1
-                            # --------
-
-                            # Sewer Costs
-                            if len(nodesFromNetwork) > 1:
-                                nodes_BI = getInflowingNodes(nodes_BI, nodesFromNetwork, flowInitial_from,
-                                                             notInaNetworkBeforeConnection)  # Only the inFlow from other nodes on the path gets calculated
-                            else:
-                                nodes_BI = assignInitialFlow(nodes_BI, pathBetweenWWTPs, flowInitial_from,
-                                                             -1)  # Change flow in nodes of first element
-
-                            if len(nodesToNetwork) > 1:
-                                nodes_BI = getInflowingNodes(nodes_BI, nodesToNetwork, flowInitial_to,
-                                                             notInaNetworkBeforeConnection)  # Only the inFlow from other nodes on the path gets calculated
-                            else:
-                                nodes_BI = assignInitialFlow(nodes_BI, pathBetweenWWTPs, flowInitial_to,
-                                                             0)  # Change flow in nodes of last element
-
-                            nodes_BI = clearFlow(nodes_BI,
-                                                 notInaNetwork)  # Clear flow where not in starting or ending network
-                            nodes_BI = changeFlowAlongPath(nodes_BI,
-                                                           pathBetweenWWTPs)  # Change Flow along the path in nodes_BI
-                            nodes_BI, inflowNodesWTPB1 = correctTD(nodes_BI, archPathWWTPInvert[:-1], minTD, WWTPs,
-                                                                   maxTD, minSlope,
-                                                                   sewers)  # Set all trench depth except inflow nodes to minimum trench depth
-                            nodes_BI, pumpWWTPListB1, edgeList1 = changeTD(nodes_BI, edgeList, pumpWWTPListB1,
-                                                                           archPathWWTPInvert, maxTD, minSlope,
-                                                                           inflowNodesWTPB1, sewers, minTD)
-                            pipeCostsB1, edgeList1 = costsBetweenWWTPs(pathBetweenWWTPs, edgeList1, nodes_BI, 0,
-                                                                       pumpWWTPListB1, minTD, discountYearsSewers,
-                                                                       interestRate, stricklerC, operationCosts,
-                                                                       f_SewerCost)  # first zero: regular flow, second zero: proportional costs
-
-                            # Pumping Costs
-                            pumpCostB1, _ = costPump(pathBetweenWWTPs, pumpWWTPListB1, pricekWh, pumpYears,
-                                                     interestRate)  # Calculate pump costs
-
-                            # Option 1 - WWTPs costs
-                            wtpCostB1 = costWWTP((flowWWFrom + flowWWTO), EW_Q, wwtpLifespan, interestRate,
-                                                 fc_wwtpOperation,
-                                                 fc_wwtpReplacement)  # WWTP-costs: Additional costs of building a larger WWTP
-
-                            # --------
-                            # Option 2
-                            # --------
-
-                            # Sewer Costs
-                            if len(nodesFromNetwork) == 0 and len(nodesToNetwork) == 0:
-                                pipeCostsB2 = 0  # As there are none pipes on the way
-                            else:
-                                # The costs of the pipes on the way between the wwtps needs to be calculated
-                                pipeCostB2a, _ = costsBetweenWWTPs(nodesFromNetwork, edgeList, nodes, 0, pumps, minTD,
-                                                                   discountYearsSewers, interestRate, stricklerC,
-                                                                   operationCosts,
-                                                                   f_SewerCost)  # first zero: regular flow, second zero: proportional costs
-                                pipeCostB2b, _ = costsBetweenWWTPs(nodesToNetwork, edgeList, nodes, 0, pumps, minTD,
-                                                                   discountYearsSewers, interestRate, stricklerC,
-                                                                   operationCosts,
-                                                                   f_SewerCost)  # first zero: regular flow, second zero: proportional costs
-                                pipeCostsB2 = pipeCostB2a + pipeCostB2b  # sum costs of the two networks
-                                pumpCostB2A, _ = costPump(nodesFromNetwork, pumps, pricekWh, pumpYears,
-                                                          interestRate)  # [CHF] Calculate pump costs
-                                pumpCostB2B, _ = costPump(nodesToNetwork, pumps, pricekWh, pumpYears,
-                                                          interestRate)  # [CHF] Calculate pump costs
-                                pumpCostB2 = pumpCostB2A + pumpCostB2B
-
-                            # WWTP costs
-                            wtpCostB2a = costWWTP(flowWWFrom, EW_Q, wwtpLifespan, interestRate, fc_wwtpOperation,
-                                                  fc_wwtpReplacement)
-                            wtpCostB2b = costWWTP(flowWWTO, EW_Q, wwtpLifespan, interestRate, fc_wwtpOperation,
-                                                  fc_wwtpReplacement)
-
-                            if needsNetworkRemoving == 1:  # Calculate costs of crossed WWTPs
-                                sumCostcrossedWWTP = getCostsOfCrossedWWTPs(allNodesToAddToPN, pathBetweenWWTPs,
-                                                                            WWTPS_noCon, sewers_NoCon, nodes_noCon,
-                                                                            EW_Q, wwtpLifespan, interestRate,
-                                                                            fc_wwtpOperation, fc_wwtpReplacement)
-                                wtpCostB2 = wtpCostB2a + wtpCostB2b + sumCostcrossedWWTP  # Total wwtp costs
-                            else:
-                                wtpCostB2 = wtpCostB2a + wtpCostB2b  # Total wwtp costs
-
-                            # --------
-                            # Option 3
-                            # --------
-
-                            # Sewer costs
-                            if len(nodesFromNetwork) > 1:  # Change nodes because of againstFlow (if needed) how it would look like with connection
-                                nodes_B3 = getInflowingNodes(nodes_B3, nodesFromNetwork, flowInitial_from,
-                                                             notInaNetworkBeforeConnection)
-                            else:
-                                nodes_B3 = assignInitialFlow(nodes_B3, pathBetweenWWTPs, flowInitial_from,
-                                                             -1)  # Change initial flow in nodes
-
-                            if len(nodesToNetwork) > 1:
-                                nodes_B3 = getInflowingNodes(nodes_B3, nodesToNetwork, flowInitial_to,
-                                                             notInaNetworkBeforeConnection)
-                            else:
-                                nodes_B3 = assignInitialFlow(nodes_B3, pathBetweenWWTPs, flowInitial_to,
-                                                             0)  # Change initial flow in nodes
-
-                            nodes_B3 = clearFlow(nodes_B3, notInaNetwork)  # Clear flow whether there is no flow
-                            nodes_B3 = changeFlowAlongPath(nodes_B3,
-                                                           pathBetweenWWTPsInvert)  # Change flow along the path
-                            nodes_B3, inflowNodesWTPB3 = correctTD(nodes_B3, pathBetweenWWTPsInvert[:-1], minTD, WWTPs,
-                                                                   maxTD, minSlope,
-                                                                   sewers)  # Set all trench depth except inflow nodes to minimum trench depth
-                            nodes_B3, pumpWWTPB3, edgeList3 = changeTD(nodes_B3, edgeList, pumpWWTPB3, archPathWWTP,
-                                                                       maxTD, minSlope, inflowNodesWTPB3, sewers, minTD)
-
-                            # Pumping Costs
-                            pumpCostB3, _ = costPump(pathBetweenWWTPsInvert, pumpWWTPB3, pricekWh, pumpYears,
-                                                     interestRate)  # Calculate pump costs
-
-                            # Sewer costs
-                            pipeCostB3, edgeList3 = costsBetweenWWTPs(pathBetweenWWTPsInvert, edgeList3, nodes_B3,
-                                                                      flowInitial_to, pumpWWTPB3, minTD,
-                                                                      discountYearsSewers, interestRate, stricklerC,
-                                                                      operationCosts,
-                                                                      f_SewerCost)  # first zero: regular flow, second zero: proportional costs
-
-                            # WWTP costs
-                            wtpCostA3 = wtpCostB1  # Total wwtp costs
-                            totCostBI = pipeCostsB1 + wtpCostB1 + pumpCostB1  # Total Costs Option 1
-                            totCostB2 = pipeCostsB2 + wtpCostB2 + pumpCostB2  # Total Costs Option 2
-                            totCostB3 = pipeCostB3 + wtpCostA3 + pumpCostB3  # Total Costs Option 3
+                            mergeOption = calculateMergeOption(archPathWWTP, mOpt, nodeIdOpt2, pathInClosestNetwork,
+                                                               nodes, WWTPs, sewers, edgeList, pumps, sortedListWWTPs,
+                                                               sewers_NoCon, nodes_noCon, WWTPS_noCon, minTD, maxTD,
+                                                               minSlope, costModel, networkIndex["drainRoots"],
+                                                               positionIndex)  # Path and costs of the three options
+                            nodes, WWTPs, sewers = mergeOption["nodes"], mergeOption["WWTPs"], mergeOption["sewers"]
+                            edgeList, pumps = mergeOption["edgeList"], mergeOption["pumps"]
+                            sortedListWWTPs = mergeOption["sortedListWWTPs"]
+                            nodes_BI, pumpWWTPListB1 = mergeOption["nodes_BI"], mergeOption["pumpWWTPListB1"]
+                            edgeChanges1, sewers_B1 = mergeOption["edgeChanges1"], mergeOption["sewers_B1"]
+                            edgeChanges2 = mergeOption["edgeChanges2"]
+                            nodes_B3, pumpWWTPB3 = mergeOption["nodes_B3"], mergeOption["pumpWWTPB3"]
+                            edgeChanges3, sewers_B3 = mergeOption["edgeChanges3"], mergeOption["sewers_B3"]
+                            WWTPFROM, WWTPTO = mergeOption["WWTPFROM"], mergeOption["WWTPTO"]
+                            pathBetweenWWTPs = mergeOption["pathBetweenWWTPs"]
+                            needsNetworkRemoving = mergeOption["needsNetworkRemoving"]
+                            allNodesToAddToPN = mergeOption["allNodesToAddToPN"]
+                            totCostBI, totCostB2, totCostB3 = mergeOption["totCostBI"], mergeOption["totCostB2"], mergeOption["totCostB3"]
 
                             # arcpy.AddMessage("-------------Cost Comparison----------")
                             # arcpy.AddMessage("totCostBI: " + str(totCostBI))
@@ -4027,7 +4509,7 @@ def mergingModule(OnlyExecuteMerge, forceZ, ZtoReach, hypoZWeighted, firstMergeC
                                     wwtpsIterate = delEntry(wwtpsIterate,
                                                             WWTPFROM)  # Femove found wwtp from copylistWTP
                                     WWTPs = delEntry(WWTPs, WWTPFROM)  # Delete wwtp
-                                    edgeList = fastCopy(edgeList3)  # Replace list with edges
+                                    edgeList = applyEdgeChanges(edgeChanges3)  # Replace list with edges
                                     nodes = fastCopyNodes(nodes_B3)  # Replace nodes by new nodes with new flow
                                     WWTPs = updateFlowInWWTP(WWTPs, nodes, WWTPTO)  # Update flow in WWTPs
                                     pumps = fastCopy(pumpWWTPB3)  # Replace pumps
@@ -4060,7 +4542,8 @@ def mergingModule(OnlyExecuteMerge, forceZ, ZtoReach, hypoZWeighted, firstMergeC
                                         hypoZ, hypoZWeighted, hypoCosts, hypoPumpCosts, hypoWWTPCosts, hypoPublicPipeCosts, _ = getFullHypotheticalCosts(
                                             aggregatetPoints, WWTPs, sewers, EW_Q, wwtpLifespan, interestRate, pumps,
                                             pumpYears, pricekWh, edgeList, nodes, stricklerC, discountYearsSewers,
-                                            operationCosts, f_SewerCost, fc_wwtpOperation, fc_wwtpReplacement)
+                                            operationCosts, f_SewerCost, fc_wwtpOperation, fc_wwtpReplacement,
+                                            costLedger)
 
                                         if hypoZ > hypoZOld:
                                             totalSystemCosts.append(
@@ -4086,7 +4569,7 @@ def mergingModule(OnlyExecuteMerge, forceZ, ZtoReach, hypoZWeighted, firstMergeC
                                     sortedListWWTPs = delEntry(sortedListWWTPs,
                                                                WWTPTO)  # Delete in wwtps to check for merging
 
-                                    edgeList = fastCopy(edgeList1)  # Prim Edges
+                                    edgeList = applyEdgeChanges(edgeChanges1)  # Prim Edges
 
                                     wwtpsIterate = delEntry(wwtpsIterate, WWTPTO)  # remove found wwtp from wwtpsIterate
                                     WWTPs = delEntry(WWTPs, WWTPTO)  # Delete wwtp
@@ -4122,7 +4605,8 @@ def mergingModule(OnlyExecuteMerge, forceZ, ZtoReach, hypoZWeighted, firstMergeC
                                         hypoZ, hypoZWeighted, hypoCosts, hypoPumpCosts, hypoWWTPCosts, hypoPublicPipeCosts, _ = getFullHypotheticalCosts(
                                             aggregatetPoints, WWTPs, sewers, EW_Q, wwtpLifespan, interestRate, pumps,
                                             pumpYears, pricekWh, edgeList, nodes, stricklerC, discountYearsSewers,
-                                            operationCosts, f_SewerCost, fc_wwtpOperation, fc_wwtpReplacement)
+                                            operationCosts, f_SewerCost, fc_wwtpOperation, fc_wwtpReplacement,
+                                            costLedger)
                                         if hypoZ > hypoZOld:
                                             totalSystemCosts.append(
                                                 [hypoZ, hypoZWeighted, hypoCosts, hypoPumpCosts, hypoWWTPCosts,
@@ -4155,6 +4639,7 @@ def mergingModule(OnlyExecuteMerge, forceZ, ZtoReach, hypoZWeighted, firstMergeC
                                 # arcpy.AddMessage("Do not make any changes...")
                                 wwtpsIterate = delEntry(wwtpsIterate,
                                                         WWTPFROM)  # delete wwtps in iteration list of wwtps
+                                edgeList = applyEdgeChanges(edgeChanges2)  # Pipe diameters of Option 2
                                 sortedListWWTPs = fastCopy(
                                     sortedListWWTPs_noCon)  # Restore as it was before because not connection took place
                                 sewers = dict(
@@ -4191,6 +4676,541 @@ def mergingModule(OnlyExecuteMerge, forceZ, ZtoReach, hypoZWeighted, firstMergeC
     return nodes, sewers, pumps, WWTPs, PN, edgeList, totalSystemCosts
 
 
+@timedFunction("mergeOption")
+def calculateMergeOption(archPathWWTP, mOpt, nodeIdOpt2, pathInClosestNetwork, nodes, WWTPs, sewers, edgeList, pumps,
+                         sortedListWWTPs, sewers_NoCon, nodes_noCon, WWTPS_noCon, minTD, maxTD, minSlope, costModel,
+                         drainRoots=None, positionIndex=None):
+    '''
+    This function adds the path between two wwtps to the sewers and calculates the costs of the three
+    options of the merging module (Option 1: merge, Option 2: no merge, Option 3: merge and swap).
+    The lists nodes, WWTPs, sewers, edgeList, pumps and sortedListWWTPs are changed as in the merging module.
+    The changes of the edges of each option are written to edgeList when the option is selected (see applyEdgeChanges).
+
+    Input Arguments:
+    archPathWWTP         -    Path between the wwtps (Djikstra)
+    mOpt                 -    Merge option
+    nodeIdOpt2           -    Node of Option 2 (closest network)
+    pathInClosestNetwork -    Path in the closest network
+    nodes                -    Nodes
+    WWTPs                -    WWTPs
+    sewers               -    Sewer Network
+    edgeList             -    List with edges
+    pumps                -    Pumps
+    sortedListWWTPs      -    WWTPs to check for merging
+    sewers_NoCon         -    Sewers before the merge
+    nodes_noCon          -    Nodes before the merge
+    WWTPS_noCon          -    WWTPs before the merge
+    minTD, maxTD, ...    -    Model parameters
+    costModel            -    Cost model (see createCostModel)
+    drainRoots           -    Drain roots (optional, see createDrainRoots)
+    positionIndex        -    Positions of the nodes and edges (optional, see createPositionIndex)
+
+    Output Arguments:
+    mergeOption          -    Dictionary with the changed lists (nodes, WWTPs, sewers, edgeList, pumps, sortedListWWTPs),
+                              the lists of Option 1 (nodes_BI, pumpWWTPListB1, edgeChanges1, sewers_B1), the changes of
+                              the edges of Option 2 (edgeChanges2) and the lists of Option 3 (nodes_B3, pumpWWTPB3,
+                              edgeChanges3, sewers_B3), the merged wwtps (WWTPFROM, WWTPTO), pathBetweenWWTPs,
+                              needsNetworkRemoving, allNodesToAddToPN and the costs (totCostBI, totCostB2, totCostB3)
+    '''
+    if positionIndex is None:
+        positionIndex = createPositionIndex()
+    allNodesToAddToPN = []
+    if nodeIdOpt2 == mOpt[0]:
+        archPathWWTP = mergePathClosestNetwork(pathInClosestNetwork, archPathWWTP,
+                                               edgeList)  # If closest network, check path again.
+
+    archPathWWTP = getNoLoopPath(sewers,
+                                 archPathWWTP, drainRoots)  # Path is changed in order that there are no loops.
+    sewers = appendToNetwork(sewers, archPathWWTP)  # Append no loop path to sewers
+    inversearchPathWWTP = invertArchPath(archPathWWTP)
+
+    # Get parts of path which are already part of a the starting and ending network
+    nodesToNetwork = findInNetworkPath(archPathWWTP, sewers_NoCon,
+                                       sewers)  # finds part of the From Network which need to be considered in costs calculations
+    nodesFromNetwork = findInNetworkPath(inversearchPathWWTP, sewers_NoCon,
+                                         sewers)  # finds part of the To Network which need to be considered in costs calculations
+    WWTPTO, WWTPFROM = nodesToNetwork[0], nodesFromNetwork[0]  # WWTPs
+
+    # Update
+    PathListToPotentialWWTP = InvertandswapID(inversearchPathWWTP)  # swap ID and invert path
+    pathBetweenWWTPs = readOnlyNodesID(archPathWWTP)  # Only ID
+    pathBetweenWWTPsInvert = pathBetweenWWTPs[::-1]  # Invert abd only ID
+    archPathWWTPInvert = InvertandswapID(archPathWWTP)  # swap ID and invert path
+
+    # Add ArchPath to edges # new that full path is entered into edgeList
+    for edge in archPathWWTP:
+        newNode, oldNode = edge[0], edge[1][0]
+        IDnew, cord_new, _, _, _, _ = getPns(newNode, nodes)
+        IDold, cord_old, _, _, _, _ = getPns(oldNode, nodes)
+        distance, slope, _ = distanceCalc3d(cord_new, cord_old)
+        edgeList = addToEdgeList(edgeList, distance, slope, IDnew, IDold, cord_new, cord_old)
+
+    # =========================================
+    # Check if networks need to be removedRemove networks
+    # If there are intercrossed networks to remove, remove network nodes from sewers, clear nodes and add again to PN
+    # =========================================
+    netWorkToRemove, needsNetworkRemoving = findNetworkToRemove(archPathWWTP, nodesToNetwork,
+                                                                nodesFromNetwork, sewers_NoCon,
+                                                                WWTPs, drainRoots)  # Find sub networks to remove
+
+    if needsNetworkRemoving == 1:
+        # arcpy.AddMessage("Network needs to be removed")
+        allNodesToAddToPN = []
+
+        # Iterate over all wwts which needs to be deleted
+        for wtpToDelet in netWorkToRemove:
+            allNodesToDelet = breathSearch(wtpToDelet, sewers)
+            nodes = clearFlow(nodes, allNodesToDelet)  # Clear copypnts flow and pressure
+            pumps = removePumpsWhereNoNetwork(pumps,
+                                              allNodesToDelet)  # Remove if there are pumps in between
+            sewers = removeInSewers(sewers,
+                                    allNodesToDelet)  # Update the Ps and delete all network nodes from sewers
+            WWTPs = delEntry(WWTPs, wtpToDelet)  # delet WWTP
+            allNodesToAddToPN.append((wtpToDelet, allNodesToDelet))  # Append PN distances
+            sortedListWWTPs = delEntry(sortedListWWTPs, wtpToDelet)  # Delete WWTP
+
+        sewers = appendToNetwork(sewers,
+                                 archPathWWTP)  # Add the path between the wwtps to the sewer network
+
+    sewers_B1, sewers_B3 = dict(sewers), dict(sewers)  # copy of sewers
+    sewers_B1 = insertPathDirection(sewers_B1,
+                                    PathListToPotentialWWTP)  # Add all nodes between wwtps to copy of sewers
+    sewers_B3 = insertPathDirection(sewers_B3,
+                                    inversearchPathWWTP)  # Add all nodes between wwtps to copy of sewers
+
+    # Initialisation wwwtp reconnection
+    nodes_BI = fastCopyNodes(nodes)
+    nodes_B3 = fastCopyNodes(nodes)
+    pumpWWTPListB1, pumpWWTPB3 = fastCopy(pumps), fastCopy(pumps)  # copy list with pumps
+    flowWWFrom = getFlowWWTP(WWTPs, WWTPFROM)  # Get flow of largestWWTPID (same as idwWWTPZero)
+    flowWWTO = getFlowWWTP(WWTPs, WWTPTO)  # Get flow of WWTPTO
+
+    notInaNetworkBeforeConnection = getNotInNetwork(pathBetweenWWTPs,
+                                                    sewers_NoCon)  # Get all nodes not in a network before interconnectin path is added
+    notInaNetwork = getPointsNotInNetwork(pathBetweenWWTPs, nodesFromNetwork,
+                                          nodesToNetwork)  # Get all nodes not in a network after innterconnection path is added
+    flowInitial_from, flowInitial_to = getFlowInitial(nodesFromNetwork, nodesToNetwork, nodes,
+                                                      flowWWFrom, flowWWTO,
+                                                      notInaNetworkBeforeConnection)  # Calculate initial Flow:  if next node is in Network, substract flow from flowWWFrom
+
+    # -----------
+    # Cost Module
+    # -----------
+
+    # --------
+    # Option 1
+    # --------
+
+    # Sewer Costs
+    if len(nodesFromNetwork) > 1:
+        nodes_BI = getInflowingNodes(nodes_BI, nodesFromNetwork, flowInitial_from,
+                                     notInaNetworkBeforeConnection)  # Only the inFlow from other nodes on the path gets calculated
+    else:
+        nodes_BI = assignInitialFlow(nodes_BI, pathBetweenWWTPs, flowInitial_from,
+                                     -1)  # Change flow in nodes of first element
+
+    if len(nodesToNetwork) > 1:
+        nodes_BI = getInflowingNodes(nodes_BI, nodesToNetwork, flowInitial_to,
+                                     notInaNetworkBeforeConnection)  # Only the inFlow from other nodes on the path gets calculated
+    else:
+        nodes_BI = assignInitialFlow(nodes_BI, pathBetweenWWTPs, flowInitial_to,
+                                     0)  # Change flow in nodes of last element
+
+    nodes_BI = clearFlow(nodes_BI,
+                         notInaNetwork)  # Clear flow where not in starting or ending network
+    nodes_BI = changeFlowAlongPath(nodes_BI,
+                                   pathBetweenWWTPs)  # Change Flow along the path in nodes_BI
+    nodes_BI, inflowNodesWTPB1 = correctTD(nodes_BI, archPathWWTPInvert[:-1], minTD, WWTPs,
+                                           maxTD, minSlope,
+                                           sewers)  # Set all trench depth except inflow nodes to minimum trench depth
+    updatePositionIndex(positionIndex, nodes, edgeList)
+    nodes_BI, pumpWWTPListB1, edgeChanges1 = changeTD(nodes_BI, createEdgeChanges(edgeList, positionIndex),
+                                                      pumpWWTPListB1, archPathWWTPInvert, maxTD, minSlope,
+                                                      inflowNodesWTPB1, sewers, minTD, positionIndex)
+    pipeCostsB1, edgeChanges1 = costsBetweenWWTPs(pathBetweenWWTPs, edgeChanges1, nodes_BI, 0,
+                                                  pumpWWTPListB1, minTD,
+                                                  costModel)  # first zero: regular flow, second zero: proportional costs
+
+    # Pumping Costs
+    pumpCostB1, _ = costPump(pathBetweenWWTPs, pumpWWTPListB1, costModel)  # Calculate pump costs
+
+    # Option 1 - WWTPs costs
+    wtpCostB1 = getModelWWTPCosts(costModel, (flowWWFrom + flowWWTO))  # WWTP-costs: Additional costs of building a larger WWTP
+
+    # --------
+    # Option 2
+    # --------
+
+    # Sewer Costs
+    edgeChanges2 = createEdgeChanges(edgeList, positionIndex)
+    if len(nodesFromNetwork) == 0 and len(nodesToNetwork) == 0:
+        pipeCostsB2 = 0  # As there are none pipes on the way
+    else:
+        # The costs of the pipes on the way between the wwtps needs to be calculated
+        pipeCostB2a, edgeChanges2 = costsBetweenWWTPs(nodesFromNetwork, edgeChanges2, nodes, 0, pumps, minTD,
+                                                      costModel)  # first zero: regular flow, second zero: proportional costs
+        pipeCostB2b, edgeChanges2 = costsBetweenWWTPs(nodesToNetwork, edgeChanges2, nodes, 0, pumps, minTD,
+                                                      costModel)  # first zero: regular flow, second zero: proportional costs
+        pipeCostsB2 = pipeCostB2a + pipeCostB2b  # sum costs of the two networks
+        pumpCostB2A, _ = costPump(nodesFromNetwork, pumps, costModel)  # [CHF] Calculate pump costs
+        pumpCostB2B, _ = costPump(nodesToNetwork, pumps, costModel)  # [CHF] Calculate pump costs
+        pumpCostB2 = pumpCostB2A + pumpCostB2B
+
+    # WWTP costs
+    wtpCostB2a = getModelWWTPCosts(costModel, flowWWFrom)
+    wtpCostB2b = getModelWWTPCosts(costModel, flowWWTO)
+
+    if needsNetworkRemoving == 1:  # Calculate costs of crossed WWTPs
+        sumCostcrossedWWTP = getCostsOfCrossedWWTPs(allNodesToAddToPN, pathBetweenWWTPs,
+                                                    WWTPS_noCon, sewers_NoCon, nodes_noCon, costModel,
+                                                    drainRoots)
+        wtpCostB2 = wtpCostB2a + wtpCostB2b + sumCostcrossedWWTP  # Total wwtp costs
+    else:
+        wtpCostB2 = wtpCostB2a + wtpCostB2b  # Total wwtp costs
+
+    # --------
+    # Option 3
+    # --------
+
+    # Sewer costs
+    if len(nodesFromNetwork) > 1:  # Change nodes because of againstFlow (if needed) how it would look like with connection
+        nodes_B3 = getInflowingNodes(nodes_B3, nodesFromNetwork, flowInitial_from,
+                                     notInaNetworkBeforeConnection)
+    else:
+        nodes_B3 = assignInitialFlow(nodes_B3, pathBetweenWWTPs, flowInitial_from,
+                                     -1)  # Change initial flow in nodes
+
+    if len(nodesToNetwork) > 1:
+        nodes_B3 = getInflowingNodes(nodes_B3, nodesToNetwork, flowInitial_to,
+                                     notInaNetworkBeforeConnection)
+    else:
+        nodes_B3 = assignInitialFlow(nodes_B3, pathBetweenWWTPs, flowInitial_to,
+                                     0)  # Change initial flow in nodes
+
+    nodes_B3 = clearFlow(nodes_B3, notInaNetwork)  # Clear flow whether there is no flow
+    nodes_B3 = changeFlowAlongPath(nodes_B3,
+                                   pathBetweenWWTPsInvert)  # Change flow along the path
+    nodes_B3, inflowNodesWTPB3 = correctTD(nodes_B3, pathBetweenWWTPsInvert[:-1], minTD, WWTPs,
+                                           maxTD, minSlope,
+                                           sewers)  # Set all trench depth except inflow nodes to minimum trench depth
+    nodes_B3, pumpWWTPB3, edgeChanges3 = changeTD(nodes_B3, copyEdgeChanges(edgeChanges2), pumpWWTPB3,
+                                                  archPathWWTP, maxTD, minSlope, inflowNodesWTPB3, sewers, minTD,
+                                                  positionIndex)  # With the pipe diameters of Option 2
+
+    # Pumping Costs
+    pumpCostB3, _ = costPump(pathBetweenWWTPsInvert, pumpWWTPB3, costModel)  # Calculate pump costs
+
+    # Sewer costs
+    pipeCostB3, edgeChanges3 = costsBetweenWWTPs(pathBetweenWWTPsInvert, edgeChanges3, nodes_B3,
+                                                 flowInitial_to, pumpWWTPB3, minTD,
+                                                 costModel)  # first zero: regular flow, second zero: proportional costs
+
+    # WWTP costs
+    wtpCostA3 = wtpCostB1  # Total wwtp costs
+    totCostBI = pipeCostsB1 + wtpCostB1 + pumpCostB1  # Total Costs Option 1
+    totCostB2 = pipeCostsB2 + wtpCostB2 + pumpCostB2  # Total Costs Option 2
+    totCostB3 = pipeCostB3 + wtpCostA3 + pumpCostB3  # Total Costs Option 3
+
+    mergeOption = {
+        "nodes": nodes, "WWTPs": WWTPs, "sewers": sewers, "edgeList": edgeList, "pumps": pumps,
+        "sortedListWWTPs": sortedListWWTPs, "nodes_BI": nodes_BI, "pumpWWTPListB1": pumpWWTPListB1,
+        "edgeChanges1": edgeChanges1, "sewers_B1": sewers_B1, "edgeChanges2": edgeChanges2, "nodes_B3": nodes_B3,
+        "pumpWWTPB3": pumpWWTPB3, "edgeChanges3": edgeChanges3, "sewers_B3": sewers_B3, "WWTPFROM": WWTPFROM, "WWTPTO": WWTPTO,
+        "pathBetweenWWTPs": pathBetweenWWTPs, "needsNetworkRemoving": needsNetworkRemoving,
+        "allNodesToAddToPN": allNodesToAddToPN, "totCostBI": totCostBI, "totCostB2": totCostB2, "totCostB3": totCostB3}
+    return mergeOption
+
+
+def evaluateSnapshotMerges(wwtpIDs, nodes, WWTPs, sewers, edgeList, pumps, sortedListWWTPs, streetNetwork, routing,
+                           f_merge, forceZ, finishedExpansion, minTD, maxTD, minSlope, costModel, multiTargetMerge):
+    '''
+    This function checks the merging of wwtps against a snapshot of the merging module. For each wwtp, the merging
+    options are calculated in order until one is merged (as in the merging module). The snapshot is not changed:
+    the changes of each wwtp are returned relative to the snapshot (see applyMergeChanges).
+
+    Input Arguments:
+    wwtpIDs                   -    WWTPs to check
+    nodes, WWTPs, sewers, ... -    Snapshot of the merging module
+    streetNetwork             -    Street Network
+    routing                   -    Routing context
+    f_merge, ...              -    Model parameters
+    costModel                 -    Cost model (see createCostModel)
+    multiTargetMerge          -    1: Paths of all options are searched at once
+
+    Output Arguments:
+    mergeResults              -    List with a dictionary for each wwtp: ID, merge (None or WWTPFROM, WWTPTO, swap,
+                                   pathBetweenWWTPs, needsNetworkRemoving, mergeCosts), noMerges ([mergeCosts, mOpt] of
+                                   the options which are not merged), changed nodes ({position: node}), changed and
+                                   removed sewers and pumps, changed and added edges, the IDs of the read nodes and
+                                   wwtps (IDs), the IDs of the changed ones (changedIDs) and the distances of the merging options (reads, see
+                                   checkMergeConflict)
+    '''
+    networkIndex = createNetworkIndex()  # Sewer nodes to find the closest network (option 2)
+    wwtpIndex = createWWTPIndex()  # WWTPs to find the closest wwtp and the highest connectivity-potential (options 1 & 3)
+    flowOfWWTPs = {wwtp[0]: wwtp[1] for wwtp in WWTPs}
+    mergeResults = []
+
+    for checkBackConnectionID in wwtpIDs:
+        _, pZero, _, _, _, _ = getPns(checkBackConnectionID, nodes)
+        nodeIdOpt1, nodeOpt1Cor, nodeIdOpt3, nodeOpt3Cor = connectivityPotential(nodes, WWTPs, checkBackConnectionID,
+                                                                                 pZero, f_merge, wwtpIndex)  # Option 1 & Option 3
+        nodeIdOpt2, nodeOpt2Cor, pathInClosestNetwork = getClosestNetworkWWTP(nodes, WWTPs, sewers, pZero,
+                                                                              checkBackConnectionID, networkIndex)  # Option 2
+        mergeOptions = storeMergingOptions(nodeIdOpt1, nodeOpt1Cor, nodeIdOpt2, nodeOpt2Cor, nodeIdOpt3, nodeOpt3Cor)
+        if multiTargetMerge == 1 and mergeOptions != []:
+            mergePaths = dijkstraManyToOne(streetNetwork, [mOpt[0] for mOpt in mergeOptions], checkBackConnectionID,
+                                           [abs(pZero[2] - mOpt[1][2]) for mOpt in mergeOptions], routing)
+
+        # Distances of the options: a closer wwtp or network or a wwtp with a higher potential changes the options
+        reads = {"pZero": pZero, "potentialIndex": float("inf"), "closestDistance": float("inf"),
+                 "networkDistance": float("inf")}
+        if nodeIdOpt1 is not None:
+            reads["potentialIndex"] = distanceCalc3d(pZero, nodeOpt1Cor)[0] * flowOfWWTPs[nodeIdOpt1] ** (-1 * f_merge)
+        if nodeIdOpt3 is not None:
+            reads["closestDistance"] = distanceCalc3d(pZero, nodeOpt3Cor)[0]
+        if nodeIdOpt2 is not None:
+            reads["networkDistance"] = distanceCalc3d(pZero, nodeOpt2Cor)[0]
+
+        mergeResult = {"ID": checkBackConnectionID, "merge": None, "noMerges": [], "nodes": {}, "sewers": {},
+                       "removedSewers": set(), "pumps": [], "removedPumps": set(), "IDs": {checkBackConnectionID},
+                       "changedIDs": set(), "reads": reads}
+        if pathInClosestNetwork is not None:
+            mergeResult["IDs"].update(pathInClosestNetwork)
+        edgeListOption, positionIndex, nodesOption = list(edgeList), createPositionIndex(), None
+        for mOpt in mergeOptions:
+            if nodesOption is None:  # The lists are only changed if networks are removed (restored as in the merging module)
+                nodesOption, WWTPsOption = fastCopyNodes(nodes), fastCopy(WWTPs)
+                pumpsOption, sortedOption = fastCopy(pumps), fastCopy(sortedListWWTPs)
+            try:  # Search path between WWTps with Djikstra
+                if multiTargetMerge == 1:
+                    archPathWWTP, distStartEnd, slopeDijkstra = mergePaths[mOpt[0]]
+                else:
+                    heightDiff = abs(pZero[2] - mOpt[1][2])  # heightdifference
+                    archPathWWTP, distStartEnd, slopeDijkstra = dijkstra(streetNetwork, mOpt[0], checkBackConnectionID,
+                                                                         heightDiff, routing)  # Djkstra
+                edgeListOption = addToEdgeList(edgeListOption, distStartEnd, slopeDijkstra, mOpt[0],
+                                               checkBackConnectionID, mOpt[1], pZero)
+            except KeyError:
+                raise Exception("There can be no sewer path be determined between the two wwtps.")
+
+            mergeOption = calculateMergeOption(archPathWWTP, mOpt, nodeIdOpt2, pathInClosestNetwork, nodesOption,
+                                               WWTPsOption, dict(sewers), edgeListOption, pumpsOption, sortedOption,
+                                               sewers, nodes, WWTPs, minTD, maxTD, minSlope, costModel,
+                                               networkIndex["drainRoots"], positionIndex)
+            totCostBI, totCostB2, totCostB3 = mergeOption["totCostBI"], mergeOption["totCostB2"], mergeOption["totCostB3"]
+            wwtpSWAP, wwtpToWwtopConncetion = costComparison(totCostBI, totCostB2, totCostB3, 0, 0, 1, forceZ,
+                                                             finishedExpansion)
+            if totCostBI - totCostB2 < totCostB3 - totCostB2:
+                mergeCosts = totCostBI - totCostB2
+            else:
+                mergeCosts = totCostB3 - totCostB2
+            mergeResult["IDs"].update((mergeOption["WWTPFROM"], mergeOption["WWTPTO"]))
+            mergeResult["IDs"].update(mergeOption["pathBetweenWWTPs"])
+
+            if wwtpToWwtopConncetion == 1:
+                mergeResult["merge"] = {
+                    "WWTPFROM": mergeOption["WWTPFROM"], "WWTPTO": mergeOption["WWTPTO"], "swap": wwtpSWAP,
+                    "pathBetweenWWTPs": mergeOption["pathBetweenWWTPs"], "mergeCosts": mergeCosts,
+                    "needsNetworkRemoving": mergeOption["needsNetworkRemoving"]}
+                if mergeOption["needsNetworkRemoving"] == 1:
+                    break  # Merged in the merging module, which removes the networks
+
+                if wwtpSWAP == 1:
+                    edgeListOption = applyEdgeChanges(mergeOption["edgeChanges3"])
+                    nodesMerged, sewersMerged, pumpsMerged = mergeOption["nodes_B3"], mergeOption["sewers_B3"], mergeOption["pumpWWTPB3"]
+                else:
+                    edgeListOption = applyEdgeChanges(mergeOption["edgeChanges1"])
+                    nodesMerged, sewersMerged, pumpsMerged = mergeOption["nodes_BI"], mergeOption["sewers_B1"], mergeOption["pumpWWTPListB1"]
+
+                # Changes of the nodes, sewers and pumps
+                for pos, node in enumerate(nodesMerged):
+                    if node != nodes[pos]:
+                        mergeResult["nodes"][pos] = node
+                mergeResult["sewers"] = dict(sewersMerged.items() - sewers.items())
+                mergeResult["removedSewers"] = sewers.keys() - sewersMerged.keys()
+                pumpsBefore = {pump[0]: pump for pump in pumps}
+                mergeResult["pumps"] = [pump for pump in pumpsMerged if pumpsBefore.get(pump[0]) != pump]
+                mergeResult["removedPumps"] = pumpsBefore.keys() - set(pump[0] for pump in pumpsMerged)
+                mergeResult["changedIDs"].update([node[0] for node in mergeResult["nodes"].values()],
+                                                 mergeResult["sewers"], mergeResult["removedSewers"],
+                                                 [pump[0] for pump in mergeResult["pumps"]], mergeResult["removedPumps"],
+                                                 mergeResult["merge"]["pathBetweenWWTPs"],
+                                                 (mergeOption["WWTPFROM"], mergeOption["WWTPTO"]))
+                mergeResult["IDs"].update(mergeResult["changedIDs"])
+                break
+            else:
+                edgeListOption = applyEdgeChanges(mergeOption["edgeChanges2"])  # Pipe diameters of Option 2
+                mergeResult["noMerges"].append([mergeCosts, mOpt])
+                if mergeOption["needsNetworkRemoving"] == 1:
+                    nodesOption = None
+
+        # Changes of the edges (written edges are replaced in the copy of the edge list, see applyEdgeChanges)
+        mergeResult["edges"] = {pos: edgeListOption[pos] for pos in range(len(edgeList))
+                                if edgeListOption[pos] is not edgeList[pos] and edgeListOption[pos] != edgeList[pos]}
+        mergeResult["addedEdges"] = edgeListOption[len(edgeList):]
+        mergeResults.append(mergeResult)
+    return mergeResults
+
+
+def evaluateMergesOfSnapshot(executor, wwtpIDs, nodes, WWTPs, sewers, edgeList, pumps, sortedListWWTPs, streetNetwork,
+                             routing, f_merge, forceZ, finishedExpansion, minTD, maxTD, minSlope, costModel,
+                             multiTargetMerge):
+    '''
+    This function checks the merging of wwtps against the same snapshot (see evaluateSnapshotMerges).
+    The wwtps are distributed to the workers of the pool (if there is one), so that the snapshot is only sent once
+    to each worker.
+
+    Input Arguments:
+    executor                  -    Pool (or None)
+    wwtpIDs                   -    WWTPs to check
+    nodes, WWTPs, sewers, ... -    Current lists of the merging module (not changed)
+    streetNetwork             -    Street Network
+    routing                   -    Routing context
+    f_merge, ...              -    Model parameters
+
+    Output Arguments:
+    mergeResults              -    Results of the wwtps in the order of wwtpIDs
+    '''
+    if wwtpIDs == []:
+        return []
+    if routing is not None and routing["backend"] != "legacy":
+        routing = freezeRoutingContext(routing)
+
+    nrOfChunks = min(getNrOfWorkers(executor), len(wwtpIDs))
+    futures = []
+    for chunk in range(nrOfChunks):
+        futures.append(submitTask(executor, evaluateSnapshotMerges, wwtpIDs[chunk::nrOfChunks], nodes, WWTPs, sewers,
+                                  edgeList, pumps, sortedListWWTPs, streetNetwork, routing, f_merge, forceZ,
+                                  finishedExpansion, minTD, maxTD, minSlope, costModel, multiTargetMerge))
+
+    mergeResults = [None] * len(wwtpIDs)
+    for chunk, future in enumerate(futures):
+        mergeResults[chunk::nrOfChunks] = future.result()
+    return mergeResults
+
+
+def createSnapshotChanges():
+    '''
+    This function creates the changes applied since the snapshot (see addSnapshotChanges).
+
+    Output Arguments:
+    snapshotChanges      -    Dictionary with the IDs of the changed nodes and wwtps, the positions of the changed
+                              edges, the changed wwtps ({ID: (coordinates, flow)}) and the coordinates of the
+                              changed sewer nodes
+    '''
+    return {"IDs": set(), "edges": set(), "wwtps": {}, "sewerNodes": []}
+
+
+def addSnapshotChanges(snapshotChanges, mergeResult, nodes, WWTPs, positionIndex):
+    '''
+    This function adds the changes of an applied result of the snapshot (see applyMergeChanges).
+
+    Input Arguments:
+    snapshotChanges      -    Changes since the snapshot (see createSnapshotChanges)
+    mergeResult          -    Applied result of a wwtp (see evaluateSnapshotMerges)
+    nodes, WWTPs         -    Lists of the merging module (with the changes applied)
+    positionIndex        -    Positions of the nodes and edges (see createPositionIndex)
+    '''
+    snapshotChanges["IDs"].update(mergeResult["changedIDs"])
+    snapshotChanges["edges"].update(mergeResult["edges"])
+    for wwtp in WWTPs:
+        if wwtp[0] in mergeResult["changedIDs"]:
+            node = nodes[getNodePosition(positionIndex, nodes, wwtp[0])]
+            if node[5] == 0:  # WWTPs which need to be connected are no merging options
+                snapshotChanges["wwtps"][wwtp[0]] = ((node[1], node[2], node[3]), wwtp[1])
+    for ID in mergeResult["sewers"]:
+        node = nodes[getNodePosition(positionIndex, nodes, ID)]
+        snapshotChanges["sewerNodes"].append((node[1], node[2], node[3]))
+    return
+
+
+def checkMergeConflict(mergeResult, snapshotChanges, f_merge):
+    '''
+    This function checks whether the result of a wwtp calculated against the snapshot is still valid, i.e. whether
+    none of its nodes, wwtps and edges were changed since the snapshot and whether no changed wwtp or sewer node
+    would be a merging option instead of the options of the result (see connectivityPotential and
+    getClosestNetworkWWTP).
+
+    Input Arguments:
+    mergeResult          -    Result of a wwtp (see evaluateSnapshotMerges)
+    snapshotChanges      -    Changes since the snapshot (see createSnapshotChanges)
+    f_merge              -    Puts the size in relation ot the distance
+
+    Output Arguments:
+    conflict             -    True if the result needs to be calculated again
+    '''
+    if not snapshotChanges["IDs"].isdisjoint(mergeResult["IDs"]) or not snapshotChanges["edges"].isdisjoint(
+            mergeResult["edges"]):
+        return True
+
+    reads = mergeResult["reads"]
+    for coordinates, flow in snapshotChanges["wwtps"].values():
+        distance, _, _ = distanceCalc3d(reads["pZero"], coordinates)
+        if distance <= reads["closestDistance"] or distance * flow ** (-1 * f_merge) <= reads["potentialIndex"]:
+            return True
+    for coordinates in snapshotChanges["sewerNodes"]:
+        distance, _, _ = distanceCalc3d(reads["pZero"], coordinates)
+        if distance <= reads["networkDistance"]:
+            return True
+    return False
+
+
+def applyMergeChanges(mergeResult, nodes, sewers, pumps, edgeList, positionIndex):
+    '''
+    This function applies the changes of a wwtp calculated against the snapshot to the lists of the merging module.
+    Added edges which were already added by another wwtp replace the edge.
+
+    Input Arguments:
+    mergeResult          -    Result of a wwtp (see evaluateSnapshotMerges)
+    nodes, sewers, ...   -    Lists of the merging module
+    positionIndex        -    Positions of the nodes and edges (see createPositionIndex)
+
+    Output Arguments:
+    nodes, sewers, pumps, edgeList    -    Updated lists
+    '''
+    for pos, node in mergeResult["nodes"].items():
+        nodes[pos] = node
+    for ID in mergeResult["removedSewers"]:
+        del sewers[ID]
+    sewers.update(mergeResult["sewers"])
+
+    if mergeResult["pumps"] or mergeResult["removedPumps"]:
+        pumpsAtNodes = {pump[0]: pump for pump in pumps if pump[0] not in mergeResult["removedPumps"]}
+        for pump in mergeResult["pumps"]:
+            pumpsAtNodes[pump[0]] = pump
+        pumps = list(pumpsAtNodes.values())
+
+    edgeChanges = createEdgeChanges(edgeList, positionIndex)
+    for pos, edge in mergeResult["edges"].items():
+        writeEdge(edgeChanges, pos)[:] = edge
+    for edge in mergeResult["addedEdges"]:
+        pos = getEdgePosition(edgeChanges, edge[0][0], edge[1][0])
+        if pos is None:
+            appendEdge(edgeChanges, edge)
+        else:
+            writeEdge(edgeChanges, pos)[:] = edge
+    edgeList = applyEdgeChanges(edgeChanges)
+    return nodes, sewers, pumps, edgeList
+
+
+def moveWWTPToFront(sortedListWWTPs, ID):
+    '''
+    This function moves a wwtp to the first position of sortedListWWTPs.
+
+    Input Arguments:
+    sortedListWWTPs     -    WWTPs to check for merging
+    ID                  -    ID of wwtp
+
+    Output Arguments:
+    sortedListWWTPs     -    Updated list
+    '''
+    for pos, wwtp in enumerate(sortedListWWTPs):
+        if wwtp[0] == ID:
+            sortedListWWTPs.insert(0, sortedListWWTPs.pop(pos))
+            break
+    return sortedListWWTPs
+
+
 def getCheapestMerge(mergeCostStorage, WWTPs):
     '''
     This function gets from all merges the cheapest. This function is used in case
@@ -4413,7 +5433,8 @@ def getClosestNode(PN):
     return PN, fromNode, toNode, factorDistanz, euclidianDistance
 
 
-def dijkstra(streetNetwork, idp0, idp1, heightDiff):
+@timedFunction("dijkstra")
+def dijkstra(streetNetwork, idp0, idp1, heightDiff, routing=None):
     """
     This function gets the path from the Djikstra list.
 
@@ -4422,14 +5443,19 @@ def dijkstra(streetNetwork, idp0, idp1, heightDiff):
     idp0                      --    Start node
     idp1                      --    Endnode
     heightDiff                --    Height Difference
+    routing                   --    Routing context. If the backend is not legacy, the search runs on CSR arrays (optional)
 
     Output Arguments:
     archPathList              --    Updates distances to all nodes.
     distStartEnd              --    Distance between the two nodes.
     slopeDijkstra             --    Slope between the two nodes on Djikstra distance.
     """
-    distances, listDijkstra = dijkstraAlgorithm(streetNetwork, idp0)  # calculate djikstra distances
-    scrapPathDjika, distStartEnd = writePath(listDijkstra, distances, idp0, idp1)
+    if routing is None or routing["backend"] == "legacy":
+        distances, listDijkstra = dijkstraAlgorithm(streetNetwork, idp0)  # calculate djikstra distances
+        scrapPathDjika, distStartEnd = writePath(listDijkstra, distances, idp0, idp1)
+    else:
+        scrapPathDjika, distances = routeStreetNetwork(routing, idp0, idp1)  # Search stops when end node is reached
+        distStartEnd = distances[idp1]
     archPathList = archPath(scrapPathDjika,
                             distances)  # the achPathList contains all intermediary, not pouplated nodes of the street network. List gets afterwards appended to P
     slopeDijkstra = (float(heightDiff) / float(
@@ -4437,6 +5463,237 @@ def dijkstra(streetNetwork, idp0, idp1, heightDiff):
     return archPathList, distStartEnd, slopeDijkstra
 
 
+@timedFunction("dijkstraManyToOne")
+def dijkstraManyToOne(streetNetwork, startNodes, idp1, heightDiffs, routing=None):
+    """
+    This function gets the paths from several start nodes to the same end node with a single Djikstra search
+    starting at the end node (the street network is undirected). The distances are summed up from the start
+    nodes in order that they are the same as with dijkstra(). Only if there are several shortest paths, another
+    one may be selected.
+
+    Input Arguments:
+    streetNetwork             --    Distances to all nodes
+    startNodes                --    Start nodes
+    idp1                      --    Endnode
+    heightDiffs               --    Height Difference for each start node
+    routing                   --    Routing context. If the backend is not legacy, the search runs on CSR arrays (optional)
+
+    Output Arguments:
+    archPaths                 --    Dictionary with archPathList, distStartEnd and slopeDijkstra (as dijkstra()) for each start node.
+                                    Start nodes which cannot be reached are missing.
+    """
+    if routing is None or routing["backend"] == "legacy":
+        paths = {}
+        if idp1 in streetNetwork:
+            distances, listDijkstra = dijkstraAlgorithm(streetNetwork, idp1)  # calculate djikstra distances
+            for idp0 in startNodes:
+                if idp0 in distances:
+                    paths[idp0], _ = writePath(listDijkstra, distances, idp1, idp0)
+    else:
+        paths = {}
+        for idp0, (path, _) in routeStreetNetworkToMany(routing, idp1, startNodes).items():
+            paths[idp0] = path
+
+    archPaths = {}
+    for idp0, heightDiff in zip(startNodes, heightDiffs):
+        if idp0 not in paths:
+            continue
+        pathFromStart = paths[idp0]  # From start node to end node
+
+        # Sum up distances from start node
+        distances, distanz = {idp0: 0}, 0
+        for u, v in zip(pathFromStart[:-1], pathFromStart[1:]):
+            distanz = distanz + streetNetwork[u][v]
+            distances[v] = distanz
+
+        distStartEnd = distances[idp1]
+        archPathList = archPath(pathFromStart[::-1], distances)
+        slopeDijkstra = (float(heightDiff) / float(
+            distStartEnd)) * 100  # Slope in % of the djikstra-street distance
+        archPaths[idp0] = (archPathList, distStartEnd, slopeDijkstra)
+    return archPaths
+
+
+def createPathContext(rasterSize, rasterPoints, buildPoints, neighborhood, f_topo, demIndex, routingFolder=None):
+    """
+    This function creates the input of the speculative path finding which does not change during the calculation.
+    It is sent once to each worker of the pool (see initPathWorker). The street graph changes and is handed over
+    per version (see publishPathRouting).
+
+    Input Arguments:
+    rasterSize, ...           --    Arguments of aStar
+    routingFolder             --    Folder for the street graphs of a process pool (None: pool sharing the memory)
+
+    Output Arguments:
+    pathContext               --    Input of the path finding
+    """
+    return {"rasterSize": rasterSize, "rasterPoints": rasterPoints, "buildPoints": buildPoints,
+            "neighborhood": neighborhood, "f_topo": f_topo, "demIndex": demIndex, "routingFolder": routingFolder,
+            "routings": {}}
+
+
+def initPathWorker(pathContext):
+    """
+    Initialisation of a worker of the pool. The raster, the building points and the DEM index are only sent
+    once to each worker.
+
+    Input Arguments:
+    pathContext               --    Input of the path finding (see createPathContext)
+    """
+    global pathWorker
+    pathWorker = pathContext
+
+
+def publishPathRouting(pathContext, routing):
+    """
+    This function hands over the current street graph to the workers of the pool. In a pool sharing the memory,
+    the frozen routing context is stored in the path context. For a process pool, it is written once per version
+    to the routing folder and read by each worker when needed.
+
+    Input Arguments:
+    pathContext               --    Input of the path finding (see createPathContext)
+    routing                   --    Routing context
+
+    Output Arguments:
+    version                   --    Version of the street graph
+    """
+    version = routing["version"]
+    if version in pathContext["routings"]:
+        return version
+
+    frozenRouting = freezeRoutingContext(routing)
+    routingFolder = pathContext["routingFolder"]
+    if routingFolder is not None:
+        saveFrozenRouting(frozenRouting, routingFolder)
+        for oldVersion in pathContext["routings"]:  # Searches on older versions are not used anymore
+            os.remove(getFrozenRoutingPath(routingFolder, oldVersion))
+    pathContext["routings"] = {version: frozenRouting}
+    return version
+
+
+def getPathWorkerRouting(version):
+    """
+    This function returns the frozen routing context of a version of the street graph in a worker of the pool.
+    In a process pool, it is read once per version from the routing folder.
+
+    Input Arguments:
+    version                   --    Version of the street graph
+
+    Output Arguments:
+    routing                   --    Frozen routing context
+    """
+    routing = pathWorker["routings"].get(version)
+    if routing is None:
+        if pathWorker["routingFolder"] is None:
+            raise Exception("ERROR: Street graph version " + str(version) + " is not published.")
+        routing = loadFrozenRouting(pathWorker["routingFolder"], version)
+        pathWorker["routings"] = {version: routing}
+    return routing
+
+
+def findCandidatePaths(idp0, idp1, p0, p1, heightDiff, maxStreetDistance, version):
+    """
+    This function searches the paths of a node which is not yet connected (speculative path finding) in a worker
+    of the pool. The path along the street is searched with Djikstra. If there is no path along the street or if
+    it is too long, the path along the terrain is searched with a*.
+
+    Input Arguments:
+    idp0, idp1                --    FROMNODE, TONODE
+    p0, p1                    --    Coordinates of FROMNODE and TONODE
+    heightDiff                --    Height Difference
+    maxStreetDistance         --    Street distance from which on the a* path is searched (streetFactor * realDistance)
+    version                   --    Version of the street graph (see publishPathRouting)
+
+    Output Arguments:
+    streetPath                --    archPathList, distStartEnd and slopeDijkstra (None if there is no path along the street)
+    terrainPath               --    archPathMST and boundingCandidates (None if not searched)
+    """
+    routing = getPathWorkerRouting(version)
+    try:
+        streetPath = dijkstra(None, idp0, idp1, heightDiff, routing)
+    except KeyError:
+        streetPath = None
+
+    terrainPath = None
+    if streetPath is None or streetPath[1] >= maxStreetDistance:
+        try:
+            terrainPath = aStar(pathWorker["rasterSize"], pathWorker["rasterPoints"], pathWorker["buildPoints"], p0,
+                                p1, idp0, idp1, pathWorker["neighborhood"], pathWorker["f_topo"],
+                                pathWorker["demIndex"], routing)
+        except Exception:
+            terrainPath = None  # Searched again in the expansion module (and the error raised there if needed)
+    return streetPath, terrainPath
+
+
+def prefetchCandidatePaths(pathPrefetch, PN, nodes, sewers, routing, executor, pathContext, speculativeBatch,
+                           streetFactor):
+    """
+    This function submits the path finding of the next nodes in PN (in the order of getClosestNode) to the pool.
+    The paths only depend on the street graph, therefore the searches on an older street graph are removed.
+    Only the IDs and coordinates of the nodes and the version of the street graph are sent with each task.
+
+    Input Arguments:
+    pathPrefetch              --    Submitted searches: {(FROMNODE, TONODE): (version of street graph, future)}
+    PN                        --    Prim list with distances
+    nodes                     --    Nodes
+    sewers                    --    Sewers
+    routing                   --    Routing context
+    executor                  --    Pool (initialised with initPathWorker)
+    pathContext               --    Input of the path finding in the pool (see createPathContext)
+    speculativeBatch          --    Number of nodes in PN to search the paths for
+    streetFactor              --    Street factor
+
+    Output Arguments:
+    pathPrefetch              --    Submitted searches
+    """
+    version = routing["version"]
+
+    for key in list(pathPrefetch):  # Remove searches on an older street graph or of connected nodes
+        if pathPrefetch[key][0] != version or key[1] in sewers:
+            pathPrefetch[key][1].cancel()
+            del pathPrefetch[key]
+
+    for candidate in heapq.nsmallest(speculativeBatch, PN, key=lambda entry: entry[0]):
+        idp0, idp1 = candidate[1], candidate[2]
+        if idp1 in sewers or (idp0, idp1) in pathPrefetch:
+            continue
+
+        if candidate[0] > 0:
+            realDistance = float(candidate[0]) / float(candidate[6])  # Euclidian distance as in getClosestNode
+        else:
+            realDistance = 0
+
+        node0, node1 = getPns(idp0, nodes), getPns(idp1, nodes)
+        if node0 is None or node1 is None:  # Not (yet) in nodes
+            continue
+        p0, p1 = node0[1], node1[1]
+        _, _, heightDiff = distanceCalc3d(p0, p1)
+
+        publishPathRouting(pathContext, routing)
+        future = submitTask(executor, findCandidatePaths, idp0, idp1, p0, p1, heightDiff,
+                            streetFactor * realDistance, version)
+        pathPrefetch[(idp0, idp1)] = (version, future)
+    return pathPrefetch
+
+
+def takePrefetchedPaths(pathPrefetch, routing, idp0, idp1):
+    """
+    This function returns the paths of a node if they were searched on the current street graph.
+
+    Input Arguments:
+    pathPrefetch              --    Submitted searches (see prefetchCandidatePaths)
+    routing                   --    Routing context
+    idp0, idp1                --    FROMNODE, TONODE
+
+    Output Arguments:
+    paths                     --    streetPath and terrainPath of findCandidatePaths (None if not available)
+    """
+    prefetched = pathPrefetch.pop((idp0, idp1), None)
+    if prefetched is None or prefetched[0] != routing["version"]:
+        return None
+    return prefetched[1].result()
+
+
 def createStreetGraph(in_FC, crs):
     """
     Reads out coordinates from line shapefile fields.
@@ -4576,7 +5833,7 @@ def writeStartnode(shapefile_path, startnodeID, crs):
     return
 
 
-def readOutAllStreetVerticesAfterAggregation(nodes, rasterPoints, rasterSize, crs):
+def readOutAllStreetVerticesAfterAggregation(nodes, rasterPoints, rasterSize, crs, demIndex=None, firstMatch=True):
     """
     This function reads out the aggregated street inlets
 
@@ -4584,33 +5841,26 @@ def readOutAllStreetVerticesAfterAggregation(nodes, rasterPoints, rasterSize, cr
     nodes               --    nodes
     rasterPoints        --    Raster Points
     rasterSize          --    Raster Size
+    demIndex            --    Grid index of the DEM (created if not provided)
+    firstMatch          --    True: first raster point within raster size (as originally), False: closest raster point
 
     Output Arguments:
     streetVert          --    Vertices of Street Network
     """
     gdf = gpd.read_file(nodes)
     gdf = gdf.set_crs(crs=crs)
-    streetVert, IDNEW = [], 100000
+    streetVert, IDNEW, alreadyRead = [], 100000, set()
 
-    def find_height(x, y, rasterPoints, rasterSize):
-        for f in rasterPoints:
-            if (f[1] <= x + rasterSize and f[1] >= x - rasterSize) and \
-                    (f[2] <= y + rasterSize and f[2] >= y - rasterSize):
-                return f[3]
-        return None
+    if demIndex is None:
+        demIndex = createDEMIndex(rasterPoints, rasterSize)
 
     for _, row in gdf.iterrows():
         X_start, Y_start = row["X_START"], row["Y_START"]
         X_end, Y_end = row["X_END"], row["Y_END"]
 
-        copyZ, copyZ2 = 1, 1
-
         # Prevent duplicates
-        for pnt in streetVert:
-            if pnt[1] == X_start and pnt[2] == Y_start:
-                copyZ = 0
-            if pnt[1] == X_end and pnt[2] == Y_end:
-                copyZ2 = 0
+        copyZ = 0 if (X_start, Y_start) in alreadyRead else 1
+        copyZ2 = 0 if (X_end, Y_end) in alreadyRead else 1
 
         # If start and end are the same
         if X_start == X_end and Y_start == Y_end:
@@ -4618,16 +5868,19 @@ def readOutAllStreetVerticesAfterAggregation(nodes, rasterPoints, rasterSize, cr
 
         if copyZ == 1:
             IDNEW += 1
-            heightSTART = find_height(X_start, Y_start, rasterPoints, rasterSize)
-            newZ = [IDNEW, X_start, Y_start, heightSTART]
-            streetVert.append(newZ)
+            streetVert.append([IDNEW, X_start, Y_start, None])
+            alreadyRead.add((X_start, Y_start))
 
         if copyZ2 == 1:
             IDNEW += 1
-            heightEND = find_height(X_end, Y_end, rasterPoints, rasterSize)
-            newZ2 = [IDNEW, X_end, Y_end, heightEND]
-            streetVert.append(newZ2)
-
+            streetVert.append([IDNEW, X_end, Y_end, None])
+            alreadyRead.add((X_end, Y_end))
+
+    # Assign the heights of all vertices at once
+    positions = selectDEMCells([pnt[1] for pnt in streetVert], [pnt[2] for pnt in streetVert], demIndex, firstMatch)
+    for pnt, pos in zip(streetVert, positions):
+        if pos >= 0:
+            pnt[3] = rasterPoints[pos][3]
     return streetVert
 
 
@@ -0,0 +1,257 @@
+# ======================================================================================
+# Copyright 2014  Swiss Federal Institute of Aquatic Science and Technology
+#
+# This file is part of SNIP (Sustainable Network Infrastructure Planning)
+# SNIP is used for determining the optimal degree of centralization for waste
+# water infrastructures. You find detailed information about SNIP in Eggimann et al. (2014).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Contact:   sven.eggimann@eawag.ch
+# Version    1.0
+# Date:      1.07.2015
+# Author:     Eggimann Sven
+# ======================================================================================
+# The SNIP model was updated and modified for use in rural Alabama in 2025.
+# For detailed information see Jordan et al. (in prep).
+
+# The model was modified for Python 3.11 to run on open source packages.
+# This module measures where the time of a SNIP run goes (timers, counters and graph sizes) and
+# writes a report (instrumentation.json) into the output folder. The measurements of tasks calculated
+# in a process pool are sent back with the results of the tasks (see takeInstrumentation).
+# Each timer only stores the number of calls, the total and the maximum time and a sample of the
+# durations (at most reservoirSize) to estimate the p95, so the memory does not grow with the calls.
+
+# Author:   Mallory Jordan
+# Contact:  maj0082@auburn.edu
+# ======================================================================================
+
+# Imports
+import json, math, random, threading, time
+from contextlib import contextmanager
+from functools import wraps
+
+instrumentation = {"timers": {}, "counters": {}, "sizes": {}, "start": time.perf_counter()}  # Measurements of this process
+instrumentationLock = threading.Lock()
+reservoirSize = 1024  # Durations stored per timer
+reservoirRandom = random.Random(0)  # Selection of the stored durations (reproducible)
+
+
+def resetInstrumentation():
+    """
+    This function deletes all measurements.
+    """
+    with instrumentationLock:
+        instrumentation["timers"], instrumentation["counters"], instrumentation["sizes"] = {}, {}, {}
+        instrumentation["start"] = time.perf_counter()
+    return
+
+
+def startTimer():
+    """
+    This function starts a timer (see stopTimer).
+
+    Output Arguments:
+    start           --    Start time
+    """
+    return time.perf_counter()
+
+
+def stopTimer(name, start):
+    """
+    This function stops a timer and stores the duration.
+
+    Input Arguments:
+    name            --    Name of the measured step
+    start           --    Start time (see startTimer)
+
+    Output Arguments:
+    duration        --    Duration [s]
+    """
+    duration = time.perf_counter() - start
+    with instrumentationLock:
+        timer = instrumentation["timers"].get(name)
+        if timer is None:
+            timer = instrumentation["timers"][name] = {"calls": 0, "total": 0.0, "max": 0.0, "samples": []}
+        timer["calls"] += 1
+        timer["total"] += duration
+        timer["max"] = max(timer["max"], duration)
+        if len(timer["samples"]) < reservoirSize:
+            timer["samples"].append(duration)
+        else:  # Each duration is stored with the same probability (reservoir sampling)
+            pos = reservoirRandom.randrange(timer["calls"])
+            if pos < reservoirSize:
+                timer["samples"][pos] = duration
+    return duration
+
+
+@contextmanager
+def timeSection(name):
+    """
+    This function measures the time of a with-block.
+
+    Input Arguments:
+    name            --    Name of the measured step
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stopTimer(name, start)
+
+
+def timedFunction(name):
+    """
+    This function creates a decorator which measures the time of each call of a function.
+
+    Input Arguments:
+    name            --    Name of the measured step
+
+    Output Arguments:
+    decorator       --    Decorator
+    """
+    def decorator(function):
+        @wraps(function)
+        def timedCall(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stopTimer(name, start)
+        return timedCall
+    return decorator
+
+
+def countEvent(name, number=1):
+    """
+    This function counts an event (e.g. an iteration).
+
+    Input Arguments:
+    name            --    Name of the event
+    number          --    Number of events
+    """
+    with instrumentationLock:
+        instrumentation["counters"][name] = instrumentation["counters"].get(name, 0) + number
+    return
+
+
+def recordSize(name, size):
+    """
+    This function stores the size of a graph or list (last and largest size).
+
+    Input Arguments:
+    name            --    Name of the graph or list
+    size            --    Size
+    """
+    with instrumentationLock:
+        largest = instrumentation["sizes"].get(name, (size, size))[1]
+        instrumentation["sizes"][name] = (size, max(largest, size))
+    return
+
+
+def takeInstrumentation():
+    """
+    This function returns the measurements and deletes them (e.g. to send the measurements of a worker process
+    with the result of a task, see mergeInstrumentation). The start time is not changed.
+
+    Output Arguments:
+    measurements    --    Dictionary with the timers, counters and sizes
+    """
+    with instrumentationLock:
+        measurements = {"timers": instrumentation["timers"], "counters": instrumentation["counters"],
+                        "sizes": instrumentation["sizes"]}
+        instrumentation["timers"], instrumentation["counters"], instrumentation["sizes"] = {}, {}, {}
+    return measurements
+
+
+def mergeInstrumentation(measurements):
+    """
+    This function adds the measurements of another process (see takeInstrumentation). If the durations of both
+    timers do not fit into the sample, the sample is drawn from both samples in relation to the number of calls.
+
+    Input Arguments:
+    measurements    --    Dictionary with the timers, counters and sizes
+    """
+    with instrumentationLock:
+        for name, other in measurements["timers"].items():
+            timer = instrumentation["timers"].get(name)
+            if timer is None:
+                instrumentation["timers"][name] = other
+                continue
+            samples, otherSamples = list(timer["samples"]), list(other["samples"])
+            if len(samples) + len(otherSamples) <= reservoirSize:
+                samples += otherSamples
+            else:
+                reservoirRandom.shuffle(samples)
+                reservoirRandom.shuffle(otherSamples)
+                merged = []
+                while len(merged) < reservoirSize and (samples or otherSamples):
+                    if samples and (not otherSamples or reservoirRandom.random() * (
+                            timer["calls"] + other["calls"]) < timer["calls"]):
+                        merged.append(samples.pop())
+                    else:
+                        merged.append(otherSamples.pop())
+                samples = merged
+            timer["calls"] += other["calls"]
+            timer["total"] += other["total"]
+            timer["max"] = max(timer["max"], other["max"])
+            timer["samples"] = samples
+        for name, number in measurements["counters"].items():
+            instrumentation["counters"][name] = instrumentation["counters"].get(name, 0) + number
+        for name, (size, largest) in measurements["sizes"].items():
+            largest = max(instrumentation["sizes"].get(name, (size, largest))[1], largest)
+            instrumentation["sizes"][name] = (size, largest)
+    return
+
+
+def createInstrumentationReport():
+    """
+    This function summarises the measurements.
+
+    Output Arguments:
+    report          --    Dictionary with the timers (calls, total, mean, p95 and max time [s]), counters and sizes.
+                          The p95 is calculated from the sample of the durations (exact up to reservoirSize calls).
+    """
+    with instrumentationLock:
+        timers = {name: dict(timer, samples=sorted(timer["samples"]))
+                  for name, timer in instrumentation["timers"].items()}
+        counters = dict(instrumentation["counters"])
+        sizes = dict(instrumentation["sizes"])
+        wallTime = time.perf_counter() - instrumentation["start"]
+
+    report = {"wallTime": wallTime, "timers": {}, "counters": counters, "sizes": {}}
+    for name in sorted(timers, key=lambda name: -timers[name]["total"]):
+        timer, durations = timers[name], timers[name]["samples"]
+        report["timers"][name] = {
+            "calls": timer["calls"], "total": timer["total"], "mean": timer["total"] / timer["calls"],
+            "p95": durations[max(0, math.ceil(0.95 * len(durations)) - 1)], "max": timer["max"]}
+    for name in sizes:
+        report["sizes"][name] = {"last": sizes[name][0], "max": sizes[name][1]}
+    return report
+
+
+def writeInstrumentationReport(pathReport):
+    """
+    This function writes the summary of the measurements into a JSON file.
+
+    Input Arguments:
+    pathReport      --    Path of the report (.json)
+
+    Output Arguments:
+    report          --    Dictionary with the summary (see createInstrumentationReport)
+    """
+    report = createInstrumentationReport()
+    with open(pathReport, "w") as outFile:
+        json.dump(report, outFile, indent=2)
+    return report
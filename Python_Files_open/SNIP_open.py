@@ -46,197 +46,498 @@
 import os, sys, time               # General Imports
 import gc; gc.disable()            # Don't allow garbage collection
 import argparse
+import copy, hashlib, pickle
+import cProfile, pstats, io
+from dataclasses import dataclass, field, fields
+from pyproj import CRS
+
+try:
+    import pyinstrument                                          # Optional: sampling profiler
+except ImportError:
+    pyinstrument = None
 
 # SNIP Imports    
 from SNIP_functions_open import *                           # Import open source functions
 from SNIP_astar_open import *                                    # Import a* functions
 from SNIP_costs_open import *                                    # Import cost functions
-
-def run_snip_model(in_street, buildings, inDHM, outListFolder=None):
-
-    start = time.perf_counter()  # Start script timer
-
-    # Set default output folder if None
-    if outListFolder is None:
-        outListFolder = os.path.join(os.getcwd(), "SNIP_outputs")
-    os.makedirs(outListFolder, exist_ok=True)
-
-    # Ensure output folder exists
-    outListFolder = outListFolder.replace("\\", "/") + "/"
-    os.makedirs(outListFolder, exist_ok=True)
-
+from SNIP_dem_open import *                                      # Import DEM index functions
+from SNIP_checkpoint_open import *                               # Import binary checkpoint functions
+from SNIP_instrumentation_open import *                          # Import timers and counters
+
+# Parameters used in the preprocessing (cannot be changed without preprocessing again)
+preprocessingParameters = ("minTD", "AggregateKritStreet", "tileSize", "demFirstMatch")
+preparedNetworkVersion = 2  # Version of PreparedNetwork (cached files of another version are not used)
+preparedLists = ("rasterPoints", "buildPoints", "streetVertices", "edgeList", "forSNIP", "aggregatetPoints", "buildings", "streetGraph")
+
+
+@dataclass
+class PreparedNetwork:
+    """
+    Prepared input of the SNIP Algorithm (result of the preprocessing). Can be saved and used for several runs.
+
+    inputHash           --  Hash of the input shapefiles and the preprocessing parameters (None if not from files)
+    preprocessing       --  Preprocessing parameters
+    """
+    crs: object
+    rasterPoints: list
+    rasterSize: float
+    demIndex: dict
+    buildPoints: list
+    buildings: list
+    aggregatetPoints: list
+    forSNIP: list
+    streetVertices: list
+    edgeList: list
+    streetGraph: dict
+    startnode: object
+    startX: float
+    startY: float
+    preprocessing: dict = field(default_factory=dict)
+    inputHash: str = None
+    version: int = preparedNetworkVersion
+
+    def content_hash(self):
+        """
+        Hash of the prepared input (sha256 of the pickled lists). Two prepared networks with the same hash
+        give the same SNIP results. The DEM index is not hashed, it is created from rasterPoints.
+        """
+        content = hashlib.sha256()
+        for dataField in fields(self):
+            if dataField.name == "crs":
+                content.update(str(self.crs.to_wkt() if isinstance(self.crs, CRS) else self.crs).encode())
+            elif dataField.name not in ("inputHash", "demIndex"):
+                content.update(pickle.dumps(getattr(self, dataField.name), protocol=pickle.HIGHEST_PROTOCOL))
+        return content.hexdigest()
+
+    def save(self, path):
+        """
+        Save the prepared input to a binary checkpoint (.npz, see SNIP_checkpoint_open).
+        """
+        metadata = {
+            "crs": self.crs.to_wkt() if isinstance(self.crs, CRS) else self.crs, "rasterSize": self.rasterSize,
+            "startnode": self.startnode, "startX": self.startX, "startY": self.startY,
+            "preprocessing": self.preprocessing, "inputHash": self.inputHash, "version": self.version}
+        return saveCheckpoint(path, {name: getattr(self, name) for name in preparedLists}, metadata=metadata)
+
+    @staticmethod
+    def load(path):
+        """
+        Load a prepared input from a binary checkpoint (see save).
+        """
+        metadata = loadCheckpointMetadata(path)
+        if metadata.get("version") != preparedNetworkVersion:
+            raise Exception("ERROR: No prepared network of version " + str(preparedNetworkVersion) + ": " + str(path))
+        content = loadCheckpoint(path, preparedLists)
+        crs = CRS.from_user_input(metadata["crs"]) if metadata["crs"] is not None else None
+        demIndex = createDEMIndex(content["rasterPoints"], metadata["rasterSize"])
+        return PreparedNetwork(crs, content["rasterPoints"], metadata["rasterSize"], demIndex, content["buildPoints"], content["buildings"],
+                               content["aggregatetPoints"], content["forSNIP"], content["streetVertices"], content["edgeList"],
+                               content["streetGraph"], metadata["startnode"], metadata["startX"], metadata["startY"],
+                               metadata["preprocessing"], metadata["inputHash"], metadata["version"])
+
+
+@dataclass
+class Result:
+    """
+    Result of a SNIP calculation.
+
+    params              --  Model parameters
+    statistics          --  Statistics of the calculated system (as statistics.txt)
+    outListFolder       --  Folder with the results
+    preparedHash        --  content_hash of the prepared input
+    """
+    params: dict
+    statistics: list
+    outListFolder: str
+    preparedHash: str
+
+
+def get_model_parameters(**changedParameters):
+    """
+    Model parameters (based parameters as in Eggimann et al. 2015 and Jordan et al. in prep)
+
+    Input Arguments:
+    changedParameters   --  Parameters which differ from the base parameters (e.g. f_merge=2.0)
+
+    Output Arguments:
+    params              --  Dictionary with all model parameters
+    """
+    params = {
+        # Sewer related
+        "maxTD": 4,                                 # [m] Maximum trench depth
+        "minTD": 0.9,                               # [m] Min trench depth
+        "minSlope": 1,                              # [%] Criteria of minimum slope without pumps needed
+        "stricklerC": 85,                           # [m^1/3 s^-1] Stricker Coefficient
+        "EW_Q": 0.3785,                             # [m3 / day] 1 EW is equal to 378.5 liter (~ 100 gallons). This factor must be the same as for the GIS-Files and in unts of [m3 / day].
+
+        # Cost related
+        "resonableCostsPerEW": 4220,                # [currency] Reasonable Costs
+        "pricekWh": 0.12,                           # [currency / kWh] price per kWh of electricity
+        "pumpingYears": 30,                         # [years] Pump lifespan
+        "discountYearsSewers": 50,                  # [years] Pipe lifespan
+        "wwtpLifespan": 25,                         # [years] WWTP lifespan
+        "interestRate": 2.75,                       # [%] Real interest rate
+        "operationCosts": 5,                        # [currency / meter] operation costs per meter pipe per year, denoted as operationCostsPerYear in the cost script
+        "pumpInvestmentCosts": 500,                 # [currency] Fix costs of pumps
+        "fc_SewerCost": 0.0,                        # [-20% - 20%] Used for Sensitivity Analysis to shift cost curve  (e.g. 10 % = 0.1)
+        "fc_wwtpOpex": 0.0,                         # [-20% - 20%] Used for Sensitivity Analysis to shift cost curve  (e.g. 10 % = 0.1)
+        "fc_wwtpCapex": 0.0,                        # [-20% - 20%] Used for Sensitivity Analysis to shift cost curve
+
+        # Algorithm related
+        "f_street": 5.0,                            # [-] Factor to set How close the sewer follow the road network
+        "f_merge": 2.4,                             # [-] Factor do determine how the WWTPS are merged.
+        "f_topo": 1.2,                              # [-] Factor weighting the dem graph creation for the a* algorithm
+        "routingBackend": "python",                 # Backend for Djikstra and a*: "legacy", "python", "numba", "scipy" or "auto" (numba/scipy are optional packages)
+        "optionExecution": "sequential",            # Pool of the solver: "sequential", "thread" or "process" (options of the expansion module only in a thread pool)
+        "optionWorkers": 0,                         # Number of workers for optionExecution (0: number of cpus)
+        "mergeStrategy": "sequential",              # Order of the wwtps in the merging module: "sequential" (by size) or "parallel" (cheapest non-conflicting merges of a snapshot, calculated in the pool of optionExecution)
+        "speculativeBatch": 0,                      # Paths of the next nodes to connect searched in advance in the pool of optionExecution (0: off)
+        "multiTargetMerge": 0,                      # 1: Paths of all merging options of a wwtp are searched at once (faster, may select another path if there are several shortest paths)
+        "checkpointIterations": 0,                  # Solver state (solverState.npz) is saved every N iterations of the expansion module and before the merging module (0: off)
+        "checkpointSeconds": 0,                     # [s] Solver state is saved every T seconds of the expansion module and before the merging module (0: off)
+        "resume": 0,                                # 1: Continue the calculation from the saved solver state in the output folder
+
+        "neighborhood": 180,                        # [m] Defines how large the neighbourhood for the a-Star Algorithm (Needs to be at least twice the raster size)
+        "AggregateKritStreet": 50,                  # [m] How long the distances on the roads can be in maximum be before they get aggregated on the street network (must not be 0)
+        "border": 3000,                             # [m] How large the virtual dem borders are around topleft and bottom
+        "tileSize": 50,                             # [m] for selection of density based starting node
+        "demFirstMatch": 1,                         # 1: Height of first DEM point within the raster size (as in Eggimann et al. 2015), 0: Height of closest DEM point
+
+        "pipeDiameterPrivateSewer": 0.1,            # [m] Cost Assumptions private sewers: Pipe Diameter
+        "avgTDprivateSewer": 0.9,                   # [m] Cost Assumptions private sewers: Average Trench Depth
+
+        # ArcGIS Representation related
+        "drawHouseConnections": 1,                  # 1: House connections are drawn in ArcGIS, 0: House Connections are not drawn in ArcGIS
+        "intermediateFormat": "npz"}                # Intermediate lists of the preprocessing: "npz" (binary checkpoint preprocessing.npz) or "txt" (text files)
+
+    for name in changedParameters:
+        if name not in params:
+            raise Exception("ERROR: Unknown model parameter: " + str(name))
+    params.update(changedParameters)
+    if params["intermediateFormat"] not in ("npz", "txt"):
+        raise Exception("ERROR: Unknown intermediate format: " + str(params["intermediateFormat"]))
+    return params
+
+
+def get_input_parameter(params):
+    """
+    Writes the model parameters into the list for the SNIP Algorithm.
+
+    Input Arguments:
+    params              --  Model parameters (see get_model_parameters)
+
+    Output Arguments:
+    InputParameter      --  List with the parameters for SNIP()
+    solverOptions       --  Solver options for SNIP()
+    """
+    interestRate = float(params["interestRate"]) / 100.0  # Reformulate real interest rate
+
+    InputParameter = [params["minTD"], params["maxTD"], params["minSlope"], params["f_merge"], params["resonableCostsPerEW"], params["neighborhood"], params["f_street"], params["pricekWh"], params["pumpingYears"], params["discountYearsSewers"], interestRate, params["stricklerC"], params["EW_Q"], params["wwtpLifespan"], params["operationCosts"], params["pumpInvestmentCosts"], params["f_topo"], params["fc_SewerCost"], params["fc_wwtpOpex"], params["fc_wwtpCapex"]]
+    solverOptions = {name: params[name] for name in ("routingBackend", "multiTargetMerge", "optionExecution", "optionWorkers", "speculativeBatch", "mergeStrategy", "checkpointIterations", "checkpointSeconds", "resume")}
+    return InputParameter, solverOptions
+
+
+def preprocess_snip_input(in_street, buildings, inDHM, outListFolder, params):
+    """
+    Reads the shapefiles and prepares the input of the SNIP Algorithm (aggregation, street splitting, street graph).
+
+    Input Arguments:
+    in_street           --  Street shapefile
+    buildings           --  Building shapefile
+    inDHM               --  DEM shapefile
+    outListFolder       --  Folder for the intermediate files (ending with "/")
+    params              --  Model parameters (see get_model_parameters)
+
+    Output Arguments:
+    prepared            --  Prepared input of SNIP() (PreparedNetwork)
+    """
     demAlreadyReadOut = 1 if inDHM else 0
+    minTD, AggregateKritStreet, tileSize, demFirstMatch = params["minTD"], params["AggregateKritStreet"], params["tileSize"], params["demFirstMatch"]
 
     # Read shapefiles
-    streets_gdf = gpd.read_file(in_street)
-    buildings_gdf = gpd.read_file(buildings)
-    dem_gdf = None
-    if demAlreadyReadOut:
-        dem_gdf = gpd.read_file(inDHM)
-
-    # Get CRS from streets as the reference
-    crs = streets_gdf.crs
-
-    # Make sure all GeoDataFrames have a CRS
-    if streets_gdf.crs is None:
-        streets_gdf = streets_gdf.set_crs(crs)
-    if buildings_gdf.crs is None:
-        buildings_gdf = buildings_gdf.set_crs(crs)
-    elif buildings_gdf.crs != crs:
-        buildings_gdf = buildings_gdf.to_crs(crs)
-    if dem_gdf is not None:
-        if dem_gdf.crs is None:
-            dem_gdf = dem_gdf.set_crs(crs)
-        elif dem_gdf.crs != crs:
-            dem_gdf = dem_gdf.to_crs(crs)
-
-    # Model parameters (based parameters as in Eggimann et al. 2015 and Jordan et al. in prep)
-    # ========================================================================
-
-    # Sewer related
-    maxTD = 4                                   # [m] Maximum trench depth
-    minTD = 0.9                                 # [m] Min trench depth
-    minSlope = 1                                # [%] Criteria of minimum slope without pumps needed
-    stricklerC = 85                             # [m^1/3 s^-1] Stricker Coefficient
-    EW_Q = 0.3785                               # [m3 / day] 1 EW is equal to 378.5 liter (~ 100 gallons). This factor must be the same as for the GIS-Files and in unts of [m3 / day].
-
-    #Cost related
-    resonableCostsPerEW = 4220                  # [currency] Reasonable Costs
-    pricekWh = 0.12                             # [currency / kWh] price per kWh of electricity
-    pumpingYears = 30                           # [years] Pump lifespan
-    discountYearsSewers = 50                    # [years] Pipe lifespan
-    wwtpLifespan = 25                           # [years] WWTP lifespan
-    interestRate = 2.75                         # [%] Real interest rate
-    operationCosts = 5                          # [currency / meter] operation costs per meter pipe per year, denoted as operationCostsPerYear in the cost script
-    pumpInvestmentCosts = 500                   # [currency] Fix costs of pumps
-    fc_SewerCost = 0.0                          # [-20% - 20%] Used for Sensitivity Analysis to shift cost curve  (e.g. 10 % = 0.1)
-    fc_wwtpOpex = 0.0                           # [-20% - 20%] Used for Sensitivity Analysis to shift cost curve  (e.g. 10 % = 0.1)
-    fc_wwtpCapex = 0.0                          # [-20% - 20%] Used for Sensitivity Analysis to shift cost curve
-
-    # Algorithm related
-    f_street = 5.0                              # [-] Factor to set How close the sewer follow the road network
-    f_merge = 2.4                               # [-] Factor do determine how the WWTPS are merged.
-    f_topo = 1.2                                # [-] Factor weighting the dem graph creation for the a* algorithm
-
-    neighborhood = 180                          # [m] Defines how large the neighbourhood for the a-Star Algorithm (Needs to be at least twice the raster size)
-    AggregateKritStreet = 50                    # [m] How long the distances on the roads can be in maximum be before they get aggregated on the street network (must not be 0)
-    border = 3000                               # [m] How large the virtual dem borders are around topleft and bottom
-    tileSize = 50                               # [m] for selection of density based starting node
-
-    pipeDiameterPrivateSewer = 0.1             # [m] Cost Assumptions private sewers: Pipe Diameter
-    avgTDprivateSewer = 0.9                    # [m] Cost Assumptions private sewers: Average Trench Depth
-
-    # ArcGIS Representation related
-    drawHouseConnections = 1                    # 1: House connections are drawn in ArcGIS, 0: House Connections are not drawn in ArcGIS
-    interestRate = float(interestRate) / 100.0  # Reformulate real interest rate
+    with timeSection("preprocessing.readInput"):
+        streets_gdf = gpd.read_file(in_street)
+        buildings_gdf = gpd.read_file(buildings)
+        dem_gdf = None
+        if demAlreadyReadOut:
+            dem_gdf = gpd.read_file(inDHM)
+
+        # Get CRS from streets as the reference
+        crs = streets_gdf.crs
+
+        # Make sure all GeoDataFrames have a CRS
+        if streets_gdf.crs is None:
+            streets_gdf = streets_gdf.set_crs(crs)
+        if buildings_gdf.crs is None:
+            buildings_gdf = buildings_gdf.set_crs(crs)
+        elif buildings_gdf.crs != crs:
+            buildings_gdf = buildings_gdf.to_crs(crs)
+        if dem_gdf is not None:
+            if dem_gdf.crs is None:
+                dem_gdf = dem_gdf.set_crs(crs)
+            elif dem_gdf.crs != crs:
+                dem_gdf = dem_gdf.to_crs(crs)
+
+        outListStep_point = outListFolder + "aggregated_nodes.shp"
+        aggregatetStreetFile = outListFolder  + "streetGraph.shp"
+        allNodesPath = outListFolder + "allNodes.shp"
+
+        # Create .txt files for SNIP Calculation and data preparation
+        buildPoints = readBuildingPoints(buildings, crs)                                                                 # Read out buildings. read ID from Field
+
+        anzNumberOfConnections = len(buildPoints)                                                                   # used for setting new IDs
+        rasterPoints, rasterSize = readRasterPoints(inDHM, anzNumberOfConnections, crs)                                  # Read out DEM
+        rasterSizeList = [rasterSize]                                                                               # Store raster size
+        demIndex = createDEMIndex(rasterPoints, rasterSize)                                                         # Grid index for the DEM look-ups
+
+    with timeSection("preprocessing.aggregation"):
+        nearPoints = readClosestPointsAggregate(buildings, crs)                                                          # Read the near_X, near_Y -points of the buildings into a list
+        aggregatetPoints, buildings = aggregate(nearPoints, AggregateKritStreet, outListStep_point, minTD, crs)          # Aggregate houses on the street and create point file (sewer inlets).
+        updateFieldStreetInlets(outListStep_point, crs)                                                                  # Update field for the sewer inlets
+        writefieldsStreetInlets(outListStep_point, aggregatetPoints, crs)                                                # Write to shapefile
+        splitStreetwithInlets(in_street, outListStep_point, aggregatetStreetFile, crs)                                   # Split street network with the sewer inlets
+        updatefieldsPoints(aggregatetStreetFile, crs)                                                                    # Update fields in splitted street and add StreetID, the height to each points is assigned from closest DEM-Point
+        streetVertices = readOutAllStreetVerticesAfterAggregation(aggregatetStreetFile, rasterPoints, rasterSize, crs, demIndex, demFirstMatch == 1)
+        aggregatetPoints = correctCoordinatesAfterClip(aggregatetPoints, streetVertices)                           # Because after ArcGIS Clipping slightly different coordinate endings, change them in aggregatetPoints (different near-analysis)
+        forSNIP, aggregatetPoints = assignStreetVertAggregationMode(aggregatetPoints, streetVertices, minTD)        # Build dictionary with vertexes and save which buildings are connected to which streetInlet
+
+    with timeSection("preprocessing.streetGraph"):
+        drawAllNodes(streetVertices, allNodesPath, crs)                                                                  # Write out all relevant nodes
+        updateFieldNode(allNodesPath, crs)
+        writefieldsAllNodes(allNodesPath, streetVertices, crs)
+        edges = createStreetGraph(aggregatetStreetFile, crs)                                                             # Create list with edges from street network
+        edgeList = addedgesID(edges, streetVertices)                                                                # Assign id and distance to edges
+        streetGraph = appendStreetIDandCreateGraph(edgeList)                                                        # Create graph
+    recordSize("streetGraph.nodes", len(streetGraph))
+    recordSize("aggregatetPoints", len(aggregatetPoints))
+    recordSize("rasterPoints", len(rasterPoints))
+
+    with timeSection("preprocessing.startnode"):
+        aggregatetPoints = assignHighAggregatedNodes(aggregatetPoints, rasterPoints, rasterSize, minTD, demIndex, demFirstMatch == 1)             # Assign High to Aggregated Nodes
+        forSNIP = addBuildingsFarFromRoadTo(aggregatetPoints, forSNIP)                                              # Add all buildings far from the road network
+        _, startnode, startX, startY = densityBasedSelection(aggregatetPoints, tileSize)                            # Select start node with highest density
+
+    prepared = PreparedNetwork(crs, rasterPoints, rasterSize, demIndex, buildPoints, buildings, aggregatetPoints, forSNIP,
+                               streetVertices, edgeList, streetGraph, startnode, startX, startY,
+                               {name: params[name] for name in preprocessingParameters})
+
+    with timeSection("preprocessing.writeIntermediate"):
+        if params["intermediateFormat"] == "txt":
+            writeTotxt(outListFolder, "rasterPoints", rasterPoints)                                                 # Write to .txt files
+            writeTotxt(outListFolder, "rastersize", rasterSizeList)                                                 # Write to .txt files
+            writeTotxt(outListFolder, "buildPoints", buildPoints)                                                   # Write to .txt files
+            writeTotxt(outListFolder, "forSNIP", forSNIP)                                                           # Write to .txt files
+            writeTotxt(outListFolder, "aggregatetPoints", aggregatetPoints)                                         # Write to .txt files
+            writeTotxt(outListFolder, "forSNIP", forSNIP)                                                           # Write to .txt files
+            writeTotxt(outListFolder, "streetVertices", streetVertices)                                             # Write to .txt files
+            writeTotxt(outListFolder, "edgeList", edgeList)                                                         # Write to .txt files
+            writeToDoc(outListFolder, "streetGraph", streetGraph)                                                   # Write to .txt files
+            writeTotxt(outListFolder, "buildings", buildings)                                                       # Write to .txt files
+        else:
+            prepared.save(outListFolder + "preprocessing.npz")                                                      # Write binary checkpoint (load with PreparedNetwork.load)
+    return prepared
+
+
+def solve_snip_model(prepared, params, outListFolder, preparedHash=None):
+    """
+    Runs the SNIP Algorithm on the prepared input and writes out the results. The lists in prepared are changed.
+
+    Input Arguments:
+    prepared            --  Prepared input of SNIP() (PreparedNetwork)
+    params              --  Model parameters (see get_model_parameters)
+    outListFolder       --  Folder for the results (ending with "/")
+    preparedHash        --  content_hash of the prepared input (checked when the solver state is resumed)
+
+    Output Arguments:
+    statistics          --  Statistics of the calculated system
+    """
+    crs, rasterPoints, rasterSize, demIndex = prepared.crs, prepared.rasterPoints, prepared.rasterSize, prepared.demIndex
+    buildPoints, buildings, aggregatetPoints, forSNIP = prepared.buildPoints, prepared.buildings, prepared.aggregatetPoints, prepared.forSNIP
+    streetVertices, edgeList, streetGraph = prepared.streetVertices, prepared.edgeList, prepared.streetGraph
+    startnode, startX, startY = prepared.startnode, prepared.startX, prepared.startY
+
+    EW_Q, discountYearsSewers, operationCosts, fc_SewerCost, tileSize = params["EW_Q"], params["discountYearsSewers"], params["operationCosts"], params["fc_SewerCost"], params["tileSize"]
+    pipeDiameterPrivateSewer, avgTDprivateSewer, drawHouseConnections = params["pipeDiameterPrivateSewer"], params["avgTDprivateSewer"], params["drawHouseConnections"]
+    interestRate = float(params["interestRate"]) / 100.0  # Reformulate real interest rate
 
     # Add parameters into List for SNIP Algorithm
-    InputParameter = [minTD, maxTD, minSlope, f_merge, resonableCostsPerEW, neighborhood, f_street, pricekWh, pumpingYears, discountYearsSewers, interestRate, stricklerC, EW_Q,  wwtpLifespan, operationCosts, pumpInvestmentCosts,  f_topo, fc_SewerCost, fc_wwtpOpex, fc_wwtpCapex]
+    InputParameter, solverOptions = get_input_parameter(params)
+    solverOptions["checkpointKey"] = preparedHash
 
-    outListStep_point = outListFolder + "aggregated_nodes.shp"
     outPathPipes = outListFolder + "sewers.shp"
     outList_nodes = outListFolder + "nodes.shp"
     outList_pumpes = outListFolder + "pumpes.shp"
     outList_WWTPs = outListFolder + "WWTPs.shp"
-    aggregatetStreetFile = outListFolder  + "streetGraph.shp"
-    allNodesPath = outListFolder + "allNodes.shp"
     outPath_StartNode = outListFolder + "startnode.shp"
 
-    # Create .txt files for SNIP Calculation and data preparation
-    buildPoints = readBuildingPoints(buildings, crs)                                                                 # Read out buildings. read ID from Field
-
-    anzNumberOfConnections = len(buildPoints)                                                                   # used for setting new IDs
-    rasterPoints, rasterSize = readRasterPoints(inDHM, anzNumberOfConnections, crs)                                  # Read out DEM
-    rasterSizeList = [rasterSize]                                                                               # Store raster size
-
-    nearPoints = readClosestPointsAggregate(buildings, crs)                                                          # Read the near_X, near_Y -points of the buildings into a list
-    aggregatetPoints, buildings = aggregate(nearPoints, AggregateKritStreet, outListStep_point, minTD, crs)          # Aggregate houses on the street and create point file (sewer inlets).
-    updateFieldStreetInlets(outListStep_point, crs)                                                                  # Update field for the sewer inlets
-    writefieldsStreetInlets(outListStep_point, aggregatetPoints, crs)                                                # Write to shapefile
-    splitStreetwithInlets(in_street, outListStep_point, aggregatetStreetFile, crs)                                   # Split street network with the sewer inlets
-    updatefieldsPoints(aggregatetStreetFile, crs)                                                                    # Update fields in splitted street and add StreetID, the height to each points is assigned from closest DEM-Point
-    streetVertices = readOutAllStreetVerticesAfterAggregation(aggregatetStreetFile, rasterPoints, rasterSize, crs)
-    aggregatetPoints = correctCoordinatesAfterClip(aggregatetPoints, streetVertices)                           # Because after ArcGIS Clipping slightly different coordinate endings, change them in aggregatetPoints (different near-analysis)
-    forSNIP, aggregatetPoints = assignStreetVertAggregationMode(aggregatetPoints, streetVertices, minTD)        # Build dictionary with vertexes and save which buildings are connected to which streetInlet
-    drawAllNodes(streetVertices, allNodesPath, crs)                                                                  # Write out all relevant nodes
-    updateFieldNode(allNodesPath, crs)
-    writefieldsAllNodes(allNodesPath, streetVertices, crs)
-    edges = createStreetGraph(aggregatetStreetFile, crs)                                                             # Create list with edges from street network
-    edgeList = addedgesID(edges, streetVertices)                                                                # Assign id and distance to edges
-    streetGraph = appendStreetIDandCreateGraph(edgeList)                                                        # Create graph
-    aggregatetPoints = assignHighAggregatedNodes(aggregatetPoints, rasterPoints, rasterSize, minTD)             # Assign High to Aggregated Nodes
-    forSNIP = addBuildingsFarFromRoadTo(aggregatetPoints, forSNIP)                                              # Add all buildings far from the road network
-    _, startnode, startX, startY = densityBasedSelection(aggregatetPoints, tileSize)                            # Select start node with highest density
-
     writeTotxt(outListFolder, "inputParameters", InputParameter)                                                # Write to .txt files
-    writeTotxt(outListFolder, "rasterPoints", rasterPoints)                                                     # Write to .txt files
-    writeTotxt(outListFolder, "rastersize", rasterSizeList)                                                     # Write to .txt files
-    writeTotxt(outListFolder, "buildPoints", buildPoints)                                                       # Write to .txt files
-    writeTotxt(outListFolder, "forSNIP", forSNIP)                                                               # Write to .txt files
-    writeTotxt(outListFolder, "aggregatetPoints", aggregatetPoints)                                             # Write to .txt files
-    writeTotxt(outListFolder, "forSNIP", forSNIP)                                                               # Write to .txt files
-    writeTotxt(outListFolder, "streetVertices", streetVertices)                                                 # Write to .txt files
-    writeTotxt(outListFolder, "edgeList", edgeList)                                                             # Write to .txt files
-    writeToDoc(outListFolder, "streetGraph", streetGraph)                                                       # Write to .txt files
-    writeTotxt(outListFolder, "buildings", buildings)                                                           # Write to .txt files
 
     print("...ready for SNIP Calculation")
 
     # Run SNIP
-    ExpansionTime, MergeTime, sewers, pointsPrim, WWTPs, wtpstodraw, pumpList, edgeList, completePumpCosts, completeWWTPCosts, completePublicPipeCosts, totalSystemCosts, buildings, buildPoints, aggregatetPoints = SNIP(0, outListFolder, 1, forSNIP, 1, streetGraph, startnode, edgeList, streetVertices, rasterSize, buildPoints, buildings, rasterPoints, InputParameter, aggregatetPoints)
+    ExpansionTime, MergeTime, sewers, pointsPrim, WWTPs, wtpstodraw, pumpList, edgeList, completePumpCosts, completeWWTPCosts, completePublicPipeCosts, totalSystemCosts, buildings, buildPoints, aggregatetPoints = SNIP(0, outListFolder, 1, forSNIP, 1, streetGraph, startnode, edgeList, streetVertices, rasterSize, buildPoints, buildings, rasterPoints, InputParameter, aggregatetPoints, demIndex, solverOptions)
 
     # Calculate cost of private sewers
-    totCostPrivateSewer = costsPrivateSewers(buildings, buildPoints, pipeDiameterPrivateSewer, avgTDprivateSewer, discountYearsSewers, interestRate, operationCosts, fc_SewerCost) # Calculate costs of Private Sewers
-
-    inputStartNod = [[startnode, startX, startY]]
-    startNodeToDraw = createPolyPoint(inputStartNod, outPath_StartNode, crs)     # Draw the wtps in ArcGIS
-    writeStartnode(outPath_StartNode, startNodeToDraw, crs)                      # Write out startnode
-
-    # Draw the graphs in ArcGIS, DrawHouse Connections
-    list_GIS = primResultGISList(drawHouseConnections, sewers, pointsPrim, streetVertices, buildings, buildPoints, rasterPoints, edgeList)
-    writeOutPipes(outListFolder, "info_pipes", list_GIS)
-
-    createPolyLine(list_GIS, outPathPipes, crs)                              # Draw Pipes in ArcGIS
-    wwtoArDrawn = createPolyPointWWTP(wtpstodraw, outList_WWTPs, crs)        # Draw the wtps in ArcGIS
-
-    if wwtoArDrawn == 1:
-        writeWWTPs(outList_WWTPs, wtpstodraw, crs)
-
-    #Draw the nodes in ArcGIS
-    createPolyPoint(pointsPrim, outList_nodes, crs)
-    writefieldsNodes(outList_nodes, pointsPrim, crs)
-
-    #Draw Pumps
-    draw = createPolyPointPump(pumpList, outList_pumpes, crs)
-    if draw == True:
-        writeFieldNodesPUMPS(outList_pumpes, pumpList, crs)
-
-    # Statistics
-    totCostPrivateSewer = costsPrivateSewers(buildings, buildPoints, pipeDiameterPrivateSewer, avgTDprivateSewer, discountYearsSewers, interestRate, operationCosts, fc_SewerCost) # Calculate costs of Private Sewers
+    with timeSection("outputWriting"):
+        totCostPrivateSewer = costsPrivateSewers(buildings, buildPoints, pipeDiameterPrivateSewer, avgTDprivateSewer, discountYearsSewers, interestRate, operationCosts, fc_SewerCost) # Calculate costs of Private Sewers
+
+        inputStartNod = [[startnode, startX, startY]]
+        startNodeToDraw = createPolyPoint(inputStartNod, outPath_StartNode, crs)     # Draw the wtps in ArcGIS
+        writeStartnode(outPath_StartNode, startNodeToDraw, crs)                      # Write out startnode
+
+        # Draw the graphs in ArcGIS, DrawHouse Connections
+        list_GIS = primResultGISList(drawHouseConnections, sewers, pointsPrim, streetVertices, buildings, buildPoints, rasterPoints, edgeList)
+        writeOutPipes(outListFolder, "info_pipes", list_GIS)
+
+        createPolyLine(list_GIS, outPathPipes, crs)                              # Draw Pipes in ArcGIS
+        wwtoArDrawn = createPolyPointWWTP(wtpstodraw, outList_WWTPs, crs)        # Draw the wtps in ArcGIS
+
+        if wwtoArDrawn == 1:
+            writeWWTPs(outList_WWTPs, wtpstodraw, crs)
+
+        #Draw the nodes in ArcGIS
+        createPolyPoint(pointsPrim, outList_nodes, crs)
+        writefieldsNodes(outList_nodes, pointsPrim, crs)
+
+        #Draw Pumps
+        draw = createPolyPointPump(pumpList, outList_pumpes, crs)
+        if draw == True:
+            writeFieldNodesPUMPS(outList_pumpes, pumpList, crs)
+
+        # Statistics
+        totCostPrivateSewer = costsPrivateSewers(buildings, buildPoints, pipeDiameterPrivateSewer, avgTDprivateSewer, discountYearsSewers, interestRate, operationCosts, fc_SewerCost) # Calculate costs of Private Sewers
+
+        # Sum whole System Costs
+        totSystemCostsNoPrivate = completePumpCosts  + completeWWTPCosts + completePublicPipeCosts
+        totSystemCostsWithPrivate = completePumpCosts  + completeWWTPCosts + completePublicPipeCosts + totCostPrivateSewer
+
+        # Calculate number of neighbours (density)
+        densityRaster, startnode, startX, startY = densityBasedSelection(aggregatetPoints, tileSize)        # Select startnode with highest density
+        for entry in densityRaster:
+            if startX >= densityRaster[entry][0] and startX < (densityRaster[entry][0] + tileSize) and startY > (densityRaster[entry][1] - tileSize) and startY <= densityRaster[entry][1]:
+                nrOfNeighboursDensity = densityRaster[entry][2]
+                break
+
+        # Write out statistics
+        statistics = getStatistics(startnode, sewers, pointsPrim, aggregatetPoints, WWTPs, edgeList, nrOfNeighboursDensity, EW_Q, buildings, buildPoints)
+
+        statistics.append(f"completePumpCosts: {completePumpCosts}")                    # Append costs to statistics.
+        statistics.append(f"completeWWTPCosts: {completeWWTPCosts}")                    # Append costs to statistics.
+        statistics.append(f"completePublicPipeCosts: {completePublicPipeCosts}")              # Append costs to statistics.
+        statistics.append(f"totCostPrivateSewer: {totCostPrivateSewer}")                  # Append costs to statistics.
+        statistics.append(f"totSystemCostsNoPrivate: {totSystemCostsNoPrivate}")              # Append costs to statistics.
+        statistics.append(f"totSystemCostsWithPrivate: {totSystemCostsWithPrivate}")            # Append costs to statistics.
+        writeTotxt(outListFolder, "statistics", statistics)     # Append costs to statistics.
+
+    writeInstrumentationReport(outListFolder + "instrumentation.json")   # Timers and counters of this run
+    resetInstrumentation()
+    return statistics
+
+
+def hash_input_files(in_street, buildings, inDHM, params):
+    """
+    Hash of the input shapefiles (all files of a shapefile) and of the preprocessing parameters.
+
+    Input Arguments:
+    in_street           --  Street shapefile
+    buildings           --  Building shapefile
+    inDHM               --  DEM shapefile
+    params              --  Model parameters
+
+    Output Arguments:
+    inputHash           --  sha256 hex digest (None if the inputs are not files)
+    """
+    inputHash = hashlib.sha256()
+    for path in (in_street, buildings, inDHM):
+        if not isinstance(path, str) or not os.path.isfile(path):
+            return None
+        stem = os.path.splitext(path)[0]
+        for extension in (".shp", ".shx", ".dbf", ".prj", ".cpg"):
+            if os.path.isfile(stem + extension):
+                with open(stem + extension, "rb") as inFile:
+                    inputHash.update(extension.encode())
+                    inputHash.update(hashlib.sha256(inFile.read()).digest())
+    inputHash.update(repr(sorted((name, params[name]) for name in preprocessingParameters)).encode())
+    inputHash.update(str(preparedNetworkVersion).encode())
+    return inputHash.hexdigest()
+
+
+def preprocess(in_street, buildings, inDHM, outListFolder=None, params=None, cacheFolder=None):
+    """
+    Preprocessing stage: Prepares the input of the SNIP Algorithm. If a cache folder is given, the prepared
+    input is stored there and used again for the same input files and preprocessing parameters (the
+    intermediate files of the preprocessing are then not written again).
+
+    Input Arguments:
+    in_street           --  Street shapefile
+    buildings           --  Building shapefile
+    inDHM               --  DEM shapefile
+    outListFolder       --  Folder for the intermediate files (default: SNIP_outputs in the working directory)
+    params              --  Model parameters (see get_model_parameters)
+    cacheFolder         --  Folder with the cached prepared inputs (optional)
+
+    Output Arguments:
+    prepared            --  Prepared input (PreparedNetwork)
+    """
+    if params is None:
+        params = get_model_parameters()
+    if outListFolder is None:
+        outListFolder = os.path.join(os.getcwd(), "SNIP_outputs")
+    outListFolder = outListFolder.replace("\\", "/").rstrip("/") + "/"
+    os.makedirs(outListFolder, exist_ok=True)
 
-    # Sum whole System Costs
-    totSystemCostsNoPrivate = completePumpCosts  + completeWWTPCosts + completePublicPipeCosts
-    totSystemCostsWithPrivate = completePumpCosts  + completeWWTPCosts + completePublicPipeCosts + totCostPrivateSewer
+    inputHash, cachePath = None, None
+    if cacheFolder is not None:
+        inputHash = hash_input_files(in_street, buildings, inDHM, params)
+        if inputHash is not None:
+            os.makedirs(cacheFolder, exist_ok=True)
+            cachePath = os.path.join(cacheFolder, "prepared_" + inputHash + ".npz")
+            if os.path.isfile(cachePath):
+                print("Prepared input is read from cache: " + cachePath)
+                return PreparedNetwork.load(cachePath)
+
+    prepared = preprocess_snip_input(in_street, buildings, inDHM, outListFolder, params)
+    prepared.inputHash = inputHash
+
+    if cachePath is not None:
+        prepared.save(cachePath)
+    return prepared
+
+
+def solve(prepared, params=None, outListFolder=None):
+    """
+    Solve stage: Runs the SNIP Algorithm on a copy of the prepared input (prepared is not changed).
+
+    Input Arguments:
+    prepared            --  Prepared input (PreparedNetwork)
+    params              --  Model parameters (see get_model_parameters)
+    outListFolder       --  Folder for the results (default: SNIP_outputs in the working directory)
+
+    Output Arguments:
+    result              --  Result
+    """
+    if params is None:
+        params = get_model_parameters()
+    for name in preprocessingParameters:
+        if name in prepared.preprocessing and prepared.preprocessing[name] != params[name]:
+            raise Exception("ERROR: Parameter differs from the preprocessing: " + str(name))
+    if outListFolder is None:
+        outListFolder = os.path.join(os.getcwd(), "SNIP_outputs")
+    outListFolder = outListFolder.replace("\\", "/").rstrip("/") + "/"
+    os.makedirs(outListFolder, exist_ok=True)
 
-    # Calculate number of neighbours (density)
-    densityRaster, startnode, startX, startY = densityBasedSelection(aggregatetPoints, tileSize)        # Select startnode with highest density
-    for entry in densityRaster:
-        if startX >= densityRaster[entry][0] and startX < (densityRaster[entry][0] + tileSize) and startY > (densityRaster[entry][1] - tileSize) and startY <= densityRaster[entry][1]:
-            nrOfNeighboursDensity = densityRaster[entry][2]
-            break
+    preparedHash = prepared.content_hash()
+    statistics = solve_snip_model(copy.deepcopy(prepared), params, outListFolder, preparedHash)  # SNIP changes the input lists
+    return Result(params, statistics, outListFolder, preparedHash)
 
-    # Write out statistics
-    statistics = getStatistics(startnode, sewers, pointsPrim, aggregatetPoints, WWTPs, edgeList, nrOfNeighboursDensity, EW_Q, buildings, buildPoints)
 
-    statistics.append(f"completePumpCosts: {completePumpCosts}")                    # Append costs to statistics.
-    statistics.append(f"completeWWTPCosts: {completeWWTPCosts}")                    # Append costs to statistics.
-    statistics.append(f"completePublicPipeCosts: {completePublicPipeCosts}")              # Append costs to statistics.
-    statistics.append(f"totCostPrivateSewer: {totCostPrivateSewer}")                  # Append costs to statistics.
-    statistics.append(f"totSystemCostsNoPrivate: {totSystemCostsNoPrivate}")              # Append costs to statistics.
-    statistics.append(f"totSystemCostsWithPrivate: {totSystemCostsWithPrivate}")            # Append costs to statistics.
-    writeTotxt(outListFolder, "statistics", statistics)     # Append costs to statistics.
+def print_runtime(start):
+    """
+    Calculate and print time required to complete script
 
-    # Calculate and print time required to complete script
+    Input Arguments:
+    start               --  Start time (time.perf_counter())
+    """
     end = time.perf_counter()
     runtime = end - start
 
@@ -250,6 +551,90 @@ def run_snip_model(in_street, buildings, inDHM, outListFolder=None):
         print(f'Runtime: {hours:.2f} hours')
 
 
+def run_snip_model(in_street, buildings, inDHM, outListFolder=None, params=None, cacheFolder=None):
+
+    start = time.perf_counter()  # Start script timer
+    resetInstrumentation()
+
+    # Model parameters (based parameters as in Eggimann et al. 2015 and Jordan et al. in prep)
+    if params is None:
+        params = get_model_parameters()
+
+    prepared = preprocess(in_street, buildings, inDHM, outListFolder, params, cacheFolder)
+    result = solve(prepared, params, outListFolder)
+
+    print_runtime(start)
+    return result.statistics
+
+
+def profile_snip_model(in_street, buildings, inDHM, outListFolder=None, params=None, cacheFolder=None, profileOut=None,
+                       profiler="cprofile", topN=40):
+    """
+    Runs run_snip_model with a profiler and writes the profile and a summary of the hotspots.
+
+    Input Arguments:
+    in_street           --  Street shapefile
+    buildings           --  Building shapefile
+    inDHM               --  DEM shapefile
+    outListFolder       --  Output folder (default: SNIP_outputs in the working directory)
+    params              --  Model parameters (see get_model_parameters)
+    cacheFolder         --  Folder with the cached prepared inputs (optional)
+    profileOut          --  Folder for the profile files (default: outListFolder)
+    profiler            --  "cprofile": snip_profile.prof (cProfile) and snip_profile.txt (top N functions)
+                            "sampling": in addition, a second run with pyinstrument (if installed):
+                            snip_profile.html and snip_profile_sampling.txt (call tree)
+    topN                --  Number of functions in the summary
+
+    Output Arguments:
+    statistics          --  Statistics of the calculated system
+    """
+    if outListFolder is None:
+        outListFolder = os.path.join(os.getcwd(), "SNIP_outputs")
+    if profileOut is None:
+        profileOut = outListFolder
+    os.makedirs(profileOut, exist_ok=True)
+    pathProfile = os.path.join(profileOut, "snip_profile")
+
+    if profiler not in ("cprofile", "sampling"):
+        raise Exception("ERROR: Unknown profiler: " + str(profiler))
+    if profiler == "sampling" and pyinstrument is None:
+        print("pyinstrument is not installed, only cProfile is used")
+        profiler = "cprofile"
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        statistics = run_snip_model(in_street, buildings, inDHM, outListFolder, params, cacheFolder)
+    finally:
+        profile.disable()
+        profile.dump_stats(pathProfile + ".prof")
+
+        # Summary of the hotspots (own time and cumulative time)
+        summary = io.StringIO()
+        profileStats = pstats.Stats(profile, stream=summary).strip_dirs()
+        summary.write("Top " + str(topN) + " functions by own time\n")
+        profileStats.sort_stats("tottime").print_stats(topN)
+        summary.write("Top " + str(topN) + " functions by cumulative time\n")
+        profileStats.sort_stats("cumulative").print_stats(topN)
+        with open(pathProfile + ".txt", "w") as outFile:
+            outFile.write(summary.getvalue())
+
+    if profiler == "sampling":  # Second run, as the sampling profiler cannot run together with cProfile
+        sampler = pyinstrument.Profiler()
+        sampler.start()
+        try:
+            run_snip_model(in_street, buildings, inDHM, outListFolder, params, cacheFolder)
+        finally:
+            sampler.stop()
+            with open(pathProfile + ".html", "w") as outFile:
+                outFile.write(sampler.output_html())
+            with open(pathProfile + "_sampling.txt", "w") as outFile:
+                outFile.write(sampler.output_text(unicode=False, color=False))
+
+    print("Profile written to: " + pathProfile + ".*")
+    return statistics
+
+
 if __name__ == "__main__":
     # === CLI entry point remains ===
     parser = argparse.ArgumentParser()
@@ -257,8 +642,19 @@ if __name__ == "__main__":
     parser.add_argument("--buildings", required=True, help="Building shapefile path")
     parser.add_argument("--dem", required=True, help="DEM shapefile path")
     parser.add_argument("--outdir", required=False, help="Output folder (optional)")
+    parser.add_argument("--cache", required=False, help="Folder to cache the preprocessed input (optional)")
+    parser.add_argument("--checkpoint-iterations", type=int, default=0, help="Save the solver state every N iterations (optional)")
+    parser.add_argument("--checkpoint-seconds", type=float, default=0, help="Save the solver state every T seconds (optional)")
+    parser.add_argument("--resume", action="store_true", help="Continue from the saved solver state in the output folder")
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=("cprofile", "sampling"), help="Profile the run: cprofile (default) or sampling (cProfile and a second run with pyinstrument, optional)")
+    parser.add_argument("--profile-out", required=False, help="Folder for the profile files (default: output folder)")
+    parser.add_argument("--profile-top", type=int, default=40, help="Number of functions in the profile summary")
 
     args = parser.parse_args()
 
-    stats = run_snip_model(args.street, args.buildings, args.dem, args.outdir)
+    params = get_model_parameters(checkpointIterations=args.checkpoint_iterations, checkpointSeconds=args.checkpoint_seconds, resume=int(args.resume))
+    if args.profile or args.profile_out:
+        stats = profile_snip_model(args.street, args.buildings, args.dem, args.outdir, params, args.cache, args.profile_out, args.profile or "cprofile", args.profile_top)
+    else:
+        stats = run_snip_model(args.street, args.buildings, args.dem, args.outdir, params, cacheFolder=args.cache)
     print("\n".join(map(str, stats)))
\ No newline at end of file
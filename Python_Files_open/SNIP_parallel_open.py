@@ -0,0 +1,188 @@
+# ======================================================================================
+# Copyright 2014  Swiss Federal Institute of Aquatic Science and Technology
+#
+# This file is part of SNIP (Sustainable Network Infrastructure Planning)
+# SNIP is used for determining the optimal degree of centralization for waste
+# water infrastructures. You find detailed information about SNIP in Eggimann et al. (2014).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Contact:   sven.eggimann@eawag.ch
+# Version    1.0
+# Date:      1.07.2015
+# Author:     Eggimann Sven
+# ======================================================================================
+# The SNIP model was updated and modified for use in rural Alabama in 2025.
+# For detailed information see Jordan et al. (in prep).
+
+# The model was modified for Python 3.11 to run on open source packages.
+# This module holds the pools used to calculate independent parts of SNIP at the same time.
+# If the execution is sequential, the tasks are calculated immediately when they are submitted,
+# so that the order of the calculations is the same as without a pool. The measurements of the tasks
+# (see SNIP_instrumentation_open) in a process pool are sent back with the results.
+
+# Author:   Mallory Jordan
+# Contact:  maj0082@auburn.edu
+# ======================================================================================
+
+# Imports
+import os
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor, ProcessPoolExecutor
+from SNIP_instrumentation_open import resetInstrumentation, takeInstrumentation, mergeInstrumentation
+
+executionModes = ("sequential", "thread", "process")
+
+
+def createExecutor(execution, workers=0, initializer=None, initargs=()):
+    """
+    This function creates the pool for the calculations.
+
+    Input Arguments:
+    execution       --    sequential: no pool, thread: thread pool, process: process pool
+    workers         --    Number of workers (0: number of cpus)
+    initializer     --    Function called once in each worker, e.g. to hand over static input (None: no initialisation)
+    initargs        --    Arguments of the initializer (sent once to each worker)
+
+    Output Arguments:
+    executor        --    Pool (None if sequential)
+    """
+    if execution not in executionModes:
+        raise Exception("ERROR: Unknown execution mode: " + str(execution))
+
+    if workers == 0:
+        workers = os.cpu_count() or 1
+
+    if execution == "thread":
+        return ThreadPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs)
+    elif execution == "process":
+        return ProcessPoolExecutor(max_workers=workers, initializer=initMeasuredWorker, initargs=(initializer, initargs))
+    else:
+        return None
+
+
+def initMeasuredWorker(initializer, initargs):
+    """
+    This function initialises a worker process: the measurements copied from the calling process are deleted
+    (see runMeasuredTask) before the initializer is called.
+
+    Input Arguments:
+    initializer     --    Function called once in each worker (None: no initialisation)
+    initargs        --    Arguments of the initializer
+    """
+    resetInstrumentation()
+    if initializer is not None:
+        initializer(*initargs)
+    return
+
+
+def runMeasuredTask(function, *args):
+    """
+    This function calculates a task in a worker process and returns the measurements of the worker since the last
+    task (see takeInstrumentation) with the result.
+
+    Input Arguments:
+    function        --    Function to calculate
+    args            --    Arguments of the function
+
+    Output Arguments:
+    result          --    Result of the function
+    measurements    --    Measurements of the worker
+    """
+    result = function(*args)
+    return result, takeInstrumentation()
+
+
+def submitTask(executor, function, *args):
+    """
+    This function submits a task to the pool. Without a pool, the task is calculated immediately.
+    Functions and arguments need to be picklable for a process pool. The measurements of a task in a process pool
+    are added to the measurements of this process when the task is finished (see runMeasuredTask).
+
+    Input Arguments:
+    executor        --    Pool (or None)
+    function        --    Function to calculate
+    args            --    Arguments of the function
+
+    Output Arguments:
+    future          --    Future with the result of the function
+    """
+    if isinstance(executor, ProcessPoolExecutor):
+        workerFuture = executor.submit(runMeasuredTask, function, *args)
+        future = Future()
+
+        def transferResult(workerFuture):
+            if future.cancelled():
+                return
+            try:
+                result, measurements = workerFuture.result()
+                mergeInstrumentation(measurements)
+                future.set_result(result)
+            except InvalidStateError:  # Cancelled in the meantime
+                pass
+            except BaseException as error:
+                try:
+                    future.set_exception(error)
+                except InvalidStateError:
+                    pass
+
+        future.add_done_callback(lambda future: future.cancelled() and workerFuture.cancel())
+        workerFuture.add_done_callback(transferResult)
+        return future
+    elif executor is not None:
+        return executor.submit(function, *args)
+
+    future = Future()
+    future.set_result(function(*args))
+    return future
+
+
+def getNrOfWorkers(executor):
+    """
+    This function returns the number of workers of the pool.
+
+    Input Arguments:
+    executor        --    Pool (or None)
+
+    Output Arguments:
+    workers         --    Number of workers (1 without pool)
+    """
+    if executor is None:
+        return 1
+    return executor._max_workers
+
+
+def shutdownExecutor(executor):
+    """
+    This function closes the pool. Tasks which are not yet started are cancelled.
+
+    Input Arguments:
+    executor        --    Pool (or None)
+    """
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def sharesMemory(executor):
+    """
+    This function checks whether the tasks of a pool are calculated in the memory of the calling process
+    (no pool or thread pool). The arguments of tasks in a process pool are copied to the worker with each task,
+    so tasks with the large lists of SNIP (nodes, edges, sewers) are only faster in a pool sharing the memory.
+
+    Input Arguments:
+    executor        --    Pool (or None)
+
+    Output Arguments:
+    shared          --    True if the arguments are not copied
+    """
+    return not isinstance(executor, ProcessPoolExecutor)
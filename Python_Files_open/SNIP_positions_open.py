@@ -0,0 +1,263 @@
+# ======================================================================================
+# Copyright 2014  Swiss Federal Institute of Aquatic Science and Technology
+#
+# This file is part of SNIP (Sustainable Network Infrastructure Planning)
+# SNIP is used for determining the optimal degree of centralization for waste
+# water infrastructures. You find detailed information about SNIP in Eggimann et al. (2014).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Contact:   sven.eggimann@eawag.ch
+# Version    1.0
+# Date:      1.07.2015
+# Author:     Eggimann Sven
+# ======================================================================================
+# The SNIP model was updated and modified for use in rural Alabama in 2025.
+# For detailed information see Jordan et al. (in prep).
+
+# The model was modified for Python 3.11 to run on open source packages.
+# This module holds the positions of the nodes and edges in their lists and the changes of the
+# edges of an option. New nodes and edges are appended to the lists and the lists of the options
+# are copies in the same order, so the positions are only read out for the appended entries.
+# An option does not copy the edge list: the changed and added edges are stored by position and
+# written to the edge list when the option is selected (see applyEdgeChanges).
+
+# Author:   Mallory Jordan
+# Contact:  maj0082@auburn.edu
+# ======================================================================================
+
+
+def createPositionIndex():
+    """
+    This function creates the index of the positions of the nodes and edges.
+
+    Output Arguments:
+    positionIndex       --    Dictionary with the positions of the nodes by ID, the positions of the edges by the IDs
+                              of their nodes (both directions), the edge list which is indexed and the number of read
+                              nodes and edges
+    """
+    return {"nodes": {}, "nrOfReadNodes": 0, "edges": {}, "nrOfReadEdges": 0, "edgeList": None}
+
+
+def readNodePositions(positionIndex, nodes, rebuild=False):
+    """
+    This function adds the positions of the nodes which are not yet read (the first entry of an ID is used).
+
+    Input Arguments:
+    positionIndex       --    Position index
+    nodes               --    Nodes
+    rebuild             --    If True, all nodes are read again
+    """
+    positions = positionIndex["nodes"]
+    if rebuild or positionIndex["nrOfReadNodes"] > len(nodes):
+        positions.clear()
+        positionIndex["nrOfReadNodes"] = 0
+    for pos in range(positionIndex["nrOfReadNodes"], len(nodes)):
+        positions.setdefault(nodes[pos][0], pos)
+    positionIndex["nrOfReadNodes"] = len(nodes)
+    return
+
+
+def getNodePosition(positionIndex, nodes, ID):
+    """
+    This function returns the position of a node (same as getTrenchDepth, the first entry with the ID is used).
+
+    Input Arguments:
+    positionIndex       --    Position index
+    nodes               --    Nodes (or a copy of the nodes in the same order)
+    ID                  --    ID
+
+    Output Arguments:
+    pos                 --    Position of the node (None if the node is not in nodes)
+    """
+    pos = positionIndex["nodes"].get(ID)
+    if pos is None or pos >= len(nodes) or nodes[pos][0] != ID:
+        readNodePositions(positionIndex, nodes, rebuild=pos is not None)
+        pos = positionIndex["nodes"].get(ID)
+        if pos is not None and nodes[pos][0] != ID:  # Nodes in another order
+            readNodePositions(positionIndex, nodes, rebuild=True)
+            pos = positionIndex["nodes"].get(ID)
+    return pos
+
+
+def readEdgePositions(positionIndex, edgeList):
+    """
+    This function adds the positions of the edges which are not yet read (the first edge between two nodes is used).
+    If another edge list is indexed, all edges are read again.
+
+    Input Arguments:
+    positionIndex       --    Position index
+    edgeList            --    Edges
+    """
+    positions = positionIndex["edges"]
+    if positionIndex["edgeList"] is not edgeList or positionIndex["nrOfReadEdges"] > len(edgeList):
+        positions.clear()
+        positionIndex["nrOfReadEdges"], positionIndex["edgeList"] = 0, edgeList
+    for pos in range(positionIndex["nrOfReadEdges"], len(edgeList)):
+        edge = edgeList[pos]
+        positions.setdefault((edge[0][0], edge[1][0]), pos)
+        positions.setdefault((edge[1][0], edge[0][0]), pos)
+    positionIndex["nrOfReadEdges"] = len(edgeList)
+    return
+
+
+def updatePositionIndex(positionIndex, nodes, edgeList):
+    """
+    This function reads the positions of the nodes and edges added since the last update. The index is updated
+    before the options are calculated in a pool, so that the options only read the index.
+
+    Input Arguments:
+    positionIndex       --    Position index
+    nodes               --    Nodes
+    edgeList            --    Edges
+    """
+    readNodePositions(positionIndex, nodes)
+    readEdgePositions(positionIndex, edgeList)
+    return
+
+
+def createEdgeChanges(edgeList, positionIndex):
+    """
+    This function creates the changes of the edges of an option.
+
+    Input Arguments:
+    edgeList            --    Edges
+    positionIndex       --    Position index (the edge list is indexed if needed)
+
+    Output Arguments:
+    edgeChanges         --    Dictionary with the edge list, the position index, the changed and added edges by
+                              position and the positions of the added edges
+    """
+    readEdgePositions(positionIndex, edgeList)
+    return {"edgeList": edgeList, "positionIndex": positionIndex, "edges": {}, "added": {},
+            "baseLength": len(edgeList), "length": len(edgeList)}
+
+
+def copyEdgeChanges(edgeChanges):
+    """
+    This function copies the changes of the edges (the changed edges are copied as well).
+
+    Input Arguments:
+    edgeChanges         --    Changes of the edges
+
+    Output Arguments:
+    edgeChangesCopy     --    Copy of the changes
+    """
+    return {"edgeList": edgeChanges["edgeList"], "positionIndex": edgeChanges["positionIndex"],
+            "edges": {pos: list(edge) for pos, edge in edgeChanges["edges"].items()},
+            "added": dict(edgeChanges["added"]), "baseLength": edgeChanges["baseLength"],
+            "length": edgeChanges["length"]}
+
+
+def getEdgePosition(edgeChanges, ID0, ID1):
+    """
+    This function returns the position of the edge between two nodes (in any direction).
+
+    Input Arguments:
+    edgeChanges         --    Changes of the edges
+    ID0, ID1            --    IDs of the nodes
+
+    Output Arguments:
+    pos                 --    Position of the edge (None if there is no edge between the nodes)
+    """
+    pos = edgeChanges["added"].get((ID0, ID1))
+    if pos is not None:
+        return pos
+
+    positionIndex, edgeList = edgeChanges["positionIndex"], edgeChanges["edgeList"]
+    readEdgePositions(positionIndex, edgeList)
+    pos = positionIndex["edges"].get((ID0, ID1))
+    if pos is not None and pos < len(edgeList) and {edgeList[pos][0][0], edgeList[pos][1][0]} != {ID0, ID1}:
+        positionIndex["edgeList"] = None  # Edges were replaced: read all edges again
+        readEdgePositions(positionIndex, edgeList)
+        pos = positionIndex["edges"].get((ID0, ID1))
+    return pos
+
+
+def readEdge(edgeChanges, pos):
+    """
+    This function returns the edge at a position (changed edge or edge of the edge list).
+
+    Input Arguments:
+    edgeChanges         --    Changes of the edges
+    pos                 --    Position
+
+    Output Arguments:
+    edge                --    Edge (not to be changed, see writeEdge)
+    """
+    edge = edgeChanges["edges"].get(pos)
+    if edge is None:
+        edge = edgeChanges["edgeList"][pos]
+    return edge
+
+
+def writeEdge(edgeChanges, pos):
+    """
+    This function returns the edge at a position which can be changed. The edge of the edge list is copied
+    the first time it is changed.
+
+    Input Arguments:
+    edgeChanges         --    Changes of the edges
+    pos                 --    Position
+
+    Output Arguments:
+    edge                --    Changed edge
+    """
+    edges = edgeChanges["edges"]
+    edge = edges.get(pos)
+    if edge is None:
+        edge = list(edgeChanges["edgeList"][pos])
+        edges[pos] = edge
+    return edge
+
+
+def appendEdge(edgeChanges, edge):
+    """
+    This function adds an edge.
+
+    Input Arguments:
+    edgeChanges         --    Changes of the edges
+    edge                --    New edge
+
+    Output Arguments:
+    pos                 --    Position of the new edge
+    """
+    pos = edgeChanges["length"]
+    edgeChanges["edges"][pos] = edge
+    edgeChanges["added"].setdefault((edge[0][0], edge[1][0]), pos)
+    edgeChanges["added"].setdefault((edge[1][0], edge[0][0]), pos)
+    edgeChanges["length"] += 1
+    return pos
+
+
+def applyEdgeChanges(edgeChanges):
+    """
+    This function writes the changes of the edges to the edge list (if the option is selected).
+
+    Input Arguments:
+    edgeChanges         --    Changes of the edges
+
+    Output Arguments:
+    edgeList            --    Edge list with the changed and added edges
+    """
+    edgeList, edges = edgeChanges["edgeList"], edgeChanges["edges"]
+    if edgeChanges["length"] > edgeChanges["baseLength"] and len(edgeList) != edgeChanges["baseLength"]:
+        raise Exception("ERROR: Edges were added to the edge list after the changes of the option.")
+
+    for pos in sorted(edges):
+        if pos < len(edgeList):
+            edgeList[pos] = edges[pos]
+        else:
+            edgeList.append(edges[pos])
+    return edgeList
@@ -0,0 +1,530 @@
+# ======================================================================================
+# Copyright 2014  Swiss Federal Institute of Aquatic Science and Technology
+#
+# This file is part of SNIP (Sustainable Network Infrastructure Planning)
+# SNIP is used for determining the optimal degree of centralization for waste
+# water infrastructures. You find detailed information about SNIP in Eggimann et al. (2014).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# The Djikstra and a* algorithm are adapted from Hetland (2010).
+#
+# Hetland M.L. (2010): Python Algorithms. Mastering Basic Algorithms in the Python Language. apress.
+#
+# Contact:   sven.eggimann@eawag.ch
+# Version    1.0
+# Date:      1.07.2015
+# Author:     Eggimann Sven
+# ======================================================================================
+# The SNIP model was updated and modified for use in rural Alabama in 2025.
+# For detailed information see Jordan et al. (in prep).
+
+# The model was modified for Python 3.11 to run on open source packages.
+# This module holds the Djikstra and a* algorithm on graphs in CSR form (integer indexed arrays).
+# The graphs are searched in the same order as with the original list based algorithms, so that
+# the same paths are found. Optionally, the searches are compiled with numba or the Djikstra search
+# is run with scipy.sparse.csgraph.
+
+# Author:   Mallory Jordan
+# Contact:  maj0082@auburn.edu
+# ======================================================================================
+
+# Imports
+import heapq, math, os, pickle
+import numpy as np
+
+try:
+    import numba                                        # Optional: compiled a* and Djikstra
+except ImportError:
+    numba = None
+
+try:
+    from scipy.sparse import csr_matrix                 # Optional: Djikstra of scipy
+    from scipy.sparse.csgraph import dijkstra as csgraphDijkstra
+except ImportError:
+    csr_matrix, csgraphDijkstra = None, None
+
+routingBackends = ("legacy", "python", "numba", "scipy", "auto")
+
+
+def resolveRoutingBackend(backend):
+    """
+    This function selects the routing backend. If the package of a backend is not installed, the pure python
+    backend is used.
+
+    Input Arguments:
+    backend         --    legacy:   original list based algorithms
+                          python:   heap based search on CSR arrays (same paths as legacy)
+                          numba:    compiled heap based search on CSR arrays (same paths as legacy)
+                          scipy:    Djikstra of scipy.sparse.csgraph (paths can differ if two paths have exactly the same length), a* as python
+                          auto:     numba if installed, otherwise scipy if installed, otherwise python
+
+    Output Arguments:
+    backend         --    Backend which is used
+    """
+    if backend not in routingBackends:
+        raise Exception("ERROR: Unknown routing backend: " + str(backend))
+
+    if backend == "auto":
+        if numba is not None:
+            return "numba"
+        if csgraphDijkstra is not None:
+            return "scipy"
+        return "python"
+
+    if backend == "numba" and numba is None:
+        print("numba is not installed. The python routing backend is used.")
+        return "python"
+
+    if backend == "scipy" and csgraphDijkstra is None:
+        print("scipy is not installed. The python routing backend is used.")
+        return "python"
+    return backend
+
+
+def streetGraphToCSR(streetNetwork):
+    """
+    This function converts the street graph (dictionary) into CSR arrays. The order of the nodes and of
+    the neighbours is the same as in the dictionary.
+
+    Input Arguments:
+    streetNetwork     --    Street graph. Form: {ID: {neighbourID: distance}}
+
+    Output Arguments:
+    csrGraph          --    Dictionary with ids (list), index (ID -> index), indptr, indices, weights
+    """
+    ids = list(streetNetwork)
+    index = {ID: nr for nr, ID in enumerate(ids)}
+    indptr, indices, weights = [0], [], []
+
+    for ID in list(ids):
+        for neighbour, distanz in streetNetwork[ID].items():
+            if neighbour not in index:  # Node without own entry in the graph
+                index[neighbour] = len(ids)
+                ids.append(neighbour)
+            indices.append(index[neighbour])
+            weights.append(distanz)
+        indptr.append(len(indices))
+
+    indptr += [len(indices)] * (len(ids) + 1 - len(indptr))
+    csrGraph = {
+        "ids": ids,
+        "index": index,
+        "indptr": np.array(indptr, dtype=np.int64),
+        "indices": np.array(indices, dtype=np.int64),
+        "weights": np.array(weights, dtype=float)}
+    return csrGraph
+
+
+def createRoutingContext(streetNetwork, backend="python"):
+    """
+    This function creates the routing context of a SNIP run. The street graph is exported to CSR arrays
+    once and only exported again after it was changed (see updateRoutingContext).
+
+    Input Arguments:
+    streetNetwork     --    Street graph
+    backend           --    Routing backend (see resolveRoutingBackend)
+
+    Output Arguments:
+    routing           --    Routing context
+    """
+    return {"backend": resolveRoutingBackend(backend), "streetNetwork": streetNetwork, "csr": None, "version": 0}
+
+
+def updateRoutingContext(routing, streetNetwork):
+    """
+    This function marks the street graph as changed (e.g. after a* edges were added).
+
+    Input Arguments:
+    routing           --    Routing context
+    streetNetwork     --    Changed street graph
+    """
+    if routing is not None:
+        routing["streetNetwork"], routing["csr"] = streetNetwork, None
+        routing["version"] += 1
+    return
+
+
+def freezeRoutingContext(routing):
+    """
+    This function returns a copy of the routing context which only holds the CSR arrays of the current
+    street graph. The copy can be searched in another thread or process while the street graph is changed.
+    Not possible for the legacy backend (which searches the street graph itself).
+
+    Input Arguments:
+    routing           --    Routing context
+
+    Output Arguments:
+    frozenRouting     --    Routing context with the CSR arrays of the current version of the street graph
+    """
+    if routing["backend"] == "legacy":
+        raise Exception("ERROR: The routing context of the legacy backend cannot be frozen.")
+
+    frozenRouting = routing.get("frozen")
+    if frozenRouting is None or frozenRouting["version"] != routing["version"]:
+        csrGraph = getStreetCSR(routing)
+        frozenGraph = {"ids": csrGraph["ids"], "index": csrGraph["index"], "indptr": csrGraph["indptr"],
+                       "indices": csrGraph["indices"], "weights": csrGraph["weights"]}
+        frozenRouting = {"backend": routing["backend"], "streetNetwork": None, "csr": frozenGraph,
+                         "version": routing["version"]}
+        routing["frozen"] = frozenRouting  # Same copy until the street graph is changed
+    return frozenRouting
+
+
+def getFrozenRoutingPath(folder, version):
+    """
+    This function returns the path of the file of a frozen routing context (see saveFrozenRouting).
+
+    Input Arguments:
+    folder            --    Folder of the frozen routing contexts
+    version           --    Version of the street graph
+
+    Output Arguments:
+    pathRouting       --    Path of the file
+    """
+    return os.path.join(folder, "routing_" + str(version) + ".pkl")
+
+
+def saveFrozenRouting(frozenRouting, folder):
+    """
+    This function writes a frozen routing context to a file, so that the workers of a process pool read the
+    CSR arrays once per version of the street graph instead of receiving them with each task.
+
+    Input Arguments:
+    frozenRouting     --    Frozen routing context (see freezeRoutingContext)
+    folder            --    Folder of the frozen routing contexts
+    """
+    pathRouting = getFrozenRoutingPath(folder, frozenRouting["version"])
+    with open(pathRouting + ".tmp", "wb") as f:
+        pickle.dump(frozenRouting, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(pathRouting + ".tmp", pathRouting)  # Complete file only
+
+
+def loadFrozenRouting(folder, version):
+    """
+    This function reads a frozen routing context (see saveFrozenRouting).
+
+    Input Arguments:
+    folder            --    Folder of the frozen routing contexts
+    version           --    Version of the street graph
+
+    Output Arguments:
+    frozenRouting     --    Frozen routing context
+    """
+    with open(getFrozenRoutingPath(folder, version), "rb") as f:
+        return pickle.load(f)
+
+
+def getStreetCSR(routing):
+    """
+    This function returns the CSR arrays of the street graph of a routing context.
+
+    Input Arguments:
+    routing           --    Routing context
+
+    Output Arguments:
+    csrGraph          --    Street graph in CSR form
+    """
+    if routing["csr"] is None:
+        routing["csr"] = streetGraphToCSR(routing["streetNetwork"])
+    return routing["csr"]
+
+
+def shortestPathsCSR(csrGraph, source, targets, backend):
+    """
+    Djikstra Algorithm on a graph in CSR form. The search stops as soon as all targets are reached.
+
+    Input Arguments:
+    csrGraph          --    Graph in CSR form
+    source            --    Index of the start node
+    targets           --    Indices of the target nodes (if empty, the distances to all nodes are calculated)
+    backend           --    python, numba or scipy
+
+    Output Arguments:
+    D                 --    Distances to the reached nodes (dictionary for python, otherwise array with inf if not reached)
+    P                 --    Predecessor of the reached nodes (dictionary for python, otherwise array)
+    """
+    indptr, indices, weights = csrGraph["indptr"], csrGraph["indices"], csrGraph["weights"]
+
+    if backend == "numba":
+        isTarget = np.zeros(len(indptr) - 1, dtype=np.bool_)
+        isTarget[list(targets)] = True
+        return dijkstraKernel(indptr, indices, weights, source, isTarget, int(isTarget.sum()))
+
+    if backend == "scipy":
+        nrOfNodes = len(indptr) - 1
+        matrix = csr_matrix((weights, indices, indptr), shape=(nrOfNodes, nrOfNodes))
+        D, P = csgraphDijkstra(matrix, indices=source, return_predecessors=True)
+        P[P < 0] = -1
+        return D, P
+
+    # Pure python: Same order of the nodes as in the original Djikstra algorithm (ties in order of insertion)
+    indptr, indices, weights = csrGraph.setdefault("lists", (indptr.tolist(), indices.tolist(), weights.tolist()))
+    inf = float('inf')
+    D, P, S = {source: 0}, {}, set()
+    Q, cnt, remaining = [(0, 0, source)], 1, set(targets)
+
+    while Q:
+        _, _, u = heapq.heappop(Q)
+        if u in S: continue                                       # Already visited? Skip it
+        S.add(u)
+        if remaining:
+            remaining.discard(u)
+            if not remaining:                                     # All targets found
+                break
+        du = D[u]
+        for k in range(indptr[u], indptr[u + 1]):                 # Relax the out-edges
+            v, d = indices[k], du + weights[k]
+            if d < D.get(v, inf):
+                D[v], P[v] = d, u
+                heapq.heappush(Q, (d, cnt, v))
+                cnt += 1
+    return D, P
+
+
+def readPathCSR(csrGraph, D, P, source, target):
+    """
+    This function reads out the path of a Djikstra search on CSR arrays. The distances along the path are
+    summed up again from the start so that they are the same as with the original algorithm.
+
+    Input Arguments:
+    csrGraph          --    Graph in CSR form
+    D, P              --    Distances and predecessors of the search (dictionaries or arrays)
+    source, target    --    Index of start and end node
+
+    Output Arguments:
+    path              --    Path as node IDs from end to start (as writePath)
+    distances         --    Distances from the start to each node of the path
+    """
+    if isinstance(D, dict):
+        reached = target in D
+    else:
+        reached = D[target] != np.inf
+    if not reached:
+        raise KeyError(csrGraph["ids"][target])
+
+    ids, streetPath = csrGraph["ids"], [target]
+    while streetPath[-1] != source:
+        streetPath.append(int(P[streetPath[-1]]))
+
+    # Sum up distances from start
+    indptr, indices, weights = csrGraph.setdefault("lists", (csrGraph["indptr"].tolist(), csrGraph["indices"].tolist(), csrGraph["weights"].tolist()))
+    distances, distanz = {ids[source]: 0}, 0
+    for u, v in zip(streetPath[::-1][:-1], streetPath[::-1][1:]):
+        for k in range(indptr[u], indptr[u + 1]):
+            if indices[k] == v:
+                distanz = distanz + weights[k]
+                break
+        distances[ids[v]] = distanz
+    return [ids[u] for u in streetPath], distances
+
+
+def routeStreetNetwork(routing, idp0, idp1):
+    """
+    This function searches the shortest path between two nodes on the street network.
+
+    Input Arguments:
+    routing           --    Routing context
+    idp0, idp1        --    Start node, end node
+
+    Output Arguments:
+    path              --    Path as node IDs from end to start (as writePath)
+    distances         --    Distances from the start to each node of the path
+
+    Raises KeyError if there is no path (as the original algorithm)
+    """
+    csrGraph = getStreetCSR(routing)
+    source, target = csrGraph["index"][idp0], csrGraph["index"][idp1]
+
+    if source == target:
+        return [idp1], {idp0: 0}
+
+    D, P = shortestPathsCSR(csrGraph, source, [target], routing["backend"])
+    return readPathCSR(csrGraph, D, P, source, target)
+
+
+def routeStreetNetworkToMany(routing, idp0, targetIDs):
+    """
+    This function searches the shortest paths from one node to several nodes of the street network
+    with a single search, which stops when all targets are reached.
+
+    Input Arguments:
+    routing           --    Routing context
+    idp0              --    Start node
+    targetIDs         --    End nodes
+
+    Output Arguments:
+    paths             --    Dictionary with the path and the distances (as routeStreetNetwork) for each end node.
+                            End nodes which cannot be reached are missing.
+    """
+    csrGraph = getStreetCSR(routing)
+    if idp0 not in csrGraph["index"]:
+        return {}
+    source = csrGraph["index"][idp0]
+    targets = [csrGraph["index"][idp1] for idp1 in targetIDs if idp1 in csrGraph["index"]]
+
+    D, P = shortestPathsCSR(csrGraph, source, [target for target in targets if target != source], routing["backend"])
+
+    paths = {}
+    for target in targets:
+        idp1 = csrGraph["ids"][target]
+        if target == source:
+            paths[idp1] = ([idp1], {idp0: 0})
+            continue
+        try:
+            paths[idp1] = readPathCSR(csrGraph, D, P, source, target)
+        except KeyError:
+            continue
+    return paths
+
+
+def aStarCSR(csrGraph, start, goal, endX, endY, backend):
+    """
+    A-Star Algorithm on a DEM graph in CSR form. The nodes are visited in the same order as in aStarAlgorithm.
+
+    Input Arguments:
+    csrGraph          --    DEM graph in CSR form (see createDEMGraphArrays)
+    start, goal       --    Index of start and end node
+    endX, endY        --    End Coordinate
+    backend           --    python, numba (scipy has no a*, the python algorithm is used)
+
+    Output Arguments:
+    backPath          --    Shortest path as node indices from end to start. [start, goal] if no path is found.
+    """
+    heuristic = [math.hypot(x - endX, y - endY) for x, y in zip(csrGraph["xs"].tolist(), csrGraph["ys"].tolist())]
+
+    if backend == "numba":
+        P, found = aStarKernel(csrGraph["indptr"], csrGraph["indices"], csrGraph["weights"], np.array(heuristic), start, goal)
+        P = P.tolist()
+    else:
+        indptr, indices, weights = csrGraph["indptr"].tolist(), csrGraph["indices"].tolist(), csrGraph["weights"].tolist()
+        P, Q, cnt, found = {}, [(heuristic[start], 0, -1, start)], 1, False
+
+        while Q:
+            d, _, p, u = heapq.heappop(Q)
+            if u in P: continue                                   # Already visited? Skip it
+            P[u] = p                                              # Set path predecessor
+            if u == goal:
+                found = True
+                break
+            hu = heuristic[u]
+            for k in range(indptr[u], indptr[u + 1]):             # Go through all neighbors
+                v = indices[k]
+                if v in P: continue
+                heapq.heappush(Q, (d + (weights[k] - hu + heuristic[v]), cnt, u, v))
+                cnt += 1
+
+    if not found or goal == start:
+        return [start, goal]                                      # No path was found
+
+    backPath = [goal]
+    while backPath[-1] != start:
+        backPath.append(P[backPath[-1]])
+    return backPath
+
+
+if numba is not None:
+
+    @numba.njit(cache=True)
+    def heapPush(keys, orders, values, preds, size, key, order, value, pred):
+        """Push an entry into the binary heap (sorted by key and insertion order)."""
+        pos = size
+        keys[pos], orders[pos], values[pos], preds[pos] = key, order, value, pred
+        while pos > 0:
+            parent = (pos - 1) // 2
+            if keys[parent] < keys[pos] or (keys[parent] == keys[pos] and orders[parent] < orders[pos]):
+                break
+            keys[parent], keys[pos] = keys[pos], keys[parent]
+            orders[parent], orders[pos] = orders[pos], orders[parent]
+            values[parent], values[pos] = values[pos], values[parent]
+            preds[parent], preds[pos] = preds[pos], preds[parent]
+            pos = parent
+        return size + 1
+
+    @numba.njit(cache=True)
+    def heapPop(keys, orders, values, preds, size):
+        """Remove the smallest entry of the binary heap."""
+        key, value, pred = keys[0], values[0], preds[0]
+        size -= 1
+        keys[0], orders[0], values[0], preds[0] = keys[size], orders[size], values[size], preds[size]
+        pos = 0
+        while True:
+            left, smallest = 2 * pos + 1, pos
+            for child in (left, left + 1):
+                if child < size and (keys[child] < keys[smallest] or (keys[child] == keys[smallest] and orders[child] < orders[smallest])):
+                    smallest = child
+            if smallest == pos:
+                break
+            keys[smallest], keys[pos] = keys[pos], keys[smallest]
+            orders[smallest], orders[pos] = orders[pos], orders[smallest]
+            values[smallest], values[pos] = values[pos], values[smallest]
+            preds[smallest], preds[pos] = preds[pos], preds[smallest]
+            pos = smallest
+        return key, value, pred, size
+
+    @numba.njit(cache=True)
+    def dijkstraKernel(indptr, indices, weights, source, isTarget, nrOfTargets):
+        """Compiled Djikstra algorithm (see shortestPathsCSR)."""
+        nrOfNodes = len(indptr) - 1
+        D, P = np.full(nrOfNodes, np.inf), np.full(nrOfNodes, -1, dtype=np.int64)
+        visited = np.zeros(nrOfNodes, dtype=np.bool_)
+        capacity = len(indices) + 1
+        keys, orders = np.empty(capacity), np.empty(capacity, dtype=np.int64)
+        values, preds = np.empty(capacity, dtype=np.int64), np.empty(capacity, dtype=np.int64)
+        D[source] = 0.0
+        size = heapPush(keys, orders, values, preds, 0, 0.0, 0, source, -1)
+        cnt, remaining = 1, nrOfTargets
+
+        while size > 0:
+            _, u, _, size = heapPop(keys, orders, values, preds, size)
+            if visited[u]:
+                continue
+            visited[u] = True
+            if isTarget[u]:
+                remaining -= 1
+                if remaining == 0:
+                    break
+            for k in range(indptr[u], indptr[u + 1]):
+                v, d = indices[k], D[u] + weights[k]
+                if d < D[v]:
+                    D[v], P[v] = d, u
+                    size = heapPush(keys, orders, values, preds, size, d, cnt, v, u)
+                    cnt += 1
+        return D, P
+
+    @numba.njit(cache=True)
+    def aStarKernel(indptr, indices, weights, heuristic, start, goal):
+        """Compiled a* algorithm (see aStarCSR)."""
+        nrOfNodes = len(indptr) - 1
+        P = np.full(nrOfNodes, -2, dtype=np.int64)          # -2: not visited
+        capacity = len(indices) + 1
+        keys, orders = np.empty(capacity), np.empty(capacity, dtype=np.int64)
+        values, preds = np.empty(capacity, dtype=np.int64), np.empty(capacity, dtype=np.int64)
+        size = heapPush(keys, orders, values, preds, 0, heuristic[start], 0, start, -1)
+        cnt = 1
+
+        while size > 0:
+            d, u, p, size = heapPop(keys, orders, values, preds, size)
+            if P[u] != -2:
+                continue
+            P[u] = p
+            if u == goal:
+                return P, True
+            for k in range(indptr[u], indptr[u + 1]):
+                v = indices[k]
+                if P[v] != -2:
+                    continue
+                size = heapPush(keys, orders, values, preds, size, d + (weights[k] - heuristic[u] + heuristic[v]), cnt, v, u)
+                cnt += 1
+        return P, False
@@ -0,0 +1,199 @@
+# ======================================================================================
+# Copyright 2014  Swiss Federal Institute of Aquatic Science and Technology
+#
+# This file is part of SNIP (Sustainable Network Infrastructure Planning)
+# SNIP is used for determining the optimal degree of centralization for waste
+# water infrastructures. You find detailed information about SNIP in Eggimann et al. (2014).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Contact:   sven.eggimann@eawag.ch
+# Version    1.0
+# Date:      1.07.2015
+# Author:     Eggimann Sven
+# ======================================================================================
+# The SNIP model was updated and modified for use in rural Alabama in 2025.
+# For detailed information see Jordan et al. (in prep).
+
+# The model was modified for Python 3.11 to run on open source packages.
+# This module holds the drain roots of the sewer network: for each node the wwtp to which it
+# flows (the end of the sewers followed downstream). The sewers are changed in many places of
+# SNIP, so the changes are read out by comparing the sewers with the state of the last update.
+# Only the roots of the changed nodes and of the nodes flowing to them are calculated again.
+# Each sewer network (dictionary) has its own state, so that switching between the sewers and
+# their copies (e.g. the sewers before a merge) does not invalidate the roots of each other.
+
+# Author:   Mallory Jordan
+# Contact:  maj0082@auburn.edu
+# ======================================================================================
+
+
+def createDrainRoots(nrOfStates=3):
+    """
+    This function creates the drain roots without any sewer network.
+
+    Input Arguments:
+    nrOfStates          --    Number of sewer networks for which the drain roots are kept
+
+    Output Arguments:
+    drainRoots          --    Dictionary with the states of the last updated sewer networks (the least recently used
+                              first, see getDrainRootState) and the number of states to keep
+    """
+    return {"states": [], "nrOfStates": nrOfStates}
+
+
+def getDrainRootState(drainRoots, sewers, create=True):
+    """
+    This function reads out the state of a sewer network (the same dictionary). If there is no state for the sewers,
+    the state of the least recently used sewers is taken over (if all states are used), so that only the differences
+    between the two sewer networks are updated.
+
+    Input Arguments:
+    drainRoots          --    Drain roots
+    sewers              --    Sewer Network
+    create              --    Criteria whether a state is created if there is none for the sewers
+
+    Output Arguments:
+    state               --    Dictionary with the sewers, the sewers of the last update (lastSewers), the nodes flowing
+                              into each node (upstreamNodes) and the calculated roots of the nodes or None
+    """
+    states = drainRoots["states"]
+    if states and states[-1]["sewers"] is sewers:
+        return states[-1]
+    for position, state in enumerate(states):
+        if state["sewers"] is sewers:
+            states.append(states.pop(position))  # Most recently used at the end
+            return state
+    if not create:
+        return None
+    if len(states) < drainRoots["nrOfStates"]:
+        state = {"sewers": sewers, "lastSewers": {}, "upstreamNodes": {}, "roots": {}}
+    else:
+        state = states.pop(0)
+        state["sewers"] = sewers
+    states.append(state)
+    return state
+
+
+def removeUpstreamNode(upstreamNodes, ID, downstreamNode):
+    """
+    This function removes a node from the nodes flowing into its downstream node.
+
+    Input Arguments:
+    upstreamNodes       --    Nodes flowing into each node
+    ID                  --    ID
+    downstreamNode      --    Node into which the node flowed
+    """
+    inflowingNodes = upstreamNodes.get(downstreamNode)
+    if inflowingNodes is not None:
+        inflowingNodes.discard(ID)
+        if len(inflowingNodes) == 0:
+            del upstreamNodes[downstreamNode]
+    return
+
+
+def updateDrainRoots(drainRoots, sewers):
+    """
+    This function updates the drain roots with the changes of the sewers since the last update of the same sewers. The
+    roots of the changed nodes and of all nodes flowing to them are deleted and calculated again when needed (see
+    getDrainRoot).
+
+    Input Arguments:
+    drainRoots          --    Drain roots
+    sewers              --    Sewer Network
+
+    Output Arguments:
+    changedEntries      --    Set with the new or changed entries of the sewers: {(ID, (downstream node, distance)),...}
+    removedNodes        --    Set with the nodes which are not in the sewers anymore
+    """
+    state = getDrainRootState(drainRoots, sewers)
+    lastSewers, upstreamNodes, roots = state["lastSewers"], state["upstreamNodes"], state["roots"]
+    changedEntries = sewers.items() - lastSewers.items()
+    removedNodes = lastSewers.keys() - sewers.keys()
+
+    if changedEntries or removedNodes:
+        for ID in removedNodes:
+            removeUpstreamNode(upstreamNodes, ID, lastSewers[ID][0])
+        for ID, entry in changedEntries:
+            if ID in lastSewers:
+                removeUpstreamNode(upstreamNodes, ID, lastSewers[ID][0])
+            if entry[0] != ():
+                upstreamNodes.setdefault(entry[0], set()).add(ID)
+
+        # Delete the roots of the changed nodes and of all nodes flowing to them
+        notValid = list(removedNodes) + [ID for ID, _ in changedEntries]
+        deleted = set()
+        while notValid:
+            ID = notValid.pop()
+            if ID not in deleted:
+                deleted.add(ID)
+                roots.pop(ID, None)
+                notValid.extend(upstreamNodes.get(ID, ()))
+        for ID in removedNodes:
+            del lastSewers[ID]
+        lastSewers.update(changedEntries)  # Only the changes are copied
+    return changedEntries, removedNodes
+
+
+def getDrainRoot(drainRoots, sewers, ID):
+    """
+    This function follows the sewers from a node downstream until a wwtp (a node flowing nowhere) or a node which is
+    not in the sewers is reached. With drain roots (updated with the same sewers, see updateDrainRoots), the roots of
+    all nodes on the way are stored, so that each node is only followed once.
+
+    Input Arguments:
+    drainRoots          --    Drain roots (or None: not stored, also if the sewers were not updated)
+    sewers              --    Sewer Network
+    ID                  --    ID
+
+    Output Arguments:
+    drainRoot           --    Last node (wwtp if it is in the sewers) or None if the sewers form a loop
+    """
+    state = getDrainRootState(drainRoots, sewers, False) if drainRoots is not None else None
+    roots = state["roots"] if state is not None else {}
+    path, onPath, element = [], set(), ID
+    while 1:
+        if element in roots:
+            drainRoot = roots[element]
+            break
+        if element in onPath:
+            drainRoot = None  # Loop
+            break
+        path.append(element)
+        onPath.add(element)
+        if element not in sewers or sewers[element][0] == ():
+            drainRoot = element
+            break
+        element = sewers[element][0]
+    if state is not None:
+        for element in path:
+            roots[element] = drainRoot
+    return drainRoot
+
+
+def flowsToWWTP(drainRoots, sewers, ID, wwtp):
+    """
+    This function checks whether a node flows to a wwtp of the sewers.
+
+    Input Arguments:
+    drainRoots          --    Drain roots (or None)
+    sewers              --    Sewer Network
+    ID                  --    ID
+    wwtp                --    ID of the wwtp
+
+    Output Arguments:
+    flowsTo             --    True if the node flows to the wwtp (or is the wwtp)
+    """
+    drainRoot = getDrainRoot(drainRoots, sewers, ID)
+    return drainRoot == wwtp and drainRoot in sewers
@@ -0,0 +1,160 @@
+# ======================================================================================
+# Copyright 2014  Swiss Federal Institute of Aquatic Science and Technology
+#
+# This file is part of SNIP (Sustainable Network Infrastructure Planning)
+# SNIP is used for determining the optimal degree of centralization for waste
+# water infrastructures. You find detailed information about SNIP in Eggimann et al. (2014).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Contact:   sven.eggimann@eawag.ch
+# Version    1.0
+# Date:      1.07.2015
+# Author:     Eggimann Sven
+# ======================================================================================
+# The SNIP model was updated and modified for use in rural Alabama in 2025.
+# For detailed information see Jordan et al. (in prep).
+
+# The model was modified for Python 3.11 to run on open source packages.
+# This module holds a grid index of points which can be changed while SNIP is calculated
+# (points are added, moved and removed). The points of the index are searched ring by ring
+# of grid cells around a location, starting with the closest ring.
+
+# Author:   Mallory Jordan
+# Contact:  maj0082@auburn.edu
+# ======================================================================================
+
+# Imports
+import math
+
+
+def createPointGrid(cellSize):
+    """
+    This function creates an empty grid index.
+
+    Input Arguments:
+    cellSize        --    [m] Size of the grid cells
+
+    Output Arguments:
+    grid            --    Dictionary with the points of each cell, the cell of each point and the range of used cells
+    """
+    return {"cellSize": float(cellSize), "cells": {}, "cellOfPoint": {}, "bounds": None}
+
+
+def getGridCell(grid, x, y):
+    """
+    This function calculates the cell of a location.
+
+    Input Arguments:
+    grid            --    Grid index
+    x, y            --    Coordinates
+
+    Output Arguments:
+    cell            --    (column, row)
+    """
+    return int(math.floor(x / grid["cellSize"])), int(math.floor(y / grid["cellSize"]))
+
+
+def addGridPoint(grid, ID, x, y, value):
+    """
+    This function adds a point to the grid index (or moves it, if it is already in the index).
+
+    Input Arguments:
+    grid            --    Grid index
+    ID              --    ID of the point
+    x, y            --    Coordinates
+    value           --    Value stored with the point (e.g. the coordinates)
+    """
+    removeGridPoint(grid, ID)
+    cell = getGridCell(grid, x, y)
+    grid["cells"].setdefault(cell, {})[ID] = value
+    grid["cellOfPoint"][ID] = cell
+
+    if grid["bounds"] is None:
+        grid["bounds"] = [cell[0], cell[1], cell[0], cell[1]]
+    else:
+        bounds = grid["bounds"]
+        bounds[0], bounds[1] = min(bounds[0], cell[0]), min(bounds[1], cell[1])
+        bounds[2], bounds[3] = max(bounds[2], cell[0]), max(bounds[3], cell[1])
+    return
+
+
+def removeGridPoint(grid, ID):
+    """
+    This function removes a point from the grid index (nothing happens if it is not in the index).
+
+    Input Arguments:
+    grid            --    Grid index
+    ID              --    ID of the point
+    """
+    cell = grid["cellOfPoint"].pop(ID, None)
+    if cell is not None:
+        points = grid["cells"][cell]
+        del points[ID]
+        if len(points) == 0:
+            del grid["cells"][cell]
+    return
+
+
+def iterateGridRings(grid, x, y):
+    """
+    This function iterates the cells of the grid index ring by ring around a location. The range of used cells
+    only grows, so removed points can lead to some empty rings at the border.
+
+    Input Arguments:
+    grid            --    Grid index
+    x, y            --    Coordinates of the location
+
+    Output Arguments:
+    minDistance     --    [m] Smallest possible planar distance between the location and a point of the ring
+    ringCells       --    List with the used cells of the ring and their points: [(cell, {ID: value}),...]
+    """
+    if grid["bounds"] is None:
+        return
+    cellSize, cells = grid["cellSize"], grid["cells"]
+    col, row = getGridCell(grid, x, y)
+    minCol, minRow, maxCol, maxRow = grid["bounds"]
+    maxRing = max(col - minCol, maxCol - col, row - minRow, maxRow - row)
+
+    for ring in range(max(maxRing, 0) + 1):
+        if ring == 0:
+            minDistance = 0.0
+            ringCells = [(col, row)]
+        else:
+            # Distance to the border of the cells within the ring
+            minDistance = max(0.0, min(x - (col - ring + 1) * cellSize, (col + ring) * cellSize - x,
+                                       y - (row - ring + 1) * cellSize, (row + ring) * cellSize - y))
+            ringCells = [(col + offset, row - ring) for offset in range(-ring, ring + 1)]
+            ringCells += [(col + offset, row + ring) for offset in range(-ring, ring + 1)]
+            ringCells += [(col - ring, row + offset) for offset in range(-ring + 1, ring)]
+            ringCells += [(col + ring, row + offset) for offset in range(-ring + 1, ring)]
+        yield minDistance, [(cell, cells[cell]) for cell in ringCells if cell in cells]
+
+
+def getCellDistance(grid, cell, x, y):
+    """
+    This function calculates the smallest planar distance between a location and a cell.
+
+    Input Arguments:
+    grid            --    Grid index
+    cell            --    (column, row)
+    x, y            --    Coordinates of the location
+
+    Output Arguments:
+    distance        --    [m] Distance (0 if the location is within the cell)
+    """
+    cellSize = grid["cellSize"]
+    distanceX = max(cell[0] * cellSize - x, 0.0, x - (cell[0] + 1) * cellSize)
+    distanceY = max(cell[1] * cellSize - y, 0.0, y - (cell[1] + 1) * cellSize)
+    return math.hypot(distanceX, distanceY)
@@ -0,0 +1,207 @@
+# ======================================================================================
+# Copyright 2014  Swiss Federal Institute of Aquatic Science and Technology
+#
+# This file is part of SNIP (Sustainable Network Infrastructure Planning)
+# SNIP is used for determining the optimal degree of centralization for waste
+# water infrastructures. You find detailed information about SNIP in Eggimann et al. (2014).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Contact:   sven.eggimann@eawag.ch
+# Version    1.0
+# Date:      1.07.2015
+# Author:     Eggimann Sven
+# ======================================================================================
+# The SNIP model was updated and modified for use in rural Alabama in 2025.
+# For detailed information see Jordan et al. (in prep).
+
+# The model was modified for Python 3.11 to run on open source packages.
+# This module runs parameter sweeps (e.g. sensitivity analysis of the cost factors). The input
+# is prepared once and only the SNIP calculation is run for each parameter combination in a
+# process pool. Replaces the subprocess loop of SNIP_experiment.py.
+
+# Author:   Mallory Jordan
+# Contact:  maj0082@auburn.edu
+# ======================================================================================
+
+# Imports
+import itertools, os, time
+import argparse
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from SNIP_open import *
+
+sweepPrepared = None  # Prepared input in the workers of the pool
+
+
+def createParameterGrid(parameterRanges):
+    """
+    This function creates all combinations of the parameter values.
+
+    Input Arguments:
+    parameterRanges     --  Dictionary with the values of each varied parameter, e.g. {"fc_SewerCost": [-0.1, 0.0, 0.1]}
+
+    Output Arguments:
+    parameterGrid       --  List with a dictionary of the varied parameters for each combination
+    """
+    names = list(parameterRanges)
+    parameterGrid = []
+    for values in itertools.product(*[parameterRanges[name] for name in names]):
+        parameterGrid.append(dict(zip(names, values)))
+    return parameterGrid
+
+
+def statisticsToDictionary(statistics):
+    """
+    This function converts the statistics of solve_snip_model into a dictionary.
+
+    Input Arguments:
+    statistics          --  Statistics (name and value alternating, then "name: value" entries)
+
+    Output Arguments:
+    row                 --  Dictionary with the statistics
+    """
+    row, pos = {}, 0
+    while pos < len(statistics):
+        entry = statistics[pos]
+        if isinstance(entry, str) and ": " in entry:
+            name, value = entry.split(": ", 1)
+            row[name] = float(value)
+            pos += 1
+        else:
+            row[entry] = statistics[pos + 1]
+            pos += 2
+    return row
+
+
+def initSweepWorker(prepared):
+    """
+    Initialisation of a worker of the pool. The prepared input is only sent once to each worker.
+
+    Input Arguments:
+    prepared            --  Prepared input (PreparedNetwork)
+    """
+    global sweepPrepared
+    sweepPrepared = prepared
+
+
+def runSweepScenario(scenarioNr, params, outListFolder, prepared=None):
+    """
+    This function runs the SNIP calculation of one parameter combination on a copy of the prepared input.
+
+    Input Arguments:
+    scenarioNr          --  Number of the parameter combination
+    params              --  Model parameters
+    outListFolder       --  Folder of the scenario (ending with "/")
+    prepared            --  Prepared input (if None, the input of the worker is used)
+
+    Output Arguments:
+    scenarioNr          --  Number of the parameter combination
+    statistics          --  Statistics of the scenario
+    """
+    if prepared is None:
+        prepared = sweepPrepared
+    result = solve(prepared, params, outListFolder)
+    return scenarioNr, result.statistics
+
+
+def runParameterSweep(in_street, buildings, inDHM, outListFolder, parameterRanges, workers=0, baseParameters=None,
+                      cacheFolder=None):
+    """
+    This function runs SNIP for all combinations of the parameter values. The shapefiles are read and
+    preprocessed once. The results of each combination are written into the folder scenario_<Nr> and the
+    statistics of all combinations into sweep_statistics.csv.
+
+    Input Arguments:
+    in_street           --  Street shapefile
+    buildings           --  Building shapefile
+    inDHM               --  DEM shapefile
+    outListFolder       --  Output folder
+    parameterRanges     --  Values of the varied parameters, e.g. {"fc_SewerCost": [-0.2, -0.1, 0.0, 0.1, 0.2]}
+    workers             --  Number of processes (0: number of cpus, 1: no pool)
+    baseParameters      --  Parameters which differ from the base parameters for all combinations (optional)
+    cacheFolder         --  Folder with the cached prepared inputs (optional, see preprocess)
+
+    Output Arguments:
+    sweepTable          --  Table (pandas DataFrame) with the varied parameters and the statistics of each combination
+    """
+    start = time.perf_counter()
+
+    if baseParameters is None:
+        baseParameters = {}
+    for name in parameterRanges:
+        if name in preprocessingParameters:
+            raise Exception("ERROR: Preprocessing parameter cannot be varied in a sweep: " + str(name))
+
+    outListFolder = outListFolder.replace("\\", "/").rstrip("/") + "/"
+    preprocessingFolder = outListFolder + "preprocessing/"
+    os.makedirs(preprocessingFolder, exist_ok=True)
+
+    # Preprocessing (once)
+    prepared = preprocess(in_street, buildings, inDHM, preprocessingFolder, get_model_parameters(**baseParameters), cacheFolder)
+
+    parameterGrid = createParameterGrid(parameterRanges)
+    scenarios = []
+    for scenarioNr, changedParameters in enumerate(parameterGrid):
+        params = get_model_parameters(**dict(baseParameters, **changedParameters))
+        scenarios.append((scenarioNr, params, outListFolder + "scenario_" + str(scenarioNr) + "/"))
+
+    # Run SNIP for each combination
+    allStatistics = {}
+    if workers == 1:
+        for scenarioNr, params, scenarioFolder in scenarios:
+            _, allStatistics[scenarioNr] = runSweepScenario(scenarioNr, params, scenarioFolder, prepared)
+    else:
+        if workers == 0:
+            workers = os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=initSweepWorker, initargs=(prepared,)) as executor:
+            futures = [executor.submit(runSweepScenario, scenarioNr, params, scenarioFolder) for scenarioNr, params, scenarioFolder in scenarios]
+            for future in futures:
+                scenarioNr, statistics = future.result()
+                allStatistics[scenarioNr] = statistics
+
+    # Collect statistics in one table
+    rows = []
+    for scenarioNr, changedParameters in enumerate(parameterGrid):
+        row = {"scenario": scenarioNr}
+        row.update(changedParameters)
+        row.update(statisticsToDictionary(allStatistics[scenarioNr]))
+        rows.append(row)
+    sweepTable = pd.DataFrame(rows)
+    sweepTable.to_csv(outListFolder + "sweep_statistics.csv", index=False)
+
+    print_runtime(start)
+    return sweepTable
+
+
+if __name__ == "__main__":
+    # Sensitivity analysis of the cost factors (5 x 5 x 5 combinations)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--street", required=True, help="Street shapefile path")
+    parser.add_argument("--buildings", required=True, help="Building shapefile path")
+    parser.add_argument("--dem", required=True, help="DEM shapefile path")
+    parser.add_argument("--outdir", required=True, help="Output folder")
+    parser.add_argument("--workers", type=int, default=0, help="Number of processes (0: number of cpus)")
+    parser.add_argument("--cache", required=False, help="Folder to cache the preprocessed input (optional)")
+
+    args = parser.parse_args()
+
+    parameterRanges = {
+        "fc_SewerCost": [-0.2, -0.1, 0.0, 0.1, 0.2],
+        "fc_wwtpOpex": [-0.2, -0.1, 0.0, 0.1, 0.2],
+        "fc_wwtpCapex": [-0.2, -0.1, 0.0, 0.1, 0.2]}
+
+    sweepTable = runParameterSweep(args.street, args.buildings, args.dem, args.outdir, parameterRanges, args.workers,
+                                   cacheFolder=args.cache)
+    print(sweepTable.to_string())
@@ -0,0 +1,277 @@
+# ======================================================================================
+# Copyright 2014  Swiss Federal Institute of Aquatic Science and Technology
+#
+# This file is part of SNIP (Sustainable Network Infrastructure Planning)
+# SNIP is used for determining the optimal degree of centralization for waste
+# water infrastructures. You find detailed information about SNIP in Eggimann et al. (2014).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Contact:   sven.eggimann@eawag.ch
+# Version    1.0
+# Date:      1.07.2015
+# Author:     Eggimann Sven
+# ======================================================================================
+# The SNIP model was updated and modified for use in rural Alabama in 2025.
+# For detailed information see Jordan et al. (in prep).
+
+# The model was modified for Python 3.11 to run on open source packages.
+# This module creates synthetic input shapefiles of any size for benchmarks: a street network
+# (regular grid or irregular network with cul-de-sacs), clustered parcel points with Q values and
+# the nearest point on the street (NEAR_X, NEAR_Y) and a fractal DEM (diamond-square algorithm).
+# The shapefiles have the same fields as the input of SNIP_open.py.
+
+# Author:   Mallory Jordan
+# Contact:  maj0082@auburn.edu
+# ======================================================================================
+
+# Imports
+import os, json, math
+import numpy as np
+import geopandas as gpd
+from shapely import STRtree
+from shapely.geometry import LineString, Point
+
+streetLayouts = ("grid", "organic")
+
+
+def getGridSize(nrSources, parcelsPerStreet=4):
+    """
+    This function calculates the number of street nodes per side of the network for a number of sources.
+
+    Input Arguments:
+    nrSources           --    Number of parcels
+    parcelsPerStreet    --    Average number of parcels per street segment
+
+    Output Arguments:
+    gridSize            --    Number of street nodes per side
+    """
+    return max(3, int(math.ceil(math.sqrt(nrSources / (2.0 * parcelsPerStreet)))) + 1)
+
+
+def createStreetNetwork(gridSize, blockSize, layout, rng, x0, y0):
+    """
+    This function creates the street segments. The segments meet at shared end points.
+
+    Input Arguments:
+    gridSize            --    Number of street nodes per side
+    blockSize           --    [m] Distance between the street nodes
+    layout              --    grid: regular grid, organic: shifted nodes, bent streets, tree (cul-de-sacs) with some loops
+    rng                 --    Random generator (numpy)
+    x0, y0              --    Lower left corner
+
+    Output Arguments:
+    streets             --    List with the street segments (LineString)
+    nodes               --    Array with the coordinates of the street nodes
+    """
+    if layout not in streetLayouts:
+        raise Exception("ERROR: Unknown street layout: " + str(layout))
+
+    cols, rows = np.meshgrid(np.arange(gridSize), np.arange(gridSize))
+    nodes = np.column_stack([x0 + cols.ravel() * blockSize, y0 + rows.ravel() * blockSize]).astype(float)
+    edges = [(r * gridSize + c, r * gridSize + c + 1) for r in range(gridSize) for c in range(gridSize - 1)]
+    edges += [(r * gridSize + c, (r + 1) * gridSize + c) for r in range(gridSize - 1) for c in range(gridSize)]
+
+    if layout == "grid":
+        return [LineString([nodes[a], nodes[b]]) for a, b in edges], nodes
+
+    # Organic network: shifted nodes, random spanning tree (cul-de-sacs) and 30 % of the other streets (loops)
+    nodes = nodes + rng.uniform(-0.3, 0.3, nodes.shape) * blockSize
+    order = rng.permutation(len(edges))
+    parent = list(range(len(nodes)))
+
+    def root(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    selectedEdges = []
+    for pos in order.tolist():
+        a, b = edges[pos]
+        rootA, rootB = root(a), root(b)
+        if rootA != rootB:
+            parent[rootA] = rootB
+            selectedEdges.append((a, b))
+        elif rng.random() < 0.3:
+            selectedEdges.append((a, b))
+
+    # Streets with a bend made of an x- and a y-parallel part. The inlets are only split exactly out
+    # of axis-parallel lines (see splitStreetwithInlets).
+    streets = []
+    for a, b in selectedEdges:
+        (xa, ya), (xb, yb) = nodes[a], nodes[b]
+        corner = (xb, ya) if rng.random() < 0.5 else (xa, yb)
+        streets.append(LineString([(xa, ya), corner, (xb, yb)]))
+    return streets, nodes
+
+
+def createParcels(nrSources, streets, nodes, blockSize, rng, nearRadius):
+    """
+    This function creates clustered parcel points around some street nodes (settlements) with the nearest
+    point on the street network.
+
+    Input Arguments:
+    nrSources           --    Number of parcels
+    streets             --    Street segments
+    nodes               --    Street nodes
+    blockSize           --    [m] Distance between the street nodes
+    rng                 --    Random generator (numpy)
+    nearRadius          --    [m] Parcels further away from the streets get no nearest point (NEAR_X = NEAR_Y = -1)
+
+    Output Arguments:
+    parcels             --    List with dictionaries with the fields of the parcel shapefile
+    """
+    nrClusters = max(1, nrSources // 200)
+    centers = nodes[rng.choice(len(nodes), nrClusters, replace=False if nrClusters <= len(nodes) else True)]
+    weights = rng.pareto(1.5, nrClusters) + 1.0  # Some large and many small settlements
+    clusters = rng.choice(nrClusters, nrSources, p=weights / weights.sum())
+    spread = rng.uniform(0.5, 2.0, nrClusters) * blockSize
+    positions = centers[clusters] + rng.normal(0.0, 1.0, (nrSources, 2)) * spread[clusters][:, None]
+
+    lower, upper = nodes.min(axis=0) - blockSize, nodes.max(axis=0) + blockSize
+    positions = np.clip(positions, lower, upper)
+
+    points = [Point(x, y) for x, y in positions.tolist()]
+    tree = STRtree(streets)
+    nearest = tree.nearest(points)
+
+    households = rng.geometric(0.6, nrSources)  # Households per parcel
+    parcels = []
+    for fid, (point, streetPos, household) in enumerate(zip(points, nearest.tolist(), households.tolist())):
+        street = streets[streetPos]
+        nearPoint = street.interpolate(street.project(point))
+        if nearPoint.distance(point) > nearRadius:
+            nearX, nearY = -1, -1  # Far from the road
+        else:
+            nearX, nearY = nearPoint.x, nearPoint.y
+        parcels.append({"FID": fid, "POINT_X": point.x, "POINT_Y": point.y, "Q": round(0.38 * household, 2),
+                        "NEAR_X": nearX, "NEAR_Y": nearY, "geometry": point})
+    return parcels
+
+
+def createFractalSurface(size, roughness, rng):
+    """
+    This function creates a fractal surface with the diamond-square algorithm.
+
+    Input Arguments:
+    size                --    Minimum number of cells per side
+    roughness           --    Decrease of the random displacement per level (0.5: smooth, 0.8: rough)
+    rng                 --    Random generator (numpy)
+
+    Output Arguments:
+    surface             --    Array (2^k + 1 cells per side) with values between -1 and 1
+    """
+    n = 2 ** int(math.ceil(math.log2(max(size - 1, 2)))) + 1
+    surface = np.zeros((n, n))
+    surface[::n - 1, ::n - 1] = rng.uniform(-1.0, 1.0, (2, 2))
+    step, scale = n - 1, 1.0
+    while step > 1:
+        half = step // 2
+
+        # Diamond step: centre of each square
+        surface[half::step, half::step] = (surface[:-1:step, :-1:step] + surface[step::step, :-1:step] +
+                                           surface[:-1:step, step::step] + surface[step::step, step::step]) / 4.0
+        surface[half::step, half::step] += rng.uniform(-scale, scale, surface[half::step, half::step].shape)
+
+        # Square step: middle of each edge (mean of the neighbours inside the surface)
+        padded = np.pad(surface, half, mode="constant", constant_values=np.nan)
+        for rowStart, colStart in ((0, half), (half, 0)):
+            rowsIdx = np.arange(rowStart, n, step)
+            colsIdx = np.arange(colStart, n, step)
+            r, c = np.meshgrid(rowsIdx + half, colsIdx + half, indexing="ij")
+            neighbours = np.stack([padded[r - half, c], padded[r + half, c], padded[r, c - half], padded[r, c + half]])
+            surface[np.ix_(rowsIdx, colsIdx)] = np.nanmean(neighbours, axis=0) + rng.uniform(-scale, scale, r.shape)
+
+        step, scale = half, scale * roughness
+
+    return surface / max(np.abs(surface).max(), 1e-12)
+
+
+def createDEMPoints(lower, upper, demCell, relief, roughness, rng):
+    """
+    This function creates the DEM points (cell centres) of a fractal terrain with a regional slope.
+
+    Input Arguments:
+    lower, upper        --    Lower left and upper right corner of the DEM
+    demCell             --    [m] Raster size
+    relief              --    [m] Height difference of the fractal terrain
+    roughness           --    Roughness of the fractal terrain (see createFractalSurface)
+    rng                 --    Random generator (numpy)
+
+    Output Arguments:
+    demPoints           --    List with dictionaries with the fields of the DEM shapefile
+    """
+    nrCols = int(math.ceil((upper[0] - lower[0]) / demCell)) + 1
+    nrRows = int(math.ceil((upper[1] - lower[1]) / demCell)) + 1
+    surface = createFractalSurface(max(nrCols, nrRows), roughness, rng)
+    slope = rng.uniform(-0.01, 0.01, 2)  # Regional slope
+
+    demPoints = []
+    for row in range(nrRows):
+        y = lower[1] + row * demCell
+        for col in range(nrCols):
+            x = lower[0] + col * demCell
+            z = 100.0 + relief * surface[row, col] + slope[0] * (x - lower[0]) + slope[1] * (y - lower[1])
+            demPoints.append({"POINT_X": x, "POINT_Y": y, "grid_code": z, "geometry": Point(x, y)})
+    return demPoints
+
+
+def createSyntheticInput(outFolder, nrSources, layout="grid", seed=1, blockSize=150.0, demCell=30.0, relief=20.0,
+                         roughness=0.6, nearRadius=300.0, crs="EPSG:32616"):
+    """
+    This function writes the synthetic input shapefiles (streets.shp, buildings.shp, dem.shp). Input which was
+    already created with the same arguments is not created again.
+
+    Input Arguments:
+    outFolder           --    Folder of the shapefiles
+    nrSources           --    Number of parcels
+    layout              --    Street network: grid or organic
+    seed                --    Seed of the random generator
+    blockSize           --    [m] Distance between the street nodes
+    demCell             --    [m] Raster size of the DEM
+    relief              --    [m] Height difference of the fractal terrain
+    roughness           --    Roughness of the fractal terrain (see createFractalSurface)
+    nearRadius          --    [m] Parcels further away from the streets are connected without street (NEAR_X = -1)
+    crs                 --    Coordinate system (projected, in meters)
+
+    Output Arguments:
+    in_street           --    Street shapefile
+    buildings           --    Parcel shapefile
+    inDHM               --    DEM shapefile
+    """
+    arguments = {"nrSources": nrSources, "layout": layout, "seed": seed, "blockSize": blockSize, "demCell": demCell,
+                 "relief": relief, "roughness": roughness, "nearRadius": nearRadius, "crs": crs}
+    os.makedirs(outFolder, exist_ok=True)
+    in_street, buildings, inDHM = (os.path.join(outFolder, name + ".shp") for name in ("streets", "buildings", "dem"))
+    pathArguments = os.path.join(outFolder, "synthetic.json")
+
+    if os.path.isfile(pathArguments) and all(os.path.isfile(path) for path in (in_street, buildings, inDHM)):
+        with open(pathArguments) as inFile:
+            if json.load(inFile) == arguments:
+                return in_street, buildings, inDHM
+
+    rng = np.random.default_rng(seed)
+    x0, y0 = 500000.0, 3600000.0
+    streets, nodes = createStreetNetwork(getGridSize(nrSources), blockSize, layout, rng, x0, y0)
+    parcels = createParcels(nrSources, streets, nodes, blockSize, rng, nearRadius)
+    lower, upper = nodes.min(axis=0) - 2 * blockSize, nodes.max(axis=0) + 2 * blockSize
+    demPoints = createDEMPoints(lower, upper, demCell, relief, roughness, rng)
+
+    gpd.GeoDataFrame(geometry=streets, crs=crs).to_file(in_street)
+    gpd.GeoDataFrame(parcels, crs=crs).to_file(buildings)
+    gpd.GeoDataFrame(demPoints, crs=crs).to_file(inDHM)
+    with open(pathArguments, "w") as outFile:
+        json.dump(arguments, outFile)
+    return in_street, buildings, inDHM
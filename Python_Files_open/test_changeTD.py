@@ -0,0 +1,314 @@
+# ======================================================================================
+# Copyright 2014  Swiss Federal Institute of Aquatic Science and Technology
+#
+# This file is part of SNIP (Sustainable Network Infrastructure Planning)
+# SNIP is used for determining the optimal degree of centralization for waste
+# water infrastructures. You find detailed information about SNIP in Eggimann et al. (2014).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Contact:   sven.eggimann@eawag.ch
+# Version    1.0
+# Date:      1.07.2015
+# Author:     Eggimann Sven
+# ======================================================================================
+# The SNIP model was updated and modified for use in rural Alabama in 2025.
+# For detailed information see Jordan et al. (in prep).
+
+# The model was modified for Python 3.11 to run on open source packages.
+# This module compares changeTD with its former implementation on generated paths.
+
+# Author:   Mallory Jordan
+# Contact:  maj0082@auburn.edu
+# ======================================================================================
+
+# Imports
+import copy, random
+import pytest
+from SNIP_functions_open import changeTD, fastCopyNodes, fastCopy, InvertandswapID, getTrenchDepth, getPns, \
+    addToEdgeList, removePumpCheck, checkIfIsPump, addPump
+from SNIP_positions_open import createPositionIndex, createEdgeChanges, applyEdgeChanges
+
+
+def checkTrenchLiftingReference(lastID, sewers, pumps, nodesCopy, nodes, trenchFrom, trenchTo, minhDiffRequired, posToNode,
+                                inflowNodes, toID, fromID, minSlope, pumpFlow, hTo, hFrom, minTD, maxTD):
+    """
+    Implementation of checkTrenchLifting before the single pass of changeTD (reference for the tests).
+
+    Input Arguments:
+    pathToNetwork         --    Path
+    sewers                --    Network
+    pumps                 --    List of pumps
+    nodesCopy             --    copy of nodes
+    nodes                 --    nodes
+    trenchFrom            --    Trench Depth From node
+    minhDiffRequired      --    Minimum required height difference
+    posToNode             --    Position To Node
+    inflowNodes           --    Inflowing nodes
+    toID                  --    ID To Node
+    fromID                --    ID From Node
+    minSlope              --    Slope Criteria
+    pumpFlow              --    Criteria whether the flow is pumped or not
+    hTo                   --    Height To node
+    hFrom                 --    Height from node
+    minTD                 --    Minimum trench depth
+    maxTD                 --    Maximum trench depth
+
+    Output Arguments:
+    nodesCopy             --    Updated nodes
+    pumps                 --    Updated list of pumps
+    """
+    pumps = removePumpCheck(pumps, toID)  # Check if at toflowing node a pump was installed. If yes, delete the pump
+    Zmin = hTo - minTD  # Intermediate Calculation
+    ZToDepth = trenchFrom - minhDiffRequired  # Intermediate Calculation
+
+    # If node has inflowing nodes or last node is reached
+    if toID in inflowNodes or toID == lastID:  # Node has inflowing nodes
+        isFreistehendeWWTP, liftTrenchDepth = True, 1  # If no connecting edge is found, the wwtp is freistehend and thus trenchlift is always possible.  # 0 means that trench can't be lifted
+
+        # Get nodes flowing to inflow node
+        for e in sewers:
+            if sewers[e][0] == toID:
+                isPump = checkIfIsPump(pumps, e)  # Check if not a pump. If water is alread
+                if isPump == False:  # Only calculate trench depth for inflowing edges if not pumped
+                    isFreistehendeWWTP = False  # criteria if is a detached wwtp
+                    lengthInflowNode = sewers[e][1]  # length to node in intework
+                    _, trenchInflowFrom, _ = getTrenchDepth(nodes, e)  # Get trench depth in inflowing nodes
+                    _, trenchTOID, _ = getTrenchDepth(nodes, toID)  # Get trench depth in inflowing nodes
+                    hDiffInflowNod = trenchInflowFrom - trenchTOID  # height difference new
+                    newSlopToInflow = round(float(hDiffInflowNod) / float(lengthInflowNode) * 100,
+                                            3)  # Calc slope. If positive, flows downstream
+                    if newSlopToInflow <= minSlope:  # if new calculated slope is less steep, lift trench. (and not goes upwards) RIESENBAUSTELLE
+                        liftTrenchDepth = 0  # inflow node can be changed and is no problem
+                break
+
+        if isFreistehendeWWTP == True:  # If is a wwtp with no network
+            liftTrenchDepth = 1  # lift trench
+
+        if liftTrenchDepth == 1:
+            if pumpFlow == True:  # If trench depth would be too deep
+                nodesCopy[posToNode][10] = Zmin  # Set new trench depth
+                newHeightDiff = nodesCopy[posToNode][
+                                    10] - trenchFrom  # Calculate height difference which needs to be pumped
+                if newHeightDiff <= 0:
+                    newHeightDiff = nodesCopy[posToNode][10] - ZToDepth
+                pumps = addPump(pumps, fromID, newHeightDiff, nodes)  # Add pump
+            else:  # free flow is possible and trench depth within limits
+                if ZToDepth > Zmin and hTo < hFrom:
+                    nodesCopy[posToNode][10] = Zmin  # Set new trench depth
+                else:
+                    nodesCopy[posToNode][10] = ZToDepth  # Set new trench depth
+                    if nodesCopy[posToNode][10] > Zmin:  # If trench depth is above minium possible trench depth
+                        nodesCopy[posToNode][10] = trenchFrom - minTD  # Set new trench depth
+        else:
+            if ZToDepth < hTo - maxTD:  # As trench lift is not possible, depth is not changed
+                newHeightDiff = nodesCopy[posToNode][
+                                    10] - trenchFrom  # Calculate height difference which needs to be pumped
+                if newHeightDiff <= 0:  # trenchFrom is higher than nodesCopy[posToNode][10]. Might occur because similar heights
+                    newHeightDiff = nodesCopy[posToNode][
+                                        10] - ZToDepth  # Even though there is a slope, not steep enough. Pump only the height it would need for free flow
+                pumps = addPump(pumps, fromID, newHeightDiff, nodes)  # Add pump
+            else:  # free flow is possible and trench depth within limits
+                if trenchFrom == trenchTo:  # Is the case in merging wwtps
+                    nodesCopy[posToNode][10] = ZToDepth
+                else:  # Don't change trench depth
+                    if ZToDepth < trenchTo:
+                        nodesCopy[posToNode][10] = ZToDepth  # Set new trench depth
+    else:
+        if pumpFlow == True:  # has no inflowing node. Free flow is not possible
+            nodesCopy[posToNode][10] = Zmin  # Change trenchDepth of toNode to minTD as the water is pumped
+            newHeightDiff = nodesCopy[posToNode][10] - trenchFrom  # Calculate height difference which needs to be
+            if newHeightDiff <= 0:
+                newHeightDiff = nodesCopy[posToNode][10] - ZToDepth
+            pumps = addPump(pumps, fromID, newHeightDiff, nodes)  # Add pump
+        else:
+            if ZToDepth > Zmin and hTo < hFrom:  # free flow is possible
+                nodesCopy[posToNode][10] = Zmin  # Set new trench depth
+            else:  # free flow is not possible
+                nodesCopy[posToNode][10] = ZToDepth  # Change trenchDepth of toNode
+    return nodesCopy, pumps
+
+
+def changeTDReference(nodes, edgesList, pumps, pathToNetwork, maxTD, minSlope, inflowNodes, sewers, minTD):
+    """
+    Implementation of changeTD before the single pass along the path and the changes of the edges (reference for
+    the tests).
+
+    Input Arguments:
+    nodes             --    List with nodes
+    edgesList         --    List with edges
+    pumps             --    List with pumps
+    pathToNetwork     --    Path
+    maxTD             --    Max Trench depth
+    minSlope          --    Minimum slope criteria
+    inflowNodes       --    Branch nodes
+    sewers            --    Sewer Network
+    minTD             --    Minimum Trench Depth
+
+    Output Arguments:
+    nodesCopy         --    Updated nodes
+    pumps             --    List with updated pumps
+    edgesList         --    List with edges where slope was recalulated is slope was laid (slope of pipes)
+    """
+    nodesCopy = fastCopyNodes(nodes)
+    edgesIDCopy = fastCopy(edgesList)
+    pathToNetwork = InvertandswapID(pathToNetwork)  # inverse and swap path
+
+    for i in pathToNetwork:  # iterate over path and change trechdepth if needed up to maximum trench depth
+        fromID, toID = i[0], i[1][0]
+        length = i[1][1]  # Read length
+        _, trenchFrom, hFrom = getTrenchDepth(nodesCopy, fromID)  # Get trenchHeight
+        positionToNode, trenchTo, hTo = getTrenchDepth(nodesCopy, toID)  # Get trenchHeight
+        minRequiredHDiff = (minSlope * length) / 100  # Minimum required hight difference for free flow
+
+        if trenchFrom - minRequiredHDiff > hTo - maxTD:  # Check if slope is steep enough and possible trench depth not too deep
+            pumpFlow, lastID = False, pathToNetwork[-1][1][0]
+            nodesCopy, pumps = checkTrenchLiftingReference(lastID, sewers, pumps, nodesCopy, nodes, trenchFrom, trenchTo,
+                                                  minRequiredHDiff, positionToNode, inflowNodes, toID, fromID, minSlope,
+                                                  pumpFlow, hTo, hFrom, minTD, maxTD)
+        else:
+            pumpFlow, lastID = True, pathToNetwork[-1][1][0]
+            nodesCopy, pumps = checkTrenchLiftingReference(lastID, sewers, pumps, nodesCopy, nodes, trenchFrom, trenchTo,
+                                                  minRequiredHDiff, positionToNode, inflowNodes, toID, fromID, minSlope,
+                                                  pumpFlow, hTo, hFrom, minTD, maxTD)
+
+        IDnew, cord_new, _, _, _, trenchTo = getPns(toID, nodesCopy)
+        IDold, cord_old, _, _, _, trenchFrom = getPns(fromID, nodesCopy)
+        newPipeSlope = (trenchFrom - trenchTo) / length  # New pipe slope
+
+        # Update slope in edgesIDCopy which becomes the slope of the pipe
+        for e in edgesIDCopy:
+            if e[0][0] == fromID and e[1][0] == toID:
+                e[3] = newPipeSlope * - 1  # Change slope with pipe installation
+                break
+
+            if e[1][0] == fromID and e[0][0] == toID:
+                e[3] = newPipeSlope  # Change slope with pipe installation
+                break
+
+        edgesIDCopy = addToEdgeList(edgesIDCopy, length, newPipeSlope, IDnew, IDold, cord_new, cord_old)
+    return nodesCopy, pumps, edgesIDCopy
+
+
+def createPathNetwork(seed, pathLength, withFlow):
+    """
+    This function generates the nodes, edges, pumps, sewers and the path to the network of changeTD.
+    Branches flow into the inflow nodes of the path (some of them pumped), the terrain along the path
+    rises and falls, so that trench lifts and pumps occur.
+
+    Input Arguments:
+    seed                       --    Seed of the random numbers
+    pathLength                 --    Number of edges in the path
+    withFlow                   --    If False, some nodes have no flow (pumping them raises an error)
+
+    Output Arguments:
+    nodes, edgeList, pumps     --    Nodes, edges and pumps
+    path, inflowNodes, sewers  --    Arguments of changeTD
+    """
+    rand = random.Random(seed)
+    nrOfNodes = pathLength + 1 + rand.randint(2, 8)
+    nodeIDs = rand.sample(range(1, 10 * nrOfNodes), nrOfNodes)
+    pathIDs, branchIDs = nodeIDs[:pathLength + 1], nodeIDs[pathLength + 1:]
+
+    nodes = []
+    for nodeID in nodeIDs:
+        height = rand.uniform(0, 8)
+        if withFlow:
+            flow, ownFlow = rand.choice([0.0, 1.5, 4.0]), rand.choice([0.5, 2.0, 3.25])
+        else:
+            flow, ownFlow = rand.choice([0.0, 0.0, 1.5]), rand.choice([0.0, 0.0, 2.0])
+        nodes.append([nodeID, rand.uniform(0, 500), rand.uniform(0, 500), height, flow, 0, 0, 0, ownFlow, [],
+                      height - rand.choice([0.5, 1.0, rand.uniform(0.3, 6.0)])])
+    coordinates = {node[0]: node[1:4] for node in nodes}
+
+    # Path from the first node to the network: [ID, [next ID, length]]
+    path = [[pathIDs[i], [pathIDs[i + 1], rand.uniform(5, 150)]] for i in range(pathLength)]
+
+    # Sewers with the path and branches flowing into nodes of the path
+    sewers = {}
+    for i in range(pathLength):
+        if rand.random() < 0.5:
+            sewers[pathIDs[i]] = pathIDs[i + 1], path[i][1][1]
+    inflowNodes = []
+    for branchID in branchIDs:
+        toID = rand.choice(pathIDs)
+        sewers[branchID] = toID, rand.uniform(5, 100)
+        if rand.random() < 0.7:
+            inflowNodes.append(toID)
+    sewers[pathIDs[-1]] = (), 0
+
+    # Edges of some path segments (in both directions) and of other nodes
+    edgeList = []
+    for ID0, ID1 in [(i[0], i[1][0]) for i in path] + [(rand.choice(nodeIDs), rand.choice(nodeIDs)) for _ in range(3)]:
+        if rand.random() < 0.6:
+            if rand.random() < 0.5:
+                ID0, ID1 = ID1, ID0
+            edgeList.append([[ID0] + coordinates[ID0], [ID1] + coordinates[ID1], rand.uniform(5, 150),
+                             rand.uniform(-0.05, 0.05), 0, 0])
+
+    # Pumps at some branch and path nodes
+    pumps = [[ID, rand.uniform(0.5, 3), rand.uniform(0.1, 2), 0] for ID in rand.sample(nodeIDs, 3)]
+    return nodes, edgeList, pumps, path, inflowNodes, sewers
+
+
+def runChangeTD(changeFunction, nodes, edgeList, pumps, path, inflowNodes, sewers, maxTD, minSlope, minTD):
+    """
+    This function runs changeTD (with the changes of the edges) or the reference on copies of the lists.
+
+    Output Arguments:
+    result                     --    (nodes, pumps, edges) or the message of the error
+    """
+    nodes, edgeList, pumps = copy.deepcopy(nodes), copy.deepcopy(edgeList), copy.deepcopy(pumps)
+    try:
+        if changeFunction is changeTD:
+            positionIndex = createPositionIndex()
+            nodesTD, pumpsTD, edgeChanges = changeTD(fastCopyNodes(nodes), createEdgeChanges(edgeList, positionIndex),
+                                                     pumps, path, maxTD, minSlope, inflowNodes, sewers, minTD,
+                                                     positionIndex)
+            edgesTD = applyEdgeChanges(edgeChanges)
+        else:
+            nodesTD, pumpsTD, edgesTD = changeTDReference(nodes, edgeList, pumps, path, maxTD, minSlope, inflowNodes,
+                                                          sewers, minTD)
+    except Exception as error:
+        return str(error)
+    return nodesTD, pumpsTD, edgesTD
+
+
+@pytest.mark.parametrize("pathLength", [1, 2, 3, 6, 15])
+@pytest.mark.parametrize("seed", range(40))
+def test_changeTD(seed, pathLength):
+    arguments = createPathNetwork(seed, pathLength, True)
+    for maxTD, minSlope, minTD in [(3, 0.3, 0.5), (8, 1.0, 1.0), (1.5, 0.1, 0.3)]:
+        result = runChangeTD(changeTD, *arguments, maxTD, minSlope, minTD)
+        assert result == runChangeTD(changeTDReference, *arguments, maxTD, minSlope, minTD)
+
+
+@pytest.mark.parametrize("pathLength", [2, 6])
+def test_changeTDPumpError(pathLength):
+    nrOfErrors = 0
+    for seed in range(60):
+        arguments = createPathNetwork(seed, pathLength, False)
+        result = runChangeTD(changeTD, *arguments, 1.5, 1.0, 0.3)
+        assert result == runChangeTD(changeTDReference, *arguments, 1.5, 1.0, 0.3)
+        nrOfErrors += isinstance(result, str)
+    assert nrOfErrors > 0
+
+
+def test_changeTDKeepsEdgeList():
+    nodes, edgeList, pumps, path, inflowNodes, sewers = createPathNetwork(0, 6, True)
+    edgesBefore = copy.deepcopy(edgeList)
+    positionIndex = createPositionIndex()
+    changeTD(fastCopyNodes(nodes), createEdgeChanges(edgeList, positionIndex), fastCopy(pumps), path, 3, 0.3,
+             inflowNodes, sewers, 0.5, positionIndex)
+    assert edgeList == edgesBefore
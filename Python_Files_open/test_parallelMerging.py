@@ -0,0 +1,79 @@
+# ======================================================================================
+# Copyright 2014  Swiss Federal Institute of Aquatic Science and Technology
+#
+# This file is part of SNIP (Sustainable Network Infrastructure Planning)
+# SNIP is used for determining the optimal degree of centralization for waste
+# water infrastructures. You find detailed information about SNIP in Eggimann et al. (2014).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Contact:   sven.eggimann@eawag.ch
+# Version    1.0
+# Date:      1.07.2015
+# Author:     Eggimann Sven
+# ======================================================================================
+# The SNIP model was updated and modified for use in rural Alabama in 2025.
+# For detailed information see Jordan et al. (in prep).
+
+# The model was modified for Python 3.11 to run on open source packages.
+# This module checks the parallel merging strategy on small synthetic inputs.
+
+# Author:   Mallory Jordan
+# Contact:  maj0082@auburn.edu
+# ======================================================================================
+
+# Imports
+import pytest
+import SNIP_functions_open
+from SNIP_functions_open import evaluateMergesOfSnapshot, applyMergeChanges, addSnapshotChanges
+from SNIP_open import get_model_parameters, preprocess, solve
+from SNIP_synthetic_open import createSyntheticInput
+
+
+@pytest.mark.parametrize("layout", ["grid", "organic"])
+def test_parallelMergingDropsOnlyRejectedWWTPs(tmp_path, monkeypatch, layout):
+    """
+    WWTPs which are not merged in a snapshot are only not checked again if they are still not merged after the
+    merges of the snapshot: each dropped wwtp is checked again against the lists at the time it is dropped.
+    """
+    snapshot, droppedWWTPs = {}, []
+
+    def recordSnapshot(executor, wwtpIDs, *snapshotLists):
+        snapshot["arguments"] = snapshotLists[5:]  # sortedListWWTPs, streetNetwork, routing and model parameters
+        return evaluateMergesOfSnapshot(executor, wwtpIDs, *snapshotLists)
+
+    def recordApply(mergeResult, nodes, sewers, pumps, edgeList, positionIndex):
+        lists = applyMergeChanges(mergeResult, nodes, sewers, pumps, edgeList, positionIndex)
+        if mergeResult["merge"] is None:
+            snapshot["applied"] = lists
+        return lists
+
+    def recordDrop(snapshotChanges, mergeResult, nodes, WWTPs, positionIndex):
+        addSnapshotChanges(snapshotChanges, mergeResult, nodes, WWTPs, positionIndex)
+        if mergeResult["merge"] is None:
+            nodes, sewers, pumps, edgeList = snapshot.pop("applied")
+            checked, = evaluateMergesOfSnapshot(None, [mergeResult["ID"]], nodes, WWTPs, sewers, edgeList, pumps,
+                                                *snapshot["arguments"])
+            droppedWWTPs.append((mergeResult["ID"], checked["merge"]))
+
+    monkeypatch.setattr(SNIP_functions_open, "evaluateMergesOfSnapshot", recordSnapshot)
+    monkeypatch.setattr(SNIP_functions_open, "applyMergeChanges", recordApply)
+    monkeypatch.setattr(SNIP_functions_open, "addSnapshotChanges", recordDrop)
+
+    in_street, buildings, inDHM = createSyntheticInput(str(tmp_path / "input"), 500, layout)
+    prepared = preprocess(in_street, buildings, inDHM, str(tmp_path / "prepared") + "/", get_model_parameters())
+    solve(prepared, get_model_parameters(mergeStrategy="parallel"), str(tmp_path / "result") + "/")
+
+    assert droppedWWTPs != []
+    assert [ID for ID, merge in droppedWWTPs if merge is not None] == []
@@ -0,0 +1,315 @@
+# ======================================================================================
+# Copyright 2014  Swiss Federal Institute of Aquatic Science and Technology
+#
+# This file is part of SNIP (Sustainable Network Infrastructure Planning)
+# SNIP is used for determining the optimal degree of centralization for waste
+# water infrastructures. You find detailed information about SNIP in Eggimann et al. (2014).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Contact:   sven.eggimann@eawag.ch
+# Version    1.0
+# Date:      1.07.2015
+# Author:     Eggimann Sven
+# ======================================================================================
+# The SNIP model was updated and modified for use in rural Alabama in 2025.
+# For detailed information see Jordan et al. (in prep).
+
+# The model was modified for Python 3.11 to run on open source packages.
+# This module compares updatePathLong with its former implementation on generated paths.
+
+# Author:   Mallory Jordan
+# Contact:  maj0082@auburn.edu
+# ======================================================================================
+
+# Imports
+import copy, random
+import pytest
+from SNIP_functions_open import updatePathLong, changeFlowInNode
+
+
+def updatePathLongReference(nodes, nodes_invert, path, sewersNoC, toNode):
+    """
+    Implementation of updatePathLong before the single pass along the path (reference for the tests).
+
+    Input Arguments:
+    nodes                      --    nodes
+    nodes_invert               --    nodes inversed direction flow
+    path                       --    Inverted path to nearest wwtp
+    sewersNoC                  --    Network before added new path
+    toNode                     --    Source
+
+    Output Arguments:
+    nodes_invert              --    Updated nodes
+    """
+    counter, finishReadingPath = 0, 0
+
+    # Change Flow of first node
+    for f in nodes_invert:
+        if f[0] == path[0]:
+            flowStartNode = f[4]  # Flow before [4] is set to zero in starting node
+
+            # Against Flow
+            for i in nodes:
+                if i[0] == path[1]:  # next element in path
+                    if i[4] != 0:
+                        flowAgainstDirection = i[4] + i[8]
+                        break
+                    else:
+                        if i[0] in sewersNoC:
+                            flowAgainstDirection = i[8]
+                        else:
+                            flowAgainstDirection = 0  # node was node connected, meaning that there is no againstFlow
+                        break
+
+            # Flows in Node
+            for t in nodes:
+                if t[0] == path[0]:
+                    flowInNode = t[4]
+                    break
+
+            startFlow = flowInNode - flowAgainstDirection
+            f[4] = startFlow
+            break
+
+    # Iterate path to swap wwtp
+    for entry in path:
+        counter += 1  # get next element
+        if counter == 1:
+            newest, secondNewest = 0, 0
+        if counter == 2:
+            secondNewest = 0
+        thirdNewest = secondNewest
+        secondNewest = newest
+
+        for i in nodes_invert:
+            if i[0] == entry:
+                newest = i
+                break
+
+        # Needed to get three points
+        if counter > 2 and finishReadingPath == 0:
+            newest, second, third = newest, secondNewest, thirdNewest
+
+            # Change flow along path to wwtp
+            for i in nodes_invert:
+                if i[0] == second[0]:  # Change flow in secondNewest
+                    if newest[0] == toNode:  # Last 3 nodes
+                        if secondNewest[8] == 0:  # Arrived at the end of path or only three entries
+                            if secondNewest[4] == 0:  # Connection to archPoint. Take over flow from node below
+                                updatedFlowSecondLast = third[4] + third[8]
+                                i[
+                                    4] = updatedFlowSecondLast  # change second last node
+                                nodes_invert = changeFlowInNode(nodes_invert, toNode,
+                                                                updatedFlowSecondLast)  # change last node
+                                break
+                            else:
+                                # only three nodes
+                                if third[0] == path[0]:
+                                    flowBefore = third[4] + third[8]  # As wwtp has now flow
+                                    if flowStartNode == second[4]:  # Check if there is inflow from other nodes
+                                        if newest[0] not in sewersNoC:
+                                            notAgainstFlow = second[4]
+                                        else:
+                                            notAgainstFlow = second[4] - (newest[4] + newest[8])
+                                    else:
+                                        if newest[0] not in sewersNoC:
+                                            notAgainstFlow = second[4]
+                                        else:
+                                            notAgainstFlow = second[4] - (newest[4] + newest[8])
+                                else:
+                                    flowBefore = third[4] + third[8]
+                                    if newest[0] not in sewersNoC:
+                                        notAgainstFlow = second[4]
+                                    else:
+                                        notAgainstFlow = second[4] - (newest[4] + newest[8])
+                                updatedFlowSecondLast = notAgainstFlow + flowBefore
+                                i[4] = updatedFlowSecondLast  # change second last node
+                                nodes_invert = changeFlowInNode(nodes_invert, toNode,
+                                                                updatedFlowSecondLast)  # change last node
+                                break
+                        else:
+                            if secondNewest[4] == 0:  # no flow
+                                flowBefore = third[4] + third[8]
+                                updatedFlowSecondLast = flowBefore
+                                flowForLast = second[8]
+                                i[4] = updatedFlowSecondLast  # change second last node
+                                nodes_invert = changeFlowInNode(nodes_invert, toNode,
+                                                                updatedFlowSecondLast + flowForLast)  # change last node
+                                break
+                            else:
+                                # first three nodes
+                                if third[0] == path[0]:
+                                    flowBefore = third[4] + third[8]
+
+                                    # Check if there is inflow from other nodes
+                                    if flowStartNode == second[4] + second[8]:
+                                        if newest[0] not in sewersNoC:
+                                            notAgainstFlow = second[4]
+                                        else:
+                                            notAgainstFlow = second[4] - (newest[4] + newest[8])
+                                    else:
+                                        if newest[0] not in sewersNoC:
+                                            notAgainstFlow = second[4]
+                                        else:
+                                            notAgainstFlow = second[4] - (newest[4] + newest[8])
+                                else:
+                                    flowBefore = third[4] + third[8]
+
+                                    if newest[
+                                        0] not in sewersNoC:  # If neweswt not in sewers, then the new branch is reached. Take over all flow
+                                        notAgainstFlow = second[4]
+                                    else:
+                                        notAgainstFlow = second[4] - (newest[4] + newest[8])
+                                flowForLast = secondNewest[8]
+                                updatedFlowSecondLast = notAgainstFlow + flowBefore
+                                i[4] = updatedFlowSecondLast  # change second last node
+                                nodes_invert = changeFlowInNode(nodes_invert, toNode,
+                                                                updatedFlowSecondLast + flowForLast)  # change last node
+                                break
+                        finishReadingPath = 1
+                        break
+                    else:  # Not Last 3 nodes, More than three nodes
+                        if secondNewest[8] == 0:
+                            if secondNewest[4] == 0:  # Connection to archPoint (unconnected point)
+                                updatedFlowSecondLast = third[4] + third[8]  # change second last
+                                i[4] = updatedFlowSecondLast  # change second last node
+                            else:
+                                if third[0] == path[0]:
+                                    flowBefore = third[8]
+                                    if flowStartNode == second[4]:  # Check if there is added flow
+                                        if newest[
+                                            0] not in sewersNoC:  # If neweswt not in sewers, then the new branch is reached. Take over all flow
+                                            notAgainstFlow = second[4]
+                                            flowBefore = third[4] + third[8]
+                                        else:
+                                            notAgainstFlow = second[4] - (newest[4] + newest[8])
+                                    else:
+                                        if newest[0] not in sewersNoC:
+                                            notAgainstFlow = second[4]
+                                            flowBefore = third[4] + third[8]
+                                        else:
+                                            notAgainstFlow = second[4] - (newest[4] + newest[8])
+                                            flowBefore = third[4] + third[8]
+                                else:  # not first 3 Points
+                                    flowBefore = third[4] + third[8]
+                                    if newest[
+                                        0] not in sewersNoC:  # If neweswt not in sewers, then the new branch is reached. Take over all flow
+                                        notAgainstFlow = second[4]
+                                    else:
+                                        notAgainstFlow = second[4] - (newest[4] + newest[8])
+                                updatedFlowSecondLast = notAgainstFlow + flowBefore
+                                i[4] = updatedFlowSecondLast  # change second last node
+                        else:  # is inhabited because has flow
+                            if secondNewest[4] == 0:  # inhabited point, no flow
+                                if newest[0] not in sewersNoC:
+                                    updatedFlowSecondLast = third[4] + third[8]  # change second last
+                                    i[4] = updatedFlowSecondLast  # change second last node
+                                else:
+                                    updatedFlowSecondLast = (third[4] - (newest[4] + newest[8])) + third[
+                                        8]  # change second last
+                                    i[4] = updatedFlowSecondLast  # change second last node
+                            else:  # There is flow
+                                if third[0] == path[0]:  # First 3 Points
+                                    flowBefore = third[4] + third[8]
+                                    if flowStartNode == second[4]:  # Check if there is added flow
+                                        if newest[0] not in sewersNoC:
+                                            notAgainstFlow = second[4]
+                                        else:
+                                            notAgainstFlow = second[4] - (newest[4] + newest[8])
+                                    else:
+                                        if newest[0] not in sewersNoC:
+                                            notAgainstFlow = second[4]
+                                        else:
+                                            notAgainstFlow = second[4] - (newest[4] + newest[8])
+                                else:  # not first 3 Points
+                                    flowBefore = third[4] + third[8]  # change second last node
+                                    if newest[0] not in sewersNoC:
+                                        notAgainstFlow = second[4]
+                                    else:
+                                        notAgainstFlow = second[4] - (newest[4] + newest[8])
+                                updatedFlowSecondLast = notAgainstFlow + flowBefore
+                                i[4] = updatedFlowSecondLast  # change second last node
+                    break
+    return nodes_invert
+
+
+def createPathNodes(seed, pathLength, flowType):
+    """
+    This function generates the nodes, the inverted nodes, the path and the network before the new path.
+    The flows are drawn from few values, so that nodes without flow and equal flows occur often.
+
+    Input Arguments:
+    seed                       --    Seed of the random numbers
+    pathLength                 --    Number of nodes in the path (at least 3)
+    flowType                   --    int or float flows
+
+    Output Arguments:
+    nodes, nodes_invert        --    Nodes and nodes inversed direction flow
+    path, sewersNoC, toNode    --    Arguments of updatePathLong
+    """
+    rand = random.Random(seed)
+    if flowType == int:
+        flows = [0, 0, 1, 2, 3, 5]
+    else:
+        flows = [0.0, 0.0, 0.5, 1.25, 2.75, rand.uniform(0.1, 10.0)]
+
+    nrOfNodes = pathLength + rand.randint(0, 5)
+    nodeIDs = rand.sample(range(1, 10 * nrOfNodes), nrOfNodes)
+
+    nodes, nodes_invert = [], []
+    for nodeID in nodeIDs:
+        ownFlow = rand.choice(flows)
+        node = [nodeID, rand.uniform(0, 100), rand.uniform(0, 100), rand.uniform(0, 10), rand.choice(flows), 0, 0, 0,
+                ownFlow, [], 0]
+        invertNode = copy.deepcopy(node)
+        if rand.random() < 0.5:
+            invertNode[4] = rand.choice(flows)
+        nodes.append(node)
+        nodes_invert.append(invertNode)
+    rand.shuffle(nodes_invert)
+
+    path = rand.sample(nodeIDs, pathLength)
+    sewersNoC = {nodeID: ((), 0) for nodeID in nodeIDs if rand.random() < 0.6}  # Nodes inside and outside
+    return nodes, nodes_invert, path, sewersNoC, path[-1]
+
+
+@pytest.mark.parametrize("flowType", [int, float])
+@pytest.mark.parametrize("pathLength", [3, 4, 5, 8, 20])
+@pytest.mark.parametrize("seed", range(40))
+def test_updatePathLong(seed, pathLength, flowType):
+    nodes, nodes_invert, path, sewersNoC, toNode = createPathNodes(seed, pathLength, flowType)
+    nodesA3 = updatePathLong(nodes, copy.deepcopy(nodes_invert), path, sewersNoC, toNode)
+    nodesA3Reference = updatePathLongReference(copy.deepcopy(nodes), copy.deepcopy(nodes_invert), path, sewersNoC,
+                                               toNode)
+    assert nodesA3 == nodesA3Reference
+
+
+@pytest.mark.parametrize("pathLength", [3, 6])
+def test_updatePathLongFirstNodeOutsideNetwork(pathLength):
+    for seed in range(20):
+        nodes, nodes_invert, path, sewersNoC, toNode = createPathNodes(seed, pathLength, float)
+        for nodeID in path:
+            sewersNoC.pop(nodeID, None)  # New branch: no node of the path is in the network
+        nodesA3 = updatePathLong(nodes, copy.deepcopy(nodes_invert), path, sewersNoC, toNode)
+        nodesA3Reference = updatePathLongReference(copy.deepcopy(nodes), copy.deepcopy(nodes_invert), path,
+                                                   sewersNoC, toNode)
+        assert nodesA3 == nodesA3Reference
+
+
+def test_updatePathLongKeepsNodes():
+    nodes, nodes_invert, path, sewersNoC, toNode = createPathNodes(0, 6, int)
+    nodesBefore = copy.deepcopy(nodes)
+    updatePathLong(nodes, nodes_invert, path, sewersNoC, toNode)
+    assert nodes == nodesBefore